@@ -1,6 +1,7 @@
 import os
 import ssl
-from flask import Flask
+from datetime import datetime
+from flask import Flask, jsonify, request
 from flask_cors import CORS
 from pathlib import Path
 from dotenv import load_dotenv
@@ -8,6 +9,10 @@ from dotenv import load_dotenv
 # Importar configuraciones y utilidades
 from config import Config
 from utils.json_encoder import CustomJSONProvider
+from utils.auth import get_auth_stats
+from database import get_pool_stats
+from comun import get_findings, get_statement_stats, init_metrics
+from comun.profiler import init_profiler
 
 # Importar blueprints de rutas
 from routes.auth import auth_bp
@@ -17,9 +22,7 @@ from routes.horarios import horarios_bp
 from routes.cumplimiento import cumplimiento_bp
 from routes.horas import horas_bp
 from routes.estado import estado_bp
-
-# Importar tareas programadas
-from tasks.scheduled_tasks import configurar_tarea_cierre_diario, configurar_reinicio_semanal
+from routes.analitica import analitica_bp
 
 # Cargar variables de entorno
 env_path = Path(__file__).parent / '.env'
@@ -47,6 +50,35 @@ def create_app():
     app.register_blueprint(cumplimiento_bp)
     app.register_blueprint(horas_bp)
     app.register_blueprint(estado_bp)
+    app.register_blueprint(analitica_bp)
+    
+    # Histogramas por ruta y por sentencia en /metrics y Server-Timing
+    init_metrics(app, 'ayudantes')
+    # Perfilado bajo demanda (X-Profile firmado o PROFILE_SAMPLE_RATE)
+    init_profiler(app, 'ayudantes')
+    
+    # Sonda del HEALTHCHECK del contenedor (healthcheck.py)
+    @app.route('/health', methods=['GET'])
+    def health():
+        return jsonify({'status': 'ok', 'pid': os.getpid()})
+    
+    # Tiempos acumulados por sentencia SQL y ocupación del pool (por proceso)
+    @app.route('/db_stats', methods=['GET'])
+    def db_stats():
+        reset = request.args.get('reset', '').lower() in ('1', 'true', 'yes')
+        return jsonify({
+            'pid': os.getpid(),
+            'timestamp': datetime.now().isoformat(),
+            'pool': get_pool_stats(),
+            'statements': get_statement_stats(reset=reset),
+            'auth': get_auth_stats(reset=reset)
+        })
+    
+    # Sentencias lentas y repetidas (N+1) por ruta (por proceso)
+    @app.route('/db_findings', methods=['GET'])
+    def db_findings():
+        reset = request.args.get('reset', '').lower() in ('1', 'true', 'yes')
+        return jsonify(dict(get_findings(reset=reset), pid=os.getpid(), timestamp=datetime.now().isoformat()))
     
     return app
 
@@ -54,17 +86,19 @@ def create_app():
 app = create_app()
 
 if __name__ == '__main__':
-    # Configurar tareas programadas
+    # Configurar tareas programadas (import diferido: con gunicorn corren en
+    # su propio proceso y la app no necesita apscheduler)
     try:
-        import apscheduler
-        configurar_tarea_cierre_diario()
-        configurar_reinicio_semanal()
-        print("Tareas programadas configuradas correctamente:")
-        print("- Cierre automático: diariamente a las 23:59")
-        print("- Reinicio semanal: domingos a las 23:55")
+        from tasks.scheduled_tasks import iniciar_tareas
+        if iniciar_tareas():
+            print("Tareas programadas configuradas correctamente:")
+            print("- Cierre automático: diariamente a las 23:59")
+            print("- Reinicio semanal: domingos a las 23:55")
     except ImportError:
         print("ADVERTENCIA: No se pudieron configurar las tareas programadas.")
         print("Instale 'apscheduler' con: pip install apscheduler")
+    except Exception as e:
+        print(f"ADVERTENCIA: No se pudieron iniciar las tareas programadas: {str(e)}")
     
     # Configurar SSL
     cert_path = 'certificate.pem'
@@ -85,5 +119,7 @@ if __name__ == '__main__':
         print(f"Error al configurar SSL: {str(e)}")
         exit(1)
     
-    print("Iniciando servidor HTTPS en 0.0.0.0:5000")
-    app.run(debug=True, host='0.0.0.0', port=5000, ssl_context=context)
\ No newline at end of file
+    # Servidor de desarrollo; en producción: gunicorn -c gunicorn.conf.py app:app
+    port = int(os.getenv('PORT', 5000))
+    print(f"Iniciando servidor HTTPS de desarrollo en 0.0.0.0:{port}")
+    app.run(debug=os.getenv('FLASK_DEBUG', '1') == '1', host='0.0.0.0', port=port, ssl_context=context)
\ No newline at end of file
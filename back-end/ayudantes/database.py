@@ -1,6 +1,13 @@
+import os
+import sys
 import pymysql
 from config import Config
 
+# Paquete compartido back-end/comun (en Docker se copia junto a la app)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from comun import export, get_pool
+from comun.config import backend_name
+
 def get_db_config():
     """Obtiene la configuración de la base de datos"""
     return {
@@ -13,6 +20,37 @@ def get_db_config():
         'cursorclass': pymysql.cursors.DictCursor
     }
 
+def get_pool_settings():
+    """Parámetros de conexión del pool (el cursor DictCursor lo pone el backend)"""
+    settings = get_db_config()
+    del settings['cursorclass']
+    return settings
+
+def app_pool():
+    """
+    Pool compartido (back-end/comun) de este proceso
+
+    Usa pymysql salvo que DB_BACKEND indique otro (sqlite para pruebas y
+    benchmarks sin servidor MySQL).
+    """
+    return get_pool('ayudantes', backend=backend_name('pymysql'), settings=get_pool_settings())
+
 def get_connection():
-    """Crea y retorna una nueva conexión a la base de datos"""
-    return pymysql.connect(**get_db_config())
\ No newline at end of file
+    """
+    Conexión del pool compartido (back-end/comun)
+
+    Se usa igual que una conexión de pymysql; close() la devuelve al pool.
+    """
+    return app_pool().acquire()
+
+def warm_pool(count=None):
+    """Abre por adelantado hasta count conexiones del pool de este proceso"""
+    return app_pool().warm(count)
+
+def get_pool_stats():
+    """Ocupación del pool de este proceso"""
+    return app_pool().stats()
+
+def stream_query(query, params=None, batch_size=1000):
+    """Ejecuta un SELECT con cursor sin buffer; las filas se traen al iterar"""
+    return export.stream_query(app_pool().backend, query, params, batch_size)
@@ -0,0 +1,79 @@
+"""
+Configuración de gunicorn para producción.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+- Workers y threads según los CPU (WEB_WORKERS, WEB_THREADS para fijarlos).
+- preload_app: la app se importa una vez en el master y los workers la
+  heredan; cada worker abre su propio pool (comun se reinicia tras el
+  fork) y lo calienta con WEB_POOL_WARM conexiones antes de atender.
+- Tareas programadas en un solo proceso aparte (tasks.scheduled_tasks),
+  lanzado por el master; los workers nunca las inician. SCHEDULER_PROCESS=0
+  para correrlo en otro lado (otro contenedor, systemd).
+- TLS en gunicorn solo si TLS_CERTFILE y TLS_KEYFILE están definidos; sin
+  ellos se sirve HTTP para un proxy que termina TLS (FORWARDED_ALLOW_IPS).
+"""
+import multiprocessing
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+
+cpus = multiprocessing.cpu_count()
+workers = int(os.getenv('WEB_WORKERS', cpus * 2 + 1))
+threads = int(os.getenv('WEB_THREADS', 4))
+# Con threads > 1 gunicorn usa el worker gthread
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+preload_app = True
+timeout = int(os.getenv('WEB_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+# Reciclar workers cada tantas peticiones. Apagado por defecto: al reciclar
+# se cortan las conexiones keep-alive abiertas y el cliente ve un error
+max_requests = int(os.getenv('WEB_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+# Cada thread puede tener una conexión: el pool no debería quedar corto
+os.environ.setdefault('MYSQL_POOL_SIZE', str(threads))
+pool_warm = int(os.getenv('WEB_POOL_WARM', min(threads, int(os.environ['MYSQL_POOL_SIZE']))))
+
+certfile = os.getenv('TLS_CERTFILE') or None
+keyfile = os.getenv('TLS_KEYFILE') or None
+forwarded_allow_ips = os.getenv('FORWARDED_ALLOW_IPS', '127.0.0.1')
+
+accesslog = os.getenv('ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.getenv('LOG_LEVEL', 'info').lower()
+
+_scheduler = None
+
+def when_ready(server):
+    """Lanza el proceso de tareas programadas cuando el master está listo"""
+    global _scheduler
+    if os.getenv('SCHEDULER_PROCESS', '1') == '0' or os.getenv('SCHEDULER_ENABLED', '1') == '0':
+        return
+    _scheduler = subprocess.Popen([sys.executable, '-m', 'tasks.scheduled_tasks'], cwd=HERE)
+    server.log.info(f"Tareas programadas en el proceso {_scheduler.pid}")
+
+def post_worker_init(worker):
+    """Calienta el pool del worker antes de aceptar peticiones"""
+    if pool_warm <= 0:
+        return
+    from database import warm_pool
+    try:
+        warm_pool(pool_warm)
+    except Exception as e:
+        worker.log.warning(f"No se pudo calentar el pool: {e}")
+
+def on_exit(server):
+    """Detiene el proceso de tareas programadas junto con el master"""
+    if _scheduler is not None and _scheduler.poll() is None:
+        _scheduler.terminate()
+        try:
+            _scheduler.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            _scheduler.kill()
@@ -0,0 +1,33 @@
+"""
+Sonda del HEALTHCHECK del contenedor: GET /health en el puerto de BIND.
+
+Usa el mismo criterio que gunicorn.conf.py para el esquema: HTTPS solo si
+TLS_CERTFILE y TLS_KEYFILE están definidos; si no, HTTP (TLS lo termina un
+proxy). Sale con código 1 si la respuesta no es 200.
+
+    python healthcheck.py
+"""
+import os
+import ssl
+import sys
+import urllib.request
+
+def health_url():
+    """URL de /health según BIND y la configuración TLS"""
+    bind = os.getenv('BIND', '0.0.0.0:5000')
+    port = bind.rsplit(':', 1)[-1]
+    tls = bool(os.getenv('TLS_CERTFILE')) and bool(os.getenv('TLS_KEYFILE'))
+    return f"{'https' if tls else 'http'}://127.0.0.1:{port}/health"
+
+def main():
+    # El certificado es de la app, no de 127.0.0.1: no se verifica
+    context = ssl._create_unverified_context()
+    try:
+        with urllib.request.urlopen(health_url(), timeout=5, context=context) as response:
+            sys.exit(0 if response.status == 200 else 1)
+    except Exception as e:
+        print(f"Healthcheck fallido: {e}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
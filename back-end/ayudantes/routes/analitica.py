@@ -0,0 +1,53 @@
+import io
+from flask import Blueprint, Response, request, jsonify
+from database import stream_query
+from utils.columnar import TABLES, arrow_schema, select_query, rows_to_batch
+from comun.export import batched
+
+analitica_bp = Blueprint('analitica', __name__)
+
+ARROW_STREAM_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+def drain(buffer):
+    """Devuelve lo escrito en el buffer y lo vacía"""
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+def arrow_stream(table, result, batch_size):
+    """Genera un stream Arrow IPC con un RecordBatch por lote de filas"""
+    import pyarrow as pa
+
+    buffer = io.BytesIO()
+    with pa.ipc.new_stream(buffer, arrow_schema(table)) as writer:
+        for rows in batched(result, batch_size):
+            writer.write_batch(rows_to_batch(table, rows))
+            yield drain(buffer)
+    yield drain(buffer)
+
+@analitica_bp.route('/arrow/<tabla>', methods=['GET'])
+def exportar_arrow(tabla):
+    """Lectura masiva de una tabla como stream Arrow IPC (desde_id opcional)"""
+    if tabla not in TABLES:
+        return jsonify({"error": f"Tabla no exportable. Use: {', '.join(TABLES)}"}), 404
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return jsonify({"error": "pyarrow no está instalado en el servidor"}), 501
+
+    try:
+        desde_id = int(request.args.get('desde_id', 0))
+        batch_size = min(max(int(request.args.get('lote', 10000)), 1), 100000)
+    except ValueError:
+        return jsonify({"error": "desde_id y lote deben ser enteros"}), 400
+
+    try:
+        result = stream_query(select_query(tabla), (desde_id,), batch_size=batch_size)
+        response = Response(arrow_stream(tabla, result, batch_size), mimetype=ARROW_STREAM_MIMETYPE)
+        response.headers['X-Accel-Buffering'] = 'no'
+        response.call_on_close(result.close)
+        return response
+    except Exception as e:
+        print(f"Error en export Arrow de {tabla}: {str(e)}")
+        return jsonify({"error": str(e)}), 500
@@ -1,212 +1,169 @@
 from flask import Blueprint, jsonify, request
 from datetime import datetime, time, timedelta, date
 from database import get_connection
-from utils.datetime_utils import get_current_datetime, convert_to_time, format_hora, get_week_dates
+from utils.datetime_utils import get_current_datetime, convert_to_time, format_hora
 from config import Config
+from tasks.reinicio_semanal import cerrar_semana
+from utils.cumplimiento import calcular_semanas, estado_semana, inicio_semana
 
 cumplimiento_bp = Blueprint('cumplimiento', __name__)
 
-@cumplimiento_bp.route('/cumplimiento', methods=['GET'])
-def get_cumplimiento():
-    """Obtener estado de cumplimiento de todos los usuarios"""
-    try:
-        conn = get_connection()
-        with conn.cursor() as cursor:
-            # Fecha y hora actual
-            now = get_current_datetime()
-            dia_actual = now.strftime('%A').lower()
-            dia_actual_esp = Config.DIAS_TRADUCCION.get(dia_actual, dia_actual)
-            hora_actual = now.strftime('%H:%M:%S')
-            fecha_actual = now.strftime('%Y-%m-%d')
+# Semanas como máximo en una consulta por rango (dos años)
+MAX_SEMANAS = 106
 
-            print(f"[DEBUG] Iniciando cálculo de cumplimiento. Fecha: {fecha_actual}, Día: {dia_actual_esp}")
+def parse_semana(valor):
+    """Lunes de una semana ISO 'YYYY-Www'"""
+    return datetime.strptime(f"{valor}-1", "%G-W%V-%u").date()
 
-            # Traer usuarios activos
-            cursor.execute("SELECT * FROM usuarios_permitidos WHERE activo = 1")
-            usuarios = cursor.fetchall()
+def etiqueta_semana(inicio):
+    """Semana ISO 'YYYY-Www' del lunes inicio"""
+    return inicio.strftime("%G-W%V")
 
-            resultado = []
+def resumen_usuario(user, now=None):
+    """
+    Estado de los bloques y de la semana de un ayudante (formato de /cumplimiento)
 
-            # Fecha de inicio de semana (lunes)
-            start_of_week = now - timedelta(days=now.weekday())
-            start_of_week_str = start_of_week.strftime('%Y-%m-%d')
+    Args:
+        user: Un elemento de clasificar_usuarios
+        now: Fecha y hora actual si la semana está en curso; los bloques de
+             hoy sin registros quedan Pendiente o Atrasado según la hora
+    """
+    dia_actual_esp = None
+    if now is not None:
+        dia_actual = now.strftime('%A').lower()
+        dia_actual_esp = Config.DIAS_TRADUCCION.get(dia_actual, dia_actual)
+        now_t = now.time().replace(microsecond=0, tzinfo=None)
 
-            for user in usuarios:
-                print(f"[DEBUG] Procesando usuario: {user['nombre']} {user['apellido']} ({user['email']})")
-                
-                # Traer sus horarios asignados
-                cursor.execute(
-                    "SELECT * FROM horarios_asignados WHERE usuario_id = %s",
-                    (user['id'],)
-                )
-                horarios = cursor.fetchall()
+    bloques = []
+    bloques_info = []
+    cumplidos = incompletos = ausentes = pendientes = 0
 
-                # Si no tiene horarios, "No Aplica"
-                if not horarios:
-                    resultado.append({
-                        "nombre": user['nombre'],
-                        "apellido": user['apellido'],
-                        "email": user['email'],
-                        "estado": "No Aplica",
-                        "bloques": [],
-                        "bloques_info": []
-                    })
-                    continue
+    for h, clasificacion in user['bloques']:
+        bloque_label = f"{h['dia']} {h['hora_entrada']}-{h['hora_salida']}"
+        bloques.append(bloque_label)
 
-                bloques = []
-                bloques_info = []
-                cumplidos = 0
-                incompletos = 0
-                ausentes = 0
-                pendientes = 0
+        dia_horario = h['dia'].lower()
+        hoy = Config.DIAS_TRADUCCION.get(dia_horario, dia_horario) == dia_actual_esp
 
-                # Un bloque por cada horario
-                for h in horarios:
-                    print(f"[DEBUG] Procesando bloque: {h['dia']} {h['hora_entrada']}-{h['hora_salida']}")
-                    
-                    bloque_label = f"{h['dia']} {h['hora_entrada']}-{h['hora_salida']}"
-                    bloques.append(bloque_label)
+        if clasificacion == 'Cumplido':
+            bloque_estado = "Cumplido"
+            cumplidos += 1
+        elif clasificacion == 'Incompleto':
+            bloque_estado = "Incompleto"
+            incompletos += 1
+        elif hoy and now_t < convert_to_time(h['hora_entrada']):
+            bloque_estado = "Pendiente"
+            pendientes += 1
+        elif hoy and now_t < convert_to_time(h['hora_salida']):
+            bloque_estado = "Atrasado"
+            incompletos += 1
+        else:
+            bloque_estado = "Ausente"
+            ausentes += 1
 
-                    # Default
-                    bloque_estado = "Ausente"
+        bloques_info.append({
+            "bloque": bloque_label,
+            "estado": bloque_estado
+        })
 
-                    # Convertir horas a datetime.time
-                    hora_entrada_dt = convert_to_time(h['hora_entrada'])
-                    hora_salida_dt = convert_to_time(h['hora_salida'])
+    if bloques and pendientes > 0 and ausentes == 0 and incompletos == 0:
+        estado_usuario = "Pendiente"
+    else:
+        estado_usuario = estado_semana(cumplidos, incompletos, ausentes, len(bloques))
 
-                    # Obtener registros de ese día o semana
-                    dia_horario = h['dia'].lower()
-                    dia_en_espanol = Config.DIAS_TRADUCCION.get(dia_horario, dia_horario)
-                    
-                    print(f"[DEBUG] Día actual: {dia_actual_esp}, Día del bloque: {dia_horario} / {dia_en_espanol}")
+    return {
+        "nombre": user['nombre'],
+        "apellido": user['apellido'],
+        "email": user['email'],
+        "estado": estado_usuario,
+        "bloques": bloques,
+        "bloques_info": bloques_info,
+        "cumplidos": cumplidos,
+        "incompletos": incompletos,
+        "ausentes": ausentes
+    }
 
-                    if dia_en_espanol == dia_actual_esp:
-                        cursor.execute("""
-                            SELECT * FROM registros
-                            WHERE email = %s AND fecha = %s
-                            ORDER BY hora
-                        """, (user['email'], fecha_actual))
-                    else:
-                        cursor.execute("""
-                            SELECT * FROM registros
-                            WHERE email = %s
-                              AND (LOWER(dia) = %s OR LOWER(dia) = %s)
-                              AND fecha BETWEEN %s AND %s
-                            ORDER BY fecha DESC, hora
-                        """, (user['email'], dia_en_espanol, dia_horario, start_of_week_str, fecha_actual))
+@cumplimiento_bp.route('/cumplimiento', methods=['GET'])
+def get_cumplimiento():
+    """
+    Obtener estado de cumplimiento de todos los usuarios
 
-                    registros_del_dia = cursor.fetchall()
-                    print(f"[DEBUG] Registros encontrados para el día: {len(registros_del_dia)}")
+    Sin parámetros, la semana actual. Con ?semana=YYYY-Www, esa semana ISO.
+    Con ?desde=YYYY-MM-DD&hasta=YYYY-MM-DD, todas las semanas que tocan el
+    rango y el total por ayudante. Ver utils/cumplimiento.py.
+    """
+    try:
+        now = get_current_datetime()
+        hoy = now.date()
+        semana = request.args.get('semana')
+        desde = request.args.get('desde')
+        hasta = request.args.get('hasta')
 
-                    # Revisar registros de entrada y salida para determinar estado del bloque
-                    cumplio_bloque = False
-                    incompleto_bloque = False
-                    
-                    # Separar registros por tipo
-                    entradas = [r for r in registros_del_dia if r['tipo'] == 'Entrada']
-                    salidas = [r for r in registros_del_dia if r['tipo'] == 'Salida']
-                    
-                    print(f"[DEBUG] Entradas: {len(entradas)}, Salidas: {len(salidas)}")
-                    
-                    # Verificar si hay al menos una entrada y una salida
-                    if entradas and salidas:
-                        for entrada in entradas:
-                            t_entrada = convert_to_time(entrada['hora'])
-                            
-                            print(f"[DEBUG] Procesando entrada id:{entrada['id']} hora:{t_entrada}")
-                            
-                            for salida in salidas:
-                                # Solo considerar salidas posteriores a esta entrada
-                                if salida['id'] > entrada['id']:
-                                    t_salida = convert_to_time(salida['hora'])
-                                    
-                                    print(f"[DEBUG] Comparando con salida id:{salida['id']} hora:{t_salida}")
-                                    
-                                    # Verificar si cumplió el bloque completo
-                                    if (t_entrada <= hora_entrada_dt and t_salida >= hora_salida_dt):
-                                        cumplio_bloque = True
-                                        print(f"[DEBUG] CUMPLIDO! Entrada a tiempo/antes y salida a tiempo/después")
-                                        break
-                                    elif (t_entrada > hora_entrada_dt and t_entrada < hora_salida_dt and t_salida >= hora_salida_dt):
-                                        incompleto_bloque = True
-                                        print(f"[DEBUG] INCOMPLETO - Entrada tarde, salida a tiempo/después")
-                                    elif (t_entrada <= hora_entrada_dt and t_salida < hora_salida_dt):
-                                        incompleto_bloque = True
-                                        print(f"[DEBUG] INCOMPLETO - Entrada a tiempo/antes, salida temprana")
-                                    elif (t_entrada < hora_salida_dt and t_salida > hora_entrada_dt):
-                                        incompleto_bloque = True
-                                        print(f"[DEBUG] INCOMPLETO - Presencia parcial en el bloque")
-                            
-                            if cumplio_bloque:
-                                break
+        try:
+            if desde or hasta:
+                desde = datetime.strptime(desde, '%Y-%m-%d').date() if desde else hoy
+                hasta = datetime.strptime(hasta, '%Y-%m-%d').date() if hasta else hoy
+                inicios = []
+                inicio = inicio_semana(desde)
+                while inicio <= hasta:
+                    inicios.append(inicio)
+                    inicio += timedelta(days=7)
+            else:
+                inicios = [parse_semana(semana) if semana else inicio_semana(hoy)]
+        except ValueError:
+            return jsonify({"error": "Use semana=YYYY-Www o desde/hasta=YYYY-MM-DD"}), 400
+        if not inicios:
+            return jsonify({"error": "desde es posterior a hasta"}), 400
+        if len(inicios) > MAX_SEMANAS:
+            return jsonify({"error": f"El rango no puede superar {MAX_SEMANAS} semanas"}), 400
 
-                    # Determinar estado según día actual o no
-                    if dia_en_espanol == dia_actual_esp:
-                        now_t = datetime.strptime(hora_actual, "%H:%M:%S").time()
-                        
-                        if cumplio_bloque:
-                            bloque_estado = "Cumplido"
-                            cumplidos += 1
-                        elif incompleto_bloque:
-                            bloque_estado = "Incompleto"
-                            incompletos += 1
-                        elif now_t < hora_entrada_dt:
-                            bloque_estado = "Pendiente"
-                            pendientes += 1
-                        elif now_t >= hora_entrada_dt and now_t < hora_salida_dt:
-                            bloque_estado = "Atrasado"
-                            incompletos += 1
-                        else:
-                            bloque_estado = "Ausente"
-                            ausentes += 1
-                    else:
-                        # Para días anteriores de la semana
-                        if cumplio_bloque:
-                            bloque_estado = "Cumplido"
-                            cumplidos += 1
-                        elif incompleto_bloque:
-                            bloque_estado = "Incompleto"
-                            incompletos += 1
-                        else:
-                            bloque_estado = "Ausente"
-                            ausentes += 1
+        conn = get_connection()
+        try:
+            with conn.cursor() as cursor:
+                semanas = calcular_semanas(cursor, inicios, hoy)
+        finally:
+            conn.close()
 
-                    print(f"[DEBUG] Estado bloque: {bloque_estado} (Cumplido: {cumplio_bloque}, Incompleto: {incompleto_bloque})")
-                    
-                    bloques_info.append({
-                        "bloque": bloque_label,
-                        "estado": bloque_estado
-                    })
+        def resumen_semana(inicio):
+            en_curso = inicio <= hoy <= inicio + timedelta(days=6)
+            return [resumen_usuario(user, now if en_curso else None) for user in semanas[inicio]]
 
-                # Estado general del usuario para la semana
-                print(f"[DEBUG] Usuario {user['email']} - Cumplidos: {cumplidos}, Incompletos: {incompletos}, Ausentes: {ausentes}, Pendientes: {pendientes}")
-                
-                if len(horarios) == 0:
-                    estado_usuario = "No Aplica"
-                elif pendientes > 0 and ausentes == 0 and incompletos == 0:
-                    estado_usuario = "Pendiente"
-                elif cumplidos == len(horarios):
-                    estado_usuario = "Cumple"
-                elif ausentes == len(horarios):
-                    estado_usuario = "Ausente"
-                elif incompletos > 0 or (cumplidos > 0 and ausentes > 0):
-                    estado_usuario = "Incompleto"
-                else:
-                    estado_usuario = "No Cumple"
-                
-                print(f"[DEBUG] Estado final usuario: {estado_usuario}")
+        if not (desde or hasta):
+            return jsonify(resumen_semana(inicios[0]))
 
-                resultado.append({
-                    "nombre": user['nombre'],
-                    "apellido": user['apellido'],
-                    "email": user['email'],
-                    "estado": estado_usuario,
-                    "bloques": bloques,
-                    "bloques_info": bloques_info
+        resultado = []
+        totales = {}
+        for inicio in inicios:
+            usuarios = resumen_semana(inicio)
+            resultado.append({
+                "semana": etiqueta_semana(inicio),
+                "inicio": inicio.isoformat(),
+                "fin": (inicio + timedelta(days=6)).isoformat(),
+                "usuarios": [
+                    {key: u[key] for key in ('email', 'estado', 'cumplidos', 'incompletos', 'ausentes')}
+                    for u in usuarios
+                ]
+            })
+            for u in usuarios:
+                total = totales.setdefault(u['email'], {
+                    "nombre": u['nombre'],
+                    "apellido": u['apellido'],
+                    "email": u['email'],
+                    "cumplidos": 0,
+                    "incompletos": 0,
+                    "ausentes": 0,
+                    "semanas_cumple": 0
                 })
+                for key in ('cumplidos', 'incompletos', 'ausentes'):
+                    total[key] += u[key]
+                total["semanas_cumple"] += u['estado'] == "Cumple"
 
-        conn.close()
-        return jsonify(resultado)
+        return jsonify({
+            "desde": desde.isoformat(),
+            "hasta": hasta.isoformat(),
+            "semanas": resultado,
+            "totales": list(totales.values())
+        })
 
     except Exception as e:
         print(f"Error en cumplimiento: {e}")
@@ -399,181 +356,22 @@ def diagnostico_cumplimiento(email):
 
 @cumplimiento_bp.route('/reiniciar_cumplimiento', methods=['POST'])
 def reiniciar_cumplimiento():
-    """Reiniciar cumplimiento semanal y guardar historial"""
+    """
+    Reiniciar cumplimiento semanal y guardar historial de la semana actual
+    (o de la que contiene 'semana' del JSON), ver tasks/reinicio_semanal.py
+    """
     try:
-        conn = get_connection()
-        
-        # Fecha actual
-        now = get_current_datetime()
-        fecha_actual = now.strftime('%Y-%m-%d')
-        
-        # 1. Crear tabla de historial si no existe
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS historial_cumplimiento (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    usuario_id INT,
-                    email VARCHAR(255),
-                    nombre VARCHAR(100),
-                    apellido VARCHAR(100),
-                    semana_inicio DATE,
-                    semana_fin DATE,
-                    estado VARCHAR(50),
-                    cumplidos INT,
-                    incompletos INT,
-                    ausentes INT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            conn.commit()
-        
-        # 2. Obtener cumplimiento actual para guardar en historial
-        with conn.cursor() as cursor:
-            # Fecha de inicio de semana (lunes) y fin (domingo)
-            start_of_week, end_of_week = get_week_dates()
-            inicio_semana_str = start_of_week.strftime('%Y-%m-%d')
-            fin_semana_str = end_of_week.strftime('%Y-%m-%d')
-            
-            # Obtener usuarios activos y sus horarios
-            cursor.execute("SELECT * FROM usuarios_permitidos WHERE activo = 1")
-            usuarios = cursor.fetchall()
-            
-            historial_insertado = 0
-            
-            for user in usuarios:
-                # Calcular cumplimiento actual para este usuario
-                cursor.execute(
-                    "SELECT * FROM horarios_asignados WHERE usuario_id = %s",
-                    (user['id'],)
-                )
-                horarios = cursor.fetchall()
-                
-                if not horarios:
-                    continue
-                
-                # Obtener los registros de esta semana
-                cursor.execute("""
-                    SELECT * FROM registros 
-                    WHERE email = %s AND fecha BETWEEN %s AND %s
-                    ORDER BY fecha, hora
-                """, (user['email'], inicio_semana_str, fecha_actual))
-                
-                registros_semana = cursor.fetchall()
-                
-                # Contar estados
-                cumplidos = 0
-                incompletos = 0
-                ausentes = 0
-                
-                # Procesamiento simplificado para conteo
-                for h in horarios:
-                    dia_semana = h['dia'].lower()
-                    
-                    # Verificar si hay registros para este día y horario
-                    cumplio_bloque = False
-                    incompleto_bloque = False
-                    
-                    # Filtrar registros por día de la semana
-                    registros_dia = [r for r in registros_semana if r['dia'].lower() == dia_semana]
-                    
-                    # Obtener horas de entrada y salida para este bloque
-                    hora_entrada_dt = convert_to_time(h['hora_entrada'])
-                    hora_salida_dt = convert_to_time(h['hora_salida'])
-                    
-                    # Verificar cumplimiento simplificado para historial
-                    entradas = [r for r in registros_dia if r['tipo'] == 'Entrada']
-                    salidas = [r for r in registros_dia if r['tipo'] == 'Salida']
-                    
-                    if entradas and salidas:
-                        for entrada in entradas:
-                            t_entrada = convert_to_time(entrada['hora'])
-                            
-                            for salida in salidas:
-                                if salida['id'] > entrada['id']:
-                                    t_salida = convert_to_time(salida['hora'])
-                                    
-                                    # Verificar cumplimiento
-                                    if t_entrada <= hora_entrada_dt and t_salida >= hora_salida_dt:
-                                        cumplio_bloque = True
-                                        break
-                                    elif ((t_entrada > hora_entrada_dt and t_entrada < hora_salida_dt and t_salida >= hora_salida_dt) or
-                                          (t_entrada <= hora_entrada_dt and t_salida < hora_salida_dt) or
-                                          (t_entrada < hora_salida_dt and t_salida > hora_entrada_dt)):
-                                        incompleto_bloque = True
-                            
-                            if cumplio_bloque:
-                                break
-                    
-                    # Incrementar contadores
-                    if cumplio_bloque:
-                        cumplidos += 1
-                    elif incompleto_bloque:
-                        incompletos += 1
-                    else:
-                        ausentes += 1
-                
-                # Determinar estado general para el historial
-                if len(horarios) == 0:
-                    estado = "No Aplica"
-                elif cumplidos == len(horarios):
-                    estado = "Cumple"
-                elif ausentes == len(horarios):
-                    estado = "Ausente"
-                elif incompletos > 0 or (cumplidos > 0 and ausentes > 0):
-                    estado = "Incompleto"
-                else:
-                    estado = "No Cumple"
-                
-                # Guardar en historial
-                cursor.execute("""
-                    INSERT INTO historial_cumplimiento
-                    (usuario_id, email, nombre, apellido, semana_inicio, semana_fin, 
-                     estado, cumplidos, incompletos, ausentes)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    user['id'],
-                    user['email'],
-                    user['nombre'],
-                    user['apellido'],
-                    inicio_semana_str,
-                    fin_semana_str,
-                    estado,
-                    cumplidos,
-                    incompletos,
-                    ausentes
-                ))
-                
-                historial_insertado += 1
-            
-            conn.commit()
-        
-        # 3. Establecer marca para indicar nuevo inicio de semana
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS sistema_config (
-                    clave VARCHAR(50) PRIMARY KEY,
-                    valor TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Actualizar la fecha de último reinicio
-            cursor.execute("""
-                INSERT INTO sistema_config (clave, valor) 
-                VALUES ('ultimo_reinicio_cumplimiento', %s)
-                ON DUPLICATE KEY UPDATE valor = %s
-            """, (fecha_actual, fecha_actual))
-            
-            conn.commit()
-        
-        conn.close()
-        
-        return jsonify({
+        data = request.get_json(silent=True) or {}
+        try:
+            semana = datetime.strptime(data['semana'], "%Y-%m-%d").date() if data.get('semana') else None
+            resultado = cerrar_semana(semana)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        resultado.update({
             "mensaje": "Reinicio de cumplimiento semanal completado",
-            "fecha_reinicio": fecha_actual,
-            "registros_historial": historial_insertado
+            "fecha_reinicio": get_current_datetime().strftime('%Y-%m-%d'),
         })
+        return jsonify(resultado)
         
     except Exception as e:
         print(f"Error en reinicio de cumplimiento: {e}")
@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta
-from database import get_connection
+from database import get_connection, stream_query
+from comun import repositorio
 from utils.datetime_utils import get_current_datetime
+from comun.export import EXPORT_FORMATS, export_response
 from config import Config
 
 registros_bp = Blueprint('registros', __name__)
@@ -66,6 +68,37 @@ def get_registros_hoy():
         print(f"Error al obtener registros de hoy: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@registros_bp.route('/exportar_registros', methods=['GET'])
+def exportar_registros():
+    """Exportar registros entre fechas como NDJSON o CSV (streaming, gzip opcional)"""
+    inicio = request.args.get('inicio')
+    fin = request.args.get('fin')
+    formato = request.args.get('formato', 'ndjson').lower()
+    comprimir = request.args.get('gzip', '').lower() in ('1', 'true', 'si')
+
+    if not inicio or not fin:
+        return jsonify({"error": "Se requieren las fechas de inicio y fin"}), 400
+    try:
+        datetime.strptime(inicio, '%Y-%m-%d')
+        datetime.strptime(fin, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({"error": "Formato de fecha inválido. Use YYYY-MM-DD"}), 400
+    if formato not in EXPORT_FORMATS:
+        return jsonify({"error": f"Formato inválido. Use {' o '.join(EXPORT_FORMATS)}"}), 400
+
+    try:
+        # Orden por id (clave primaria): las filas salen sin ordenar el resultado completo
+        result = stream_query("""
+            SELECT id, fecha, hora, dia, nombre, apellido, email, tipo, timestamp
+            FROM registros
+            WHERE fecha BETWEEN %s AND %s
+            ORDER BY id
+        """, (inicio, fin))
+        return export_response(result, formato, f"registros_ayudantes_{inicio}_{fin}", compress=comprimir)
+    except Exception as e:
+        print(f"Error al exportar registros: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @registros_bp.route('/registros', methods=['POST'])
 def add_registro():
     """Agregar nuevo registro de entrada/salida"""
@@ -99,50 +132,18 @@ def add_registro():
                 day_name = now.strftime("%A")
                 dia = Config.DIAS_SEMANA.get(day_name, day_name)
             
-            email = data['email']
-            
-            # Determinar si es entrada o salida consultando la tabla de estados
-            cursor.execute("SELECT estado FROM estado_usuarios WHERE email = %s", (email,))
-            estado_actual = cursor.fetchone()
-            
-            if estado_actual and estado_actual['estado'] == 'dentro':
-                tipo = 'Salida'
-                nuevo_estado = 'fuera'
-            else:
-                tipo = 'Entrada'
-                nuevo_estado = 'dentro'
-            
-            # Insertar registro
-            query = """
-                INSERT INTO registros 
-                (fecha, hora, dia, nombre, apellido, email, tipo, timestamp) 
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            cursor.execute(query, (
-                fecha, hora, dia,
-                data['nombre'], data['apellido'], email,
-                tipo, timestamp
-            ))
-            
-            # Actualizar el estado del usuario
-            cursor.execute("""
-                INSERT INTO estado_usuarios (email, nombre, apellido, estado, 
-                    ultima_entrada, ultima_salida)
-                VALUES (%s, %s, %s, %s, 
-                    CASE WHEN %s = 'dentro' THEN NOW() ELSE NULL END,
-                    CASE WHEN %s = 'fuera' THEN NOW() ELSE NULL END)
-                ON DUPLICATE KEY UPDATE 
-                    estado = %s, 
-                    ultima_entrada = CASE WHEN %s = 'dentro' THEN NOW() ELSE ultima_entrada END,
-                    ultima_salida = CASE WHEN %s = 'fuera' THEN NOW() ELSE ultima_salida END
-            """, (
-                email, data['nombre'], data['apellido'], nuevo_estado, 
-                nuevo_estado, nuevo_estado,
-                nuevo_estado, nuevo_estado, nuevo_estado
-            ))
+            # Entrada/Salida según estado_usuarios, registro y nuevo estado
+            # (repositorio común, la misma lógica que usa el lector)
+            persona = {'nombre': data['nombre'], 'apellido': data['apellido'], 'email': data['email']}
+            escaneo = repositorio.register_helper_scan(
+                cursor, persona, now, fecha=fecha, hora=hora, dia=dia,
+                extra={'timestamp': timestamp}
+            )
+            tipo = escaneo.tipo
+            nuevo_estado = 'dentro' if tipo == 'Entrada' else 'fuera'
             
             conn.commit()
-            registro_id = cursor.lastrowid
+            registro_id = escaneo.registro_id
             
         conn.close()
         return jsonify({
@@ -1,6 +1,7 @@
 from flask import Blueprint, jsonify
 from datetime import datetime, date, timedelta
 from database import get_connection
+from comun import repositorio
 from utils.datetime_utils import get_current_datetime
 
 usuarios_bp = Blueprint('usuarios', __name__)
@@ -28,26 +29,8 @@ def get_ayudantes_presentes():
             now = get_current_datetime()
             today = now.strftime('%Y-%m-%d')
             
-            # Buscar ayudantes basados en la tabla registros
             # Un ayudante está presente si su último registro del día es de tipo 'Entrada'
-            cursor.execute("""
-                SELECT r.email, r.nombre, r.apellido, r.hora as ultima_entrada
-                FROM registros r
-                JOIN (
-                    -- Subconsulta para obtener el ID del último registro de cada usuario en el día actual
-                    SELECT email, MAX(id) as last_id
-                    FROM registros
-                    WHERE fecha = %s
-                    GROUP BY email
-                ) as ultimos
-                ON r.id = ultimos.last_id
-                LEFT JOIN usuarios_permitidos u ON r.email = u.email
-                WHERE r.fecha = %s
-                AND r.tipo = 'Entrada'  -- Solo considerar como presentes a quienes su último registro sea Entrada
-                ORDER BY r.hora DESC
-            """, (today, today))
-            
-            ayudantes_dentro = cursor.fetchall()
+            ayudantes_dentro = repositorio.helpers_present(cursor, today)
             
             # Formateo de datos
             for ayudante in ayudantes_dentro:
@@ -0,0 +1,276 @@
+"""
+Cierre diario: Salida automática para quien quedó dentro al final del día.
+
+Todo ocurre en una transacción y con sentencias por conjunto (sin un
+INSERT por usuario ni por día), sobre un rango de fechas:
+
+1. INSERT ... SELECT de una Salida (auto_generado = 1) por cada ayudante y
+   día del rango cuyo último registro del día es una Entrada.
+2. Respaldo para el último día: ayudantes que siguen 'dentro' en
+   estado_usuarios sin Salida ese día ni registros posteriores.
+3. UPDATE de estado_usuarios a 'fuera' para los ayudantes cerrados (salvo
+   que tengan registros después del rango).
+4. INSERT ... SELECT de una Salida en EST_registros por cada estudiante y
+   día cuyo último registro es una Entrada, y reinicio de
+   estado_estudiantes hasta el último día.
+
+Las Salidas de días pasados quedan a las 23:59:59 y las del día actual a
+la hora del cierre. La marca ultimo_cierre_diario de sistema_config guarda
+el último día cerrado: cerrar_pendientes() procesa desde ahí, así los días
+en que el servidor estuvo abajo se cierran en la siguiente corrida.
+Cerrar de nuevo un día ya cerrado no crea nada.
+
+Lo usan la tarea programada (en el mismo proceso, sin llamar a la API) y
+POST /procesar_salidas_pendientes.
+
+Uso (desde back-end/ayudantes):
+    python -m tasks.cierre_diario                          # pendientes hasta hoy
+    python -m tasks.cierre_diario --desde 2024-03-01 --hasta 2024-03-31
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+from config import Config
+from database import get_connection
+from utils.datetime_utils import format_hora, get_current_datetime
+from comun import error_code
+from comun.backends import TABLE_MISSING
+
+MARCA = 'ultimo_cierre_diario'
+
+# Sin marca, cuántos días hacia atrás revisa la primera corrida
+MAX_DIAS_SIN_MARCA = int(os.getenv('CIERRE_MAX_DIAS', 180))
+
+FIN_DEL_DIA = '23:59:59'
+
+SALIDAS_AYUDANTES = """
+    INSERT INTO registros (fecha, hora, dia, nombre, apellido, email, tipo, auto_generado)
+    SELECT r.fecha, CASE WHEN r.fecha = %s THEN %s ELSE %s END, r.dia,
+           u.nombre, u.apellido, u.email, 'Salida', 1
+    FROM registros r
+    JOIN (
+        SELECT email, fecha, MAX(id) AS last_id
+        FROM registros
+        WHERE fecha BETWEEN %s AND %s
+        GROUP BY email, fecha
+    ) ultimos ON r.id = ultimos.last_id
+    JOIN usuarios_permitidos u ON u.email = r.email
+    WHERE r.tipo = 'Entrada'
+"""
+
+SALIDAS_AYUDANTES_DENTRO = """
+    INSERT INTO registros (fecha, hora, dia, nombre, apellido, email, tipo, auto_generado)
+    SELECT %s, %s, %s, u.nombre, u.apellido, u.email, 'Salida', 1
+    FROM estado_usuarios e
+    JOIN usuarios_permitidos u ON u.email = e.email
+    WHERE e.estado = 'dentro'
+    AND NOT EXISTS (
+        SELECT 1 FROM registros s
+        WHERE s.email = e.email
+        AND (s.fecha > %s OR (s.fecha = %s AND s.tipo = 'Salida') OR s.id > %s)
+    )
+"""
+
+ESTADO_AYUDANTES = """
+    UPDATE estado_usuarios
+    SET estado = 'fuera', ultima_salida = NOW()
+    WHERE email IN (
+        SELECT email FROM registros
+        WHERE id > %s AND tipo = 'Salida' AND auto_generado = 1
+    )
+    AND NOT EXISTS (
+        SELECT 1 FROM registros r
+        WHERE r.email = estado_usuarios.email AND r.fecha > %s
+    )
+"""
+
+SALIDAS_ESTUDIANTES = """
+    INSERT INTO EST_registros (fecha, hora, dia, nombre, apellido, email, tipo, auto_generado)
+    SELECT r.fecha, CASE WHEN r.fecha = %s THEN %s ELSE %s END, r.dia,
+           r.nombre, r.apellido, r.email, 'Salida', 1
+    FROM EST_registros r
+    JOIN (
+        SELECT email, fecha, MAX(id) AS last_id
+        FROM EST_registros
+        WHERE fecha BETWEEN %s AND %s
+        GROUP BY email, fecha
+    ) ultimos ON r.id = ultimos.last_id
+    WHERE r.tipo = 'Entrada'
+"""
+
+CONFIG_TABLE = """
+    CREATE TABLE IF NOT EXISTS sistema_config (
+        clave VARCHAR(50) PRIMARY KEY,
+        valor TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+"""
+
+REINICIO_ESTUDIANTES = """
+    UPDATE estado_estudiantes
+    SET estado = 'fuera', movimientos = 0
+    WHERE fecha_estado <= %s AND (estado = 'dentro' OR movimientos <> 0)
+"""
+
+def cerrar_dias(desde, hasta, conn, hora=None):
+    """
+    Cierra los días desde..hasta con la transacción abierta de conn (no confirma)
+
+    Args:
+        desde, hasta: Rango de fechas (inclusive)
+        conn: Conexión del pool
+        hora: Hora de las Salidas del día actual (por defecto la de ahora)
+
+    Returns:
+        dict: registros_creados (ayudantes), estudiantes_cerrados,
+              estudiantes_reiniciados, fechas_cerradas y detalle
+    """
+    now = get_current_datetime()
+    hoy = now.date()
+    hora = hora or now.strftime("%H:%M:%S")
+    dia = Config.DIAS_SEMANA[hasta.strftime("%A")]
+    hora_hasta = hora if hasta == hoy else FIN_DEL_DIA
+
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT COALESCE(MAX(id), 0) AS ultimo_id FROM registros")
+        ultimo_id = cursor.fetchone()['ultimo_id']
+
+        cursor.execute(SALIDAS_AYUDANTES, (hoy, hora, FIN_DEL_DIA, desde, hasta))
+        registros_creados = cursor.rowcount
+        cursor.execute(SALIDAS_AYUDANTES_DENTRO, (hasta, hora_hasta, dia, hasta, hasta, ultimo_id))
+        registros_creados += cursor.rowcount
+        cursor.execute(ESTADO_AYUDANTES, (ultimo_id, hasta))
+
+        cursor.execute("""
+            SELECT email, nombre, apellido, fecha, hora FROM registros
+            WHERE id > %s AND tipo = 'Salida' AND auto_generado = 1
+            ORDER BY id
+        """, (ultimo_id,))
+        detalle = cursor.fetchall()
+
+        cursor.execute("SELECT COALESCE(MAX(id), 0) AS ultimo_id FROM EST_registros")
+        ultimo_est_id = cursor.fetchone()['ultimo_id']
+        cursor.execute(SALIDAS_ESTUDIANTES, (hoy, hora, FIN_DEL_DIA, desde, hasta))
+        estudiantes_cerrados = cursor.rowcount
+        cursor.execute("""
+            SELECT DISTINCT fecha FROM EST_registros
+            WHERE id > %s AND tipo = 'Salida' AND auto_generado = 1
+        """, (ultimo_est_id,))
+        fechas = {row['fecha'] for row in cursor.fetchall()} | {row['fecha'] for row in detalle}
+
+        # estado_estudiantes la crea la API de estudiantes al iniciar
+        estudiantes_reiniciados = 0
+        try:
+            cursor.execute(REINICIO_ESTUDIANTES, (hasta,))
+            estudiantes_reiniciados = cursor.rowcount
+        except Exception as e:
+            if error_code(e) != TABLE_MISSING:
+                raise
+
+    return {
+        'registros_creados': registros_creados,
+        'estudiantes_cerrados': estudiantes_cerrados,
+        'estudiantes_reiniciados': estudiantes_reiniciados,
+        'fechas_cerradas': sorted(fecha.strftime("%Y-%m-%d") for fecha in fechas),
+        'detalle': [
+            {
+                'email': row['email'],
+                'nombre': row['nombre'],
+                'apellido': row['apellido'],
+                'fecha': row['fecha'].strftime("%Y-%m-%d"),
+                'hora': format_hora(row['hora']),
+            }
+            for row in detalle
+        ],
+    }
+
+def leer_marca(cursor):
+    """Último día cerrado según sistema_config (bloquea la fila hasta el commit)"""
+    cursor.execute("SELECT valor FROM sistema_config WHERE clave = %s FOR UPDATE", (MARCA,))
+    row = cursor.fetchone()
+    return datetime.strptime(row['valor'], "%Y-%m-%d").date() if row and row['valor'] else None
+
+def guardar_marca(cursor, fecha):
+    valor = fecha.strftime("%Y-%m-%d")
+    cursor.execute("""
+        INSERT INTO sistema_config (clave, valor)
+        VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE valor = VALUES(valor)
+    """, (MARCA, valor))
+
+def cerrar_pendientes(hasta=None, desde=None, conn=None):
+    """
+    Cierra todos los días sin cerrar hasta hasta en una sola transacción
+
+    Sin desde, empieza en la marca ultimo_cierre_diario (el último día
+    cerrado se revisa de nuevo por si hubo escaneos después del cierre) o,
+    sin marca, MAX_DIAS_SIN_MARCA días atrás. La marca queda en hasta si
+    avanza.
+
+    Args:
+        hasta: Último día a cerrar (por defecto hoy)
+        desde: Primer día (opcional, para reprocesar un rango a mano)
+        conn: Conexión a usar (por defecto una del pool, que se devuelve)
+
+    Returns:
+        dict: resultado de cerrar_dias más fecha_procesada, desde y duracion_ms
+    """
+    inicio = time.perf_counter()
+    hasta = hasta or get_current_datetime().date()
+
+    propia = conn is None
+    if propia:
+        conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            # DDL fuera de la transacción (en MySQL confirma lo pendiente)
+            cursor.execute(CONFIG_TABLE)
+            conn.commit()
+            marca = leer_marca(cursor)
+        if desde is None:
+            desde = marca or hasta - timedelta(days=MAX_DIAS_SIN_MARCA)
+        desde = min(desde, hasta)
+
+        resultado = cerrar_dias(desde, hasta, conn)
+        if marca is None or hasta > marca:
+            with conn.cursor() as cursor:
+                guardar_marca(cursor, hasta)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if propia:
+            conn.close()
+
+    resultado.update({
+        'fecha_procesada': hasta.strftime("%Y-%m-%d"),
+        'desde': desde.strftime("%Y-%m-%d"),
+        'duracion_ms': round((time.perf_counter() - inicio) * 1000, 1),
+    })
+    return resultado
+
+def cerrar_dia(fecha=None, conn=None):
+    """Cierra un solo día (por defecto hoy) y avanza la marca si corresponde"""
+    fecha = fecha or get_current_datetime().date()
+    return cerrar_pendientes(hasta=fecha, desde=fecha, conn=conn)
+
+def main():
+    parser = argparse.ArgumentParser(description='Cierre diario de registros sin salida')
+    parser.add_argument('--desde', help='Primer día (YYYY-MM-DD, por defecto la marca de sistema_config)')
+    parser.add_argument('--hasta', help='Último día (YYYY-MM-DD, por defecto hoy)')
+    args = parser.parse_args()
+
+    def parse(value):
+        return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+
+    resultado = cerrar_pendientes(hasta=parse(args.hasta), desde=parse(args.desde))
+    print(f"Cierre del {resultado['desde']} al {resultado['fecha_procesada']}: "
+          f"{resultado['registros_creados']} ayudantes y {resultado['estudiantes_cerrados']} estudiantes "
+          f"en {len(resultado['fechas_cerradas'])} días, {resultado['duracion_ms']} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Export incremental de registros a Parquet particionado por mes.
+
+Cada corrida lee solo las filas con id mayor al último exportado (marca
+guardada en <destino>/_estado.json) y escribe un archivo nuevo por
+partición tocada:
+
+    <destino>/registros/mes=2024-03/part-000000012345-000000012999.parquet
+
+El directorio se lee con pyarrow.dataset / pandas / duckdb como un dataset
+con particiones hive, sin pasar por la API JSON.
+
+Uso (desde back-end/ayudantes):
+    python -m tasks.columnar_export --destino /datos/parquet [--tablas registros EST_registros]
+"""
+import argparse
+import json
+import os
+import tempfile
+
+from database import stream_query
+from utils.columnar import TABLES, select_query, rows_to_batch
+
+STATE_FILE = '_estado.json'
+BATCH_SIZE = 50000
+
+def load_state(destino):
+    """Marca de agua (último id exportado) por tabla"""
+    path = os.path.join(destino, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def save_state(destino, state):
+    """Guarda la marca de agua de forma atómica (archivo temporal + rename)"""
+    fd, tmp_path = tempfile.mkstemp(dir=destino, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, os.path.join(destino, STATE_FILE))
+
+def write_partitions(destino, table, batch):
+    """Escribe un RecordBatch repartido en un archivo por mes"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    data = pa.Table.from_batches([batch])
+    partition = TABLES[table]['partition']
+    months = pc.strftime(data[partition].cast(pa.timestamp('s')), format='%Y-%m')
+
+    written = 0
+    for month in pc.unique(months).to_pylist():
+        if month is None:
+            part = data.filter(pc.is_null(months))
+            month = 'sin_fecha'
+        else:
+            part = data.filter(pc.equal(months, month))
+
+        ids = part['id']
+        folder = os.path.join(destino, table, f"mes={month}")
+        os.makedirs(folder, exist_ok=True)
+        name = f"part-{pc.min(ids).as_py():012d}-{pc.max(ids).as_py():012d}.parquet"
+        tmp_path = os.path.join(folder, f".{name}.tmp")
+        pq.write_table(part, tmp_path, compression='zstd')
+        os.replace(tmp_path, os.path.join(folder, name))
+        written += 1
+    return written
+
+def export_table(destino, table, state, batch_size=BATCH_SIZE):
+    """
+    Exporta las filas nuevas de una tabla. La marca se guarda después de
+    cada lote ya escrito, así una corrida interrumpida retoma desde ahí.
+    """
+    last_id = state.get(table, 0)
+    result = stream_query(select_query(table), (last_id,), batch_size=batch_size)
+
+    exported = files = 0
+    try:
+        rows = []
+        for row in result:
+            rows.append(row)
+            if len(rows) >= batch_size:
+                files += write_partitions(destino, table, rows_to_batch(table, rows))
+                exported += len(rows)
+                state[table] = rows[-1][0]
+                save_state(destino, state)
+                rows = []
+        if rows:
+            files += write_partitions(destino, table, rows_to_batch(table, rows))
+            exported += len(rows)
+            state[table] = rows[-1][0]
+            save_state(destino, state)
+    finally:
+        result.close()
+
+    return exported, files
+
+def ejecutar_export_columnar(destino=None, tablas=None):
+    """Exporta todas las tablas configuradas; se puede llamar desde el scheduler"""
+    destino = destino or os.getenv('PARQUET_DIR', 'parquet')
+    os.makedirs(destino, exist_ok=True)
+    state = load_state(destino)
+
+    resumen = {}
+    for table in tablas or TABLES:
+        try:
+            exported, files = export_table(destino, table, state)
+            resumen[table] = {'filas': exported, 'archivos': files, 'ultimo_id': state.get(table, 0)}
+        except Exception as e:
+            print(f"Error exportando {table}: {str(e)}")
+            resumen[table] = {'error': str(e)}
+    print(f"Export columnar: {resumen}")
+    return resumen
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export incremental de registros a Parquet")
+    parser.add_argument('--destino', default=None, help="Directorio del dataset (por defecto $PARQUET_DIR)")
+    parser.add_argument('--tablas', nargs='+', choices=list(TABLES), default=None)
+    args = parser.parse_args()
+    ejecutar_export_columnar(args.destino, args.tablas)
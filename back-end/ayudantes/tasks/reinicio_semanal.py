@@ -0,0 +1,271 @@
+"""
+Reinicio semanal: guarda el cumplimiento de la semana en historial_cumplimiento.
+
+El cumplimiento de todos los ayudantes se calcula por conjunto
+(utils/cumplimiento.py) y se escribe con un INSERT de varias filas por
+lote. Es idempotente por (usuario_id, semana_inicio): los ayudantes que ya
+tienen fila para la semana se omiten, así repetir el reinicio no duplica
+nada y una semana cerrada no cambia.
+
+Una semana que todavía no termina (la tarea programada corre el domingo a
+las 23:55, y POST /reiniciar_cumplimiento puede llegar a mitad de semana)
+se puede volver a cerrar: sus filas se reemplazan hasta que pase el
+domingo. Una semana que aún no empieza no se cierra.
+
+Lo usan la tarea programada (en el mismo proceso, sin llamar a la API) y
+POST /reiniciar_cumplimiento.
+
+Las tablas historial_cumplimiento anteriores no tenían el índice único;
+el primer cierre de cada proceso lo agrega (asegurar_historial).
+
+Uso (desde back-end/ayudantes):
+    python -m tasks.reinicio_semanal                       # semana actual
+    python -m tasks.reinicio_semanal --semana 2024-03-04
+    python -m tasks.reinicio_semanal --migrar              # solo índices
+"""
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta
+
+from database import get_connection
+from utils.cumplimiento import calcular_semana, estado_semana, inicio_semana
+from utils.datetime_utils import get_current_datetime
+from tasks.cierre_diario import CONFIG_TABLE
+
+MARCA = 'ultimo_reinicio_cumplimiento'
+
+# Filas por INSERT
+LOTE = 1000
+
+HISTORIAL_TABLE = """
+    CREATE TABLE IF NOT EXISTS historial_cumplimiento (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        usuario_id INT,
+        email VARCHAR(255),
+        nombre VARCHAR(100),
+        apellido VARCHAR(100),
+        semana_inicio DATE,
+        semana_fin DATE,
+        estado VARCHAR(50),
+        cumplidos INT,
+        incompletos INT,
+        ausentes INT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE KEY uq_historial_usuario_semana (usuario_id, semana_inicio),
+        INDEX idx_historial_email_semana (email, semana_inicio)
+    )
+"""
+
+# Índices de historial_cumplimiento: (nombre, columnas, único). Las tablas
+# creadas antes de uq_historial_usuario_semana no lo tienen, y sin él el
+# INSERT IGNORE no evita duplicados; asegurar_historial los agrega.
+HISTORIAL_INDICES = [
+    ('uq_historial_usuario_semana', ('usuario_id', 'semana_inicio'), True),
+    ('idx_historial_email_semana', ('email', 'semana_inicio'), False),
+]
+
+_historial_verificado = False
+
+COLUMNAS = ('usuario_id', 'email', 'nombre', 'apellido', 'semana_inicio', 'semana_fin',
+            'estado', 'cumplidos', 'incompletos', 'ausentes')
+
+def indices_historial(cursor):
+    """Índices de historial_cumplimiento como {nombre: (columnas, único)}"""
+    cursor.execute("""
+        SELECT index_name AS nombre, MIN(non_unique) AS no_unico,
+               GROUP_CONCAT(column_name ORDER BY seq_in_index) AS columnas
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = 'historial_cumplimiento'
+        GROUP BY index_name
+    """)
+    return {
+        row['nombre']: (tuple(row['columnas'].split(',')), int(row['no_unico']) == 0)
+        for row in cursor.fetchall()
+    }
+
+def asegurar_historial(conn, cursor):
+    """
+    Crea historial_cumplimiento y le agrega los índices que falten (una vez
+    por proceso; llamar fuera de una transacción)
+
+    Antes de crear el índice único se borran los duplicados por
+    (usuario_id, semana_inicio) que dejaron los cierres repetidos, y queda
+    la fila más reciente de cada par. Si no se puede crear (por ejemplo,
+    otro proceso insertó un duplicado entre medio) se vuelve a intentar en
+    el próximo cierre.
+
+    También sirve como paso de migración:
+        python -m tasks.reinicio_semanal --migrar
+    """
+    global _historial_verificado
+    cursor.execute(HISTORIAL_TABLE)
+    conn.commit()
+    # Las bases SQLite (comun/sqlite_schema.sql) ya traen los índices
+    if _historial_verificado or conn.backend.name == 'sqlite':
+        return
+
+    presentes = indices_historial(cursor)
+    faltantes = 0
+    for nombre, columnas, unico in HISTORIAL_INDICES:
+        if nombre in presentes or any(
+            cols == columnas and (es_unico or not unico) for cols, es_unico in presentes.values()
+        ):
+            continue
+
+        try:
+            if unico:
+                cursor.execute("""
+                    DELETE h FROM historial_cumplimiento h
+                    JOIN historial_cumplimiento o
+                      ON o.usuario_id = h.usuario_id
+                     AND o.semana_inicio = h.semana_inicio
+                     AND o.id > h.id
+                """)
+                if cursor.rowcount:
+                    logging.warning(f"historial_cumplimiento: {cursor.rowcount} filas duplicadas borradas")
+            kind = 'UNIQUE KEY' if unico else 'INDEX'
+            logging.info(f"Creando índice {nombre} en historial_cumplimiento")
+            cursor.execute(f"ALTER TABLE historial_cumplimiento ADD {kind} {nombre} ({', '.join(columnas)})")
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            faltantes += 1
+            logging.error(f"No se pudo crear el índice {nombre}: {e}")
+
+    _historial_verificado = faltantes == 0
+
+def filas_historial(semana, inicio, fin):
+    """Filas de historial de los ayudantes con horario (los demás no aplican)"""
+    filas = []
+    for user in semana:
+        total = len(user['bloques'])
+        if total == 0:
+            continue
+        clasificaciones = [clasificacion for _, clasificacion in user['bloques']]
+        cumplidos = clasificaciones.count('Cumplido')
+        incompletos = clasificaciones.count('Incompleto')
+        ausentes = total - cumplidos - incompletos
+        filas.append((
+            user['usuario_id'], user['email'], user['nombre'], user['apellido'], inicio, fin,
+            estado_semana(cumplidos, incompletos, ausentes, total), cumplidos, incompletos, ausentes
+        ))
+    return filas
+
+def insertar_historial(cursor, filas):
+    """INSERT de varias filas por lote; devuelve las filas insertadas"""
+    insertadas = 0
+    fila = '(' + ', '.join(['%s'] * len(COLUMNAS)) + ')'
+    for i in range(0, len(filas), LOTE):
+        lote = filas[i:i + LOTE]
+        cursor.execute(
+            f"INSERT IGNORE INTO historial_cumplimiento ({', '.join(COLUMNAS)}) VALUES "
+            + ', '.join([fila] * len(lote)),
+            [valor for f in lote for valor in f]
+        )
+        insertadas += cursor.rowcount
+    return insertadas
+
+def cerrar_semana(fecha=None, conn=None):
+    """
+    Guarda en historial_cumplimiento la semana que contiene fecha
+
+    Args:
+        fecha: Un día de la semana (por defecto hoy)
+        conn: Conexión a usar (por defecto una del pool, que se devuelve)
+
+    Returns:
+        dict: semana_inicio, semana_fin, registros_historial (filas nuevas),
+              ya_cerrados (ayudantes que ya tenían la semana), en_curso,
+              reemplazados (filas de un cierre anterior de la semana en
+              curso) y duracion_ms
+
+    Raises:
+        ValueError: Si la semana aún no empieza
+    """
+    inicio_t = time.perf_counter()
+    hoy = get_current_datetime().date()
+    inicio = inicio_semana(fecha or hoy)
+    fin = inicio + timedelta(days=6)
+    if inicio > hoy:
+        raise ValueError(f"La semana del {inicio.strftime('%Y-%m-%d')} aún no empieza")
+    en_curso = fin >= hoy
+
+    propia = conn is None
+    if propia:
+        conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            # DDL fuera de la transacción (en MySQL confirma lo pendiente)
+            asegurar_historial(conn, cursor)
+            cursor.execute(CONFIG_TABLE)
+            conn.commit()
+
+            reemplazados = 0
+            if en_curso:
+                # El cierre anterior se hizo con la semana incompleta
+                cursor.execute("DELETE FROM historial_cumplimiento WHERE semana_inicio = %s", (inicio,))
+                reemplazados = cursor.rowcount
+
+            cursor.execute("""
+                SELECT usuario_id FROM historial_cumplimiento
+                WHERE semana_inicio = %s
+                FOR UPDATE
+            """, (inicio,))
+            cerrados = {row['usuario_id'] for row in cursor.fetchall()}
+
+            filas = [
+                f for f in filas_historial(calcular_semana(cursor, inicio), inicio, fin)
+                if f[0] not in cerrados
+            ]
+            insertadas = insertar_historial(cursor, filas) if filas else 0
+
+            cursor.execute("""
+                INSERT INTO sistema_config (clave, valor)
+                VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE valor = VALUES(valor)
+            """, (MARCA, hoy.strftime("%Y-%m-%d")))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if propia:
+            conn.close()
+
+    return {
+        'semana_inicio': inicio.strftime("%Y-%m-%d"),
+        'semana_fin': fin.strftime("%Y-%m-%d"),
+        'registros_historial': insertadas,
+        'ya_cerrados': len(cerrados),
+        'en_curso': en_curso,
+        'reemplazados': reemplazados,
+        'duracion_ms': round((time.perf_counter() - inicio_t) * 1000, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Guarda el cumplimiento semanal en el historial')
+    parser.add_argument('--semana', help='Un día de la semana a cerrar (YYYY-MM-DD, por defecto hoy)')
+    parser.add_argument('--migrar', action='store_true',
+                        help='Solo crear la tabla y sus índices (borra duplicados por ayudante y semana)')
+    args = parser.parse_args()
+
+    if args.migrar:
+        conn = get_connection()
+        try:
+            with conn.cursor() as cursor:
+                asegurar_historial(conn, cursor)
+        finally:
+            conn.close()
+        print("historial_cumplimiento verificado" if _historial_verificado
+              else "No se pudieron crear todos los índices de historial_cumplimiento")
+        return
+
+    fecha = datetime.strptime(args.semana, "%Y-%m-%d").date() if args.semana else None
+    resultado = cerrar_semana(fecha)
+    print(f"Semana del {resultado['semana_inicio']} al {resultado['semana_fin']}: "
+          f"{resultado['registros_historial']} filas nuevas, {resultado['ya_cerrados']} ya cerradas, "
+          f"{resultado['duracion_ms']} ms")
+
+if __name__ == '__main__':
+    main()
@@ -1,77 +1,72 @@
-from apscheduler.schedulers.background import BackgroundScheduler
-import requests
-from config import Config
+import os
+import signal
+import threading
+from tasks.cierre_diario import cerrar_pendientes
+from tasks.reinicio_semanal import cerrar_semana
+from tasks.scheduler import iniciar_scheduler, registrar_tarea
 
-def ejecutar_cierre_diario():
-    """Ejecuta el cierre diario de registros sin salida"""
-    try:
-        # URL del servidor de producción
-        server_url = Config.SERVER_URL
-        
-        # Llamar al endpoint de procesar salidas pendientes
-        response = requests.post(
-            f'{server_url}/api/procesar_salidas_pendientes',
-            json={},
-            verify=True  # En producción, verificar los certificados
-        )
-        
-        if response.status_code == 200:
-            print(f"Cierre diario ejecutado con éxito: {response.json()}")
-        else:
-            print(f"Error en cierre diario: {response.text}")
-    
-    except Exception as e:
-        print(f"Error al ejecutar cierre diario: {str(e)}")
+def ejecutar_cierre_diario(programada=None):
+    """
+    Ejecuta el cierre diario de registros sin salida (en este proceso),
+    incluidos los días anteriores que quedaron sin cerrar, hasta el día
+    de la ejecución programada
+    """
+    hasta = programada.date() if programada else None
+    resultado = cerrar_pendientes(hasta=hasta)
+    print(f"Cierre diario ejecutado con éxito: {resultado['registros_creados']} ayudantes, "
+          f"{resultado['estudiantes_cerrados']} estudiantes en {resultado['duracion_ms']} ms")
+    return resultado
+
+def ejecutar_reinicio_semanal(programada=None):
+    """
+    Guarda el cumplimiento de la semana en el historial (en este proceso),
+    la semana de la ejecución programada
+    """
+    resultado = cerrar_semana(programada.date() if programada else None)
+    print(f"Reinicio semanal de cumplimiento ejecutado: {resultado['registros_historial']} filas "
+          f"para la semana del {resultado['semana_inicio']} en {resultado['duracion_ms']} ms")
+    return resultado
 
-def ejecutar_reinicio_semanal():
-    """Ejecuta el reinicio semanal de cumplimiento"""
-    try:
-        # URL del servidor de producción
-        server_url = Config.SERVER_URL
-        
-        # Llamar al endpoint de reinicio
-        response = requests.post(
-            f'{server_url}/reiniciar_cumplimiento',
-            json={},
-            verify=True
-        )
-        
-        if response.status_code == 200:
-            print(f"Reinicio semanal de cumplimiento ejecutado: {response.json()}")
-        else:
-            print(f"Error en reinicio semanal: {response.text}")
-    
-    except Exception as e:
-        print(f"Error al ejecutar reinicio semanal: {str(e)}")
+def ejecutar_export_columnar(programada=None):
+    """Export incremental a Parquet en PARQUET_DIR"""
+    from tasks.columnar_export import ejecutar_export_columnar as exportar
+    return exportar(destino=os.getenv('PARQUET_DIR'))
 
-def configurar_tarea_cierre_diario():
+def iniciar_tareas():
     """
-    Configura una tarea programada que se ejecutará diariamente a las 23:59
-    para cerrar los registros sin salida del día.
+    Registra las tareas programadas e inicia el scheduler de este proceso:
+    - Cierre diario: todos los días a las 23:59
+    - Reinicio semanal: domingos a las 23:55
+    - Export columnar: todos los días a las 02:30, solo con PARQUET_DIR
+
+    Se puede llamar en cada proceso: cada ejecución la hace uno solo
+    (ver tasks/scheduler.py).
+
+    Returns:
+        BackgroundScheduler o None si SCHEDULER_ENABLED=0
     """
-    # Crear el scheduler
-    scheduler = BackgroundScheduler()
-    
-    # Programar la tarea para ejecutarse TODOS los días a las 23:59 (11:59 PM)
-    scheduler.add_job(ejecutar_cierre_diario, 'cron', hour=23, minute=59)
-    
-    # Iniciar el scheduler
-    scheduler.start()
-    
-    print("Tarea de cierre diario programada para ejecutarse a las 23:59 (11:59 PM)")
+    registrar_tarea('cierre_diario', ejecutar_cierre_diario, hour=23, minute=59)
+    registrar_tarea('reinicio_semanal', ejecutar_reinicio_semanal, day_of_week='sun', hour=23, minute=55)
+    if os.getenv('PARQUET_DIR'):
+        registrar_tarea('export_columnar', ejecutar_export_columnar, hour=2, minute=30)
+    return iniciar_scheduler()
 
-def configurar_reinicio_semanal():
+def main():
     """
-    Configura una tarea programada para reiniciar los estados de cumplimiento
-    cada semana (domingos a las 23:55).
+    Proceso dedicado a las tareas programadas: lo lanza gunicorn.conf.py
+    junto a los workers, o se corre aparte (python -m tasks.scheduled_tasks)
     """
-    # Crear el scheduler
-    scheduler = BackgroundScheduler()
-    
-    # Programar la tarea para ejecutarse los domingos a las 23:55
-    scheduler.add_job(ejecutar_reinicio_semanal, 'cron', day_of_week='sun', hour=23, minute=55)
-    
-    # Iniciar el scheduler
-    scheduler.start()
-    
-    print("Tarea de reinicio semanal programada para los domingos a las 23:55")
\ No newline at end of file
+    scheduler = iniciar_tareas()
+    if scheduler is None:
+        print("Scheduler deshabilitado (SCHEDULER_ENABLED=0)")
+        return
+
+    detener = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: detener.set())
+    print(f"Scheduler iniciado (pid {os.getpid()}): {', '.join(job.id for job in scheduler.get_jobs())}")
+    detener.wait()
+    scheduler.shutdown()
+
+if __name__ == '__main__':
+    main()
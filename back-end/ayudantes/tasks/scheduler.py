@@ -0,0 +1,242 @@
+"""
+Tareas programadas con un solo líder.
+
+Cada proceso que inicia el scheduler (app.py, varios contenedores o
+workers) programa las mismas tareas, pero antes de ejecutar una toma
+GET_LOCK('labinf:<tarea>', 0) en MySQL: solo un proceso la corre y los
+demás la omiten. El lock es de la conexión, así que se libera solo si el
+proceso muere.
+
+Cada ejecución queda en tareas_ejecuciones (hora programada, inicio, fin,
+duración, estado, detalle, host y pid). Una ejecución programada que ya
+terminó (o está corriendo) no se repite, aunque otro proceso llegue
+después por el jitter. Si el líder muere a mitad de una tarea (OOM,
+despliegue), su fila queda en 'corriendo': pasados SCHEDULER_TIMEOUT
+segundos desde su inicio se marca 'error' y la ejecución se repite.
+
+Ejecuciones perdidas: al iniciar, si la última hora programada de una
+tarea es posterior a su última ejecución registrada (el servidor estaba
+abajo), se ejecuta de inmediato con SCHEDULER_MISSED=run (por defecto) o
+se salta con skip. Una tarea que nunca corrió no se considera perdida.
+
+Variables de entorno:
+- SCHEDULER_ENABLED: 0 para no iniciar el scheduler en este proceso.
+- SCHEDULER_JITTER: segundos al azar que se suman a cada disparo (0).
+- SCHEDULER_MISSED: run | skip.
+- SCHEDULER_TIMEOUT: segundos tras los que una ejecución en 'corriendo'
+  se da por muerta (3600); debe superar la tarea más larga.
+"""
+import json
+import os
+import socket
+import time
+from datetime import timedelta
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
+
+from database import get_connection
+from utils.datetime_utils import TIMEZONE, get_current_datetime
+
+LOCK_PREFIX = 'labinf:'
+
+SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', '1') != '0'
+SCHEDULER_JITTER = int(os.getenv('SCHEDULER_JITTER', 0))
+SCHEDULER_MISSED = os.getenv('SCHEDULER_MISSED', 'run')
+SCHEDULER_TIMEOUT = int(os.getenv('SCHEDULER_TIMEOUT', 3600))
+
+# Días hacia atrás en que se busca la última hora programada (tareas semanales)
+VENTANA_DIAS = 8
+
+RUNS_TABLE = """
+    CREATE TABLE IF NOT EXISTS tareas_ejecuciones (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        tarea VARCHAR(50) NOT NULL,
+        programada DATETIME NULL,
+        inicio DATETIME NOT NULL,
+        fin DATETIME NULL,
+        duracion_ms INT NULL,
+        estado VARCHAR(10) NOT NULL,
+        detalle TEXT,
+        host VARCHAR(100),
+        pid INT,
+        INDEX idx_tareas_ejecuciones_tarea_programada (tarea, programada)
+    )
+"""
+
+# nombre -> (función(programada), parámetros cron)
+TAREAS = {}
+
+_scheduler = None
+
+def registrar_tarea(nombre, funcion, **cron):
+    """Agrega una tarea; funcion recibe la hora programada (datetime local sin zona)"""
+    TAREAS[nombre] = (funcion, cron)
+
+def ultima_programada(cron, now):
+    """Última hora (sin zona) en que el cron debía disparar, hasta now"""
+    trigger = CronTrigger(timezone=TIMEZONE, **cron)
+    ultima = None
+    siguiente = trigger.get_next_fire_time(None, now - timedelta(days=VENTANA_DIAS))
+    while siguiente and siguiente <= now:
+        ultima = siguiente
+        siguiente = trigger.get_next_fire_time(siguiente, siguiente + timedelta(seconds=1))
+    return ultima.replace(tzinfo=None) if ultima else None
+
+def local_now():
+    return get_current_datetime().replace(tzinfo=None, microsecond=0)
+
+def resumen(resultado):
+    """Detalle corto para la tabla (sin listas por usuario)"""
+    if isinstance(resultado, dict):
+        resultado = {k: v for k, v in resultado.items() if not isinstance(v, list)}
+    return json.dumps(resultado, default=str, ensure_ascii=False)[:2000]
+
+def limite_corriendo():
+    """Inicio antes del cual una ejecución en 'corriendo' se da por muerta"""
+    return local_now() - timedelta(seconds=SCHEDULER_TIMEOUT)
+
+def ejecutar_tarea(nombre, programada=None):
+    """
+    Ejecuta una tarea si este proceso obtiene el lock y esa hora
+    programada no se ejecutó aún
+
+    Returns:
+        El resultado de la tarea, o None si se omitió o falló
+    """
+    funcion, cron = TAREAS[nombre]
+    programada = programada or ultima_programada(cron, get_current_datetime())
+
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT GET_LOCK(%s, 0) AS obtenido", (LOCK_PREFIX + nombre,))
+            if cursor.fetchone()['obtenido'] != 1:
+                print(f"Tarea {nombre}: la ejecuta otro proceso")
+                return None
+        try:
+            with conn.cursor() as cursor:
+                # Con el lock tomado, una fila en 'corriendo' es de un proceso
+                # que ya no lo tiene; si es vieja, ese proceso murió
+                cursor.execute("""
+                    UPDATE tareas_ejecuciones
+                    SET estado = 'error', fin = %s, detalle = %s
+                    WHERE tarea = %s AND programada = %s AND estado = 'corriendo' AND inicio < %s
+                """, (local_now(), f"Sin terminar tras {SCHEDULER_TIMEOUT} s (proceso caído)",
+                      nombre, programada, limite_corriendo()))
+                if cursor.rowcount:
+                    print(f"Tarea {nombre}: la ejecución de {programada} quedó sin terminar, se repite")
+
+                cursor.execute("""
+                    SELECT id FROM tareas_ejecuciones
+                    WHERE tarea = %s AND programada = %s AND estado IN ('ok', 'corriendo')
+                    LIMIT 1
+                """, (nombre, programada))
+                if cursor.fetchone():
+                    print(f"Tarea {nombre}: la ejecución de {programada} ya se hizo")
+                    return None
+
+                cursor.execute("""
+                    INSERT INTO tareas_ejecuciones (tarea, programada, inicio, estado, host, pid)
+                    VALUES (%s, %s, %s, 'corriendo', %s, %s)
+                """, (nombre, programada, local_now(), socket.gethostname(), os.getpid()))
+                ejecucion_id = cursor.lastrowid
+            conn.commit()
+
+            inicio = time.perf_counter()
+            resultado = None
+            try:
+                resultado = funcion(programada)
+                estado, detalle = 'ok', resumen(resultado)
+            except Exception as e:
+                print(f"Error en tarea {nombre}: {str(e)}")
+                estado, detalle = 'error', str(e)[:2000]
+
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE tareas_ejecuciones
+                    SET fin = %s, duracion_ms = %s, estado = %s, detalle = %s
+                    WHERE id = %s
+                """, (local_now(), int((time.perf_counter() - inicio) * 1000), estado, detalle, ejecucion_id))
+            conn.commit()
+            return resultado
+        finally:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_PREFIX + nombre,))
+            conn.commit()
+    finally:
+        conn.close()
+
+def ejecuciones_perdidas(now=None):
+    """
+    Tareas cuya última hora programada no tiene ejecución registrada
+    (y que sí corrieron alguna vez); una ejecución que quedó en
+    'corriendo' más de SCHEDULER_TIMEOUT no cuenta
+
+    Returns:
+        list: (nombre, programada)
+    """
+    now = now or get_current_datetime()
+    perdidas = []
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            for nombre, (_, cron) in TAREAS.items():
+                programada = ultima_programada(cron, now)
+                if programada is None:
+                    continue
+                cursor.execute("""
+                    SELECT programada FROM tareas_ejecuciones
+                    WHERE tarea = %s AND programada IS NOT NULL
+                      AND NOT (estado = 'corriendo' AND inicio < %s)
+                    ORDER BY programada DESC
+                    LIMIT 1
+                """, (nombre, limite_corriendo()))
+                ultima = cursor.fetchone()
+                if ultima is not None and ultima['programada'] < programada:
+                    perdidas.append((nombre, programada))
+        conn.commit()
+    finally:
+        conn.close()
+    return perdidas
+
+def asegurar_tabla():
+    """Crea tareas_ejecuciones si no existe"""
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(RUNS_TABLE)
+        conn.commit()
+    finally:
+        conn.close()
+
+def iniciar_scheduler():
+    """
+    Inicia un único BackgroundScheduler con todas las tareas registradas
+    (una vez por proceso)
+
+    Returns:
+        BackgroundScheduler o None si SCHEDULER_ENABLED=0
+    """
+    global _scheduler
+    if _scheduler is not None or not SCHEDULER_ENABLED:
+        return _scheduler
+
+    asegurar_tabla()
+    scheduler = BackgroundScheduler(timezone=TIMEZONE)
+    for nombre, (_, cron) in TAREAS.items():
+        scheduler.add_job(
+            ejecutar_tarea, CronTrigger(timezone=TIMEZONE, jitter=SCHEDULER_JITTER or None, **cron),
+            args=[nombre], id=nombre, coalesce=True, misfire_grace_time=3600
+        )
+
+    for nombre, programada in ejecuciones_perdidas():
+        if SCHEDULER_MISSED == 'run':
+            print(f"Tarea {nombre}: ejecución perdida de {programada}, se ejecuta ahora")
+            scheduler.add_job(ejecutar_tarea, 'date', args=[nombre, programada], id=f"{nombre}-perdida")
+        else:
+            print(f"Tarea {nombre}: ejecución perdida de {programada} (omitida)")
+
+    scheduler.start()
+    _scheduler = scheduler
+    return scheduler
@@ -1,14 +1,129 @@
 import jwt
 import hashlib
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
 from functools import wraps
+from threading import Lock
 from flask import request, jsonify
 from config import Config
 from database import get_connection
 
+# Caché de principales de token_required, por (id de usuario, id del token).
+# Una entrada vive AUTH_CACHE_TTL segundos como máximo (y nunca más que el
+# token); después se vuelve a validar contra admin_users. Ninguna ruta
+# modifica admin_users: un cambio de rol o contraseña, o un usuario
+# eliminado, se hace en la base y cada worker lo ve a más tardar en
+# AUTH_CACHE_TTL. Ese es el límite de revocación entre procesos.
+AUTH_CACHE_TTL = float(os.getenv('AUTH_CACHE_TTL', 60))
+AUTH_CACHE_SIZE = int(os.getenv('AUTH_CACHE_SIZE', 1024))
+
+# Claims del usuario que crear_token puede incluir en el token ('usr')
+CLAIMS = ('nombre', 'apellido', 'email', 'role')
+
+_principales = OrderedDict()
+# id de usuario -> (hasta cuándo, claims leídos de admin_users): un token
+# con claims se acepta sin leer la base solo si coinciden con estos
+_vigentes = {}
+# id de usuario -> momento de la revocación (rechaza tokens emitidos antes)
+_revocados = {}
+_lock = Lock()
+
+_stats = {'hits': 0, 'misses': 0, 'db_lookups': 0, 'rechazos': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+
+def crear_token(user, horas=8, claims=True):
+    """
+    Emite un JWT para un admin_users
+
+    Args:
+        user: Fila de admin_users (al menos id)
+        horas: Vigencia del token
+        claims: Incluir nombre, apellido, email y role en el token; así la
+                primera petición de un token no necesita leer la base si el
+                usuario ya se validó hace poco
+
+    Returns:
+        str: Token HS256 con id, jti, iat y exp
+    """
+    now = datetime.now(timezone.utc)
+    payload = {
+        'id': user['id'],
+        'jti': uuid.uuid4().hex,
+        'iat': now,
+        'exp': now + timedelta(hours=horas),
+    }
+    if claims:
+        payload['usr'] = {key: user[key] for key in CLAIMS if key in user}
+    return jwt.encode(payload, Config.JWT_SECRET, algorithm="HS256")
+
+def _registrar(inicio, resultado):
+    elapsed = (time.perf_counter() - inicio) * 1000
+    with _lock:
+        _stats[resultado] += 1
+        _stats['total_ms'] += elapsed
+        _stats['max_ms'] = max(_stats['max_ms'], elapsed)
+
+def _buscar_principal(data, key, now):
+    """
+    Principal de un token ya verificado: caché, claims o admin_users
+
+    Returns:
+        tuple: (principal o None, 'hits' o 'misses')
+    """
+    user_id = data['id']
+    with _lock:
+        revocado = _revocados.get(user_id)
+        if revocado is not None and data.get('iat', 0) <= revocado:
+            return None, 'misses'
+        entrada = _principales.get(key)
+        if entrada and entrada[1] > now:
+            _principales.move_to_end(key)
+            return entrada[0], 'hits'
+        vigente = _vigentes.get(user_id)
+        claims_vigentes = (
+            'usr' in data and vigente is not None and vigente[0] > now
+            and data['usr'] == vigente[1]
+        )
+
+    if claims_vigentes:
+        principal = dict(data['usr'], id=user_id)
+    else:
+        with _lock:
+            _stats['db_lookups'] += 1
+        conn = get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT * FROM admin_users WHERE id = %s", (user_id,))
+                row = cursor.fetchone()
+        finally:
+            conn.close()
+        if not row:
+            return None, 'misses'
+        principal = {k: v for k, v in row.items() if k != 'password'}
+
+    vence = min(now + AUTH_CACHE_TTL, data.get('exp', float('inf')))
+    with _lock:
+        if not claims_vigentes:
+            # Un token anterior a un cambio de rol trae claims viejos: no
+            # coinciden y se busca en la base
+            _vigentes[user_id] = (vence, {key: principal[key] for key in CLAIMS if key in principal})
+        _principales[key] = (principal, vence)
+        while len(_principales) > AUTH_CACHE_SIZE:
+            _principales.popitem(last=False)
+    return principal, 'misses'
+
 def token_required(f):
-    """Decorador para validar token JWT en endpoints protegidos"""
+    """
+    Decorador para validar token JWT en endpoints protegidos
+
+    La firma y la expiración se verifican en cada petición; el usuario se
+    busca en admin_users solo si no está en la caché de principales.
+    """
     @wraps(f)
     def decorated(*args, **kwargs):
+        inicio = time.perf_counter()
         auth_header = request.headers.get('Authorization')
         if not auth_header or not auth_header.startswith('Bearer '):
             return jsonify({'error': 'Token is missing!'}), 401
@@ -16,23 +131,59 @@ def token_required(f):
         token = auth_header.split(' ')[1]
         try:
             data = jwt.decode(token, Config.JWT_SECRET, algorithms=["HS256"])
-            conn = get_connection()
-            with conn.cursor() as cursor:
-                cursor.execute("SELECT * FROM admin_users WHERE id = %s", (data['id'],))
-                current_user = cursor.fetchone()
-            conn.close()
+            key = (data['id'], data.get('jti') or hashlib.sha256(token.encode()).hexdigest()[:32])
+            current_user, resultado = _buscar_principal(data, key, time.time())
 
             if not current_user:
+                _registrar(inicio, 'rechazos')
                 return jsonify({'error': 'Invalid token!'}), 401
         except jwt.ExpiredSignatureError:
+            _registrar(inicio, 'rechazos')
             return jsonify({'error': 'Token has expired!'}), 401
-        except jwt.InvalidTokenError:
+        except (jwt.InvalidTokenError, KeyError):
+            _registrar(inicio, 'rechazos')
             return jsonify({'error': 'Invalid token!'}), 401
 
+        _registrar(inicio, resultado)
         return f(current_user, *args, **kwargs)
 
     return decorated
 
+def invalidar_principal(user_id=None):
+    """
+    Saca de la caché a un usuario (o a todos) tras modificarlo o eliminarlo
+
+    Los tokens del usuario emitidos antes de este momento quedan
+    rechazados en este proceso; en los demás workers la caché deja de
+    usarlos a más tardar en AUTH_CACHE_TTL segundos. Hoy ninguna ruta
+    modifica admin_users; una que lo haga debe llamarla.
+    """
+    with _lock:
+        if user_id is None:
+            _principales.clear()
+            _vigentes.clear()
+            return
+        _revocados[user_id] = time.time()
+        _vigentes.pop(user_id, None)
+        for key in [key for key in _principales if key[0] == user_id]:
+            del _principales[key]
+
+def get_auth_stats(reset=False):
+    """Aciertos de la caché de principales y latencia de token_required"""
+    with _lock:
+        stats = dict(_stats)
+        atendidas = stats['hits'] + stats['misses'] + stats['rechazos']
+        stats['hit_rate'] = round(stats['hits'] / (stats['hits'] + stats['misses']), 4) \
+            if stats['hits'] + stats['misses'] else None
+        stats['mean_ms'] = round(stats['total_ms'] / atendidas, 3) if atendidas else None
+        stats['total_ms'] = round(stats['total_ms'], 3)
+        stats['max_ms'] = round(stats['max_ms'], 3)
+        stats['cached'] = len(_principales)
+        if reset:
+            _stats.update({key: 0 for key in _stats})
+            _stats['total_ms'] = _stats['max_ms'] = 0.0
+    return stats
+
 def hash_password(password):
     """Hashea una contraseña usando SHA256"""
-    return hashlib.sha256(password.encode()).hexdigest()
\ No newline at end of file
+    return hashlib.sha256(password.encode()).hexdigest()
@@ -0,0 +1,106 @@
+"""
+Conversión de tablas de registros a Arrow con tipos de columna fijos.
+
+fecha -> date32, hora -> int32 (segundos desde medianoche), tipo/dia/estado
+-> columnas dictionary (pocas categorías repetidas). Lo usan el export
+incremental a Parquet (tasks/columnar_export.py) y el endpoint Arrow IPC.
+pyarrow se importa dentro de las funciones: es opcional para el resto de
+la API.
+"""
+from datetime import date, datetime, time, timedelta
+
+# Columnas exportadas por tabla. 'partition' es la columna DATE que define
+# la partición mensual de los archivos Parquet.
+TABLES = {
+    'registros': {
+        'partition': 'fecha',
+        'columns': [
+            ('id', 'int64'), ('fecha', 'date'), ('hora', 'seconds'), ('dia', 'category'),
+            ('nombre', 'string'), ('apellido', 'string'), ('email', 'string'),
+            ('tipo', 'category'), ('timestamp', 'timestamp')
+        ]
+    },
+    'EST_registros': {
+        'partition': 'fecha',
+        'columns': [
+            ('id', 'int64'), ('fecha', 'date'), ('hora', 'seconds'), ('dia', 'category'),
+            ('nombre', 'string'), ('apellido', 'string'), ('email', 'string'),
+            ('tipo', 'category'), ('auto_generado', 'bool')
+        ]
+    },
+    'historial_cumplimiento': {
+        'partition': 'semana_inicio',
+        'columns': [
+            ('id', 'int64'), ('usuario_id', 'int32'), ('email', 'string'),
+            ('nombre', 'string'), ('apellido', 'string'), ('semana_inicio', 'date'),
+            ('semana_fin', 'date'), ('estado', 'category'), ('cumplidos', 'int32'),
+            ('incompletos', 'int32'), ('ausentes', 'int32'), ('created_at', 'timestamp')
+        ]
+    }
+}
+
+def select_query(table):
+    """SELECT de las columnas exportadas, incremental por id"""
+    columns = ', '.join(f"`{name}`" for name, _ in TABLES[table]['columns'])
+    return f"SELECT {columns} FROM `{table}` WHERE id > %s ORDER BY id"
+
+def to_seconds(value):
+    """Hora (TIME como timedelta, time o 'HH:MM:SS') a segundos desde medianoche"""
+    if value is None:
+        return None
+    if isinstance(value, timedelta):
+        return int(value.total_seconds())
+    if isinstance(value, time):
+        return value.hour * 3600 + value.minute * 60 + value.second
+    hh, mm, ss = (int(part) for part in str(value).split(':'))
+    return hh * 3600 + mm * 60 + ss
+
+def to_date(value):
+    """DATE como date (los strings se parsean)"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value), '%Y-%m-%d').date()
+
+def arrow_schema(table):
+    """Schema Arrow de una tabla exportable"""
+    import pyarrow as pa
+
+    types = {
+        'int64': pa.int64(),
+        'int32': pa.int32(),
+        'date': pa.date32(),
+        'seconds': pa.int32(),
+        'string': pa.string(),
+        'category': pa.dictionary(pa.int8(), pa.string()),
+        'bool': pa.bool_(),
+        'timestamp': pa.timestamp('s')
+    }
+    return pa.schema([(name, types[kind]) for name, kind in TABLES[table]['columns']])
+
+def rows_to_batch(table, rows):
+    """
+    Convierte filas (tuplas en el orden de TABLES) a un RecordBatch tipado.
+    Se arma columna por columna para no crear un dict por fila.
+    """
+    import pyarrow as pa
+
+    schema = arrow_schema(table)
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    arrays = []
+    for (name, kind), field, values in zip(TABLES[table]['columns'], schema, columns):
+        if kind == 'seconds':
+            values = [to_seconds(value) for value in values]
+        elif kind == 'date':
+            values = [to_date(value) for value in values]
+        elif kind == 'bool':
+            values = [None if value is None else bool(value) for value in values]
+
+        if kind == 'category':
+            arrays.append(pa.array(values, type=pa.string()).dictionary_encode().cast(field.type))
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
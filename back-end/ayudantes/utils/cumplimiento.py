@@ -0,0 +1,247 @@
+"""
+Cálculo de cumplimiento semanal por conjunto.
+
+calcular_semana() trae con tres consultas (ayudantes activos, sus
+horarios y los registros de la semana) lo que antes se pedía por usuario,
+y clasifica cada bloque en memoria. calcular_semanas() hace lo mismo para
+varias semanas con una sola consulta de registros y guarda las semanas
+terminadas en una caché LRU por (semana, versión de horarios, huella de
+registros). Una semana terminada todavía recibe registros: el cierre
+diario pendiente, POST /registros con fecha pasada o el journal del
+cliente. La huella (cantidad e id máximo de la semana) cambia con
+cualquiera de ellos, venga del proceso que venga, así la caché no
+necesita invalidarse desde quien escribe.
+"""
+import hashlib
+import os
+from collections import OrderedDict
+from datetime import timedelta
+from threading import Lock
+
+from config import Config
+from utils.datetime_utils import convert_to_time
+
+# Semanas terminadas calculadas desde registros que se guardan en memoria
+CUMPLIMIENTO_CACHE_SEMANAS = int(os.getenv('CUMPLIMIENTO_CACHE_SEMANAS', 104))
+
+# Días en español por weekday() (lunes = 0)
+DIAS = list(Config.DIAS_SEMANA.values())
+
+_semanas = OrderedDict()
+_semanas_lock = Lock()
+
+def inicio_semana(fecha):
+    """Lunes de la semana de fecha"""
+    return fecha - timedelta(days=fecha.weekday())
+
+def clasificar_bloque(registros, hora_entrada, hora_salida):
+    """
+    Clasifica un bloque de horario según los registros de ese día
+
+    Args:
+        registros: Registros del día ordenados por id (tipo, hora, id)
+        hora_entrada, hora_salida: Límites del bloque (datetime.time)
+
+    Returns:
+        'Cumplido', 'Incompleto' o None si no hay un par Entrada/Salida que
+        toque el bloque
+    """
+    incompleto = False
+    entradas = [r for r in registros if r['tipo'] == 'Entrada']
+    salidas = [r for r in registros if r['tipo'] == 'Salida']
+
+    for entrada in entradas:
+        t_entrada = convert_to_time(entrada['hora'])
+        for salida in salidas:
+            # Solo salidas posteriores a esta entrada
+            if salida['id'] <= entrada['id']:
+                continue
+            t_salida = convert_to_time(salida['hora'])
+            if t_entrada <= hora_entrada and t_salida >= hora_salida:
+                return 'Cumplido'
+            if ((t_entrada > hora_entrada and t_entrada < hora_salida and t_salida >= hora_salida) or
+                    (t_entrada <= hora_entrada and t_salida < hora_salida) or
+                    (t_entrada < hora_salida and t_salida > hora_entrada)):
+                incompleto = True
+    return 'Incompleto' if incompleto else None
+
+def estado_semana(cumplidos, incompletos, ausentes, total):
+    """Estado general de la semana a partir del conteo de bloques"""
+    if total == 0:
+        return "No Aplica"
+    if cumplidos == total:
+        return "Cumple"
+    if ausentes == total:
+        return "Ausente"
+    if incompletos > 0 or (cumplidos > 0 and ausentes > 0):
+        return "Incompleto"
+    return "No Cumple"
+
+def cargar_horarios(cursor):
+    """
+    Ayudantes activos y sus bloques de horario
+
+    Returns:
+        tuple: (usuarios, horarios por usuario_id, versión) donde la versión
+               es un hash de ambos: cambia si cambia un horario o un ayudante
+    """
+    cursor.execute("""
+        SELECT id, nombre, apellido, email FROM usuarios_permitidos
+        WHERE activo = 1
+        ORDER BY id
+    """)
+    usuarios = cursor.fetchall()
+
+    cursor.execute("""
+        SELECT h.usuario_id, h.dia, h.hora_entrada, h.hora_salida
+        FROM horarios_asignados h
+        JOIN usuarios_permitidos u ON u.id = h.usuario_id
+        WHERE u.activo = 1
+        ORDER BY h.usuario_id, h.id
+    """)
+    filas = cursor.fetchall()
+    horarios = {}
+    for h in filas:
+        horarios.setdefault(h['usuario_id'], []).append(h)
+
+    contenido = repr([tuple(u.values()) for u in usuarios] + [tuple(h.values()) for h in filas])
+    version = hashlib.sha1(contenido.encode('utf-8')).hexdigest()[:16]
+    return usuarios, horarios, version
+
+def cargar_registros(cursor, desde, hasta):
+    """
+    Registros entre desde y hasta (una consulta), agrupados por
+    (lunes de la semana, email, día en español) y ordenados por id
+
+    El día sale de la fecha y no de la columna dia, que en registros
+    antiguos (cliente Kivy anterior) está en inglés o vacía.
+    """
+    cursor.execute("""
+        SELECT id, email, fecha, hora, tipo FROM registros
+        WHERE fecha BETWEEN %s AND %s
+        ORDER BY id
+    """, (desde, hasta))
+    registros = {}
+    for r in cursor.fetchall():
+        registros.setdefault((inicio_semana(r['fecha']), r['email'], DIAS[r['fecha'].weekday()]), []).append(r)
+    return registros
+
+def huellas_registros(cursor, desde, hasta):
+    """
+    (cantidad, id máximo) de los registros de cada semana entre desde y hasta
+
+    Solo recorre el índice (fecha, email), sin leer las filas.
+
+    Returns:
+        dict: lunes -> (cantidad, id máximo); las semanas sin registros no están
+    """
+    cursor.execute("""
+        SELECT fecha, COUNT(*) AS cantidad, MAX(id) AS ultimo FROM registros
+        WHERE fecha BETWEEN %s AND %s
+        GROUP BY fecha
+    """, (desde, hasta))
+    huellas = {}
+    for r in cursor.fetchall():
+        inicio = inicio_semana(r['fecha'])
+        cantidad, ultimo = huellas.get(inicio, (0, 0))
+        huellas[inicio] = (cantidad + r['cantidad'], max(ultimo, r['ultimo']))
+    return huellas
+
+def clasificar_usuarios(usuarios, horarios, registros, inicio):
+    """
+    Clasifica los bloques de cada ayudante en la semana de inicio
+
+    Returns:
+        list: Un dict por ayudante (usuario_id, email, nombre, apellido) con
+              'bloques': lista de (horario, clasificación de clasificar_bloque)
+    """
+    resultado = []
+    for user in usuarios:
+        bloques = []
+        for h in horarios.get(user['id'], []):
+            dia = h['dia'].lower()
+            del_dia = registros.get((inicio, user['email'], Config.DIAS_TRADUCCION.get(dia, dia)), [])
+            clasificacion = clasificar_bloque(
+                del_dia, convert_to_time(h['hora_entrada']), convert_to_time(h['hora_salida'])
+            )
+            bloques.append((h, clasificacion))
+        resultado.append({
+            'usuario_id': user['id'],
+            'email': user['email'],
+            'nombre': user['nombre'],
+            'apellido': user['apellido'],
+            'bloques': bloques,
+        })
+    return resultado
+
+def calcular_semana(cursor, inicio, hasta=None):
+    """
+    Cumplimiento de todos los ayudantes activos en la semana de inicio
+
+    Args:
+        cursor: Cursor de diccionarios
+        inicio: Lunes de la semana
+        hasta: Último día con registros a considerar (por defecto el domingo)
+
+    Returns:
+        list: ver clasificar_usuarios
+    """
+    fin = inicio + timedelta(days=6)
+    usuarios, horarios, _ = cargar_horarios(cursor)
+    registros = cargar_registros(cursor, inicio, min(hasta or fin, fin))
+    return clasificar_usuarios(usuarios, horarios, registros, inicio)
+
+def calcular_semanas(cursor, inicios, hoy):
+    """
+    Cumplimiento de varias semanas con una sola pasada por registros
+
+    Las semanas terminadas (domingo antes de hoy) quedan en caché por
+    (semana, versión de horarios, huella de registros); solo las que faltan
+    o cambiaron se calculan, con una consulta de registros que cubre todas.
+
+    Args:
+        cursor: Cursor de diccionarios
+        inicios: Lunes de cada semana
+        hoy: Fecha actual (la semana en curso no se guarda en caché)
+
+    Returns:
+        dict: lunes -> lista de clasificar_usuarios
+    """
+    usuarios, horarios, version = cargar_horarios(cursor)
+
+    terminadas = [inicio for inicio in inicios if inicio + timedelta(days=6) < hoy]
+    huellas = {}
+    if terminadas:
+        huellas = huellas_registros(cursor, min(terminadas), max(terminadas) + timedelta(days=6))
+    claves = {inicio: (inicio, version, huellas.get(inicio)) for inicio in terminadas}
+
+    resultado = {}
+    with _semanas_lock:
+        for inicio, clave in claves.items():
+            if clave in _semanas:
+                _semanas.move_to_end(clave)
+                resultado[inicio] = _semanas[clave]
+
+    faltantes = [inicio for inicio in inicios if inicio not in resultado]
+    if faltantes:
+        registros = cargar_registros(cursor, min(faltantes), min(max(faltantes) + timedelta(days=6), hoy))
+        for inicio in faltantes:
+            resultado[inicio] = clasificar_usuarios(usuarios, horarios, registros, inicio)
+
+        with _semanas_lock:
+            for inicio in faltantes:
+                if inicio in claves:
+                    _semanas[claves[inicio]] = resultado[inicio]
+            while len(_semanas) > CUMPLIMIENTO_CACHE_SEMANAS:
+                _semanas.popitem(last=False)
+    return resultado
+
+def invalidar_semanas():
+    """
+    Vacía la caché de semanas calculadas de este proceso
+
+    No hace falta tras escribir registros (la huella los detecta); sirve
+    para liberar memoria o empezar de cero en las pruebas.
+    """
+    with _semanas_lock:
+        _semanas.clear()
@@ -0,0 +1,30 @@
+"""
+Acceso a datos compartido por las APIs de ayudantes, estudiantes y lector
+y por el cliente de reconocimiento facial.
+
+- config: parámetros de conexión desde el entorno (MYSQL_*, DB_BACKEND).
+- backends: drivers intercambiables (pymysql, mysql-connector, sqlite).
+- sqlite: backend SQLite con traducción del dialecto de MySQL, para
+  pruebas y benchmarks sin servidor; fixtures: datos de ejemplo.
+- pool: pool de conexiones por proceso con cursores instrumentados.
+- instrumentation: tiempos acumulados por sentencia SQL.
+- metrics: histogramas por ruta y por sentencia, /metrics (Prometheus) y
+  encabezado Server-Timing para las apps Flask.
+- detector: sentencias lentas y repetidas (N+1) por petición.
+- profiler: perfilado de peticiones con firma o por muestra (cProfile o
+  pilas colapsadas); se importa aparte (python -m comun.profiler firma).
+- export: consultas leídas con cursor sin buffer y exports en streaming
+  (NDJSON / CSV, gzip) para las APIs.
+- repositorio: búsqueda de usuarios, decisión Entrada/Salida, registro
+  de escaneos y presencia.
+
+En Docker el paquete se copia junto a cada servicio (/app/comun); en el
+repositorio cada servicio agrega back-end/ al path.
+"""
+from comun.backends import BACKENDS, create_backend, error_code, is_lock_conflict, register_backend
+from comun.config import database_settings
+from comun.instrumentation import InstrumentedCursor, get_statement_stats, record_statement
+from comun.detector import get_findings
+from comun.metrics import init_metrics, render_prometheus
+from comun.pool import ConnectionPool, PoolTimeout, create_pool, get_pool
+from comun.sqlite import SQLiteDatabase
@@ -0,0 +1,136 @@
+"""
+Backends de base de datos intercambiables.
+
+Cada backend sabe abrir una conexión, dar un cursor que devuelve filas como
+dict y traducir sus errores a códigos de MySQL. El pool y el repositorio
+solo hablan con esta interfaz; los drivers se importan al crear el
+backend, así cada servicio instala únicamente el que usa.
+"""
+
+# Códigos de error de MySQL que usa el repositorio
+LOCK_WAIT_TIMEOUT = 1205
+DEADLOCK = 1213
+TABLE_MISSING = 1146
+
+BACKENDS = {}
+
+def register_backend(cls):
+    """Registra una clase de backend bajo su nombre (usable como decorador)"""
+    BACKENDS[cls.name] = cls
+    return cls
+
+def create_backend(name, settings):
+    """
+    Instancia el backend registrado con ese nombre
+
+    Raises:
+        ValueError: Si no hay un backend con ese nombre
+    """
+    try:
+        cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Backend de base de datos desconocido: {name}. Use: {', '.join(BACKENDS)}")
+    return cls(settings)
+
+def error_code(error):
+    """Código de error de MySQL de una excepción de cualquier driver (o None)"""
+    code = getattr(error, 'errno', None)
+    if code is None and getattr(error, 'args', None) and isinstance(error.args[0], int):
+        code = error.args[0]
+    return code
+
+def is_lock_conflict(error):
+    """Deadlock o lock wait timeout: la transacción se puede reintentar"""
+    return error_code(error) in (LOCK_WAIT_TIMEOUT, DEADLOCK)
+
+class Backend:
+    """Interfaz común de los backends"""
+
+    name = None
+
+    # Excepción base del driver
+    Error = Exception
+
+    def __init__(self, settings):
+        self.settings = settings
+
+    def connect(self, autocommit):
+        raise NotImplementedError
+
+    def cursor(self, connection):
+        """Cursor del driver con filas como dict"""
+        raise NotImplementedError
+
+    def stream_cursor(self, connection):
+        """Cursor sin buffer con filas como tupla (comun.export)"""
+        return connection.cursor()
+
+    def begin(self, connection):
+        connection.begin()
+
+    def in_transaction(self, connection):
+        """Si la conexión tiene una transacción abierta (sin ir al servidor)"""
+        return True
+
+    def ping(self, connection):
+        """Verifica (y si hace falta reabre) una conexión que estuvo inactiva"""
+        connection.ping(reconnect=True)
+
+@register_backend
+class PyMySQLBackend(Backend):
+    """MySQL con PyMySQL (ayudantes y lector)"""
+
+    name = 'pymysql'
+
+    def __init__(self, settings):
+        import pymysql
+        import pymysql.cursors
+        from pymysql.constants import SERVER_STATUS
+
+        super().__init__(settings)
+        self.driver = pymysql
+        self.Error = pymysql.Error
+        self.in_trans_flag = SERVER_STATUS.SERVER_STATUS_IN_TRANS
+
+    def connect(self, autocommit):
+        return self.driver.connect(autocommit=autocommit, **self.settings)
+
+    def cursor(self, connection):
+        return connection.cursor(self.driver.cursors.DictCursor)
+
+    def stream_cursor(self, connection):
+        return connection.cursor(self.driver.cursors.SSCursor)
+
+    def in_transaction(self, connection):
+        return bool(connection.server_status & self.in_trans_flag)
+
+@register_backend
+class MySQLConnectorBackend(Backend):
+    """MySQL con mysql.connector (estudiantes y el cliente Kivy)"""
+
+    name = 'mysql-connector'
+
+    def __init__(self, settings):
+        import mysql.connector
+
+        super().__init__(settings)
+        self.driver = mysql.connector
+        self.Error = mysql.connector.Error
+
+    def connect(self, autocommit):
+        return self.driver.connect(autocommit=autocommit, **self.settings)
+
+    def cursor(self, connection):
+        return connection.cursor(dictionary=True)
+
+    def stream_cursor(self, connection):
+        return connection.cursor(buffered=False)
+
+    def begin(self, connection):
+        connection.start_transaction()
+
+    def in_transaction(self, connection):
+        return connection.in_transaction
+
+    def ping(self, connection):
+        connection.ping(reconnect=True, attempts=1)
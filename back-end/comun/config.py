@@ -0,0 +1,43 @@
+"""
+Configuración de base de datos común a todos los servicios.
+
+Las variables son las mismas que ya usan los servicios (MYSQL_HOST,
+MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB, MYSQL_PORT); DB_BACKEND elige el
+driver y MYSQL_POOL_SIZE / MYSQL_POOL_TIMEOUT dimensionan el pool.
+"""
+import os
+
+DEFAULT_BACKEND = 'pymysql'
+
+def database_settings(**overrides):
+    """
+    Parámetros de conexión leídos del entorno
+
+    Args:
+        **overrides: Valores que reemplazan a los del entorno (por ejemplo
+            el DB_CONFIG del cliente)
+
+    Returns:
+        dict con host, user, password, database, port y charset
+    """
+    settings = {
+        'host': os.getenv('MYSQL_HOST', 'localhost'),
+        'user': os.getenv('MYSQL_USER', 'root'),
+        'password': os.getenv('MYSQL_PASSWORD', ''),
+        'database': os.getenv('MYSQL_DB', 'registro_qr'),
+        'port': int(os.getenv('MYSQL_PORT', 3306)),
+        'charset': os.getenv('DB_CHARSET', 'utf8mb4')
+    }
+    settings.update({key: value for key, value in overrides.items() if value is not None})
+    return settings
+
+def pool_settings():
+    """Tamaño del pool y segundos máximos de espera por una conexión libre"""
+    return {
+        'size': int(os.getenv('MYSQL_POOL_SIZE', 5)),
+        'timeout': float(os.getenv('MYSQL_POOL_TIMEOUT', 5))
+    }
+
+def backend_name(default=DEFAULT_BACKEND):
+    """Backend configurado en DB_BACKEND"""
+    return os.getenv('DB_BACKEND', default)
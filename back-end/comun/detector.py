@@ -0,0 +1,163 @@
+"""
+Detector de sentencias lentas y de patrones N+1.
+
+comun.metrics le pasa cada petición terminada con sus sentencias
+agrupadas por texto normalizado (veces, tiempo, filas) y cada sentencia
+que supera SQL_SLOW_MS. Se marcan dos hallazgos:
+
+- n_plus_one: una petición corrió la misma sentencia normalizada más de
+  SQL_REPEAT_THRESHOLD veces (una consulta por usuario dentro de un for).
+- slow_query: una ejecución tardó más de SQL_SLOW_MS milisegundos.
+
+Cada hallazgo suma en un resumen por (tipo, ruta, sentencia) que los
+servicios exponen en su endpoint de hallazgos, y se escribe como una
+línea JSON en SQL_FINDINGS_LOG (archivo rotativo) si está definido. Para
+no inundar el log, una misma combinación se escribe a lo más una vez
+cada SQL_FINDINGS_LOG_INTERVAL segundos; el resumen las cuenta todas.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+ENABLED = os.getenv('SQL_DETECTOR_ENABLED', '1') != '0'
+REPEAT_THRESHOLD = int(os.getenv('SQL_REPEAT_THRESHOLD', 10))
+SLOW_MS = float(os.getenv('SQL_SLOW_MS', 250))
+LOG_PATH = os.getenv('SQL_FINDINGS_LOG')
+LOG_BYTES = int(os.getenv('SQL_FINDINGS_LOG_BYTES', 5 * 1024 * 1024))
+LOG_BACKUPS = int(os.getenv('SQL_FINDINGS_LOG_BACKUPS', 5))
+LOG_INTERVAL = float(os.getenv('SQL_FINDINGS_LOG_INTERVAL', 60))
+
+# Combinaciones (tipo, ruta, sentencia) distintas que guarda el resumen
+MAX_FINDINGS = 500
+
+# Largo máximo del texto de la sentencia en el resumen y en el log
+QUERY_TEXT_LENGTH = 500
+
+_findings = OrderedDict()
+_lock = threading.Lock()
+
+_logger = None
+_logger_lock = threading.Lock()
+
+def findings_logger():
+    """Logger de hallazgos con su archivo rotativo (None sin SQL_FINDINGS_LOG)"""
+    global _logger
+    if not LOG_PATH:
+        return None
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                logger = logging.getLogger('comun.detector')
+                handler = RotatingFileHandler(LOG_PATH, maxBytes=LOG_BYTES, backupCount=LOG_BACKUPS)
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                logger.addHandler(handler)
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                _logger = logger
+    return _logger
+
+def _query_id(normalized):
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12]
+
+def report(kind, service, normalized, method=None, route=None, **detail):
+    """
+    Registra un hallazgo en el resumen y, si corresponde, en el log
+
+    Args:
+        kind: 'n_plus_one' o 'slow_query'
+        service: Servicio que lo detectó
+        normalized: Texto normalizado de la sentencia
+        method, route: Petición (None fuera de una petición)
+        **detail: count, total_ms (de la petición o de la ejecución), rows...
+    """
+    query_id = _query_id(normalized)
+    key = (kind, method, route, query_id)
+    now = time.time()
+    with _lock:
+        entry = _findings.get(key)
+        if entry is None:
+            entry = _findings[key] = {
+                'kind': kind, 'method': method, 'route': route, 'query_id': query_id,
+                'query': normalized[:QUERY_TEXT_LENGTH], 'occurrences': 0,
+                'max_count': 0, 'max_ms': 0.0, 'total_ms': 0.0, 'rows': 0,
+                'first_seen': now, 'last_seen': now, 'logged_at': None,
+            }
+            while len(_findings) > MAX_FINDINGS:
+                _findings.popitem(last=False)
+        else:
+            _findings.move_to_end(key)
+        entry['occurrences'] += 1
+        entry['last_seen'] = now
+        entry['max_count'] = max(entry['max_count'], detail.get('count', 1))
+        entry['max_ms'] = max(entry['max_ms'], detail.get('total_ms', 0.0))
+        entry['total_ms'] += detail.get('total_ms', 0.0)
+        entry['rows'] += detail.get('rows', 0)
+        write = entry['logged_at'] is None or now - entry['logged_at'] >= LOG_INTERVAL
+        if write:
+            entry['logged_at'] = now
+
+    logger = findings_logger() if write else None
+    if logger is not None:
+        logger.info(json.dumps(dict(
+            {'ts': datetime.now().isoformat(timespec='milliseconds'), 'kind': kind,
+             'service': service, 'pid': os.getpid(), 'method': method, 'route': route,
+             'query_id': query_id, 'query': normalized[:QUERY_TEXT_LENGTH]},
+            **{name: round(value, 3) if isinstance(value, float) else value for name, value in detail.items()}
+        ), ensure_ascii=False, default=str))
+
+def check_request(service, method, route, statements, request_ms):
+    """
+    Revisa las sentencias de una petición terminada
+
+    Args:
+        statements: dict texto normalizado -> [veces, segundos, filas]
+        request_ms: Duración total de la petición
+    """
+    for normalized, (count, seconds, rows) in statements.items():
+        if count > REPEAT_THRESHOLD:
+            report('n_plus_one', service, normalized, method, route, count=count,
+                   total_ms=seconds * 1000, mean_ms=seconds * 1000 / count,
+                   rows=rows, request_ms=request_ms)
+
+def check_statement(service, normalized, seconds, rows=0, method=None, route=None):
+    """Marca una ejecución que superó SQL_SLOW_MS"""
+    report('slow_query', service, normalized, method, route,
+           total_ms=seconds * 1000, rows=rows)
+
+def is_slow(seconds):
+    return seconds * 1000 >= SLOW_MS
+
+def get_findings(reset=False):
+    """
+    Resumen de hallazgos del proceso, de más a menos frecuentes
+
+    Returns:
+        dict: Umbrales vigentes y la lista de hallazgos (tipo, ruta,
+              sentencia, ocurrencias, máximo de repeticiones en una
+              petición, max_ms: el mayor tiempo de la sentencia en una
+              petición o ejecución, total_ms y filas acumulados)
+    """
+    with _lock:
+        findings = [dict(entry) for entry in _findings.values()]
+        if reset:
+            _findings.clear()
+    for entry in findings:
+        del entry['logged_at']
+        entry['first_seen'] = datetime.fromtimestamp(entry['first_seen']).isoformat(timespec='seconds')
+        entry['last_seen'] = datetime.fromtimestamp(entry['last_seen']).isoformat(timespec='seconds')
+        entry['max_ms'] = round(entry['max_ms'], 3)
+        entry['total_ms'] = round(entry['total_ms'], 3)
+    findings.sort(key=lambda entry: (entry['occurrences'], entry['total_ms']), reverse=True)
+    return {
+        'enabled': ENABLED,
+        'repeat_threshold': REPEAT_THRESHOLD,
+        'slow_ms': SLOW_MS,
+        'log': LOG_PATH,
+        'findings': findings,
+    }
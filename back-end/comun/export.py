@@ -0,0 +1,190 @@
+"""
+Exportación en streaming de consultas grandes (NDJSON / CSV, opcionalmente
+gzip), compartida por las APIs de ayudantes y estudiantes.
+
+stream_query abre una conexión propia del backend y lee el resultado con
+un cursor sin buffer (Backend.stream_cursor), así la memoria no depende
+del tamaño del resultado; export_response lo convierte en una respuesta
+Flask que se genera fila a fila y cierra la conexión al terminar o si el
+cliente se desconecta.
+"""
+from datetime import datetime, date, time, timedelta
+from decimal import Decimal
+import csv
+import io
+import json
+import logging
+import zlib
+
+# Formatos soportados y su tipo MIME
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+class StreamedQuery:
+    """
+    Resultado de una consulta leído fila a fila desde el servidor
+
+    Usa una conexión propia (no la del pool ni la del request): mientras
+    queden filas sin leer la conexión no admite otras consultas, y la
+    respuesta en streaming sigue consumiendo filas después de que termina
+    la vista. Se itera como tuplas; los nombres de columna quedan en
+    columns.
+    """
+
+    def __init__(self, connection, cursor, batch_size, errors=Exception):
+        self.connection = connection
+        self.cursor = cursor
+        self.batch_size = batch_size
+        self.errors = errors
+        self.columns = [column[0] for column in cursor.description]
+
+    def __iter__(self):
+        try:
+            while True:
+                rows = self.cursor.fetchmany(self.batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            self.close()
+
+    def close(self):
+        """Cierra la conexión sin leer las filas pendientes (cliente desconectado)"""
+        if self.connection is None:
+            return
+        connection, self.connection = self.connection, None
+        try:
+            # cursor.close() de un cursor sin buffer consume el resto del
+            # resultado; cerrar la conexión directamente lo descarta
+            connection.close()
+        except self.errors as e:
+            logging.warning(f"Error cerrando conexión de streaming: {e}")
+
+def stream_query(backend, query, params=None, batch_size=1000):
+    """
+    Ejecuta un SELECT con cursor sin buffer; las filas se traen al iterar
+
+    Args:
+        backend: Backend de comun.backends (el del pool del servicio)
+        query (str): Consulta SQL
+        params (tuple): Parámetros para la consulta
+        batch_size (int): Filas por lectura
+
+    Returns:
+        StreamedQuery: Iterable de tuplas con atributo columns
+    """
+    connection = backend.connect(autocommit=True)
+    try:
+        cursor = backend.stream_cursor(connection)
+        cursor.execute(query, params or ())
+    except Exception:
+        connection.close()
+        raise
+    return StreamedQuery(connection, cursor, batch_size, backend.Error)
+
+def export_value(value):
+    """
+    Convierte un valor de la base de datos a un tipo serializable
+
+    Args:
+        value: Valor tal como lo entrega el cursor
+
+    Returns:
+        Valor apto para JSON/CSV
+    """
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        # Columnas TIME llegan como timedelta
+        segundos = int(value.total_seconds())
+        return f"{segundos // 3600:02d}:{segundos % 3600 // 60:02d}:{segundos % 60:02d}"
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8', errors='replace')
+    return value
+
+def batched(rows, batch_size):
+    """Agrupa un iterable de filas en listas de hasta batch_size filas"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def ndjson_chunks(columns, rows, batch_size=500):
+    """Genera el export como NDJSON, un bloque de texto por lote de filas"""
+    for batch in batched(rows, batch_size):
+        yield ''.join(
+            json.dumps(dict(zip(columns, map(export_value, row))), ensure_ascii=False) + '\n'
+            for row in batch
+        )
+
+def csv_chunks(columns, rows, batch_size=500):
+    """Genera el export como CSV; la cabecera sale como primer bloque"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(columns)
+    yield buffer.getvalue()
+
+    for batch in batched(rows, batch_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([[export_value(value) for value in row] for row in batch])
+        yield buffer.getvalue()
+
+def gzip_chunks(chunks, level=6):
+    """
+    Comprime en gzip un flujo de bloques sin acumularlo
+
+    Cada bloque se vacía con Z_SYNC_FLUSH para que el cliente reciba los
+    datos a medida que salen de la base de datos.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_response(result, formato, filename, compress=False):
+    """
+    Arma la respuesta en streaming de un export
+
+    Args:
+        result: Resultado de stream_query (columns, iterable de filas y close)
+        formato: 'ndjson' o 'csv'
+        filename: Nombre base del archivo descargado (sin extensión)
+        compress: Si debe comprimirse en gzip
+
+    Returns:
+        Flask response que se genera fila a fila
+    """
+    from flask import Response
+
+    if formato == 'csv':
+        chunks = csv_chunks(result.columns, result)
+    else:
+        chunks = ndjson_chunks(result.columns, result)
+
+    body = (chunk.encode('utf-8') for chunk in chunks)
+    filename = f"{filename}.{formato}"
+    mimetype = EXPORT_FORMATS[formato]
+
+    if compress:
+        body = gzip_chunks(body)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+
+    response = Response(body, mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # Evitar que un proxy acumule la respuesta completa antes de enviarla
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(result.close)
+    return response
@@ -0,0 +1,78 @@
+"""
+Datos de ejemplo para bases locales (pruebas y desarrollo).
+
+Pocos ayudantes con sus bloques de horario, estudiantes y un
+administrador; suficientes para recorrer todas las rutas. Las sentencias
+usan %s, así que sirven para cualquier conexión de los backends
+(SQLite o MySQL).
+"""
+
+# (nombre, apellido, email, activo)
+HELPERS = [
+    ('Ana', 'Rojas', 'ana.rojas@uai.cl', 1),
+    ('Benjamín', 'Soto', 'benjamin.soto@uai.cl', 1),
+    ('Carla', 'Muñoz', 'carla.munoz@uai.cl', 1),
+    ('Diego', 'Pérez', 'diego.perez@uai.cl', 0),
+]
+
+# (email del ayudante, día, hora_entrada, hora_salida)
+HORARIOS = [
+    ('ana.rojas@uai.cl', 'lunes', '09:00:00', '11:00:00'),
+    ('ana.rojas@uai.cl', 'miércoles', '14:00:00', '16:00:00'),
+    ('benjamin.soto@uai.cl', 'martes', '10:00:00', '13:00:00'),
+    ('benjamin.soto@uai.cl', 'jueves', '10:00:00', '13:00:00'),
+    ('carla.munoz@uai.cl', 'viernes', '08:30:00', '12:30:00'),
+]
+
+# (nombre, apellido, email, activo, TP)
+STUDENTS = [
+    ('Elena', 'Castro', 'elena.castro@alumnos.uai.cl', 1, 'Ingeniería Civil'),
+    ('Felipe', 'Vera', 'felipe.vera@alumnos.uai.cl', 1, 'Ingeniería Comercial'),
+    ('Gabriela', 'Núñez', 'gabriela.nunez@alumnos.uai.cl', 1, 'No especificado'),
+    ('Hugo', 'Lagos', 'hugo.lagos@alumnos.uai.cl', 0, 'Derecho'),
+]
+
+# (nombre, apellido, email, password, role); password es hash_password('admin')
+ADMINS = [
+    ('Admin', 'Lab', 'admin@uai.cl', '8c6976e5b5410415bde908bd4dee15dfb167a9c873fc4bb8a81f6f2ab448a918', 'admin'),
+]
+
+def load_fixtures(connection):
+    """
+    Inserta los datos de ejemplo y confirma
+
+    Args:
+        connection: Conexión de cualquier backend (o un PooledConnection)
+
+    Returns:
+        dict: Filas insertadas por tabla
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.executemany(
+            "INSERT INTO usuarios_permitidos (nombre, apellido, email, activo) VALUES (%s, %s, %s, %s)",
+            HELPERS
+        )
+        for email, dia, entrada, salida in HORARIOS:
+            cursor.execute("""
+                INSERT INTO horarios_asignados (usuario_id, dia, hora_entrada, hora_salida)
+                SELECT id, %s, %s, %s FROM usuarios_permitidos WHERE email = %s
+            """, (dia, entrada, salida, email))
+        cursor.executemany(
+            "INSERT INTO usuarios_estudiantes (nombre, apellido, email, activo, TP) VALUES (%s, %s, %s, %s, %s)",
+            STUDENTS
+        )
+        cursor.executemany(
+            "INSERT INTO admin_users (nombre, apellido, email, password, role) VALUES (%s, %s, %s, %s, %s)",
+            ADMINS
+        )
+        connection.commit()
+    finally:
+        cursor.close()
+
+    return {
+        'usuarios_permitidos': len(HELPERS),
+        'horarios_asignados': len(HORARIOS),
+        'usuarios_estudiantes': len(STUDENTS),
+        'admin_users': len(ADMINS),
+    }
@@ -0,0 +1,113 @@
+"""
+Contadores de tiempo por sentencia SQL, compartidos por todos los
+servicios.
+
+Cada ejecución suma llamadas, errores, tiempo total y máximo bajo el texto
+normalizado de la sentencia. Los contadores son por proceso; cada servicio
+los expone en su endpoint de estadísticas. Cada ejecución y las filas
+leídas también van a comun.metrics (histogramas y petición en curso).
+"""
+import threading
+import time
+
+from comun.metrics import record_query, record_rows
+
+_stats_lock = threading.Lock()
+_statement_stats = {}
+
+def normalize_statement(query):
+    """Texto de la sentencia con los espacios colapsados (clave de los contadores)"""
+    return ' '.join(query.split())
+
+def record_statement(query, seconds, error=False):
+    """Acumula tiempo y cantidad de ejecuciones por sentencia"""
+    key = normalize_statement(query)
+    with _stats_lock:
+        stats = _statement_stats.get(key)
+        if stats is None:
+            stats = _statement_stats[key] = {'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+        stats['calls'] += 1
+        stats['errors'] += int(error)
+        stats['total_ms'] += seconds * 1000
+        stats['max_ms'] = max(stats['max_ms'], seconds * 1000)
+    record_query(key, seconds, error)
+
+def get_statement_stats(reset=False):
+    """
+    Contadores por sentencia, de mayor a menor tiempo total
+
+    Args:
+        reset (bool): Si debe vaciar los contadores después de leerlos
+
+    Returns:
+        list: Un dict por sentencia con calls, errors, total_ms, avg_ms y max_ms
+    """
+    with _stats_lock:
+        stats = [
+            dict(values, query=query, avg_ms=values['total_ms'] / values['calls'])
+            for query, values in _statement_stats.items()
+        ]
+        if reset:
+            _statement_stats.clear()
+    return sorted(stats, key=lambda item: item['total_ms'], reverse=True)
+
+def timed_execute(execute, query, params):
+    """Ejecuta execute(query, params) registrando su duración"""
+    start = time.perf_counter()
+    try:
+        result = execute(query, params)
+    except Exception:
+        record_statement(query, time.perf_counter() - start, error=True)
+        raise
+    record_statement(query, time.perf_counter() - start)
+    return result
+
+class InstrumentedCursor:
+    """
+    Envoltorio de un cursor DB-API que registra cada execute
+
+    El resto de la interfaz (fetch*, lastrowid, rowcount, description...)
+    pasa directo al cursor del driver. Se puede usar con `with` igual que
+    los cursores de PyMySQL. owner mantiene viva la conexión del pool
+    mientras el cursor esté en uso.
+    """
+
+    def __init__(self, cursor, owner=None):
+        self._cursor = cursor
+        self._owner = owner
+
+    def execute(self, query, params=None):
+        return timed_execute(self._cursor.execute, query, params)
+
+    def executemany(self, query, seq_params):
+        return timed_execute(self._cursor.executemany, query, seq_params)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            record_rows(1)
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._cursor.fetchmany(*args)
+        record_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        record_rows(len(rows))
+        return rows
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        for row in self._cursor:
+            record_rows(1)
+            yield row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._cursor.close()
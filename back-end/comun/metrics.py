@@ -0,0 +1,317 @@
+"""
+Métricas por petición para las apps Flask de los servicios.
+
+init_metrics(app, service) agrega hooks before/after request que miden
+cada petición y le atribuyen el tiempo de base de datos, la cantidad de
+sentencias y las filas leídas (los cursores de comun, y el de
+estudiantes, avisan a record_query y record_rows). Con eso se llenan
+histogramas por ruta y por sentencia, que /metrics entrega en el formato
+de texto de Prometheus; cada respuesta lleva además un encabezado
+Server-Timing con el desglose de esa petición.
+
+Los mismos hooks alimentan a comun.detector (sentencias lentas y N+1).
+
+Como los contadores de instrumentation, las métricas son por proceso:
+con varios workers cada uno responde por sí mismo (la etiqueta pid
+distingue las series).
+"""
+import bisect
+import hashlib
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from comun import detector
+
+# Límites (en segundos) de los histogramas de duración
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Límites de los histogramas de sentencias por petición
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# Largo máximo del texto de una sentencia en la etiqueta query
+QUERY_LABEL_LENGTH = 120
+
+_current = ContextVar('comun_metrics_request', default=None)
+
+class Histogram:
+    """Histograma acumulado por combinación de etiquetas"""
+
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def snapshot(self):
+        """dict etiquetas -> (conteos acumulados por límite, suma, total)"""
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        result = {}
+        for labels, (counts, total) in series.items():
+            cumulative, running = [], 0
+            for count in counts:
+                running += count
+                cumulative.append(running)
+            result[labels] = (cumulative, total, running)
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+class Counter:
+    """Contador acumulado por combinación de etiquetas"""
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, value=1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + value
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._series)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+REQUEST_SECONDS = Histogram(
+    'labinf_http_request_duration_seconds', 'Duración de las peticiones HTTP',
+    ('service', 'method', 'route', 'status'), LATENCY_BUCKETS
+)
+REQUEST_DB_SECONDS = Histogram(
+    'labinf_http_request_db_seconds', 'Tiempo de base de datos por petición',
+    ('service', 'method', 'route'), LATENCY_BUCKETS
+)
+REQUEST_QUERIES = Histogram(
+    'labinf_http_request_queries', 'Sentencias SQL por petición',
+    ('service', 'method', 'route'), COUNT_BUCKETS
+)
+REQUEST_ROWS = Counter(
+    'labinf_http_request_rows_total', 'Filas leídas de la base por las peticiones',
+    ('service', 'method', 'route')
+)
+QUERY_SECONDS = Histogram(
+    'labinf_db_query_duration_seconds', 'Duración de cada sentencia SQL',
+    ('service', 'query_id', 'query'), LATENCY_BUCKETS
+)
+QUERY_ERRORS = Counter(
+    'labinf_db_query_errors_total', 'Sentencias SQL que terminaron en error',
+    ('service', 'query_id', 'query')
+)
+QUERY_ROWS = Counter(
+    'labinf_db_query_rows_total', 'Filas leídas por cada sentencia SQL',
+    ('service', 'query_id', 'query')
+)
+
+METRICS = (REQUEST_SECONDS, REQUEST_DB_SECONDS, REQUEST_QUERIES, REQUEST_ROWS,
+           QUERY_SECONDS, QUERY_ERRORS, QUERY_ROWS)
+
+# Servicio del proceso (lo fija init_metrics; un proceso sirve una app)
+_service = [os.getenv('METRICS_SERVICE', 'labinf')]
+
+_query_labels = {}
+_query_labels_lock = threading.Lock()
+
+class RequestMetrics:
+    """
+    Lo que una petición lleva gastado en la base
+
+    statements agrupa las sentencias por texto normalizado ([veces,
+    segundos, filas]) y slow guarda las ejecuciones lentas, para el
+    detector.
+    """
+
+    __slots__ = ('start', 'db_seconds', 'queries', 'rows', 'last_query',
+                 'statements', 'slow', 'last_statement', 'last_slow')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db_seconds = 0.0
+        self.queries = 0
+        self.rows = 0
+        self.last_query = None
+        self.statements = {}
+        self.slow = []
+        self.last_statement = None
+        self.last_slow = None
+
+def query_labels(normalized):
+    """(query_id, texto recortado) de una sentencia normalizada"""
+    labels = _query_labels.get(normalized)
+    if labels is None:
+        query_id = hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12]
+        text = normalized if len(normalized) <= QUERY_LABEL_LENGTH else normalized[:QUERY_LABEL_LENGTH] + '...'
+        labels = (query_id, text)
+        with _query_labels_lock:
+            _query_labels[normalized] = labels
+    return labels
+
+def record_query(normalized, seconds, error=False):
+    """
+    Suma una sentencia al histograma por sentencia y a la petición en curso
+
+    Args:
+        normalized: Texto de la sentencia con los espacios colapsados
+        seconds: Duración de execute
+        error: Si execute lanzó una excepción
+    """
+    labels = (_service[0],) + query_labels(normalized)
+    QUERY_SECONDS.observe(labels, seconds)
+    if error:
+        QUERY_ERRORS.inc(labels)
+    current = _current.get()
+    if current is None:
+        if detector.ENABLED and detector.is_slow(seconds):
+            detector.check_statement(_service[0], normalized, seconds)
+        return
+
+    current.db_seconds += seconds
+    current.queries += 1
+    current.last_query = labels
+    if detector.ENABLED:
+        entry = current.statements.get(normalized)
+        if entry is None:
+            entry = current.statements[normalized] = [0, 0.0, 0]
+        entry[0] += 1
+        entry[1] += seconds
+        current.last_statement = entry
+        current.last_slow = None
+        if detector.is_slow(seconds):
+            current.last_slow = [normalized, seconds, 0]
+            current.slow.append(current.last_slow)
+
+def record_rows(count):
+    """Filas leídas por la última sentencia (lo llaman los fetch* de los cursores)"""
+    current = _current.get()
+    if current is not None and count:
+        current.rows += count
+        if current.last_query is not None:
+            QUERY_ROWS.inc(current.last_query, count)
+        if current.last_statement is not None:
+            current.last_statement[2] += count
+        if current.last_slow is not None:
+            current.last_slow[2] += count
+
+def current_request():
+    """Métricas de la petición en curso, o None fuera de una petición"""
+    return _current.get()
+
+def server_timing(current, total_seconds):
+    """Valor del encabezado Server-Timing de una petición"""
+    return (
+        f'db;dur={current.db_seconds * 1000:.1f};desc="{current.queries} queries, {current.rows} rows", '
+        f'app;dur={(total_seconds - current.db_seconds) * 1000:.1f}, '
+        f'total;dur={total_seconds * 1000:.1f}'
+    )
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels_text(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}'
+
+def _format_bound(bound):
+    return repr(float(bound)) if isinstance(bound, float) else str(bound)
+
+def render_prometheus():
+    """Todas las métricas del proceso en el formato de texto de Prometheus"""
+    pid = ('pid', os.getpid())
+    lines = []
+    for metric in METRICS:
+        names = metric.label_names + ('pid',)
+        if isinstance(metric, Histogram):
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} histogram')
+            for labels, (cumulative, total, count) in sorted(metric.snapshot().items()):
+                values = labels + (pid[1],)
+                for bound, running in zip(metric.buckets + ('+Inf',), cumulative):
+                    le = (('le', _format_bound(bound)),)
+                    lines.append(f'{metric.name}_bucket{_labels_text(names, values, le)} {running}')
+                lines.append(f'{metric.name}_sum{_labels_text(names, values)} {total:.6f}')
+                lines.append(f'{metric.name}_count{_labels_text(names, values)} {count}')
+        else:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} counter')
+            for labels, value in sorted(metric.snapshot().items()):
+                lines.append(f'{metric.name}{_labels_text(names, labels + (pid[1],))} {value}')
+    return '\n'.join(lines) + '\n'
+
+def reset_metrics():
+    """Vacía todas las métricas del proceso"""
+    for metric in METRICS:
+        metric.reset()
+
+def init_metrics(app, service, path='/metrics'):
+    """
+    Instrumenta una app Flask y publica sus métricas
+
+    Args:
+        app: Aplicación Flask
+        service: Nombre del servicio (etiqueta service)
+        path: Ruta del endpoint de Prometheus
+
+    METRICS_ENABLED=0 deja la app sin hooks ni endpoint.
+    """
+    if os.getenv('METRICS_ENABLED', '1') == '0':
+        return app
+
+    from flask import Response, request
+
+    _service[0] = service
+
+    @app.before_request
+    def start_request_metrics():
+        _current.set(RequestMetrics())
+
+    @app.after_request
+    def finish_request_metrics(response):
+        current = _current.get()
+        if current is None:
+            return response
+        _current.set(None)
+        total = time.perf_counter() - current.start
+        route = request.url_rule.rule if request.url_rule is not None else '<sin ruta>'
+        if route == path:
+            return response
+
+        labels = (service, request.method, route)
+        REQUEST_SECONDS.observe(labels + (str(response.status_code),), total)
+        REQUEST_DB_SECONDS.observe(labels, current.db_seconds)
+        REQUEST_QUERIES.observe(labels, current.queries)
+        if current.rows:
+            REQUEST_ROWS.inc(labels, current.rows)
+        response.headers['Server-Timing'] = server_timing(current, total)
+
+        if detector.ENABLED:
+            detector.check_request(service, request.method, route, current.statements, total * 1000)
+            for normalized, seconds, rows in current.slow:
+                detector.check_statement(service, normalized, seconds, rows, request.method, route)
+        return response
+
+    def metrics_endpoint():
+        return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule(path, 'metrics', metrics_endpoint, methods=['GET'])
+    return app
@@ -0,0 +1,278 @@
+"""
+Pool de conexiones común a todos los servicios.
+
+Las conexiones se abren bajo demanda hasta `size` y se reutilizan (LIFO,
+así las más recientes siguen calientes). Una conexión inactiva más de
+PING_AFTER segundos se verifica con ping antes de entregarla. Al
+devolverla, si quedó una transacción abierta se revierte.
+
+acquire() entrega un PooledConnection con la misma interfaz que la
+conexión del driver: close() la devuelve al pool en vez de cerrarla, y si
+el código que la pidió la pierde sin cerrarla (un return temprano) vuelve
+al pool cuando el objeto se libera.
+"""
+from collections import deque
+from contextlib import contextmanager
+import logging
+import os
+import threading
+import time
+import weakref
+
+from comun.backends import create_backend
+from comun.config import backend_name, database_settings, pool_settings
+from comun.instrumentation import InstrumentedCursor
+
+# Segundos de inactividad tras los que se hace ping antes de reutilizar
+PING_AFTER = 30
+
+logger = logging.getLogger(__name__)
+
+class PoolTimeout(Exception):
+    """No se liberó ninguna conexión dentro del tiempo de espera"""
+
+class PooledConnection:
+    """
+    Conexión prestada por el pool
+
+    cursor() devuelve cursores instrumentados (filas como dict si el pool
+    se creó con dict_rows); cualquier otro atributo es el de la conexión
+    del driver.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self.raw = raw
+        self._release = weakref.finalize(self, pool.release, raw)
+
+    @property
+    def backend(self):
+        """Backend del pool (name distingue MySQL de SQLite)"""
+        return self._pool.backend
+
+    def cursor(self, *args, **kwargs):
+        if args or kwargs or not self._pool.dict_rows:
+            cursor = self.raw.cursor(*args, **kwargs)
+        else:
+            cursor = self._pool.backend.cursor(self.raw)
+        return InstrumentedCursor(cursor, owner=self)
+
+    def dict_cursor(self):
+        """Cursor instrumentado con filas como dict, sea cual sea el pool"""
+        return InstrumentedCursor(self._pool.backend.cursor(self.raw), owner=self)
+
+    def close(self):
+        """Devuelve la conexión al pool (se puede llamar más de una vez)"""
+        self._release()
+
+    def discard(self):
+        """Cierra la conexión en vez de devolverla (quedó en estado dudoso)"""
+        if self._release.detach() is not None:
+            self._pool.release(self.raw, broken=True)
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class ConnectionPool:
+    """Pool de conexiones de un backend"""
+
+    def __init__(self, backend, size=5, timeout=5.0, autocommit=False, dict_rows=True):
+        self.backend = backend
+        self.size = size
+        self.timeout = timeout
+        self.autocommit = autocommit
+        self.dict_rows = dict_rows
+        self._idle = deque()
+        self._opened = 0
+        self._cond = threading.Condition()
+        self._pid = os.getpid()
+        self._stats = {'acquired': 0, 'created': 0, 'waits': 0, 'wait_ms': 0.0, 'timeouts': 0}
+
+    def _check_fork(self):
+        # Tras un fork (gunicorn --preload) las conexiones del padre no se
+        # comparten: se olvidan sin cerrarlas y el hijo abre las suyas
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._idle.clear()
+            self._opened = 0
+
+    def acquire(self):
+        """
+        Presta una conexión, esperando hasta timeout si todas están en uso
+
+        Raises:
+            PoolTimeout: Si no se liberó ninguna a tiempo
+            backend.Error: Si no se pudo abrir una conexión nueva
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+        raw = None
+        with self._cond:
+            self._check_fork()
+            waited = False
+            while True:
+                if self._idle:
+                    raw, last_used = self._idle.pop()
+                    break
+                if self._opened < self.size:
+                    self._opened += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(f"Pool de conexiones agotado ({self.size} en uso)")
+                waited = True
+                self._cond.wait(remaining)
+            self._stats['acquired'] += 1
+            if waited:
+                self._stats['waits'] += 1
+                self._stats['wait_ms'] += (time.monotonic() - start) * 1000
+
+        if raw is None:
+            try:
+                raw = self.backend.connect(self.autocommit)
+            except Exception:
+                with self._cond:
+                    self._opened -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._stats['created'] += 1
+        elif time.monotonic() - last_used > PING_AFTER:
+            try:
+                self.backend.ping(raw)
+            except self.backend.Error as e:
+                logger.warning(f"Conexión inactiva descartada: {e}")
+                self.release(raw, broken=True)
+                return self.acquire()
+
+        return PooledConnection(self, raw)
+
+    def warm(self, count=None):
+        """
+        Abre conexiones hasta tener count (por defecto size) abiertas, así
+        las primeras peticiones de un worker no pagan la conexión
+
+        Returns:
+            int: Conexiones abiertas ahora
+        """
+        count = min(count or self.size, self.size)
+        conns = []
+        try:
+            while True:
+                with self._cond:
+                    self._check_fork()
+                    if self._opened >= count:
+                        break
+                conns.append(self.acquire())
+        finally:
+            for conn in conns:
+                conn.close()
+        with self._cond:
+            return self._opened
+
+    def release(self, raw, broken=False):
+        """Devuelve una conexión del driver al pool (o la cierra si está rota)"""
+        if os.getpid() != self._pid:
+            return
+        if not broken and self.backend.in_transaction(raw):
+            try:
+                raw.rollback()
+            except self.backend.Error:
+                broken = True
+
+        with self._cond:
+            if broken:
+                self._opened -= 1
+            else:
+                self._idle.append((raw, time.monotonic()))
+            self._cond.notify()
+
+        if broken:
+            try:
+                raw.close()
+            except Exception:
+                pass
+
+    @contextmanager
+    def transaction(self):
+        """
+        Transacción explícita sobre una conexión del pool
+
+        Se confirma al salir del bloque o se revierte si ocurre una
+        excepción; la conexión vuelve al pool en ambos casos.
+
+        Yields:
+            Cursor instrumentado con filas como dict
+        """
+        conn = self.acquire()
+        try:
+            self.backend.begin(conn.raw)
+            cursor = conn.dict_cursor()
+            try:
+                yield cursor
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        finally:
+            conn.close()
+
+    def stats(self):
+        """Ocupación del pool y esperas acumuladas"""
+        with self._cond:
+            return dict(
+                self._stats,
+                backend=self.backend.name,
+                size=self.size,
+                opened=self._opened,
+                idle=len(self._idle)
+            )
+
+def create_pool(backend=None, settings=None, size=None, timeout=None, autocommit=False, dict_rows=True):
+    """
+    Crea un pool con la configuración del entorno
+
+    Args:
+        backend (str): Nombre del backend (por defecto $DB_BACKEND o pymysql)
+        settings (dict): Parámetros de conexión que reemplazan a los del entorno
+        size (int): Conexiones máximas (por defecto $MYSQL_POOL_SIZE)
+        timeout (float): Espera máxima por una conexión (por defecto $MYSQL_POOL_TIMEOUT)
+        autocommit (bool): Modo autocommit de las conexiones
+        dict_rows (bool): Si cursor() devuelve filas como dict
+
+    Returns:
+        ConnectionPool
+    """
+    defaults = pool_settings()
+    return ConnectionPool(
+        create_backend(backend or backend_name(), database_settings(**(settings or {}))),
+        size=size or defaults['size'],
+        timeout=timeout or defaults['timeout'],
+        autocommit=autocommit,
+        dict_rows=dict_rows
+    )
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(name='default', **options):
+    """
+    Pool del proceso con ese nombre, creado la primera vez con options
+    (mismos argumentos que create_pool)
+    """
+    pool = _pools.get(name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                pool = _pools[name] = create_pool(**options)
+    return pool
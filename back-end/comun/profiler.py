@@ -0,0 +1,271 @@
+"""
+Perfilado bajo demanda de peticiones de las apps Flask.
+
+init_profiler(app, service) perfila una petición cuando:
+
+- trae el encabezado X-Profile firmado con PROFILE_SECRET (HMAC-SHA256
+  de "<timestamp>:<MÉTODO> <ruta>", válido PROFILE_SIGNATURE_TTL
+  segundos); python -m comun.profiler /cumplimiento imprime uno, o
+- cae en la muestra aleatoria de 1 cada PROFILE_SAMPLE_RATE peticiones.
+
+Hay dos modos: cprofile (cProfile del thread de la petición, se guarda
+como .pstats) y sample (un thread toma la pila de la petición cada
+PROFILE_INTERVAL_MS y la guarda en formato colapsado, .folded, para
+flamegraph.pl o speedscope). X-Profile-Mode elige el modo de una
+petición firmada; las muestras aleatorias usan PROFILE_SAMPLE_MODE.
+
+Cada perfil queda en PROFILE_DIR con un .json al lado (ruta, estado,
+duración y, si comun.metrics está activo, tiempo de base y sentencias),
+se avisa en el encabezado X-Profile-Id y se descarga desde
+<path>/<id> con una firma para esa ruta. Sin PROFILE_SECRET ni
+PROFILE_SAMPLE_RATE no se registra ningún hook: no cuesta nada.
+"""
+import argparse
+import cProfile
+import hashlib
+import hmac
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+SECRET = os.getenv('PROFILE_SECRET', '')
+SAMPLE_RATE = int(os.getenv('PROFILE_SAMPLE_RATE', 0))
+SAMPLE_MODE = os.getenv('PROFILE_SAMPLE_MODE', 'sample')
+SIGNATURE_TTL = int(os.getenv('PROFILE_SIGNATURE_TTL', 300))
+INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 5))
+PROFILE_DIR = os.getenv('PROFILE_DIR') or os.path.join(tempfile.gettempdir(), 'labinf-perfiles')
+KEEP = int(os.getenv('PROFILE_KEEP', 50))
+
+MODES = {'cprofile': '.pstats', 'sample': '.folded'}
+
+HEADER = 'X-Profile'
+MODE_HEADER = 'X-Profile-Mode'
+
+def sign(secret, method, path, timestamp=None):
+    """Valor del encabezado X-Profile para method y path"""
+    timestamp = int(time.time() if timestamp is None else timestamp)
+    message = f'{timestamp}:{method.upper()} {path}'.encode('utf-8')
+    digest = hmac.new(secret.encode('utf-8'), message, hashlib.sha256).hexdigest()
+    return f'{timestamp}:{digest}'
+
+def verify(secret, header, method, path, now=None):
+    """Si header es una firma vigente de method y path"""
+    if not secret or not header:
+        return False
+    timestamp, _, _ = header.partition(':')
+    try:
+        timestamp = int(timestamp)
+    except ValueError:
+        return False
+    now = time.time() if now is None else now
+    if abs(now - timestamp) > SIGNATURE_TTL:
+        return False
+    return hmac.compare_digest(sign(secret, method, path, timestamp), header)
+
+class StackSampler:
+    """
+    Toma la pila de un thread cada interval segundos desde otro thread
+
+    Solo cuesta mientras corre: el thread perfilado no ejecuta nada extra.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='comun-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        """Pilas en formato colapsado: 'a;b;c cantidad' por línea"""
+        with open(path, 'w', encoding='utf-8') as output:
+            for stack, count in self.stacks.most_common():
+                output.write(f'{stack} {count}\n')
+
+class ActiveProfile:
+    """Perfil de una petición en curso"""
+
+    def __init__(self, mode, trigger):
+        self.mode = mode
+        self.trigger = trigger
+        self.id = f'{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}'
+        self.start = time.perf_counter()
+        self.stopped = False
+        if mode == 'cprofile':
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        else:
+            self.profiler = StackSampler(threading.get_ident(), INTERVAL_MS / 1000)
+            self.profiler.start()
+
+    def stop(self):
+        if self.stopped:
+            return
+        self.stopped = True
+        self.elapsed = time.perf_counter() - self.start
+        if self.mode == 'cprofile':
+            self.profiler.disable()
+        else:
+            self.profiler.stop()
+
+    def save(self, directory, metadata):
+        """Escribe el perfil y su .json; devuelve el nombre del archivo del perfil"""
+        os.makedirs(directory, exist_ok=True)
+        filename = self.id + MODES[self.mode]
+        target = os.path.join(directory, filename)
+        if self.mode == 'cprofile':
+            self.profiler.dump_stats(target)
+        else:
+            self.profiler.dump(target)
+            metadata['samples'] = self.profiler.samples
+        metadata.update(id=self.id, mode=self.mode, trigger=self.trigger, file=filename,
+                        duration_ms=round(self.elapsed * 1000, 3))
+        with open(os.path.join(directory, self.id + '.json'), 'w', encoding='utf-8') as output:
+            json.dump(metadata, output, ensure_ascii=False, indent=2)
+        return filename
+
+def list_profiles(directory=None):
+    """Metadatos de los perfiles guardados, del más reciente al más antiguo"""
+    directory = directory or PROFILE_DIR
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in os.listdir(directory):
+        if name.endswith('.json'):
+            try:
+                with open(os.path.join(directory, name), encoding='utf-8') as source:
+                    profiles.append(json.load(source))
+            except (OSError, ValueError):
+                continue
+    return sorted(profiles, key=lambda item: item.get('id', ''), reverse=True)
+
+def prune_profiles(directory=None, keep=None):
+    """Borra los perfiles más antiguos más allá de keep"""
+    directory = directory or PROFILE_DIR
+    keep = KEEP if keep is None else keep
+    for profile in list_profiles(directory)[keep:]:
+        for name in (profile['id'] + '.json', profile.get('file')):
+            if name:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+
+def init_profiler(app, service, path='/profiles'):
+    """
+    Registra el perfilado bajo demanda en una app Flask
+
+    Args:
+        app: Aplicación Flask (después de init_metrics, para que el .json
+             incluya el tiempo de base de la petición)
+        service: Nombre del servicio (va en los metadatos)
+        path: Prefijo de los endpoints de descarga (requieren firma)
+    """
+    if not SECRET and SAMPLE_RATE <= 0:
+        return app
+
+    from flask import abort, g, jsonify, request, send_from_directory
+    from comun.metrics import current_request
+
+    def signed():
+        return verify(SECRET, request.headers.get(HEADER), request.method, request.path)
+
+    @app.before_request
+    def start_profile():
+        if request.path == path or request.path.startswith(path + '/'):
+            return
+        trigger = mode = None
+        if request.headers.get(HEADER) and signed():
+            trigger, mode = 'signed', request.headers.get(MODE_HEADER, 'cprofile')
+        elif SAMPLE_RATE > 0 and random.randrange(SAMPLE_RATE) == 0:
+            trigger, mode = 'sample', SAMPLE_MODE
+        if trigger:
+            g.comun_profile = ActiveProfile(mode if mode in MODES else 'cprofile', trigger)
+
+    @app.after_request
+    def finish_profile(response):
+        profile = g.pop('comun_profile', None)
+        if profile is None:
+            return response
+        profile.stop()
+        metadata = {
+            'service': service, 'pid': os.getpid(), 'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'route': request.url_rule.rule if request.url_rule is not None else None,
+            'status': response.status_code, 'created': datetime.now().isoformat(timespec='seconds'),
+        }
+        current = current_request()
+        if current is not None:
+            metadata.update(db_ms=round(current.db_seconds * 1000, 3), queries=current.queries, rows=current.rows)
+        try:
+            profile.save(PROFILE_DIR, metadata)
+            prune_profiles()
+            response.headers['X-Profile-Id'] = profile.id
+        except OSError as e:
+            print(f"Error al guardar el perfil {profile.id}: {e}")
+        return response
+
+    @app.teardown_request
+    def stop_profile(error=None):
+        # Si la petición terminó sin pasar por after_request
+        profile = g.pop('comun_profile', None)
+        if profile is not None:
+            profile.stop()
+
+    def profiles_index():
+        if not signed():
+            abort(403)
+        return jsonify({'dir': PROFILE_DIR, 'profiles': list_profiles()})
+
+    def profile_download(profile_id):
+        if not signed():
+            abort(403)
+        for profile in list_profiles():
+            if profile.get('id') == profile_id:
+                return send_from_directory(PROFILE_DIR, profile['file'], as_attachment=True)
+        abort(404)
+
+    if SECRET:
+        app.add_url_rule(path, 'profiles', profiles_index, methods=['GET'])
+        app.add_url_rule(path + '/<profile_id>', 'profile_download', profile_download, methods=['GET'])
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description='Firma el encabezado X-Profile de una petición')
+    parser.add_argument('ruta', help='Ruta sin query string, p. ej. /cumplimiento o /profiles/<id>')
+    parser.add_argument('--metodo', default='GET')
+    args = parser.parse_args()
+    if not SECRET:
+        parser.error('Falta PROFILE_SECRET')
+    print(f'{HEADER}: {sign(SECRET, args.metodo, args.ruta)}')
+
+if __name__ == '__main__':
+    main()
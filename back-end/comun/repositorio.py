@@ -0,0 +1,341 @@
+"""
+Operaciones frecuentes sobre usuarios y registros, escritas una sola vez
+para todos los servicios.
+
+Cada función recibe un cursor con filas como dict y parámetros %s: el de
+PooledConnection.dict_cursor() / ConnectionPool.transaction(), o el
+StatementCursor de la API de estudiantes. Las que escriben varias filas
+deben llamarse dentro de una transacción; quien llama decide cuándo
+confirmar.
+"""
+from datetime import date, datetime, time
+import logging
+from typing import Callable, List, NamedTuple, Optional, TypedDict, TypeVar
+
+from comun.backends import is_lock_conflict
+
+# Reintentos de una transacción ante deadlock o lock wait timeout
+SCAN_RETRIES = 3
+
+# Columnas opcionales de registros que algunos servicios completan
+REGISTRO_EXTRA_COLUMNS = ('timestamp', 'auto_generado', 'metodo')
+
+DIAS_SEMANA = {
+    'Monday': 'lunes',
+    'Tuesday': 'martes',
+    'Wednesday': 'miércoles',
+    'Thursday': 'jueves',
+    'Friday': 'viernes',
+    'Saturday': 'sábado',
+    'Sunday': 'domingo'
+}
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+class Persona(TypedDict, total=False):
+    id: int
+    nombre: str
+    apellido: str
+    email: str
+
+class Escaneo(NamedTuple):
+    """Resultado de registrar un escaneo"""
+    persona: Persona
+    tipo: str
+    registro_id: int
+    fecha: date
+    hora: time
+
+def dia_semana(moment: datetime) -> str:
+    """Día de la semana en español, como se guarda en la columna dia"""
+    return DIAS_SEMANA[moment.strftime('%A')]
+
+def with_lock_retries(operation: Callable[[], T], retries: int = SCAN_RETRIES) -> T:
+    """
+    Ejecuta operation() (una transacción completa) reintentando si choca
+    con otra por deadlock o lock wait timeout
+    """
+    for attempt in range(retries):
+        try:
+            return operation()
+        except Exception as e:
+            if is_lock_conflict(e) and attempt < retries - 1:
+                logger.warning(f"Reintentando transacción tras conflicto de bloqueo: {e}")
+                continue
+            raise
+
+# --- Usuarios ---
+
+def find_student(cursor, email: str) -> Optional[Persona]:
+    """Estudiante activo con ese email (o None)"""
+    cursor.execute("""
+        SELECT id, nombre, apellido, email
+        FROM usuarios_estudiantes
+        WHERE email = %s AND activo = 1
+        ORDER BY id
+        LIMIT 1
+    """, (email,))
+    return cursor.fetchone()
+
+def find_helper(cursor, email: str) -> Optional[Persona]:
+    """Ayudante activo con ese email (o None)"""
+    cursor.execute("""
+        SELECT id, nombre, apellido, email
+        FROM usuarios_permitidos
+        WHERE email = %s AND activo = 1
+        ORDER BY id
+        LIMIT 1
+    """, (email,))
+    return cursor.fetchone()
+
+def upsert_student(cursor, persona: Persona, unique_email: bool = True) -> int:
+    """
+    Id del estudiante, creándolo si no existe
+
+    Con el índice único sobre email es un solo INSERT ... ON DUPLICATE KEY
+    UPDATE; sin él se busca con bloqueo y se inserta solo si falta.
+    """
+    if unique_email:
+        cursor.execute("""
+            INSERT INTO usuarios_estudiantes (nombre, apellido, email, activo, TP)
+            VALUES (%s, %s, %s, 1, 'No especificado')
+            ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)
+        """, (persona['nombre'], persona['apellido'], persona['email']))
+        return cursor.lastrowid
+
+    cursor.execute(
+        "SELECT id FROM usuarios_estudiantes WHERE email = %s ORDER BY id LIMIT 1 FOR UPDATE",
+        (persona['email'],)
+    )
+    existing = cursor.fetchone()
+    if existing:
+        return existing['id']
+
+    cursor.execute("""
+        INSERT INTO usuarios_estudiantes (nombre, apellido, email, activo, TP)
+        VALUES (%s, %s, %s, 1, 'No especificado')
+    """, (persona['nombre'], persona['apellido'], persona['email']))
+    return cursor.lastrowid
+
+# --- Escaneos ---
+
+def insert_registro(cursor, table: str, persona: Persona, tipo: str, fecha, hora, dia: str, extra: Optional[dict] = None) -> int:
+    """INSERT de un registro en registros o EST_registros; devuelve su id"""
+    if table not in ('registros', 'EST_registros'):
+        raise ValueError(f"Tabla de registros inválida: {table}")
+    extra = extra or {}
+    unknown = set(extra) - set(REGISTRO_EXTRA_COLUMNS)
+    if unknown:
+        raise ValueError(f"Columnas no permitidas en registros: {', '.join(sorted(unknown))}")
+
+    columns = ['fecha', 'hora', 'dia', 'nombre', 'apellido', 'email', 'tipo'] + list(extra)
+    values = [fecha, hora, dia, persona['nombre'], persona['apellido'], persona['email'], tipo] + list(extra.values())
+    cursor.execute(
+        f"INSERT INTO {table} ({', '.join(f'`{column}`' for column in columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))})",
+        values
+    )
+    return cursor.lastrowid
+
+def helper_next_tipo(cursor, email: str) -> str:
+    """
+    Entrada o Salida según estado_usuarios
+
+    Bloquea la fila del ayudante hasta el fin de la transacción, así dos
+    escaneos simultáneos no deciden ambos lo mismo.
+    """
+    cursor.execute("SELECT estado FROM estado_usuarios WHERE email = %s FOR UPDATE", (email,))
+    estado = cursor.fetchone()
+    return 'Salida' if estado and estado['estado'] == 'dentro' else 'Entrada'
+
+def register_helper_scan(cursor, persona: Persona, now: datetime, tipo: Optional[str] = None,
+                         fecha=None, hora=None, dia: Optional[str] = None, extra: Optional[dict] = None) -> Escaneo:
+    """
+    Registra un escaneo de ayudante (llamar dentro de una transacción)
+
+    1. Decide Entrada/Salida con estado_usuarios (salvo que tipo venga dado).
+    2. INSERT en registros.
+    3. Upsert de estado_usuarios con el nuevo estado.
+
+    Args:
+        persona: nombre, apellido y email del ayudante
+        now: Momento del escaneo
+        tipo: 'Entrada'/'Salida' ya decidido por quien llama (opcional)
+        fecha, hora, dia: Valores a guardar si difieren de now (registros manuales)
+        extra: Columnas opcionales de REGISTRO_EXTRA_COLUMNS
+    """
+    email = persona['email']
+    if tipo is None:
+        tipo = helper_next_tipo(cursor, email)
+    nuevo_estado = 'dentro' if tipo == 'Entrada' else 'fuera'
+    fecha = fecha or now.date()
+    hora = hora or now.time().replace(microsecond=0)
+
+    registro_id = insert_registro(
+        cursor, 'registros', persona, tipo, fecha, hora, dia or dia_semana(now), extra
+    )
+
+    cursor.execute("""
+        INSERT INTO estado_usuarios (email, nombre, apellido, estado,
+            ultima_entrada, ultima_salida)
+        VALUES (%s, %s, %s, %s,
+            CASE WHEN %s = 'dentro' THEN NOW() ELSE NULL END,
+            CASE WHEN %s = 'fuera' THEN NOW() ELSE NULL END)
+        ON DUPLICATE KEY UPDATE
+            estado = VALUES(estado),
+            ultima_entrada = CASE WHEN VALUES(estado) = 'dentro' THEN NOW() ELSE ultima_entrada END,
+            ultima_salida = CASE WHEN VALUES(estado) = 'fuera' THEN NOW() ELSE ultima_salida END
+    """, (email, persona['nombre'], persona['apellido'], nuevo_estado, nuevo_estado, nuevo_estado))
+
+    return Escaneo(persona, tipo, registro_id, fecha, hora)
+
+def register_student_scan(cursor, persona: Persona, now: datetime, auto_generado: int = 0) -> Escaneo:
+    """
+    Registra un escaneo de estudiante (llamar dentro de una transacción)
+
+    1. Upsert condicional de estado_estudiantes: suma un movimiento al día
+       (o reinicia el contador si es de otro día). La fila queda bloqueada
+       hasta el commit, así dos escaneos simultáneos del mismo estudiante
+       se serializan y no pueden decidir ambos "Entrada".
+    2. INSERT en EST_registros con el tipo según la paridad del contador.
+
+    Args:
+        persona: Estudiante con id (find_student o upsert_student)
+        now: Momento del escaneo
+        auto_generado: Valor de la columna auto_generado
+    """
+    # LAST_INSERT_ID(expr) devuelve el contador actualizado en el mismo
+    # paquete de respuesta; en una fila nueva queda en 0. Cada asignación
+    # usa solo los valores anteriores de la fila (estado antes que
+    # movimientos) para que el resultado no dependa del orden en que el
+    # motor las aplica (MySQL de izquierda a derecha, SQLite todas juntas).
+    cursor.execute("""
+        INSERT INTO estado_estudiantes (email, estudiante_id, fecha_estado, movimientos, estado)
+        VALUES (%s, %s, %s, 1, 'dentro')
+        ON DUPLICATE KEY UPDATE
+            estado = IF(MOD(IF(fecha_estado = VALUES(fecha_estado), movimientos + 1, 1), 2) = 1, 'dentro', 'fuera'),
+            movimientos = LAST_INSERT_ID(IF(fecha_estado = VALUES(fecha_estado), movimientos + 1, 1)),
+            fecha_estado = VALUES(fecha_estado),
+            estudiante_id = VALUES(estudiante_id)
+    """, (persona['email'], persona['id'], now.date()))
+    movimientos = cursor.lastrowid or 1
+    tipo = 'Entrada' if movimientos % 2 == 1 else 'Salida'
+
+    fecha = now.date()
+    hora = now.time().replace(microsecond=0)
+    registro_id = insert_registro(
+        cursor, 'EST_registros', persona, tipo, fecha, hora, dia_semana(now),
+        {'auto_generado': auto_generado}
+    )
+    return Escaneo(persona, tipo, registro_id, fecha, hora)
+
+def set_student_state(cursor, email: str, fecha, tipo: str) -> None:
+    """
+    Refleja en estado_estudiantes un registro de tipo ya decidido que es el
+    último del día (toggle de presencia; llamar en la transacción del
+    registro). Si puede no ser el último, usar recompute_student_state.
+
+    El contador avanza al menor valor mayor que el actual (o que 0 si es de
+    otro día) con la paridad del tipo: impar para Entrada, par para Salida,
+    la misma convención de register_student_scan. Así el próximo escaneo
+    alterna a partir de este registro.
+
+    Args:
+        email: Email del estudiante (debe existir en usuarios_estudiantes)
+        fecha: Fecha del registro
+        tipo: 'Entrada' o 'Salida'
+    """
+    # VALUES(movimientos) es 1 o 2 según el tipo: base + 1 ya tiene la
+    # paridad buscada si coincide con la suya, si no se suma uno más
+    cursor.execute("""
+        INSERT INTO estado_estudiantes (email, estudiante_id, fecha_estado, movimientos, estado)
+        SELECT email, id, %s, IF(%s = 'Entrada', 1, 2), IF(%s = 'Entrada', 'dentro', 'fuera')
+        FROM usuarios_estudiantes
+        WHERE email = %s
+        ORDER BY id
+        LIMIT 1
+        ON DUPLICATE KEY UPDATE
+            movimientos = IF(fecha_estado = VALUES(fecha_estado), movimientos, 0) + 1
+                + MOD(IF(fecha_estado = VALUES(fecha_estado), movimientos, 0) + 1 + VALUES(movimientos), 2),
+            estado = VALUES(estado),
+            fecha_estado = VALUES(fecha_estado),
+            estudiante_id = VALUES(estudiante_id)
+    """, (fecha, tipo, tipo, email))
+
+def recompute_student_state(cursor, email: str, fecha) -> None:
+    """
+    Reconstruye estado_estudiantes desde los registros del día que quedan
+    (llamar en la transacción que los cambió)
+
+    Para cambios que no son el último movimiento del día: un registro
+    manual con hora anterior al último escaneo o un registro borrado. El
+    estado es el tipo del último registro por (hora, id) y el contador la
+    cantidad de registros, más uno si hace falta para que su paridad
+    coincida con ese tipo (ver register_student_scan). Sin registros queda
+    en 0 y 'fuera': el próximo escaneo es una Entrada.
+
+    Args:
+        email: Email del estudiante
+        fecha: Día a reconstruir (el de hoy; otros días no tienen estado)
+    """
+    # Bloquea la fila antes de leer los registros: un escaneo simultáneo
+    # espera y suma sobre el estado reconstruido
+    cursor.execute("SELECT movimientos FROM estado_estudiantes WHERE email = %s FOR UPDATE", (email,))
+    cursor.fetchall()
+
+    cursor.execute("""
+        SELECT tipo FROM EST_registros
+        WHERE email = %s AND fecha = %s
+        ORDER BY hora, id
+    """, (email, fecha))
+    tipos = [row['tipo'] for row in cursor.fetchall()]
+
+    movimientos = len(tipos)
+    dentro = bool(tipos) and tipos[-1] == 'Entrada'
+    if movimientos % 2 != (1 if dentro else 0):
+        movimientos += 1
+
+    cursor.execute("""
+        INSERT INTO estado_estudiantes (email, estudiante_id, fecha_estado, movimientos, estado)
+        SELECT email, id, %s, %s, %s
+        FROM usuarios_estudiantes
+        WHERE email = %s
+        ORDER BY id
+        LIMIT 1
+        ON DUPLICATE KEY UPDATE
+            movimientos = VALUES(movimientos),
+            estado = VALUES(estado),
+            fecha_estado = VALUES(fecha_estado),
+            estudiante_id = VALUES(estudiante_id)
+    """, (fecha, movimientos, 'dentro' if dentro else 'fuera', email))
+
+# --- Presencia ---
+
+def helpers_present(cursor, fecha) -> List[dict]:
+    """Ayudantes cuyo último registro del día es una Entrada, del más reciente al más antiguo"""
+    cursor.execute("""
+        SELECT r.email, r.nombre, r.apellido, r.hora as ultima_entrada
+        FROM registros r
+        JOIN (
+            SELECT email, MAX(id) as last_id
+            FROM registros
+            WHERE fecha = %s
+            GROUP BY email
+        ) as ultimos
+        ON r.id = ultimos.last_id
+        WHERE r.tipo = 'Entrada'
+        ORDER BY r.hora DESC
+    """, (fecha,))
+    return cursor.fetchall()
+
+def student_is_present(cursor, email: str, fecha) -> bool:
+    """Si el estudiante está dentro según estado_estudiantes"""
+    cursor.execute("""
+        SELECT estado
+        FROM estado_estudiantes
+        WHERE email = %s AND fecha_estado = %s
+    """, (email, fecha))
+    estado = cursor.fetchone()
+    return bool(estado) and estado['estado'] == 'dentro'
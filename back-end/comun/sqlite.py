@@ -0,0 +1,608 @@
+"""
+Backend SQLite: las mismas sentencias de los servicios contra una base
+local, sin servidor MySQL.
+
+Pensado para pruebas y benchmarks. Una base nueva en memoria con el
+esquema completo (sqlite_schema.sql) se crea en milisegundos; en disco
+usa WAL para que varios hilos o procesos escriban a la vez.
+
+Las sentencias se traducen una vez (caché por texto):
+
+- %s -> ?, INSERT IGNORE -> INSERT OR IGNORE.
+- ON DUPLICATE KEY UPDATE -> ON CONFLICT DO UPDATE SET, VALUES(col) ->
+  excluded.col. SQLite evalúa todas las asignaciones con los valores
+  anteriores de la fila; MySQL las aplica de izquierda a derecha, así que
+  los upserts compartidos no dependen de ese orden.
+- FOR UPDATE se quita: las transacciones que escriben o bloquean empiezan
+  con BEGIN IMMEDIATE, que serializa a los escritores.
+- INTERVAL n UNIT dentro de DATE_ADD / DATE_SUB.
+- DDL de MySQL (AUTO_INCREMENT, ON UPDATE CURRENT_TIMESTAMP, INDEX en
+  línea, opciones de tabla).
+
+Las funciones de MySQL que usan las consultas (CURDATE, NOW, IF, MOD,
+LAST_INSERT_ID, WEEKDAY, LAST_DAY, DATE_ADD, DATE_SUB, CONCAT,
+SUBSTRING_INDEX, GET_LOCK...) se registran en cada conexión. GET_LOCK y
+RELEASE_LOCK solo coordinan conexiones del mismo proceso. Las columnas DATE,
+TIME y DATETIME vuelven como date, timedelta y datetime, igual que con
+PyMySQL, y los errores de bloqueo llevan el código de MySQL (1205) para
+que with_lock_retries los reintente.
+
+No cubre GROUP_CONCAT(... ORDER BY), information_schema ni funciones
+de fecha sobre columnas calculadas (vuelven como texto).
+"""
+import calendar
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from functools import lru_cache
+import itertools
+import os
+import re
+import sqlite3
+import threading
+from time import monotonic
+import uuid
+
+from comun.backends import LOCK_WAIT_TIMEOUT, TABLE_MISSING, Backend, register_backend
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), 'sqlite_schema.sql')
+
+# Segundos que una conexión espera un bloqueo antes de fallar con 1205
+BUSY_TIMEOUT = 5.0
+
+# Código de MySQL para una clave única duplicada
+DUPLICATE_ENTRY = 1062
+
+_now = datetime.now
+
+def set_clock(clock=None):
+    """
+    Reemplaza el reloj de NOW() / CURDATE() / CURTIME()
+
+    Args:
+        clock: Función sin argumentos que devuelve un datetime (None
+            vuelve a datetime.now). Para fijar "hoy" en pruebas y en los
+            datos sintéticos de los benchmarks.
+    """
+    global _now
+    _now = clock or datetime.now
+
+class SQLiteError(sqlite3.DatabaseError):
+    """Error de SQLite con el código equivalente de MySQL en errno"""
+
+    def __init__(self, errno, msg):
+        super().__init__(errno, msg)
+        self.errno = errno
+        self.msg = msg
+
+    def __str__(self):
+        return f"({self.errno}) {self.msg}"
+
+# --- Traducción de SQL ---
+
+_PLACEHOLDER = re.compile(r'%(s|%)')
+_ODKU = re.compile(r'\bON\s+DUPLICATE\s+KEY\s+UPDATE\b', re.IGNORECASE)
+_VALUES_REF = re.compile(r'\bVALUES\s*\(\s*`?(\w+)`?\s*\)', re.IGNORECASE)
+_INSERT_IGNORE = re.compile(r'\bINSERT\s+IGNORE\b', re.IGNORECASE)
+_LOCKING_READ = re.compile(r'\s+(FOR\s+UPDATE|LOCK\s+IN\s+SHARE\s+MODE)\b', re.IGNORECASE)
+_INTERVAL = re.compile(
+    r'\bINTERVAL\s+(.+?)\s+(SECOND|MINUTE|HOUR|DAY|WEEK|MONTH|YEAR)\b', re.IGNORECASE
+)
+_CURRENT_TIMESTAMP = re.compile(r'\bCURRENT_TIMESTAMP\b(\s*\(\s*\))?', re.IGNORECASE)
+_AUTO_INCREMENT = re.compile(
+    r'\bINT(?:EGER)?(?:\(\d+\))?\s+(?:NOT\s+NULL\s+)?AUTO_INCREMENT\s+PRIMARY\s+KEY\b', re.IGNORECASE
+)
+_ON_UPDATE = re.compile(r'\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP\b', re.IGNORECASE)
+_INLINE_INDEX = re.compile(r',\s*(?:UNIQUE\s+)?(?:INDEX|KEY)\s+`?\w+`?\s*\([^)]*\)', re.IGNORECASE)
+_TABLE_OPTIONS = re.compile(r'\)\s*(?:ENGINE|DEFAULT\s+CHARSET|CHARSET|COLLATE)\b[^)]*$', re.IGNORECASE)
+_DDL_DEFAULT_NOW = re.compile(r'\bDEFAULT\s+CURRENT_TIMESTAMP\b', re.IGNORECASE)
+_INSERT_TABLE = re.compile(r'^\s*(?:INSERT|REPLACE)\s+(?:OR\s+\w+\s+)?INTO\s+`?(\w+)`?', re.IGNORECASE)
+
+@lru_cache(maxsize=512)
+def translate(query, with_params=True):
+    """
+    Sentencia de MySQL reescrita para SQLite
+
+    Args:
+        query (str): Sentencia con parámetros %s
+        with_params (bool): Si se ejecuta con parámetros (solo entonces %%
+            es un % escapado, igual que en los drivers de MySQL)
+
+    Returns:
+        str
+    """
+    keyword = query.lstrip().split(None, 1)[0].upper() if query.strip() else ''
+
+    if with_params:
+        query = _PLACEHOLDER.sub(lambda m: '?' if m.group(1) == 's' else '%', query)
+
+    if keyword in ('CREATE', 'ALTER'):
+        query = _AUTO_INCREMENT.sub('INTEGER PRIMARY KEY AUTOINCREMENT', query)
+        query = _ON_UPDATE.sub('', query)
+        query = _INLINE_INDEX.sub('', query)
+        query = _TABLE_OPTIONS.sub(')', query.rstrip())
+        return _DDL_DEFAULT_NOW.sub("DEFAULT (datetime('now', 'localtime'))", query)
+
+    query = _INSERT_IGNORE.sub('INSERT OR IGNORE', query)
+    query = _LOCKING_READ.sub('', query)
+    query = _INTERVAL.sub(lambda m: f"{m.group(1)}, '{m.group(2).upper()}'", query)
+    query = _CURRENT_TIMESTAMP.sub('NOW()', query)
+
+    match = _ODKU.search(query)
+    if match:
+        assignments = _VALUES_REF.sub(r'excluded.\1', query[match.end():])
+        query = f"{query[:match.start()]}ON CONFLICT DO UPDATE SET{assignments}"
+    return query
+
+def is_locking(query):
+    """Si la sentencia escribe o bloquea filas (abre la transacción con BEGIN IMMEDIATE)"""
+    keyword = query.lstrip().split(None, 1)[0].upper()
+    if keyword in ('SELECT', 'WITH', 'SHOW', 'PRAGMA', 'EXPLAIN'):
+        return bool(_LOCKING_READ.search(query))
+    return True
+
+# --- Valores ---
+
+def adapt(value):
+    """Parámetro de Python al formato en que se guarda en SQLite"""
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None).isoformat(' ', 'seconds' if not value.microsecond else 'microseconds')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, time):
+        return value.replace(tzinfo=None).isoformat('seconds' if not value.microsecond else 'microseconds')
+    if isinstance(value, timedelta):
+        return format_timedelta(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+def format_timedelta(value):
+    """TIME de MySQL (HH:MM:SS, puede pasar de 24 horas o ser negativo)"""
+    seconds = int(value.total_seconds())
+    sign = '-' if seconds < 0 else ''
+    seconds = abs(seconds)
+    return f"{sign}{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+def parse_date(value):
+    text = value.decode() if isinstance(value, bytes) else value
+    try:
+        return date.fromisoformat(text[:10])
+    except ValueError:
+        return text
+
+def parse_datetime(value):
+    text = value.decode() if isinstance(value, bytes) else value
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+def parse_time(value):
+    """TIME como timedelta, igual que PyMySQL y mysql.connector"""
+    text = value.decode() if isinstance(value, bytes) else value
+    negative = text.startswith('-')
+    try:
+        hours, minutes, seconds = text.lstrip('-').split(':')
+        delta = timedelta(hours=int(hours), minutes=int(minutes), seconds=float(seconds))
+    except ValueError:
+        return text
+    return -delta if negative else delta
+
+# Los convertidores se eligen por el tipo declarado de la columna
+sqlite3.register_converter('DATE', parse_date)
+sqlite3.register_converter('DATETIME', parse_datetime)
+sqlite3.register_converter('TIMESTAMP', parse_datetime)
+sqlite3.register_converter('TIME', parse_time)
+
+# --- Funciones de MySQL ---
+
+def _as_date(value):
+    if value is None:
+        return None
+    return date.fromisoformat(str(value)[:10])
+
+def _shift(value, amount, unit, sign):
+    if value is None or amount is None:
+        return None
+    amount = int(amount) * sign
+    text = str(value)
+    has_time = len(text) > 10 or unit in ('SECOND', 'MINUTE', 'HOUR')
+    moment = datetime.fromisoformat(text) if len(text) > 10 else datetime.fromisoformat(text[:10])
+    if unit in ('MONTH', 'YEAR'):
+        months = moment.month - 1 + amount * (12 if unit == 'YEAR' else 1)
+        year, month = moment.year + months // 12, months % 12 + 1
+        moment = moment.replace(year=year, month=month, day=min(moment.day, calendar.monthrange(year, month)[1]))
+    else:
+        seconds = {'SECOND': 1, 'MINUTE': 60, 'HOUR': 3600, 'DAY': 86400, 'WEEK': 604800}[unit]
+        moment += timedelta(seconds=amount * seconds)
+    return moment.isoformat(' ', 'seconds') if has_time else moment.date().isoformat()
+
+def _last_day(value):
+    day = _as_date(value)
+    if day is None:
+        return None
+    return day.replace(day=calendar.monthrange(day.year, day.month)[1]).isoformat()
+
+def _concat(*values):
+    if any(value is None for value in values):
+        return None
+    return ''.join(str(value) for value in values)
+
+def _substring_index(text, delimiter, count):
+    if text is None:
+        return None
+    parts = str(text).split(delimiter)
+    count = int(count)
+    return delimiter.join(parts[:count] if count >= 0 else parts[count:])
+
+def _mod(a, b):
+    if a is None or b is None or b == 0:
+        return None
+    return a - b * int(a / b)
+
+FUNCTIONS = [
+    ('NOW', 0, lambda: _now().replace(microsecond=0).isoformat(' ')),
+    ('SYSDATE', 0, lambda: _now().replace(microsecond=0).isoformat(' ')),
+    ('CURDATE', 0, lambda: _now().date().isoformat()),
+    ('CURTIME', 0, lambda: _now().time().replace(microsecond=0).isoformat()),
+    ('IF', 3, lambda condition, yes, no: yes if condition else no),
+    ('MOD', 2, _mod),
+    ('WEEKDAY', 1, lambda value: None if value is None else _as_date(value).weekday()),
+    ('LAST_DAY', 1, _last_day),
+    ('DATE_ADD', 3, lambda value, amount, unit: _shift(value, amount, unit, 1)),
+    ('DATE_SUB', 3, lambda value, amount, unit: _shift(value, amount, unit, -1)),
+    ('CONCAT', -1, _concat),
+    ('SUBSTRING_INDEX', 3, _substring_index),
+    ('DATABASE', 0, lambda: 'main'),
+]
+
+# Locks con nombre (GET_LOCK / RELEASE_LOCK): valen entre las conexiones
+# del proceso a la misma base y se liberan al cerrar la conexión
+_named_locks = {}
+_named_locks_changed = threading.Condition()
+
+def _get_lock(target, owner, name, timeout):
+    key = (target, name)
+    deadline = None if timeout is None or timeout < 0 else monotonic() + timeout
+    with _named_locks_changed:
+        while _named_locks.get(key, owner) != owner:
+            remaining = None if deadline is None else deadline - monotonic()
+            if remaining is not None and remaining <= 0:
+                return 0
+            _named_locks_changed.wait(remaining)
+        _named_locks[key] = owner
+        return 1
+
+def _release_lock(target, owner, name):
+    key = (target, name)
+    with _named_locks_changed:
+        if key not in _named_locks:
+            return None
+        if _named_locks[key] != owner:
+            return 0
+        del _named_locks[key]
+        _named_locks_changed.notify_all()
+        return 1
+
+def _release_all_locks(target, owner):
+    with _named_locks_changed:
+        for key in [key for key, holder in _named_locks.items() if key[0] == target and holder == owner]:
+            del _named_locks[key]
+        _named_locks_changed.notify_all()
+
+# --- Conexión ---
+
+class SQLiteCursor:
+    """
+    Cursor con la interfaz de PyMySQL y mysql.connector
+
+    Filas como dict (DictCursor / dictionary=True) o tuplas; lastrowid
+    sigue las reglas de MySQL: el id autoincremental insertado, el valor
+    de LAST_INSERT_ID(expr) si la sentencia lo usó, o 0.
+    """
+
+    def __init__(self, connection, dict_rows=False):
+        self.connection = connection
+        self.dict_rows = dict_rows
+        self._cursor = connection.db.cursor()
+        self.lastrowid = None
+        self.rowcount = -1
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def column_names(self):
+        return tuple(column[0] for column in self._cursor.description or ())
+
+    def execute(self, query, params=None):
+        self.connection.execute(self, query, params)
+        return self.rowcount
+
+    def executemany(self, query, seq_params):
+        self.connection.execute(self, query, seq_params, many=True)
+        return self.rowcount
+
+    def _row(self, row):
+        if row is None or not self.dict_rows:
+            return row
+        return dict(zip(self.column_names, row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(size or self._cursor.arraysize)
+        return [self._row(row) for row in rows]
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class SQLiteConnection:
+    """
+    Conexión SQLite con la interfaz de PyMySQL y mysql.connector que usan
+    los servicios (cursor, begin / start_transaction, commit, rollback,
+    ping, in_transaction, connection_id)
+
+    Sin autocommit, la primera sentencia que escribe o bloquea abre la
+    transacción con BEGIN IMMEDIATE. Las lecturas anteriores ven lo último
+    confirmado, como las lecturas sin bloqueo de InnoDB.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, target, autocommit=False, timeout=BUSY_TIMEOUT):
+        self.target = target
+        self.db = sqlite3.connect(
+            target, uri=True, timeout=timeout, isolation_level=None,
+            detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False
+        )
+        self.autocommit_mode = autocommit
+        self.connection_id = next(self._ids)
+        self.last_insert_id = 0
+        self._insert_id_set = False
+        self._rowid_tables = {}
+        self._closed = False
+
+        for name, arity, function in FUNCTIONS:
+            self.db.create_function(name, arity, function)
+        self.db.create_function('LAST_INSERT_ID', 0, lambda: self.last_insert_id)
+        self.db.create_function('LAST_INSERT_ID', 1, self._set_last_insert_id)
+        self.db.create_function('GET_LOCK', 2, lambda name, wait: _get_lock(target, self.connection_id, name, wait))
+        self.db.create_function('RELEASE_LOCK', 1, lambda name: _release_lock(target, self.connection_id, name))
+
+    def _set_last_insert_id(self, value):
+        self.last_insert_id = value
+        self._insert_id_set = True
+        return value
+
+    @property
+    def in_transaction(self):
+        return self.db.in_transaction
+
+    def autocommit(self, value):
+        """Equivalente a Connection.autocommit() de PyMySQL"""
+        if value and self.db.in_transaction:
+            self.db.execute('COMMIT')
+        self.autocommit_mode = bool(value)
+
+    def cursor(self, cursorclass=None, dictionary=False, **options):
+        """
+        Cursor nuevo; filas como dict con dictionary=True (mysql.connector)
+        o una clase DictCursor (PyMySQL). prepared / buffered se aceptan y
+        no cambian nada: SQLite ya cachea las sentencias compiladas.
+        """
+        dict_rows = dictionary or 'Dict' in getattr(cursorclass, '__name__', '')
+        return SQLiteCursor(self, dict_rows)
+
+    def begin(self):
+        """Abre una transacción que ya puede escribir (espera al escritor actual)"""
+        self._run(lambda: self.db.execute('BEGIN IMMEDIATE'))
+
+    def start_transaction(self, **options):
+        if self.db.in_transaction:
+            raise SQLiteError(0, 'Transaction already in progress')
+        self.begin()
+
+    def commit(self):
+        if self.db.in_transaction:
+            self._run(lambda: self.db.execute('COMMIT'))
+
+    def rollback(self):
+        if self.db.in_transaction:
+            self.db.execute('ROLLBACK')
+
+    def ping(self, reconnect=True, attempts=1, delay=0):
+        if self._closed:
+            raise SQLiteError(2006, 'Conexión cerrada')
+
+    def is_connected(self):
+        return not self._closed
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            _release_all_locks(self.target, self.connection_id)
+            self.db.close()
+
+    def _has_rowid_id(self, table):
+        """Si la tabla tiene una clave primaria INTEGER autoincremental (lastrowid válido)"""
+        known = self._rowid_tables.get(table)
+        if known is None:
+            columns = self.db.execute(f'PRAGMA table_info("{table}")').fetchall()
+            keys = [column for column in columns if column[5]]
+            known = len(keys) == 1 and keys[0][2].upper() == 'INTEGER'
+            self._rowid_tables[table] = known
+        return known
+
+    def _run(self, operation):
+        """Ejecuta operation() traduciendo los errores de SQLite a códigos de MySQL"""
+        try:
+            return operation()
+        except sqlite3.OperationalError as e:
+            message = str(e)
+            if 'locked' in message or 'busy' in message:
+                raise SQLiteError(LOCK_WAIT_TIMEOUT, message) from e
+            if message.startswith('no such table'):
+                raise SQLiteError(TABLE_MISSING, message) from e
+            raise
+        except sqlite3.IntegrityError as e:
+            if 'UNIQUE' in str(e):
+                raise SQLiteError(DUPLICATE_ENTRY, str(e)) from e
+            raise
+
+    def execute(self, cursor, query, params=None, many=False):
+        """Ejecuta una sentencia de MySQL en cursor (lo llama SQLiteCursor)"""
+        sql = translate(query, params is not None)
+        # Las lecturas simples no abren transacción: una transacción de
+        # SQLite que empezó leyendo no puede pasar a escribir si otra
+        # escribió entretanto (falla sin esperar el busy_timeout)
+        if not self.autocommit_mode and not self.db.in_transaction and is_locking(query):
+            self._run(lambda: self.db.execute('BEGIN IMMEDIATE'))
+
+        self._insert_id_set = False
+        if many:
+            rows = [[adapt(value) for value in row] for row in params]
+            self._run(lambda: cursor._cursor.executemany(sql, rows))
+        elif params is None:
+            self._run(lambda: cursor._cursor.execute(sql))
+        else:
+            values = params if isinstance(params, dict) else [adapt(value) for value in params]
+            self._run(lambda: cursor._cursor.execute(sql, values))
+
+        cursor.rowcount = cursor._cursor.rowcount
+        insert = _INSERT_TABLE.match(sql)
+        if self._insert_id_set:
+            cursor.lastrowid = self.last_insert_id
+        elif insert:
+            if cursor.rowcount > 0 and self._has_rowid_id(insert.group(1)):
+                self.last_insert_id = cursor._cursor.lastrowid
+                cursor.lastrowid = self.last_insert_id
+            else:
+                cursor.lastrowid = 0
+        else:
+            cursor.lastrowid = 0
+
+# --- Bases ---
+
+def load_schema(connection):
+    """Crea las tablas que faltan (CREATE TABLE IF NOT EXISTS)"""
+    with open(SCHEMA_PATH, encoding='utf-8') as schema:
+        connection.db.executescript(schema.read())
+
+class SQLiteDatabase:
+    """
+    Base SQLite con el esquema de los servicios
+
+    Sin path es una base en memoria nueva, compartida por todas las
+    conexiones del proceso (VFS memdb) mientras este objeto siga abierto.
+    Con path es un archivo en modo WAL.
+
+    settings sirve como parámetros del backend 'sqlite':
+
+        db = SQLiteDatabase(fixtures=True)
+        pool = create_pool(backend='sqlite', settings=db.settings)
+    """
+
+    def __init__(self, path=None, fixtures=False):
+        self.memory = path in (None, ':memory:')
+        if self.memory:
+            self.target = f"file:/registro_qr_{uuid.uuid4().hex}?vfs=memdb"
+        else:
+            self.target = f"file:{os.path.abspath(path)}"
+
+        # Mantiene viva la base en memoria mientras exista el objeto
+        self._keeper = self.connect(autocommit=True)
+        if not self.memory:
+            self._keeper.db.execute('PRAGMA journal_mode=WAL')
+        load_schema(self._keeper)
+
+        if fixtures:
+            from comun.fixtures import load_fixtures
+            load_fixtures(self._keeper)
+
+    @property
+    def settings(self):
+        return {'path': self.target}
+
+    def connect(self, autocommit=True):
+        """Conexión nueva a esta base"""
+        connection = SQLiteConnection(self.target, autocommit)
+        if not self.memory:
+            connection.db.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def execute(self, query, params=None):
+        """Ejecuta una sentencia suelta en autocommit y devuelve las filas como dict"""
+        with self._keeper.cursor(dictionary=True) as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall() if cursor.description else []
+
+    def close(self):
+        self._keeper.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+def open_database(path=None, name='registro_qr'):
+    """
+    Base del proceso para un path (o en memoria con ese nombre), creada
+    con el esquema la primera vez
+    """
+    key = path or name
+    with _databases_lock:
+        database = _databases.get(key)
+        if database is None:
+            database = _databases[key] = SQLiteDatabase(path)
+    return database
+
+@register_backend
+class SQLiteBackend(Backend):
+    """
+    SQLite local (pruebas y benchmarks)
+
+    settings['path'] es un archivo, ':memory:' o el URI de un
+    SQLiteDatabase; sin él se usa $SQLITE_PATH o una base en memoria del
+    proceso con el nombre de settings['database'].
+    """
+
+    name = 'sqlite'
+    Error = sqlite3.Error
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        path = settings.get('path') or os.getenv('SQLITE_PATH')
+        if path and path.startswith('file:'):
+            self.target = path
+        else:
+            database = open_database(None if path == ':memory:' else path, settings.get('database', 'registro_qr'))
+            self.target = database.target
+        self.timeout = float(settings.get('timeout', BUSY_TIMEOUT))
+
+    def connect(self, autocommit):
+        return SQLiteConnection(self.target, autocommit, self.timeout)
+
+    def cursor(self, connection):
+        return connection.cursor(dictionary=True)
+
+    def in_transaction(self, connection):
+        return connection.in_transaction
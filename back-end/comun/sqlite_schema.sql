@@ -0,0 +1,142 @@
+-- Esquema de registro_qr para el backend SQLite (comun/sqlite.py).
+--
+-- Mismas tablas y columnas que usan las APIs y el cliente. Los tipos se
+-- declaran como DATE / TIME / DATETIME / TIMESTAMP para que el backend
+-- devuelva date, timedelta y datetime igual que los drivers de MySQL.
+
+CREATE TABLE IF NOT EXISTS usuarios_permitidos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre VARCHAR(100) NOT NULL,
+    apellido VARCHAR(100) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    activo INTEGER NOT NULL DEFAULT 1,
+    foto_url VARCHAR(255)
+);
+CREATE INDEX IF NOT EXISTS idx_usuarios_permitidos_email ON usuarios_permitidos (email);
+
+CREATE TABLE IF NOT EXISTS registros (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fecha DATE NOT NULL,
+    hora TIME NOT NULL,
+    dia VARCHAR(20),
+    nombre VARCHAR(100),
+    apellido VARCHAR(100),
+    email VARCHAR(255) NOT NULL,
+    tipo VARCHAR(10) NOT NULL,
+    timestamp DATETIME,
+    auto_generado INTEGER NOT NULL DEFAULT 0,
+    metodo VARCHAR(20)
+);
+CREATE INDEX IF NOT EXISTS idx_registros_fecha_email ON registros (fecha, email);
+CREATE INDEX IF NOT EXISTS idx_registros_email_fecha ON registros (email, fecha);
+
+CREATE TABLE IF NOT EXISTS estado_usuarios (
+    email VARCHAR(255) NOT NULL PRIMARY KEY,
+    nombre VARCHAR(100),
+    apellido VARCHAR(100),
+    estado VARCHAR(10) NOT NULL DEFAULT 'fuera',
+    ultima_entrada DATETIME,
+    ultima_salida DATETIME,
+    updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS horarios_asignados (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    usuario_id INTEGER NOT NULL,
+    dia VARCHAR(20) NOT NULL,
+    hora_entrada TIME NOT NULL,
+    hora_salida TIME NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_horarios_usuario ON horarios_asignados (usuario_id, dia);
+
+CREATE TABLE IF NOT EXISTS historial_cumplimiento (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    usuario_id INTEGER,
+    email VARCHAR(255),
+    nombre VARCHAR(100),
+    apellido VARCHAR(100),
+    semana_inicio DATE,
+    semana_fin DATE,
+    estado VARCHAR(50),
+    cumplidos INTEGER,
+    incompletos INTEGER,
+    ausentes INTEGER,
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_historial_usuario_semana ON historial_cumplimiento (usuario_id, semana_inicio);
+CREATE INDEX IF NOT EXISTS idx_historial_email_semana ON historial_cumplimiento (email, semana_inicio);
+
+CREATE TABLE IF NOT EXISTS sistema_config (
+    clave VARCHAR(50) PRIMARY KEY,
+    valor TEXT,
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS tareas_ejecuciones (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tarea VARCHAR(50) NOT NULL,
+    programada DATETIME,
+    inicio DATETIME NOT NULL,
+    fin DATETIME,
+    duracion_ms INTEGER,
+    estado VARCHAR(10) NOT NULL,
+    detalle TEXT,
+    host VARCHAR(100),
+    pid INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_tareas_ejecuciones_tarea_programada ON tareas_ejecuciones (tarea, programada);
+
+CREATE TABLE IF NOT EXISTS admin_users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre VARCHAR(100),
+    apellido VARCHAR(100),
+    email VARCHAR(255) NOT NULL UNIQUE,
+    password VARCHAR(255) NOT NULL,
+    role VARCHAR(20) NOT NULL DEFAULT 'admin',
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS usuarios_estudiantes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre VARCHAR(100) NOT NULL,
+    apellido VARCHAR(100) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    activo INTEGER NOT NULL DEFAULT 1,
+    TP VARCHAR(100) DEFAULT 'No especificado'
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_usuarios_estudiantes_email ON usuarios_estudiantes (email);
+
+CREATE TABLE IF NOT EXISTS EST_registros (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fecha DATE NOT NULL,
+    hora TIME NOT NULL,
+    dia VARCHAR(20),
+    nombre VARCHAR(100),
+    apellido VARCHAR(100),
+    email VARCHAR(255) NOT NULL,
+    tipo VARCHAR(10) NOT NULL,
+    auto_generado INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_est_registros_fecha_hora_id ON EST_registros (fecha, hora, id);
+CREATE INDEX IF NOT EXISTS idx_est_registros_email_fecha ON EST_registros (email, fecha);
+
+CREATE TABLE IF NOT EXISTS estado_estudiantes (
+    email VARCHAR(255) NOT NULL PRIMARY KEY,
+    estudiante_id INTEGER NOT NULL,
+    fecha_estado DATE NOT NULL,
+    movimientos INTEGER NOT NULL DEFAULT 0,
+    estado VARCHAR(10) NOT NULL DEFAULT 'fuera',
+    actualizado TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+CREATE INDEX IF NOT EXISTS idx_estado_estudiantes_fecha ON estado_estudiantes (fecha_estado, estado);
+
+CREATE TABLE IF NOT EXISTS faces (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(100) NOT NULL,
+    email VARCHAR(100) NOT NULL,
+    embedding JSON NOT NULL,
+    model VARCHAR(50) NOT NULL DEFAULT 'deepface-facenet512',
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+CREATE INDEX IF NOT EXISTS idx_faces_email ON faces (email);
@@ -1,5 +1,5 @@
 # app.py - Archivo principal de la aplicación Flask
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
 from flask_cors import CORS
 from datetime import datetime
 import os
@@ -9,7 +9,11 @@ from dotenv import load_dotenv
 from routes.estudiantes import estudiantes_bp
 from routes.registros import registros_bp
 from routes.qr import qr_bp
-from config.database import init_db, close_db
+from config.database import init_db, close_db, get_statement_stats
+from comun.detector import get_findings
+from comun.metrics import init_metrics
+from comun.profiler import init_profiler
+from utils.helpers import safe_bool
 
 # Cargar variables de entorno
 load_dotenv()
@@ -23,6 +27,10 @@ def create_app():
     app.config['MYSQL_USER'] = os.getenv('MYSQL_USER', 'root')
     app.config['MYSQL_PASSWORD'] = os.getenv('MYSQL_PASSWORD', '')
     app.config['MYSQL_DB'] = os.getenv('MYSQL_DB', 'registro_qr')
+    app.config['MYSQL_POOL_SIZE'] = int(os.getenv('MYSQL_POOL_SIZE', 5))
+    app.config['MYSQL_POOL_TIMEOUT'] = float(os.getenv('MYSQL_POOL_TIMEOUT', 5))
+    app.config['DB_BACKEND'] = os.getenv('DB_BACKEND', 'mysql-connector')
+    app.config['SQLITE_PATH'] = os.getenv('SQLITE_PATH')
     
     # Habilitar CORS
     CORS(app, resources={
@@ -41,6 +49,11 @@ def create_app():
     app.register_blueprint(registros_bp, url_prefix='/api')
     app.register_blueprint(qr_bp, url_prefix='/api')
     
+    # Histogramas por ruta y por sentencia en /api/metrics y Server-Timing
+    init_metrics(app, 'estudiantes', path='/api/metrics')
+    # Perfilado bajo demanda (X-Profile firmado o PROFILE_SAMPLE_RATE)
+    init_profiler(app, 'estudiantes', path='/api/profiles')
+    
     # Ruta de salud
     @app.route('/api/health')
     def health_check():
@@ -50,6 +63,22 @@ def create_app():
             'message': 'API funcionando correctamente'
         })
     
+    # Tiempos acumulados por sentencia SQL (desde el inicio del proceso)
+    @app.route('/api/db_stats')
+    def db_stats():
+        reset = safe_bool(request.args.get('reset'))
+        return jsonify({
+            'pid': os.getpid(),
+            'timestamp': datetime.now().isoformat(),
+            'statements': get_statement_stats(reset=reset)
+        })
+    
+    # Sentencias lentas y repetidas (N+1) por ruta (por proceso)
+    @app.route('/api/db_findings')
+    def db_findings():
+        reset = safe_bool(request.args.get('reset'))
+        return jsonify(dict(get_findings(reset=reset), pid=os.getpid(), timestamp=datetime.now().isoformat()))
+    
     # Manejador de errores
     @app.errorhandler(404)
     def not_found(error):
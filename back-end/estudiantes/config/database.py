@@ -1,62 +1,262 @@
 # config/database.py - Configuración de la base de datos
 import mysql.connector
+import mysql.connector.pooling
 from flask import g, current_app
+from collections import OrderedDict
+from contextlib import contextmanager
 import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+# Paquete compartido back-end/comun (en Docker se copia junto a la app)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from comun import export
+from comun.backends import create_backend
+from comun.instrumentation import record_statement, get_statement_stats
+from comun.metrics import record_rows
+from comun.pool import PoolTimeout, create_pool
+
+# Tipo de sentencia declarado por quien llama a execute_query
+READ = 'read'
+WRITE = 'write'
+
+# Prepared statements cacheados por conexión física
+STATEMENT_CACHE_SIZE = 32
+
+# Backend por defecto; con DB_BACKEND=sqlite las mismas consultas corren
+# sobre una base local (pruebas y benchmarks, ver back-end/comun/sqlite.py)
+DEFAULT_BACKEND = 'mysql-connector'
+
+# Errores de base de datos de cualquiera de los backends
+DB_ERRORS = (mysql.connector.Error, sqlite3.Error)
+
+_pool_lock = threading.Lock()
+
+def connection_params():
+    """Parámetros de conexión tomados de la configuración de la app"""
+    return {
+        'host': current_app.config['MYSQL_HOST'],
+        'user': current_app.config['MYSQL_USER'],
+        'password': current_app.config['MYSQL_PASSWORD'],
+        'database': current_app.config['MYSQL_DB'],
+        'charset': 'utf8mb4'
+    }
+
+def using_mysql():
+    """Si la app usa el pool propio de mysql.connector (y no un backend de comun)"""
+    return current_app.config['DB_BACKEND'] == DEFAULT_BACKEND
+
+def get_pool():
+    """
+    Pool de conexiones de la app, creado en la primera petición
+    
+    El pool abre todas sus conexiones al crearse, por eso no se crea en
+    create_app: la app arranca aunque la base aún no responda.
+    pool_reset_session=False conserva los prepared statements de cada
+    conexión entre requests (todas trabajan en autocommit y cada
+    transacción termina en commit o rollback). Con otro DB_BACKEND se usa
+    el pool compartido de comun con las mismas condiciones.
+    """
+    pool = current_app.extensions.get('mysql_pool')
+    if pool is None:
+        with _pool_lock:
+            pool = current_app.extensions.get('mysql_pool')
+            if pool is None:
+                if using_mysql():
+                    pool = mysql.connector.pooling.MySQLConnectionPool(
+                        pool_name='estudiantes',
+                        pool_size=current_app.config['MYSQL_POOL_SIZE'],
+                        pool_reset_session=False,
+                        autocommit=True,
+                        **connection_params()
+                    )
+                else:
+                    pool = create_pool(
+                        backend=current_app.config['DB_BACKEND'],
+                        settings=dict(connection_params(), path=current_app.config.get('SQLITE_PATH')),
+                        size=current_app.config['MYSQL_POOL_SIZE'],
+                        timeout=current_app.config['MYSQL_POOL_TIMEOUT'],
+                        autocommit=True,
+                        dict_rows=False
+                    )
+                current_app.extensions['mysql_pool'] = pool
+    return pool
 
 def get_db():
-    """Obtiene la conexión a la base de datos"""
+    """Obtiene una conexión del pool para el request actual"""
     if 'db' not in g:
-        try:
-            g.db = mysql.connector.connect(
-                host=current_app.config['MYSQL_HOST'],
-                user=current_app.config['MYSQL_USER'],
-                password=current_app.config['MYSQL_PASSWORD'],
-                database=current_app.config['MYSQL_DB'],
-                charset='utf8mb4',
-                autocommit=True
-            )
-            g.db.ping(reconnect=True)
-        except mysql.connector.Error as e:
-            logging.error(f"Error conectando a la base de datos: {e}")
-            raise
+        pool = get_pool()
+        if not using_mysql():
+            try:
+                g.db = pool.acquire()
+            except PoolTimeout:
+                logging.error("Pool de conexiones agotado")
+                raise
+            return g.db
+        deadline = time.monotonic() + current_app.config['MYSQL_POOL_TIMEOUT']
+        while True:
+            try:
+                g.db = pool.get_connection()
+                break
+            except mysql.connector.errors.PoolError:
+                # Pool agotado: esperar a que otro hilo devuelva su conexión
+                if time.monotonic() >= deadline:
+                    logging.error("Pool de conexiones agotado")
+                    raise
+                time.sleep(0.01)
+            except mysql.connector.Error as e:
+                logging.error(f"Error conectando a la base de datos: {e}")
+                raise
     return g.db
 
 def close_db(e=None):
-    """Cierra la conexión a la base de datos"""
+    """Devuelve la conexión al pool"""
     db = g.pop('db', None)
     if db is not None:
         db.close()
 
 def init_db(app):
-    """Inicializa la configuración de la base de datos"""
+    """
+    Inicializa la configuración de la base de datos
+    
+    Verifica el esquema (tablas auxiliares e índices) una vez al arrancar,
+    fuera de las peticiones; ver config/schema.py.
+    """
+    from config.schema import ensure_schema
+    
+    app.config.setdefault('DB_BACKEND', DEFAULT_BACKEND)
+    app.config.setdefault('MYSQL_POOL_SIZE', 5)
+    app.config.setdefault('MYSQL_POOL_TIMEOUT', 5)
     app.teardown_appcontext(close_db)
+    with app.app_context():
+        ensure_schema()
 
-def execute_query(query, params=None, fetch_one=False, fetch_all=True):
+def prepared_cursor(db, query):
+    """
+    Cursor con la sentencia ya preparada en el servidor
+    
+    Cada conexión física guarda sus cursores preparados (LRU acotado a
+    STATEMENT_CACHE_SIZE); la segunda ejecución de la misma sentencia en
+    esa conexión solo envía los parámetros. Si la conexión se reconectó
+    (cambia su connection_id) el caché se descarta.
+    """
+    # Las conexiones del pool son envoltorios; el caché vive en la conexión física
+    raw = getattr(db, '_cnx', None) or getattr(db, 'raw', db)
+    cache = getattr(raw, '_statement_cache', None)
+    if cache is None or cache['connection_id'] != raw.connection_id:
+        cache = {'connection_id': raw.connection_id, 'cursors': OrderedDict()}
+        raw._statement_cache = cache
+    
+    cursors = cache['cursors']
+    cursor = cursors.get(query)
+    if cursor is not None:
+        cursors.move_to_end(query)
+        return cursor
+    
+    cursor = raw.cursor(prepared=True)
+    cursors[query] = cursor
+    if len(cursors) > STATEMENT_CACHE_SIZE:
+        _, evicted = cursors.popitem(last=False)
+        try:
+            evicted.close()
+        except DB_ERRORS:
+            pass
+    return cursor
+
+class StatementCursor:
+    """
+    Cursor con la interfaz mínima que usan las rutas (execute, fetchone,
+    fetchall, lastrowid, rowcount) y filas como dict
+    
+    Con prepared=True cada sentencia usa su prepared statement cacheado;
+    todas las ejecuciones quedan registradas en los contadores por sentencia.
+    """
+    
+    def __init__(self, db, prepared=True):
+        self.db = db
+        self.prepared = prepared
+        self._cursor = None
+        self._text_cursor = None
+    
+    def execute(self, query, params=None):
+        if self.prepared:
+            self._cursor = prepared_cursor(self.db, query)
+        else:
+            if self._text_cursor is None:
+                self._text_cursor = self.db.cursor()
+            self._cursor = self._text_cursor
+        
+        start = time.perf_counter()
+        try:
+            self._cursor.execute(query, params or ())
+        except DB_ERRORS:
+            record_statement(query, time.perf_counter() - start, error=True)
+            raise
+        record_statement(query, time.perf_counter() - start)
+    
+    def _as_dict(self, row):
+        return dict(zip(self._cursor.column_names, row)) if row is not None else None
+    
+    def fetchone(self):
+        """Primera fila; el resto se descarta para poder reutilizar el cursor"""
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._cursor.fetchall()
+            record_rows(1)
+        return self._as_dict(row)
+    
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        record_rows(len(rows))
+        return [self._as_dict(row) for row in rows]
+    
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+    
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+    
+    def close(self):
+        # Los cursores preparados quedan en el caché de la conexión
+        if self._text_cursor is not None:
+            self._text_cursor.close()
+
+def execute_query(query, params=None, *, kind, fetch_one=False, fetch_all=True, prepared=False):
     """
     Ejecuta una consulta SQL de forma segura
     
     Args:
         query (str): Consulta SQL
         params (tuple): Parámetros para la consulta
+        kind (str): READ si devuelve filas, WRITE si modifica datos
         fetch_one (bool): Si debe retornar solo un registro
         fetch_all (bool): Si debe retornar todos los registros
+        prepared (bool): Usar prepared statement cacheado (consultas fijas y frecuentes)
     
     Returns:
         dict/list: Resultado de la consulta
     """
+    if kind not in (READ, WRITE):
+        raise ValueError(f"Tipo de sentencia inválido: {kind}")
+    
     db = get_db()
-    cursor = db.cursor(dictionary=True)
+    cursor = StatementCursor(db, prepared=prepared)
     
     try:
-        cursor.execute(query, params or ())
+        cursor.execute(query, params)
         
-        if query.strip().upper().startswith('SELECT'):
+        if kind == READ:
             if fetch_one:
                 result = cursor.fetchone()
             elif fetch_all:
                 result = cursor.fetchall()
             else:
-                result = cursor.rowcount
+                result = len(cursor.fetchall())
         else:
             # Para INSERT, UPDATE, DELETE
             db.commit()
@@ -67,9 +267,73 @@ def execute_query(query, params=None, fetch_one=False, fetch_all=True):
         
         return result
         
-    except mysql.connector.Error as e:
+    except DB_ERRORS as e:
         db.rollback()
         logging.error(f"Error ejecutando consulta: {e}")
         raise
     finally:
-        cursor.close()
\ No newline at end of file
+        cursor.close()
+
+@contextmanager
+def statement_cursor():
+    """
+    StatementCursor con prepared statements sobre la conexión del request
+    
+    Para pasar a las funciones del repositorio común fuera de una
+    transacción (cada sentencia se confirma sola en autocommit).
+    """
+    cursor = StatementCursor(get_db(), prepared=True)
+    try:
+        yield cursor
+    finally:
+        cursor.close()
+
+@contextmanager
+def transaction():
+    """
+    Ejecuta varias sentencias como una sola transacción
+    
+    La conexión del request trabaja en autocommit; aquí se abre una
+    transacción explícita que se confirma al salir del bloque o se revierte
+    si ocurre una excepción.
+    
+    Yields:
+        StatementCursor con prepared statements sobre la conexión del request
+    """
+    db = get_db()
+    cursor = StatementCursor(db, prepared=True)
+    db.start_transaction()
+    try:
+        yield cursor
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def stream_query(query, params=None, batch_size=1000):
+    """
+    Ejecuta una consulta SELECT con cursor sin buffer (server-side)
+    
+    Las filas se traen del servidor a medida que se iteran, en lotes de
+    batch_size (ver comun.export). Con MySQL se abre una conexión propia de
+    mysql.connector fuera del pool.
+    
+    Args:
+        query (str): Consulta SQL
+        params (tuple): Parámetros para la consulta
+        batch_size (int): Filas por lectura
+    
+    Returns:
+        StreamedQuery: Iterable de tuplas con atributo columns
+    """
+    if using_mysql():
+        backend = create_backend(DEFAULT_BACKEND, connection_params())
+    else:
+        backend = get_pool().backend
+    try:
+        return export.stream_query(backend, query, params, batch_size)
+    except DB_ERRORS as e:
+        logging.error(f"Error ejecutando consulta de streaming: {e}")
+        raise
\ No newline at end of file
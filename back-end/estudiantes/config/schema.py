@@ -0,0 +1,162 @@
+# config/schema.py - Índices y tablas auxiliares que necesita la API
+#
+# ensure_schema() corre una vez al crear la app (init_db), con una conexión
+# propia y nunca dentro de una petición. También sirve como paso de
+# migración antes de desplegar:
+#     python -m config.schema
+import mysql.connector
+import logging
+import sys
+
+from config.database import connection_params, using_mysql
+
+# Tablas auxiliares mantenidas por la API: (tabla, DDL, carga inicial)
+TABLES = [
+    # Estado del día por estudiante: cada escaneo suma un movimiento y la
+    # paridad decide Entrada/Salida (ver routes/qr.register_scan). La carga
+    # inicial lo reconstruye desde los registros de hoy.
+    ('estado_estudiantes', """
+    CREATE TABLE IF NOT EXISTS estado_estudiantes (
+        email VARCHAR(255) NOT NULL PRIMARY KEY,
+        estudiante_id INT NOT NULL,
+        fecha_estado DATE NOT NULL,
+        movimientos INT NOT NULL DEFAULT 0,
+        estado VARCHAR(10) NOT NULL DEFAULT 'fuera',
+        actualizado TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        INDEX idx_estado_estudiantes_fecha (fecha_estado, estado)
+    )
+    """, """
+    INSERT IGNORE INTO estado_estudiantes (email, estudiante_id, fecha_estado, movimientos, estado)
+    SELECT ultimo.email, ue.id, CURDATE(),
+           IF(ultimo.tipo = 'Entrada', 1, 2), IF(ultimo.tipo = 'Entrada', 'dentro', 'fuera')
+    FROM (
+        SELECT er.email,
+               SUBSTRING_INDEX(GROUP_CONCAT(er.tipo ORDER BY er.hora DESC, er.id DESC), ',', 1) AS tipo
+        FROM EST_registros er
+        WHERE er.fecha = CURDATE()
+        GROUP BY er.email
+    ) ultimo
+    JOIN usuarios_estudiantes ue ON ue.email = ultimo.email
+    """),
+]
+
+# (tabla, nombre del índice, columnas, único)
+INDEXES = [
+    # Orden y cursor de los listados de registros
+    ('EST_registros', 'idx_est_registros_fecha_hora_id', ('fecha', 'hora', 'id'), False),
+    # Upsert del estudiante al escanear un QR
+    ('usuarios_estudiantes', 'uq_usuarios_estudiantes_email', ('email',), True),
+]
+
+# Segundos de espera al conectar para verificar el esquema
+CONNECT_TIMEOUT = 5
+
+_schema_ready = False
+_available_indexes = set()
+
+def index_available(name):
+    """
+    Indica si el índice de INDEXES con ese nombre existe (o uno equivalente)
+
+    Permite a las rutas elegir una alternativa cuando el índice no se pudo
+    crear, por ejemplo emails duplicados que impiden el índice único.
+    """
+    return name in _available_indexes
+
+def existing_indexes(cursor, table):
+    """Índices de una tabla como {nombre: (columnas, único)}"""
+    cursor.execute("""
+        SELECT index_name, MIN(non_unique), GROUP_CONCAT(column_name ORDER BY seq_in_index)
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s
+        GROUP BY index_name
+    """, (table,))
+    return {
+        name: (tuple(columns.split(',')), int(non_unique) == 0)
+        for name, non_unique, columns in cursor.fetchall()
+    }
+
+def ensure_schema():
+    """
+    Crea las tablas e índices que faltan (una vez por proceso)
+
+    Se ejecuta al iniciar la app, dentro de su app context. Si la base no
+    está disponible se registra el error y la API arranca igual: las rutas
+    usan sus alternativas sin índice hasta el próximo arranque o hasta
+    correr python -m config.schema. Si falla por permisos o datos que
+    violan un índice único solo se registra, la API sigue funcionando sin él.
+
+    Returns:
+        bool: Si el esquema quedó verificado
+    """
+    global _schema_ready
+    if _schema_ready:
+        return True
+
+    if not using_mysql():
+        # Las bases locales (comun/sqlite_schema.sql) ya traen tablas e índices
+        _available_indexes.update(name for _, name, _, _ in INDEXES)
+        _schema_ready = True
+        return True
+
+    try:
+        # Conexión propia: al arrancar todavía no hay pool (se crea en la
+        # primera petición de cada worker)
+        db = mysql.connector.connect(autocommit=True, connection_timeout=CONNECT_TIMEOUT, **connection_params())
+    except mysql.connector.Error as e:
+        logging.error(f"No se pudo verificar el esquema (base no disponible): {e}")
+        return False
+
+    cursor = db.cursor()
+    try:
+        for table, ddl, backfill in TABLES:
+            cursor.execute(
+                "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+                (table,)
+            )
+            if cursor.fetchone()[0] == 0:
+                logging.info(f"Creando tabla {table}")
+                cursor.execute(ddl)
+                if backfill:
+                    cursor.execute(backfill)
+
+        for table, name, columns, unique in INDEXES:
+            present = existing_indexes(cursor, table)
+            equivalent = any(
+                cols == columns and (is_unique or not unique)
+                for cols, is_unique in present.values()
+            )
+            if name in present or equivalent:
+                _available_indexes.add(name)
+                continue
+
+            logging.info(f"Creando índice {name} en {table}")
+            kind = 'UNIQUE INDEX' if unique else 'INDEX'
+            try:
+                cursor.execute(f"CREATE {kind} {name} ON {table} ({', '.join(columns)})")
+                _available_indexes.add(name)
+            except mysql.connector.Error as e:
+                logging.error(f"No se pudo crear el índice {name}: {e}")
+    except mysql.connector.Error as e:
+        logging.error(f"No se pudo verificar el esquema: {e}")
+    finally:
+        cursor.close()
+        db.close()
+
+    _schema_ready = True
+    return True
+
+def main():
+    """Paso de migración: verifica el esquema con la configuración del entorno"""
+    # Importar app ya la crea (y verifica el esquema); el módulo
+    # config.schema de la app no es este __main__
+    from app import app
+    from config import schema
+
+    with app.app_context():
+        ok = schema.ensure_schema()
+    print("Esquema verificado" if ok else "No se pudo verificar el esquema")
+    sys.exit(0 if ok else 1)
+
+if __name__ == '__main__':
+    main()
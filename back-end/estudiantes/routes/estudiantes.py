@@ -1,8 +1,10 @@
 # routes/estudiantes.py - Rutas para manejo de estudiantes
 from flask import Blueprint, request, jsonify
-from config.database import execute_query
+from config.database import execute_query, statement_cursor, transaction, READ, WRITE
+from comun import repositorio
 from utils.validators import validate_email, validate_required_fields
 from utils.helpers import format_response, handle_error
+from datetime import datetime
 import logging
 
 estudiantes_bp = Blueprint('estudiantes', __name__)
@@ -11,7 +13,8 @@ estudiantes_bp = Blueprint('estudiantes', __name__)
 def get_estudiantes():
     """Obtiene la lista de todos los estudiantes"""
     try:
-        # Consulta simplificada y corregida
+        # Presencia desde estado_estudiantes: un join por estudiante, sin
+        # recorrer el historial de registros
         query = """
         SELECT 
             ue.id,
@@ -21,28 +24,17 @@ def get_estudiantes():
             ue.activo,
             ue.TP as carrera,
             CASE 
-                WHEN EXISTS (
-                    SELECT 1 FROM EST_registros er 
-                    WHERE er.email = ue.email 
-                    AND DATE(er.fecha) = CURDATE() 
-                    AND er.tipo = 'Entrada'
-                    AND NOT EXISTS (
-                        SELECT 1 FROM EST_registros er2 
-                        WHERE er2.email = ue.email 
-                        AND DATE(er2.fecha) = CURDATE() 
-                        AND er2.tipo = 'Salida' 
-                        AND er2.hora > er.hora
-                    )
-                ) 
+                WHEN ee.fecha_estado = CURDATE() AND ee.estado = 'dentro'
                 THEN 1 
                 ELSE 0 
             END as presente
         FROM usuarios_estudiantes ue
+        LEFT JOIN estado_estudiantes ee ON ee.email = ue.email
         WHERE ue.activo = 1
         ORDER BY ue.apellido, ue.nombre
         """
         
-        estudiantes = execute_query(query)
+        estudiantes = execute_query(query, kind=READ, prepared=True)
         
         # Formatear respuesta
         formatted_estudiantes = []
@@ -72,33 +64,29 @@ def toggle_presente(estudiante_id):
         
         # Obtener datos del estudiante
         query_estudiante = "SELECT * FROM usuarios_estudiantes WHERE id = %s"
-        estudiante = execute_query(query_estudiante, (estudiante_id,), fetch_one=True)
+        estudiante = execute_query(query_estudiante, (estudiante_id,), fetch_one=True, kind=READ, prepared=True)
         
         if not estudiante:
             return jsonify({'error': 'Estudiante no encontrado'}), 404
         
-        # Si se marca como presente, registrar entrada
-        if presente:
-            query_insert = """
-            INSERT INTO EST_registros (fecha, hora, dia, nombre, apellido, email, tipo, auto_generado)
-            VALUES (CURDATE(), CURTIME(), DAYNAME(CURDATE()), %s, %s, %s, 'Entrada', 1)
-            """
-            execute_query(query_insert, (
-                estudiante['nombre'],
-                estudiante['apellido'],
-                estudiante['email']
-            ))
-        else:
-            # Si se marca como ausente, registrar salida
-            query_insert = """
+        # Presente registra una entrada, ausente una salida
+        tipo = 'Entrada' if presente else 'Salida'
+        now = datetime.now()
+        
+        with transaction() as cursor:
+            cursor.execute("""
             INSERT INTO EST_registros (fecha, hora, dia, nombre, apellido, email, tipo, auto_generado)
-            VALUES (CURDATE(), CURTIME(), DAYNAME(CURDATE()), %s, %s, %s, 'Salida', 1)
-            """
-            execute_query(query_insert, (
+            VALUES (%s, %s, %s, %s, %s, %s, %s, 1)
+            """, (
+                now.date(),
+                now.time(),
+                repositorio.dia_semana(now),
                 estudiante['nombre'],
                 estudiante['apellido'],
-                estudiante['email']
+                estudiante['email'],
+                tipo
             ))
+            repositorio.set_student_state(cursor, estudiante['email'], now.date(), tipo)
         
         return format_response({'success': True, 'presente': presente})
         
@@ -122,7 +110,7 @@ def create_estudiante():
         
         # Verificar si el email ya existe
         query_exists = "SELECT id FROM usuarios_estudiantes WHERE email = %s"
-        existing = execute_query(query_exists, (data['email'],), fetch_one=True)
+        existing = execute_query(query_exists, (data['email'],), fetch_one=True, kind=READ)
         
         if existing:
             return jsonify({'error': 'Ya existe un estudiante con ese email'}), 409
@@ -139,7 +127,7 @@ def create_estudiante():
             data['email'].strip().lower(),
             data.get('activo', True),
             data.get('carrera', '')
-        ))
+        ), kind=WRITE)
         
         return format_response({
             'id': result['last_insert_id'],
@@ -160,29 +148,14 @@ def get_estudiante(estudiante_id):
         WHERE id = %s
         """
         
-        estudiante = execute_query(query, (estudiante_id,), fetch_one=True)
+        estudiante = execute_query(query, (estudiante_id,), fetch_one=True, kind=READ, prepared=True)
         
         if not estudiante:
             return jsonify({'error': 'Estudiante no encontrado'}), 404
         
         # Verificar si está presente hoy
-        query_presente = """
-        SELECT COUNT(*) as presente
-        FROM EST_registros 
-        WHERE email = %s 
-        AND DATE(fecha) = CURDATE() 
-        AND tipo = 'Entrada'
-        AND NOT EXISTS (
-            SELECT 1 FROM EST_registros er2 
-            WHERE er2.email = %s 
-            AND DATE(er2.fecha) = CURDATE() 
-            AND er2.tipo = 'Salida' 
-            AND er2.hora > EST_registros.hora
-        )
-        """
-        
-        presente_result = execute_query(query_presente, (estudiante['email'], estudiante['email']), fetch_one=True)
-        presente = presente_result['presente'] > 0 if presente_result else False
+        with statement_cursor() as cursor:
+            presente = repositorio.student_is_present(cursor, estudiante['email'], datetime.now().date())
         
         # Obtener historial de registros reciente
         query_registros = """
@@ -193,7 +166,7 @@ def get_estudiante(estudiante_id):
         LIMIT 10
         """
         
-        registros = execute_query(query_registros, (estudiante['email'],))
+        registros = execute_query(query_registros, (estudiante['email'],), kind=READ, prepared=True)
         
         response_data = {
             'id': str(estudiante['id']),
@@ -223,7 +196,7 @@ def update_estudiante(estudiante_id):
         
         # Verificar que el estudiante existe
         query_exists = "SELECT id FROM usuarios_estudiantes WHERE id = %s"
-        existing = execute_query(query_exists, (estudiante_id,), fetch_one=True)
+        existing = execute_query(query_exists, (estudiante_id,), fetch_one=True, kind=READ)
         
         if not existing:
             return jsonify({'error': 'Estudiante no encontrado'}), 404
@@ -265,7 +238,7 @@ def update_estudiante(estudiante_id):
         WHERE id = %s
         """
         
-        execute_query(query_update, params)
+        execute_query(query_update, params, kind=WRITE)
         
         return format_response({'mensaje': 'Estudiante actualizado exitosamente'})
         
@@ -278,14 +251,14 @@ def delete_estudiante(estudiante_id):
     try:
         # Verificar que el estudiante existe
         query_exists = "SELECT id FROM usuarios_estudiantes WHERE id = %s"
-        existing = execute_query(query_exists, (estudiante_id,), fetch_one=True)
+        existing = execute_query(query_exists, (estudiante_id,), fetch_one=True, kind=READ)
         
         if not existing:
             return jsonify({'error': 'Estudiante no encontrado'}), 404
         
         # Marcar como inactivo en lugar de eliminar
         query_delete = "UPDATE usuarios_estudiantes SET activo = 0 WHERE id = %s"
-        execute_query(query_delete, (estudiante_id,))
+        execute_query(query_delete, (estudiante_id,), kind=WRITE)
         
         return format_response({'mensaje': 'Estudiante desactivado exitosamente'})
         
@@ -1,6 +1,8 @@
 # routes/qr.py - Rutas para manejo de códigos QR y autenticación
 from flask import Blueprint, request, jsonify
-from config.database import execute_query
+from config.database import DB_ERRORS, execute_query, transaction, READ
+from config.schema import index_available
+from comun import repositorio
 from utils.helpers import format_response, handle_error
 from utils.validators import validate_email, validate_qr_data
 from datetime import datetime, timedelta
@@ -41,18 +43,8 @@ def validate_qr():
                     'expired': True
                 }), 400
         
-        # Buscar o crear el estudiante
-        email = qr_info['email'].strip().lower()
-        estudiante = get_or_create_estudiante(qr_info)
-        
-        if not estudiante:
-            return jsonify({'error': 'Error al procesar datos del estudiante'}), 500
-        
-        # Determinar tipo de registro (entrada/salida)
-        tipo_registro = determine_registro_type(email)
-        
-        # Registrar entrada/salida
-        registro_id = create_registro_from_qr(estudiante, tipo_registro, qr_info)
+        # Buscar o crear el estudiante, decidir entrada/salida y registrar
+        estudiante, tipo_registro, registro_id = register_scan(qr_info)
         
         return format_response({
             'success': True,
@@ -121,7 +113,7 @@ def get_qr_status(email):
         
         # Buscar estudiante
         query_estudiante = "SELECT * FROM usuarios_estudiantes WHERE email = %s"
-        estudiante = execute_query(query_estudiante, (email.lower(),), fetch_one=True)
+        estudiante = execute_query(query_estudiante, (email.lower(),), fetch_one=True, kind=READ, prepared=True)
         
         if not estudiante:
             return jsonify({'error': 'Estudiante no encontrado'}), 404
@@ -130,12 +122,12 @@ def get_qr_status(email):
         query_ultimo = """
         SELECT tipo, hora, fecha 
         FROM EST_registros 
-        WHERE email = %s AND DATE(fecha) = CURDATE()
+        WHERE email = %s AND fecha = CURDATE()
         ORDER BY fecha DESC, hora DESC 
         LIMIT 1
         """
         
-        ultimo_registro = execute_query(query_ultimo, (email.lower(),), fetch_one=True)
+        ultimo_registro = execute_query(query_ultimo, (email.lower(),), fetch_one=True, kind=READ, prepared=True)
         
         # Determinar estado actual
         if ultimo_registro:
@@ -165,93 +157,44 @@ def get_qr_status(email):
     except Exception as e:
         return handle_error(e, "Error al obtener estado QR")
 
-def get_or_create_estudiante(qr_info):
-    """Busca un estudiante o lo crea si no existe"""
-    try:
-        email = qr_info['email'].strip().lower()
-        
-        # Buscar estudiante existente
-        query_search = "SELECT * FROM usuarios_estudiantes WHERE email = %s"
-        estudiante = execute_query(query_search, (email,), fetch_one=True)
-        
-        if estudiante:
-            return estudiante
-        
-        # Crear nuevo estudiante
-        query_insert = """
-        INSERT INTO usuarios_estudiantes (nombre, apellido, email, activo, TP)
-        VALUES (%s, %s, %s, 1, 'No especificado')
-        """
-        
-        result = execute_query(query_insert, (
-            qr_info['name'].strip(),
-            qr_info['surname'].strip(),
-            email
-        ))
-        
-        # Retornar el estudiante recién creado
-        return {
-            'id': result['last_insert_id'],
-            'nombre': qr_info['name'].strip(),
-            'apellido': qr_info['surname'].strip(),
-            'email': email,
-            'activo': True,
-            'TP': 'No especificado'
-        }
-        
-    except Exception as e:
-        logging.error(f"Error al obtener/crear estudiante: {e}")
-        return None
-
-def determine_registro_type(email):
-    """Determina si el próximo registro debe ser entrada o salida"""
+def register_scan(qr_info, now=None):
+    """
+    Registra un escaneo QR en una sola transacción
+    
+    Upsert del estudiante (lo crea si no existe) y luego el escaneo del
+    repositorio común: el contador de estado_estudiantes decide
+    Entrada/Salida con la fila bloqueada hasta el commit, así dos escaneos
+    simultáneos del mismo estudiante no pueden decidir ambos "Entrada".
+    Se reintenta ante deadlock o lock wait timeout.
+    
+    Args:
+        qr_info: Datos del QR ya validados
+        now: datetime del escaneo (por defecto, ahora)
+    
+    Returns:
+        Tupla (estudiante, tipo_registro, registro_id)
+    """
+    now = now or datetime.now()
+    estudiante = {
+        'nombre': qr_info['name'].strip(),
+        'apellido': qr_info['surname'].strip(),
+        'email': qr_info['email'].strip().lower()
+    }
+    
+    def scan():
+        with transaction() as cursor:
+            estudiante['id'] = repositorio.upsert_student(
+                cursor, estudiante, unique_email=index_available('uq_usuarios_estudiantes_email')
+            )
+            return repositorio.register_student_scan(cursor, estudiante, now, auto_generado=1)
+    
     try:
-        # Obtener el último registro del día
-        query = """
-        SELECT tipo 
-        FROM EST_registros 
-        WHERE email = %s AND DATE(fecha) = CURDATE()
-        ORDER BY fecha DESC, hora DESC 
-        LIMIT 1
-        """
-        
-        ultimo_registro = execute_query(query, (email,), fetch_one=True)
-        
-        if not ultimo_registro:
-            return 'Entrada'  # Primera vez del día
-        
-        # Alternar entre entrada y salida
-        return 'Salida' if ultimo_registro['tipo'] == 'Entrada' else 'Entrada'
-        
-    except Exception as e:
-        logging.error(f"Error al determinar tipo de registro: {e}")
-        return 'Entrada'  # Default a entrada en caso de error
-
-def create_registro_from_qr(estudiante, tipo_registro, qr_info):
-    """Crea un registro basado en datos del QR"""
-    try:
-        now = datetime.now()
-        
-        query = """
-        INSERT INTO EST_registros (fecha, hora, dia, nombre, apellido, email, tipo, auto_generado)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, 1)
-        """
-        
-        result = execute_query(query, (
-            now.date(),
-            now.time(),
-            now.strftime('%A'),
-            estudiante['nombre'],
-            estudiante['apellido'],
-            estudiante['email'],
-            tipo_registro
-        ))
-        
-        return result['last_insert_id']
-        
-    except Exception as e:
-        logging.error(f"Error al crear registro desde QR: {e}")
+        escaneo = repositorio.with_lock_retries(scan)
+    except DB_ERRORS as e:
+        logging.error(f"Error al registrar escaneo QR: {e}")
         raise
+    
+    return estudiante, escaneo.tipo, escaneo.registro_id
 
 @qr_bp.route('/qr/history/<email>', methods=['GET'])
 def get_qr_history(email):
@@ -279,7 +222,7 @@ def get_qr_history(email):
         LIMIT %s
         """
         
-        registros = execute_query(query, (email.lower(), days, limit))
+        registros = execute_query(query, (email.lower(), days, limit), kind=READ)
         
         # Formatear respuesta
         formatted_registros = []
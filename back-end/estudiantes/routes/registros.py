@@ -1,17 +1,16 @@
 # routes/registros.py - Rutas para manejo de registros
 from flask import Blueprint, request, jsonify
-from config.database import execute_query
-from utils.helpers import format_response, handle_error
+from config.database import execute_query, stream_query, transaction, READ, WRITE
+from comun import repositorio
+from utils.helpers import format_response, handle_error, encode_cursor, decode_cursor, validate_page_size, safe_bool
+from comun.export import EXPORT_FORMATS, export_response
 from datetime import datetime, timedelta
 import logging
 
 registros_bp = Blueprint('registros', __name__)
 
-@registros_bp.route('/registros', methods=['GET'])
-def get_registros():
-    """Obtiene todos los registros"""
-    try:
-        query = """
+# Columnas comunes de los listados de registros
+REGISTROS_SELECT = """
         SELECT 
             er.id,
             er.fecha,
@@ -24,99 +23,60 @@ def get_registros():
             ue.id as estudianteId
         FROM EST_registros er
         LEFT JOIN usuarios_estudiantes ue ON er.email = ue.email
-        ORDER BY er.fecha DESC, er.hora DESC
-        """
-        
-        registros = execute_query(query)
-        return format_response(format_registros(registros))
+"""
+
+# Posición estrictamente posterior al cursor en orden (fecha, hora, id) descendente
+KEYSET_CONDITION = """
+        (er.fecha < %s
+         OR (er.fecha = %s AND (er.hora < %s OR (er.hora = %s AND er.id < %s))))
+"""
+
+@registros_bp.route('/registros', methods=['GET'])
+def get_registros():
+    """Obtiene todos los registros (paginado)"""
+    try:
+        return paginate_registros()
         
     except Exception as e:
         return handle_error(e, "Error al obtener registros")
 
 @registros_bp.route('/registros_hoy', methods=['GET'])
 def get_registros_hoy():
-    """Obtiene los registros de hoy"""
+    """Obtiene los registros de hoy (paginado)"""
     try:
-        query = """
-        SELECT 
-            er.id,
-            er.fecha,
-            er.hora as horaRegistro,
-            er.nombre as nombreEstudiante,
-            er.apellido as apellidoEstudiante,
-            '' as rutEstudiante,
-            er.email,
-            LOWER(er.tipo) as tipoRegistro,
-            ue.id as estudianteId
-        FROM EST_registros er
-        LEFT JOIN usuarios_estudiantes ue ON er.email = ue.email
-        WHERE DATE(er.fecha) = CURDATE()
-        ORDER BY er.hora DESC
-        """
-        
-        registros = execute_query(query)
-        return format_response(format_registros(registros))
+        return paginate_registros(["er.fecha = CURDATE()"])
         
     except Exception as e:
         return handle_error(e, "Error al obtener registros de hoy")
 
 @registros_bp.route('/registros_semana', methods=['GET'])
 def get_registros_semana():
-    """Obtiene los registros de esta semana"""
+    """Obtiene los registros de esta semana (paginado)"""
     try:
-        query = """
-        SELECT 
-            er.id,
-            er.fecha,
-            er.hora as horaRegistro,
-            er.nombre as nombreEstudiante,
-            er.apellido as apellidoEstudiante,
-            '' as rutEstudiante,
-            er.email,
-            LOWER(er.tipo) as tipoRegistro,
-            ue.id as estudianteId
-        FROM EST_registros er
-        LEFT JOIN usuarios_estudiantes ue ON er.email = ue.email
-        WHERE YEARWEEK(er.fecha, 1) = YEARWEEK(CURDATE(), 1)
-        ORDER BY er.fecha DESC, er.hora DESC
-        """
-        
-        registros = execute_query(query)
-        return format_response(format_registros(registros))
+        # Semana de lunes a domingo, como rango para poder usar el índice
+        return paginate_registros([
+            "er.fecha >= DATE_SUB(CURDATE(), INTERVAL WEEKDAY(CURDATE()) DAY)",
+            "er.fecha < DATE_ADD(DATE_SUB(CURDATE(), INTERVAL WEEKDAY(CURDATE()) DAY), INTERVAL 7 DAY)"
+        ])
         
     except Exception as e:
         return handle_error(e, "Error al obtener registros de la semana")
 
 @registros_bp.route('/registros_mes', methods=['GET'])
 def get_registros_mes():
-    """Obtiene los registros de este mes"""
+    """Obtiene los registros de este mes (paginado)"""
     try:
-        query = """
-        SELECT 
-            er.id,
-            er.fecha,
-            er.hora as horaRegistro,
-            er.nombre as nombreEstudiante,
-            er.apellido as apellidoEstudiante,
-            '' as rutEstudiante,
-            er.email,
-            LOWER(er.tipo) as tipoRegistro,
-            ue.id as estudianteId
-        FROM EST_registros er
-        LEFT JOIN usuarios_estudiantes ue ON er.email = ue.email
-        WHERE YEAR(er.fecha) = YEAR(CURDATE()) AND MONTH(er.fecha) = MONTH(CURDATE())
-        ORDER BY er.fecha DESC, er.hora DESC
-        """
-        
-        registros = execute_query(query)
-        return format_response(format_registros(registros))
+        return paginate_registros([
+            "er.fecha > LAST_DAY(DATE_SUB(CURDATE(), INTERVAL 1 MONTH))",
+            "er.fecha <= LAST_DAY(CURDATE())"
+        ])
         
     except Exception as e:
         return handle_error(e, "Error al obtener registros del mes")
 
 @registros_bp.route('/registros_entre_fechas', methods=['GET'])
 def get_registros_entre_fechas():
-    """Obtiene registros entre dos fechas"""
+    """Obtiene registros entre dos fechas (paginado)"""
     try:
         inicio = request.args.get('inicio')
         fin = request.args.get('fin')
@@ -131,29 +91,137 @@ def get_registros_entre_fechas():
         except ValueError:
             return jsonify({'error': 'Formato de fecha inválido. Use YYYY-MM-DD'}), 400
         
-        query = """
-        SELECT 
-            er.id,
-            er.fecha,
-            er.hora as horaRegistro,
-            er.nombre as nombreEstudiante,
-            er.apellido as apellidoEstudiante,
-            '' as rutEstudiante,
-            er.email,
-            LOWER(er.tipo) as tipoRegistro,
-            ue.id as estudianteId
-        FROM EST_registros er
-        LEFT JOIN usuarios_estudiantes ue ON er.email = ue.email
-        WHERE er.fecha BETWEEN %s AND %s
-        ORDER BY er.fecha DESC, er.hora DESC
-        """
-        
-        registros = execute_query(query, (inicio, fin))
-        return format_response(format_registros(registros))
+        return paginate_registros(["er.fecha BETWEEN %s AND %s"], [inicio, fin])
         
     except Exception as e:
         return handle_error(e, "Error al obtener registros entre fechas")
 
+@registros_bp.route('/exportar_registros', methods=['GET'])
+def exportar_registros():
+    """
+    Exporta los registros entre dos fechas como NDJSON o CSV en streaming
+    
+    Query params: inicio, fin (YYYY-MM-DD), formato (ndjson|csv) y gzip.
+    Las filas se envían a medida que llegan del servidor, así un rango de
+    un semestre no se materializa en memoria.
+    """
+    try:
+        inicio = request.args.get('inicio')
+        fin = request.args.get('fin')
+        formato = request.args.get('formato', 'ndjson').lower()
+        
+        if not inicio or not fin:
+            return jsonify({'error': 'Se requieren las fechas de inicio y fin'}), 400
+        
+        try:
+            datetime.strptime(inicio, '%Y-%m-%d')
+            datetime.strptime(fin, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({'error': 'Formato de fecha inválido. Use YYYY-MM-DD'}), 400
+        
+        if formato not in EXPORT_FORMATS:
+            return jsonify({'error': f'Formato inválido. Use {" o ".join(EXPORT_FORMATS)}'}), 400
+        
+        # Orden del índice (fecha, hora, id): el servidor entrega filas sin ordenar en memoria
+        result = stream_query("""
+            SELECT id, fecha, hora, dia, nombre, apellido, email, tipo, auto_generado
+            FROM EST_registros
+            WHERE fecha BETWEEN %s AND %s
+            ORDER BY fecha, hora, id
+        """, (inicio, fin))
+        
+        return export_response(
+            result,
+            formato,
+            f"registros_estudiantes_{inicio}_{fin}",
+            compress=safe_bool(request.args.get('gzip'))
+        )
+        
+    except Exception as e:
+        return handle_error(e, "Error al exportar registros")
+
+def paginate_registros(conditions=None, params=None):
+    """
+    Devuelve una página de registros ordenada por (fecha, hora, id) descendente
+    
+    La paginación es por cursor (keyset): el cursor codifica la clave del
+    último registro entregado y la página siguiente se filtra en SQL, así
+    el costo no depende de cuántas páginas se hayan recorrido.
+    
+    Args:
+        conditions: Lista de condiciones SQL adicionales (se unen con AND)
+        params: Parámetros de esas condiciones
+    
+    Returns:
+        Flask response con 'data' (lista) y 'pagination'
+    """
+    per_page = validate_page_size(request)
+    where = list(conditions or [])
+    args = list(params or [])
+    
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            fecha, hora, registro_id = parse_registros_cursor(cursor)
+        except ValueError:
+            return jsonify({'error': 'Cursor inválido'}), 400
+        where.append(KEYSET_CONDITION)
+        args.extend([fecha, fecha, hora, hora, registro_id])
+    
+    query = REGISTROS_SELECT
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += " ORDER BY er.fecha DESC, er.hora DESC, er.id DESC LIMIT %s"
+    args.append(per_page + 1)
+    
+    registros = execute_query(query, tuple(args), kind=READ, prepared=True)
+    
+    # Se pide una fila extra solo para saber si hay más páginas
+    has_more = len(registros) > per_page
+    registros = registros[:per_page]
+    
+    return format_response(format_registros(registros), pagination={
+        'per_page': per_page,
+        'has_more': has_more,
+        'next_cursor': encode_cursor(registro_cursor_key(registros[-1])) if has_more else None
+    })
+
+def registro_cursor_key(reg):
+    """Clave (fecha, hora, id) de un registro como valores JSON"""
+    fecha = reg['fecha']
+    if not isinstance(fecha, str):
+        fecha = fecha.isoformat()
+    
+    hora = reg['horaRegistro']
+    if isinstance(hora, timedelta):
+        # mysql.connector entrega TIME como timedelta
+        segundos = int(hora.total_seconds())
+        hora = f"{segundos // 3600:02d}:{segundos % 3600 // 60:02d}:{segundos % 60:02d}"
+    elif not isinstance(hora, str):
+        hora = hora.strftime('%H:%M:%S')
+    
+    return [fecha, hora, int(reg['id'])]
+
+def parse_registros_cursor(cursor):
+    """
+    Valida un cursor de registros
+    
+    Returns:
+        Tupla (fecha, hora, id)
+    
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    fecha, hora, registro_id = decode_cursor(cursor, 3)
+    # JSON válido con otros tipos (p. ej. [1,2,3]) haría fallar strptime con TypeError
+    if not isinstance(fecha, str) or not isinstance(hora, str):
+        raise ValueError('Cursor inválido')
+    if not isinstance(registro_id, int) or isinstance(registro_id, bool):
+        raise ValueError('Cursor inválido')
+    datetime.strptime(fecha, '%Y-%m-%d')
+    datetime.strptime(hora, '%H:%M:%S')
+    return fecha, hora, registro_id
+
 @registros_bp.route('/registros', methods=['POST'])
 def create_registro():
     """Crea un nuevo registro manual"""
@@ -182,25 +250,32 @@ def create_registro():
         if isinstance(hora, str):
             hora = datetime.strptime(hora, '%H:%M:%S').time()
         
-        # Insertar registro
+        # Insertar registro y, si es de hoy, actualizar el estado del estudiante
         query = """
         INSERT INTO EST_registros (fecha, hora, dia, nombre, apellido, email, tipo, auto_generado)
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
         """
         
-        result = execute_query(query, (
-            fecha,
-            hora,
-            fecha.strftime('%A'),  # Día de la semana
-            data['nombre'].strip(),
-            data['apellido'].strip(),
-            data['email'].strip().lower(),
-            data['tipo'].capitalize(),
-            data.get('auto_generado', False)
-        ))
+        with transaction() as cursor:
+            cursor.execute(query, (
+                fecha,
+                hora,
+                repositorio.dia_semana(fecha),
+                data['nombre'].strip(),
+                data['apellido'].strip(),
+                data['email'].strip().lower(),
+                data['tipo'].capitalize(),
+                data.get('auto_generado', False)
+            ))
+            registro_id = cursor.lastrowid
+            
+            # La hora puede ser anterior al último escaneo: el estado sale
+            # de todos los registros de hoy, no del tipo de este
+            if fecha == datetime.now().date():
+                repositorio.recompute_student_state(cursor, data['email'].strip().lower(), fecha)
         
         return format_response({
-            'id': result['last_insert_id'],
+            'id': registro_id,
             'mensaje': 'Registro creado exitosamente'
         }), 201
         
@@ -228,7 +303,7 @@ def get_registro(registro_id):
         WHERE er.id = %s
         """
         
-        registro = execute_query(query, (registro_id,), fetch_one=True)
+        registro = execute_query(query, (registro_id,), fetch_one=True, kind=READ, prepared=True)
         
         if not registro:
             return jsonify({'error': 'Registro no encontrado'}), 404
@@ -243,16 +318,18 @@ def get_registro(registro_id):
 def delete_registro(registro_id):
     """Elimina un registro"""
     try:
-        # Verificar que el registro existe
-        query_exists = "SELECT id FROM EST_registros WHERE id = %s"
-        existing = execute_query(query_exists, (registro_id,), fetch_one=True)
-        
-        if not existing:
-            return jsonify({'error': 'Registro no encontrado'}), 404
-        
-        # Eliminar registro
-        query_delete = "DELETE FROM EST_registros WHERE id = %s"
-        execute_query(query_delete, (registro_id,))
+        with transaction() as cursor:
+            # Verificar que el registro existe
+            cursor.execute("SELECT email, fecha FROM EST_registros WHERE id = %s FOR UPDATE", (registro_id,))
+            existing = cursor.fetchone()
+            
+            if not existing:
+                return jsonify({'error': 'Registro no encontrado'}), 404
+            
+            # Eliminar registro y, si es de hoy, rehacer el estado del estudiante
+            cursor.execute("DELETE FROM EST_registros WHERE id = %s", (registro_id,))
+            if existing['fecha'] == datetime.now().date():
+                repositorio.recompute_student_state(cursor, existing['email'], existing['fecha'])
         
         return format_response({'mensaje': 'Registro eliminado exitosamente'})
         
@@ -265,7 +342,7 @@ def get_registros_estudiante(estudiante_id):
     try:
         # Obtener email del estudiante
         query_estudiante = "SELECT email FROM usuarios_estudiantes WHERE id = %s"
-        estudiante = execute_query(query_estudiante, (estudiante_id,), fetch_one=True)
+        estudiante = execute_query(query_estudiante, (estudiante_id,), fetch_one=True, kind=READ)
         
         if not estudiante:
             return jsonify({'error': 'Estudiante no encontrado'}), 404
@@ -287,7 +364,7 @@ def get_registros_estudiante(estudiante_id):
         ORDER BY er.fecha DESC, er.hora DESC
         """
         
-        registros = execute_query(query, (estudiante_id, estudiante['email']))
+        registros = execute_query(query, (estudiante_id, estudiante['email']), kind=READ)
         return format_response(format_registros(registros))
         
     except Exception as e:
@@ -308,8 +385,12 @@ def format_registros(registros):
             hora_obj = datetime.strptime(reg['horaRegistro'], '%H:%M:%S').time()
         else:
             hora_obj = reg['horaRegistro']
-        
-        fecha_hora = datetime.combine(fecha_obj, hora_obj)
+
+        if isinstance(hora_obj, timedelta):
+            # mysql.connector entrega TIME como timedelta
+            fecha_hora = datetime.combine(fecha_obj, datetime.min.time()) + hora_obj
+        else:
+            fecha_hora = datetime.combine(fecha_obj, hora_obj)
         
         formatted.append({
             'id': str(reg['id']),
@@ -1,10 +1,17 @@
 # utils/helpers.py - Funciones de ayuda y utilidades
 from flask import jsonify
 from datetime import datetime, date, time
+import base64
+import binascii
+import json
 import logging
 import traceback
 
-def format_response(data, message=None, status='success'):
+# Tamaño de página para listados con cursor
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+def format_response(data, message=None, status='success', pagination=None):
     """
     Formatea respuestas de la API de manera consistente
     
@@ -12,6 +19,7 @@ def format_response(data, message=None, status='success'):
         data: Datos a retornar
         message: Mensaje opcional
         status: Estado de la respuesta
+        pagination: Metadata de paginación opcional (next_cursor, has_more...)
     
     Returns:
         Flask response object
@@ -25,6 +33,9 @@ def format_response(data, message=None, status='success'):
     if message:
         response['message'] = message
     
+    if pagination is not None:
+        response['pagination'] = pagination
+    
     return jsonify(response)
 
 def handle_error(error, message="Error interno del servidor", status_code=500):
@@ -136,6 +147,63 @@ def validate_pagination_params(request):
     except ValueError:
         return {'page': 1, 'per_page': 50}
 
+def encode_cursor(values):
+    """
+    Codifica la posición de un listado como cursor opaco
+    
+    Args:
+        values: Lista de valores JSON-serializables (la clave de orden)
+    
+    Returns:
+        String base64 url-safe sin padding
+    """
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, length):
+    """
+    Decodifica un cursor generado por encode_cursor
+    
+    Args:
+        cursor: String recibido del cliente
+        length: Cantidad de valores esperados
+    
+    Returns:
+        Lista de valores
+    
+    Raises:
+        ValueError: Si el cursor está corrupto o no tiene la forma esperada
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise ValueError('Cursor inválido') from e
+    
+    if not isinstance(values, list) or len(values) != length:
+        raise ValueError('Cursor inválido')
+    
+    return values
+
+def validate_page_size(request, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """
+    Obtiene el tamaño de página (per_page) acotado al máximo permitido
+    
+    Args:
+        request: Flask request object
+        default: Tamaño si no se especifica o es inválido
+        maximum: Tope del tamaño de página
+    
+    Returns:
+        Int entre 1 y maximum
+    """
+    try:
+        per_page = int(request.args.get('per_page', default))
+    except (ValueError, TypeError):
+        per_page = default
+    
+    return max(1, min(per_page, maximum))
+
 def format_database_error(error):
     """
     Formatea errores de base de datos para respuestas user-friendly
@@ -1,13 +1,19 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import pymysql
 import json
 import time
 import os
+import sys
 from datetime import datetime, timedelta
 import logging
 from dotenv import load_dotenv
 
+# Paquete compartido back-end/comun (en Docker se copia junto a la app)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from comun import database_settings, error_code, get_findings, get_pool, get_statement_stats, init_metrics, repositorio
+from comun.profiler import init_profiler
+from comun.backends import TABLE_MISSING
+
 # Cargar variables de entorno
 load_dotenv()
 
@@ -24,21 +30,18 @@ app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'default-secret-key')
 if os.getenv('FLASK_ENV'):
     app.config['ENV'] = os.getenv('FLASK_ENV')
 
-# Configuración de la base de datos
-DB_CONFIG = {
-    'host': os.getenv('MYSQL_HOST', 'localhost'),
-    'user': os.getenv('MYSQL_USER', 'root'),
-    'password': os.getenv('MYSQL_PASSWORD', ''),
-    'database': os.getenv('MYSQL_DB', 'registro_qr'),
-    'port': int(os.getenv('MYSQL_PORT', 3306)),
-    'charset': 'utf8mb4',
-    'cursorclass': pymysql.cursors.DictCursor
-}
+# Histogramas por ruta y por sentencia en /metrics y Server-Timing
+init_metrics(app, 'lector')
+# Perfilado bajo demanda (X-Profile firmado o PROFILE_SAMPLE_RATE)
+init_profiler(app, 'lector')
+
+# Configuración de la base de datos (MYSQL_* y MYSQL_POOL_*, ver back-end/comun)
+DB_CONFIG = database_settings()
 
 def get_db_connection():
-    """Establece conexión a la base de datos"""
+    """Conexión del pool compartido; close() la devuelve al pool"""
     try:
-        return pymysql.connect(**DB_CONFIG)
+        return get_pool('lector', settings=DB_CONFIG).acquire()
     except Exception as e:
         logger.error(f"Error conectando a BD: {str(e)}")
         return None
@@ -47,6 +50,13 @@ def normalize_email(email):
     """Normaliza email para comparaciones"""
     return email.lower().strip() if email else ""
 
+def format_hora(hora):
+    """Hora HH:MM:SS de una columna TIME (timedelta) o de un time"""
+    if isinstance(hora, timedelta):
+        segundos = int(hora.total_seconds())
+        return f"{segundos // 3600:02d}:{segundos % 3600 // 60:02d}:{segundos % 60:02d}"
+    return str(hora)
+
 def get_dia_espanol():
     """Obtiene el día actual en español"""
     dias = {
@@ -65,6 +75,23 @@ def health_check():
         "service": "QR Temporal API"
     })
 
+@app.route('/db-stats', methods=['GET'])
+def db_stats():
+    """Tiempos acumulados por sentencia SQL y ocupación del pool (por proceso)"""
+    reset = request.args.get('reset', '').lower() in ('1', 'true', 'yes')
+    return jsonify({
+        "pid": os.getpid(),
+        "timestamp": datetime.now().isoformat(),
+        "pool": get_pool('lector', settings=DB_CONFIG).stats(),
+        "statements": get_statement_stats(reset=reset)
+    })
+
+@app.route('/db-findings', methods=['GET'])
+def db_findings():
+    """Sentencias lentas y repetidas (N+1) por ruta (por proceso)"""
+    reset = request.args.get('reset', '').lower() in ('1', 'true', 'yes')
+    return jsonify(dict(get_findings(reset=reset), pid=os.getpid(), timestamp=datetime.now().isoformat()))
+
 @app.route('/validate-qr', methods=['POST'])
 def validate_qr():
     """Endpoint principal para validar QR temporal"""
@@ -150,71 +177,32 @@ def process_student(nombre, apellido, email):
     if not conn:
         return {"success": False, "error": "Sin conexión a BD"}
     
+    def scan():
+        try:
+            cursor = conn.cursor()
+            
+            # Verificar que el estudiante existe y está activo
+            estudiante = repositorio.find_student(cursor, email)
+            if not estudiante:
+                return None
+            
+            # Entrada/Salida según estado_estudiantes (misma lógica que la API de estudiantes)
+            escaneo = repositorio.register_student_scan(cursor, estudiante, datetime.now(), auto_generado=0)
+            conn.commit()
+            return escaneo
+        except Exception:
+            conn.rollback()
+            raise
+    
     try:
-        cursor = conn.cursor()
-        
-        # Verificar que el estudiante existe y está activo
-        cursor.execute("""
-            SELECT id, nombre, apellido, email, activo 
-            FROM usuarios_estudiantes 
-            WHERE LOWER(email) = %s AND activo = 1
-        """, (email,))
-        
-        estudiante = cursor.fetchone()
-        if not estudiante:
+        escaneo = repositorio.with_lock_retries(scan)
+        if escaneo is None:
             return {"success": False, "error": "Estudiante no encontrado o inactivo"}
-        
-        # Verificar último registro para determinar entrada/salida
-        cursor.execute("""
-            SELECT tipo, DATE(fecha) as fecha_reg 
-            FROM EST_registros 
-            WHERE email = %s 
-            ORDER BY fecha DESC, hora DESC 
-            LIMIT 1
-        """, (email,))
-        
-        ultimo_registro = cursor.fetchone()
-        fecha_actual = datetime.now().date()
-        
-        # Determinar tipo de registro
-        if ultimo_registro and ultimo_registro['fecha_reg'] == fecha_actual and ultimo_registro['tipo'] == 'Entrada':
-            tipo_registro = 'Salida'
-        else:
-            tipo_registro = 'Entrada'
-        
-        # Insertar registro
-        now = datetime.now()
-        cursor.execute("""
-            INSERT INTO EST_registros 
-            (fecha, hora, dia, nombre, apellido, email, tipo, auto_generado) 
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
-            now.strftime("%Y-%m-%d"),
-            now.strftime("%H:%M:%S"),
-            get_dia_espanol(),
-            estudiante['nombre'],
-            estudiante['apellido'],
-            estudiante['email'],
-            tipo_registro,
-            0
-        ))
-        
-        conn.commit()
-        
-        return {
-            "success": True,
-            "tipo": tipo_registro,
-            "usuario_tipo": "ESTUDIANTE",
-            "nombre": estudiante['nombre'],
-            "apellido": estudiante['apellido'],
-            "email": estudiante['email'],
-            "fecha": now.strftime("%Y-%m-%d"),
-            "hora": now.strftime("%H:%M:%S"),
-            "message": f"{tipo_registro} registrada para {estudiante['nombre']} {estudiante['apellido']}"
-        }
+        return scan_result(escaneo, "ESTUDIANTE")
         
     except Exception as e:
-        conn.rollback()
+        if error_code(e) == TABLE_MISSING:
+            logger.error("Falta la tabla estado_estudiantes: la crea la API de estudiantes al iniciar")
         logger.error(f"Error procesando estudiante: {str(e)}")
         return {"success": False, "error": f"Error en BD: {str(e)}"}
     finally:
@@ -226,76 +214,52 @@ def process_helper(nombre, apellido, email):
     if not conn:
         return {"success": False, "error": "Sin conexión a BD"}
     
+    def scan():
+        try:
+            cursor = conn.cursor()
+            
+            # Verificar que el ayudante existe y está activo
+            ayudante = repositorio.find_helper(cursor, email)
+            if not ayudante:
+                return None
+            
+            # Entrada/Salida según estado_usuarios (misma lógica que la API de ayudantes)
+            escaneo = repositorio.register_helper_scan(
+                cursor, ayudante, datetime.now(), extra={'auto_generado': 0}
+            )
+            conn.commit()
+            return escaneo
+        except Exception:
+            conn.rollback()
+            raise
+    
     try:
-        cursor = conn.cursor()
-        
-        # Verificar que el ayudante existe y está activo
-        cursor.execute("""
-            SELECT id, nombre, apellido, email, activo 
-            FROM usuarios_permitidos 
-            WHERE LOWER(email) = %s AND activo = 1
-        """, (email,))
-        
-        ayudante = cursor.fetchone()
-        if not ayudante:
+        escaneo = repositorio.with_lock_retries(scan)
+        if escaneo is None:
             return {"success": False, "error": "Ayudante no encontrado o inactivo"}
-        
-        # Verificar último registro para determinar entrada/salida
-        cursor.execute("""
-            SELECT tipo, DATE(fecha) as fecha_reg 
-            FROM registros 
-            WHERE email = %s 
-            ORDER BY fecha DESC, hora DESC 
-            LIMIT 1
-        """, (email,))
-        
-        ultimo_registro = cursor.fetchone()
-        fecha_actual = datetime.now().date()
-        
-        # Determinar tipo de registro
-        if ultimo_registro and ultimo_registro['fecha_reg'] == fecha_actual and ultimo_registro['tipo'] == 'Entrada':
-            tipo_registro = 'Salida'
-        else:
-            tipo_registro = 'Entrada'
-        
-        # Insertar registro
-        now = datetime.now()
-        cursor.execute("""
-            INSERT INTO registros 
-            (fecha, hora, dia, nombre, apellido, email, tipo, auto_generado) 
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
-            now.strftime("%Y-%m-%d"),
-            now.strftime("%H:%M:%S"),
-            get_dia_espanol(),
-            ayudante['nombre'],
-            ayudante['apellido'],
-            ayudante['email'],
-            tipo_registro,
-            0
-        ))
-        
-        conn.commit()
-        
-        return {
-            "success": True,
-            "tipo": tipo_registro,
-            "usuario_tipo": "AYUDANTE",
-            "nombre": ayudante['nombre'],
-            "apellido": ayudante['apellido'],
-            "email": ayudante['email'],
-            "fecha": now.strftime("%Y-%m-%d"),
-            "hora": now.strftime("%H:%M:%S"),
-            "message": f"{tipo_registro} registrada para {ayudante['nombre']} {ayudante['apellido']}"
-        }
+        return scan_result(escaneo, "AYUDANTE")
         
     except Exception as e:
-        conn.rollback()
         logger.error(f"Error procesando ayudante: {str(e)}")
         return {"success": False, "error": f"Error en BD: {str(e)}"}
     finally:
         conn.close()
 
+def scan_result(escaneo, usuario_tipo):
+    """Respuesta de /validate-qr para un escaneo registrado"""
+    persona = escaneo.persona
+    return {
+        "success": True,
+        "tipo": escaneo.tipo,
+        "usuario_tipo": usuario_tipo,
+        "nombre": persona['nombre'],
+        "apellido": persona['apellido'],
+        "email": persona['email'],
+        "fecha": escaneo.fecha.strftime("%Y-%m-%d"),
+        "hora": escaneo.hora.strftime("%H:%M:%S"),
+        "message": f"{escaneo.tipo} registrada para {persona['nombre']} {persona['apellido']}"
+    }
+
 @app.route('/verify-student', methods=['POST'])
 def verify_student():
     """Verificar si un estudiante existe"""
@@ -415,10 +379,16 @@ def get_last_records():
         # Combinar y ordenar por fecha/hora
         todos_registros = list(estudiantes) + list(ayudantes)
         todos_registros.sort(key=lambda x: (x['fecha'], x['hora']), reverse=True)
+        todos_registros = todos_registros[:limit]
+        
+        # El driver entrega DATE como date y TIME como timedelta
+        for registro in todos_registros:
+            registro['fecha'] = str(registro['fecha'])
+            registro['hora'] = format_hora(registro['hora'])
         
         return jsonify({
             "success": True,
-            "records": todos_registros[:limit]
+            "records": todos_registros
         })
         
     except Exception as e:
@@ -486,6 +456,7 @@ if __name__ == '__main__':
     print("  - GET /get-last-records - Últimos registros")
     print("  - GET /stats - Estadísticas del día")
     print("  - GET /health - Estado de la API")
+    print("  - GET /db-stats - Tiempos por sentencia SQL")
     print(f"🔗 API ejecutándose en http://{host}:{port}")
     
     app.run(host=host, port=port, debug=(os.getenv('FLASK_ENV') == 'development'))
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+Mide las rutas de un servicio contra una base ya cargada.
+
+Cada servicio corre en su propio proceso (lo lanza run.py): ayudantes y
+estudiantes tienen módulos de primer nivel con el mismo nombre (config,
+utils, routes) y no se pueden importar juntos. Las peticiones pasan por
+el cliente de pruebas de Flask, sin red: se mide la ruta, sus consultas
+y la serialización. De la última respuesta se guardan las sentencias,
+filas y tiempo de base que informa su encabezado Server-Timing.
+
+Uso (normalmente desde run.py):
+    python benchmarks/endpoints.py ayudantes --sqlite /tmp/bench.db --json salida.json
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(ROOT, 'back-end')
+
+# Rutas medidas por servicio: (nombre, método, ruta)
+ENDPOINTS = {
+    'ayudantes': [
+        ('GET /cumplimiento', 'GET', '/cumplimiento'),
+        # Reporte del semestre: la primera petición calcula, las demás leen la caché
+        ('GET /cumplimiento semestre', 'GET',
+         f'/cumplimiento?desde={date.today() - timedelta(weeks=18)}&hasta={date.today()}'),
+        ('GET /horas_acumuladas', 'GET', '/horas_acumuladas'),
+    ],
+    'estudiantes': [
+        ('GET /api/estudiantes_presentes/estudiantes', 'GET', '/api/estudiantes_presentes/estudiantes'),
+    ],
+    'lector': [
+        ('POST /validate-qr', 'POST', '/validate-qr'),
+    ],
+    'cliente': [
+        ('snapshot.load', None, None),
+        ('recognize_face', None, None),
+    ],
+}
+
+def summarize(samples, **extra):
+    """Tiempos en ms de una serie de ejecuciones"""
+    ordered = sorted(samples)
+
+    def percentile(fraction):
+        return round(ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))] * 1000, 3)
+
+    return dict({
+        'n': len(ordered),
+        'min_ms': round(ordered[0] * 1000, 3),
+        'p50_ms': round(statistics.median(ordered) * 1000, 3),
+        'p90_ms': percentile(0.90),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }, **extra)
+
+SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries, (\d+) rows"')
+
+def db_timing(response):
+    """Sentencias, filas y ms de base de una respuesta (encabezado Server-Timing)"""
+    match = SERVER_TIMING_DB.search(response.headers.get('Server-Timing', ''))
+    if not match:
+        return {}
+    return {'db_ms': float(match.group(1)), 'queries': int(match.group(2)), 'rows': int(match.group(3))}
+
+def time_requests(client, method, path, repeat, body=None, warmup=1):
+    """Tiempos de repeat peticiones (más warmup sin medir) a una ruta"""
+    samples = []
+    status = size = response = None
+    # Las rutas de ayudantes imprimen trazas de depuración por usuario
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for index in range(warmup + repeat):
+            payload = body() if callable(body) else body
+            start = time.perf_counter()
+            response = client.open(path, method=method, json=payload)
+            elapsed = time.perf_counter() - start
+            status, size = response.status_code, len(response.get_data())
+            if index >= warmup:
+                samples.append(elapsed)
+    return summarize(samples, status=status, bytes=size, **db_timing(response))
+
+def sample_emails(table, count, seed=7):
+    """Emails activos al azar de una tabla de usuarios (para los QR del lector)"""
+    from comun.sqlite import SQLiteConnection
+
+    connection = SQLiteConnection(os.environ['SQLITE_PATH'], autocommit=True)
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT email FROM {table} WHERE activo = 1")
+        emails = [row[0] for row in cursor.fetchall()]
+    finally:
+        connection.close()
+    return random.Random(seed).sample(emails, min(count, len(emails)))
+
+def bench_ayudantes(repeat):
+    sys.path.insert(0, os.path.join(BACKEND_DIR, 'ayudantes'))
+    from app import app
+
+    client = app.test_client()
+    return {
+        name: time_requests(client, method, path, repeat)
+        for name, method, path in ENDPOINTS['ayudantes']
+    }
+
+def bench_estudiantes(repeat):
+    sys.path.insert(0, os.path.join(BACKEND_DIR, 'estudiantes'))
+    from app import create_app
+
+    client = create_app().test_client()
+    return {
+        name: time_requests(client, method, path, repeat)
+        for name, method, path in ENDPOINTS['estudiantes']
+    }
+
+def bench_lector(repeat):
+    sys.path.insert(0, os.path.join(BACKEND_DIR, 'lector'))
+    import api_qr_temporal
+
+    # Mitad ayudantes, mitad estudiantes; cada petición es un usuario distinto
+    users = [(email, 'AYUDANTE') for email in sample_emails('usuarios_permitidos', repeat)]
+    users += [(email, 'ESTUDIANTE') for email in sample_emails('usuarios_estudiantes', repeat + 1)]
+    random.Random(11).shuffle(users)
+    queue = itertools.cycle(users)
+
+    def body():
+        email, tipo = next(queue)
+        return {
+            'name': 'Bench', 'surname': 'Lector', 'email': email, 'tipoUsuario': tipo,
+            'timestamp': int(time.time() * 1000), 'status': 'VALID'
+        }
+
+    client = api_qr_temporal.app.test_client()
+    return {
+        name: time_requests(client, method, path, repeat, body=body)
+        for name, method, path in ENDPOINTS['lector']
+    }
+
+def bench_cliente(repeat):
+    """
+    Reconocimiento facial del cliente: carga del snapshot local (la
+    consulta de faces) y búsqueda del rostro más cercano
+    """
+    import numpy as np
+
+    sys.path.insert(0, os.path.join(ROOT, 'cliente'))
+    from snapshot import LocalSnapshot
+    from comun import create_pool
+
+    pool = create_pool(backend='sqlite', settings={'path': os.environ['SQLITE_PATH']}, dict_rows=False)
+    snapshot = LocalSnapshot(pool.acquire)
+
+    samples = []
+    for _ in range(max(1, repeat // 2)):
+        start = time.perf_counter()
+        snapshot.load()
+        samples.append(time.perf_counter() - start)
+    results = {'snapshot.load': summarize(samples, faces=len(snapshot.face_names))}
+
+    # Consultas: rostros enrolados con ruido, como una captura nueva de la misma persona
+    rng = np.random.default_rng(5)
+    rows = rng.integers(0, len(snapshot.face_names), size=repeat * 20)
+    queries = snapshot.face_matrix[rows] + rng.normal(0, 0.01, (len(rows), snapshot.face_matrix.shape[1]))
+    samples, hits = [], 0
+    for row, query in zip(rows, queries):
+        start = time.perf_counter()
+        _, email = snapshot.recognize(query)
+        samples.append(time.perf_counter() - start)
+        hits += email == snapshot.face_emails[row]
+    results['recognize_face'] = summarize(samples, accuracy=round(hits / len(rows), 4))
+    return results
+
+BENCHES = {
+    'ayudantes': bench_ayudantes,
+    'estudiantes': bench_estudiantes,
+    'lector': bench_lector,
+    'cliente': bench_cliente,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description='Mide las rutas de un servicio')
+    parser.add_argument('servicio', choices=sorted(BENCHES))
+    parser.add_argument('--sqlite', required=True, help='Archivo SQLite ya cargado')
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--json', required=True, help='Archivo donde escribir los resultados')
+    args = parser.parse_args()
+
+    os.environ['DB_BACKEND'] = 'sqlite'
+    os.environ['SQLITE_PATH'] = f"file:{os.path.abspath(args.sqlite)}"
+    sys.path.insert(0, BACKEND_DIR)
+
+    results = BENCHES[args.servicio](args.repeticiones)
+    with open(args.json, 'w') as output:
+        json.dump(results, output, indent=2)
+
+if __name__ == '__main__':
+    main()
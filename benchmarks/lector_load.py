@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+"""
+Prueba de carga del lector: lectores de puerta escaneando QR temporales.
+
+Las llegadas son de lazo abierto: se generan de antemano (proceso de
+Poisson más ráfagas en los cambios de clase) y se despachan a su hora
+aunque el servidor vaya atrasado, así la latencia incluye la cola en la
+puerta. Cada lector es un hilo que procesa sus escaneos de a uno, como
+el dispositivo real. Los QR usan el formato de la app (name, surname,
+email, tipoUsuario, timestamp) y pueden llegar vencidos.
+
+Al terminar revisa la base: ningún usuario con dos Entradas (o dos
+Salidas) seguidas el mismo día, estado_usuarios / estado_estudiantes de
+acuerdo con el último registro y tantas filas como respuestas exitosas.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/lector_load.py                       # lector en proceso, SQLite temporal
+    python benchmarks/lector_load.py --lectores 8 --tasa 20 --duracion 60 --pool 10
+    python benchmarks/lector_load.py --url http://localhost:5000 --sqlite /tmp/registro_qr.db
+
+Con --url se prueba un servidor ya levantado (por ejemplo gunicorn con
+DB_BACKEND=sqlite y SQLITE_PATH); --sqlite indica su base para elegir
+usuarios y revisar la consistencia (sin --sqlite se usa MySQL con las
+variables MYSQL_*).
+"""
+import argparse
+from collections import Counter, defaultdict
+from datetime import datetime
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(ROOT, 'back-end'))
+
+from endpoints import summarize
+from workload import Workload, load
+from comun import create_pool, database_settings
+from comun.config import backend_name
+
+# Segundos que el servidor acepta un QR (validate_timestamp)
+QR_VALIDEZ = 16
+
+TABLES = {'AYUDANTE': 'registros', 'ESTUDIANTE': 'EST_registros'}
+
+def schedule(rate, duration, bursts, burst_size, burst_sd, rng):
+    """
+    Momentos de llegada (segundos desde el inicio)
+
+    Poisson de tasa rate durante duration, más bursts ráfagas de
+    burst_size escaneos (normal con desviación burst_sd) repartidas en la
+    prueba, como las salidas de clase.
+    """
+    times = []
+    moment = rng.expovariate(rate) if rate > 0 else duration
+    while moment < duration:
+        times.append(moment)
+        moment += rng.expovariate(rate)
+    for index in range(bursts):
+        center = duration * (index + 1) / (bursts + 1)
+        times.extend(min(max(rng.gauss(center, burst_sd), 0), duration) for _ in range(burst_size))
+    return sorted(times)
+
+def plan(args, users, rng):
+    """
+    Escaneos de la prueba: (segundo, usuario, lector, vencido)
+
+    Una fracción --simultaneos repite el escaneo en otro lector casi a la
+    vez (el mismo QR en dos puertas), el caso que podría dejar dos
+    Entradas seguidas.
+    """
+    scans = []
+    for moment in schedule(args.tasa, args.duracion, args.rafagas, args.rafaga, args.rafaga_sd, rng):
+        user = rng.choice(users)
+        reader = rng.randrange(args.lectores)
+        stale = rng.random() < args.vencidos
+        scans.append((moment, user, reader, stale))
+        if args.lectores > 1 and rng.random() < args.simultaneos:
+            other = (reader + rng.randrange(1, args.lectores)) % args.lectores
+            scans.append((moment + rng.uniform(0, 0.05), user, other, stale))
+    scans.sort(key=lambda scan: scan[0])
+    return scans
+
+def qr_payload(user, age, rng):
+    """QR como lo genera la app, mostrado hace age segundos"""
+    email, nombre, apellido, tipo = user
+    return {
+        'name': nombre,
+        'surname': apellido,
+        'email': email,
+        'tipoUsuario': tipo,
+        'timestamp': int((time.time() - age) * 1000),
+        'status': 'VALID',
+    }
+
+def classify(response):
+    """(resultado, tipo) de una respuesta de /validate-qr"""
+    try:
+        body = response.json()
+    except ValueError:
+        return 'error', None
+    if response.status_code == 200 and body.get('success'):
+        return 'ok', body.get('tipo')
+    if body.get('expired'):
+        return 'expired', None
+    if response.status_code == 200 and 'no encontrado' in str(body.get('error', '')):
+        return 'rejected', None
+    return 'error', None
+
+def reader_loop(url, inbox, results, timeout):
+    """Un lector: procesa sus escaneos en orden, uno a la vez"""
+    session = requests.Session()
+    while True:
+        item = inbox.get()
+        if item is None:
+            break
+        scheduled, reader, user, stale, payload = item
+        started = time.perf_counter()
+        try:
+            response = session.post(f"{url}/validate-qr", json=payload, timeout=timeout)
+            outcome, tipo = classify(response)
+            status = response.status_code
+        except requests.RequestException:
+            outcome, tipo, status = 'error', None, None
+        finished = time.perf_counter()
+        results.append({
+            'reader': reader, 'usuario_tipo': user[3], 'stale': stale, 'status': status,
+            'outcome': outcome, 'tipo': tipo,
+            'wait': started - scheduled, 'service': finished - started, 'total': finished - scheduled,
+            'finished': finished,
+        })
+
+def run_load(url, scans, args, rng):
+    """Despacha los escaneos a su hora y espera a que terminen"""
+    inboxes = [queue.Queue() for _ in range(args.lectores)]
+    results = []
+    readers = [
+        threading.Thread(target=reader_loop, args=(url, inbox, results, args.timeout), daemon=True)
+        for inbox in inboxes
+    ]
+    for reader in readers:
+        reader.start()
+
+    start = time.perf_counter()
+    for moment, user, reader, stale in scans:
+        scheduled = start + moment
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        age = rng.uniform(QR_VALIDEZ + 4, 120) if stale else rng.uniform(0, args.edad_qr)
+        inboxes[reader].put((scheduled, reader, user, stale, qr_payload(user, age, rng)))
+
+    for inbox in inboxes:
+        inbox.put(None)
+    for reader in readers:
+        reader.join()
+    return start, results
+
+def report(scans, results, start, args):
+    """Throughput, latencias y tasas de la corrida"""
+    elapsed = max(result['finished'] for result in results) - start
+    outcomes = Counter(result['outcome'] for result in results)
+    fresh = [result for result in results if not result['stale']]
+
+    # Pico: escaneos terminados en la mejor ventana de 1 s
+    finished = sorted(result['finished'] for result in results)
+    peak, low = 0, 0
+    for high, moment in enumerate(finished):
+        while moment - finished[low] > 1:
+            low += 1
+        peak = max(peak, high - low + 1)
+
+    return {
+        'scans': len(scans),
+        'duration_s': round(elapsed, 3),
+        'offered_rps': round(len(scans) / args.duracion, 2),
+        'throughput_rps': round(len(results) / elapsed, 2),
+        'peak_rps': peak,
+        'latency': summarize([result['total'] for result in results]),
+        'service': summarize([result['service'] for result in results]),
+        'queue_wait': summarize([result['wait'] for result in results]),
+        'outcomes': dict(outcomes),
+        'tipos': dict(Counter(result['tipo'] for result in results if result['tipo'])),
+        'error_rate': round(outcomes['error'] / len(results), 4),
+        'expired_rate': round(outcomes['expired'] / len(results), 4),
+        # QR enviados vigentes que el servidor rechazó por vencidos (cola en la puerta)
+        'expired_in_queue': sum(1 for result in fresh if result['outcome'] == 'expired'),
+        'ok_by_table': {
+            TABLES[tipo]: sum(1 for result in results if result['outcome'] == 'ok' and result['usuario_tipo'] == tipo)
+            for tipo in TABLES
+        },
+    }
+
+# --- Base ---
+
+def open_pool(sqlite_path):
+    """Pool para elegir usuarios y revisar la consistencia (SQLite o MySQL)"""
+    if sqlite_path:
+        return create_pool(backend='sqlite', settings={'path': sqlite_path}, size=1)
+    return create_pool(backend=backend_name('pymysql'), settings=database_settings(), size=1)
+
+def active_users(connection):
+    """(email, nombre, apellido, tipoUsuario) de ayudantes y estudiantes activos"""
+    cursor = connection.cursor()
+    users = []
+    for table, tipo in (('usuarios_permitidos', 'AYUDANTE'), ('usuarios_estudiantes', 'ESTUDIANTE')):
+        cursor.execute(f"SELECT email, nombre, apellido FROM {table} WHERE activo = 1")
+        users.extend((row['email'], row['nombre'], row['apellido'], tipo) for row in cursor.fetchall())
+    cursor.close()
+    return users
+
+def last_ids(connection):
+    """Último id de cada tabla de registros antes de la prueba"""
+    cursor = connection.cursor()
+    ids = {}
+    for table in TABLES.values():
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) AS id FROM {table}")
+        ids[table] = cursor.fetchone()['id']
+    cursor.close()
+    connection.commit()
+    return ids
+
+def check_consistency(connection, baseline, ok_by_table):
+    """
+    Revisa los registros creados durante la prueba
+
+    Returns:
+        dict: por tabla, filas nuevas, Entradas/Salidas dobles y estados
+        que no coinciden con el último registro; 'ok' si todo cuadra
+    """
+    cursor = connection.cursor()
+    checks = {}
+    for table, first_id in baseline.items():
+        cursor.execute(f"SELECT id, email, fecha, tipo FROM {table} WHERE id > %s ORDER BY id", (first_id,))
+        sequences = defaultdict(list)
+        for row in cursor.fetchall():
+            sequences[(row['email'], row['fecha'])].append(row['tipo'])
+
+        dobles = Counter()
+        wrong_state = 0
+        for (email, fecha), tipos in sequences.items():
+            cursor.execute(
+                f"SELECT tipo FROM {table} WHERE email = %s AND fecha = %s AND id <= %s ORDER BY id DESC LIMIT 1",
+                (email, fecha, first_id)
+            )
+            previous = cursor.fetchone()
+            sequence = ([previous['tipo']] if previous else []) + tipos
+            dobles.update(tipo for before, tipo in zip(sequence, sequence[1:]) if before == tipo)
+
+            if table == 'registros':
+                cursor.execute("SELECT estado FROM estado_usuarios WHERE email = %s", (email,))
+                estado = cursor.fetchone()
+                expected = 'dentro' if tipos[-1] == 'Entrada' else 'fuera'
+                wrong_state += not estado or estado['estado'] != expected
+            else:
+                cursor.execute("SELECT COUNT(*) AS total FROM EST_registros WHERE email = %s AND fecha = %s", (email, fecha))
+                total = cursor.fetchone()['total']
+                cursor.execute(
+                    "SELECT movimientos, estado FROM estado_estudiantes WHERE email = %s AND fecha_estado = %s",
+                    (email, fecha)
+                )
+                estado = cursor.fetchone()
+                expected = 'dentro' if total % 2 == 1 else 'fuera'
+                wrong_state += not estado or estado['movimientos'] != total or estado['estado'] != expected
+
+        new_rows = sum(len(tipos) for tipos in sequences.values())
+        checks[table] = {
+            'new_rows': new_rows,
+            'ok_responses': ok_by_table[table],
+            'entradas_dobles': dobles['Entrada'],
+            'salidas_dobles': dobles['Salida'],
+            'estado_inconsistente': wrong_state,
+        }
+    cursor.close()
+    connection.commit()
+
+    checks['ok'] = all(
+        check['new_rows'] == check['ok_responses'] and not check['entradas_dobles']
+        and not check['salidas_dobles'] and not check['estado_inconsistente']
+        for check in checks.values()
+    )
+    return checks
+
+# --- Servidor en proceso ---
+
+def start_lector(sqlite_path, pool_size):
+    """Levanta api_qr_temporal con el servidor multihilo de werkzeug; devuelve su URL"""
+    from werkzeug.serving import make_server
+
+    os.environ['DB_BACKEND'] = 'sqlite'
+    os.environ['SQLITE_PATH'] = sqlite_path
+    os.environ['MYSQL_POOL_SIZE'] = str(pool_size)
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    sys.path.insert(0, os.path.join(ROOT, 'back-end', 'lector'))
+    import api_qr_temporal
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, api_qr_temporal.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+def prepare_sqlite(path, scale, seed):
+    """Base SQLite con los usuarios de una escala (sin historial) si aún no tiene"""
+    from comun.sqlite import SQLiteDatabase
+
+    database = SQLiteDatabase(path)
+    if not database.execute("SELECT 1 FROM usuarios_permitidos LIMIT 1"):
+        connection = database.connect(autocommit=False)
+        try:
+            load(connection, Workload.for_scale(scale, years=0, seed=seed))
+        finally:
+            connection.close()
+    return database
+
+def print_report(results):
+    latency = results['latency']
+    print(f"Escaneos: {results['scans']} en {results['duration_s']:.1f} s "
+          f"(ofrecidos {results['offered_rps']}/s, atendidos {results['throughput_rps']}/s, pico {results['peak_rps']}/s)")
+    print(f"Latencia total  p50 {latency['p50_ms']:.1f} ms  p95 {latency['p95_ms']:.1f} ms  "
+          f"p99 {latency['p99_ms']:.1f} ms  max {latency['max_ms']:.1f} ms")
+    print(f"Servicio        p50 {results['service']['p50_ms']:.1f} ms  p99 {results['service']['p99_ms']:.1f} ms; "
+          f"cola p99 {results['queue_wait']['p99_ms']:.1f} ms")
+    print(f"Resultados: {results['outcomes']}  tipos: {results['tipos']}")
+    print(f"Errores {results['error_rate']:.2%}  vencidos {results['expired_rate']:.2%} "
+          f"({results['expired_in_queue']} vencidos esperando en la puerta)")
+    consistency = results.get('consistency')
+    if consistency:
+        for table in TABLES.values():
+            check = consistency[table]
+            print(f"{table}: {check['new_rows']} filas / {check['ok_responses']} OK, "
+                  f"Entradas dobles {check['entradas_dobles']}, Salidas dobles {check['salidas_dobles']}, "
+                  f"estado inconsistente {check['estado_inconsistente']}")
+        print("Consistencia: OK" if consistency['ok'] else "Consistencia: FALLA")
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga de /validate-qr con lectores de puerta')
+    parser.add_argument('--url', help='Servidor ya levantado (por defecto se levanta el lector en proceso)')
+    parser.add_argument('--sqlite', help='Base SQLite del servidor (por defecto una temporal)')
+    parser.add_argument('--escala', default='1k-1y', help='Usuarios a crear si la base está vacía (ver workload.SCALES)')
+    parser.add_argument('--pool', type=int, default=5, help='MYSQL_POOL_SIZE del lector en proceso')
+    parser.add_argument('--lectores', type=int, default=4, help='Lectores de puerta simultáneos')
+    parser.add_argument('--tasa', type=float, default=5.0, help='Escaneos por segundo fuera de las ráfagas (Poisson)')
+    parser.add_argument('--duracion', type=float, default=30.0, help='Segundos de prueba')
+    parser.add_argument('--rafagas', type=int, default=2, help='Cambios de clase durante la prueba')
+    parser.add_argument('--rafaga', type=int, default=150, help='Escaneos por ráfaga')
+    parser.add_argument('--rafaga-sd', type=float, default=3.0, help='Desviación de cada ráfaga en segundos')
+    parser.add_argument('--edad-qr', type=float, default=8.0, help='Segundos máximos desde que la app generó el QR')
+    parser.add_argument('--vencidos', type=float, default=0.02, help='Fracción de QR ya vencidos')
+    parser.add_argument('--simultaneos', type=float, default=0.02, help='Fracción de escaneos repetidos en otro lector')
+    parser.add_argument('--timeout', type=float, default=10.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='Archivo donde escribir los resultados')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    sqlite_path = args.sqlite
+    if not args.url and not sqlite_path:
+        sqlite_path = os.path.join(tempfile.mkdtemp(prefix='labinf-lector-'), 'registro_qr.db')
+    database = prepare_sqlite(sqlite_path, args.escala, args.seed) if sqlite_path else None
+    target = database.target if database else None
+
+    url, server = (args.url.rstrip('/'), None) if args.url else start_lector(target, args.pool)
+
+    pool = open_pool(target)
+    connection = pool.acquire()
+    users = active_users(connection)
+    baseline = last_ids(connection)
+    connection.close()
+    if not users:
+        parser.error('La base no tiene usuarios activos')
+
+    scans = plan(args, users, rng)
+    print(f"{len(scans)} escaneos de {len(users)} usuarios en {args.lectores} lectores contra {url}")
+    start, results = run_load(url, scans, args, rng)
+    summary = report(scans, results, start, args)
+
+    connection = pool.acquire()
+    summary['consistency'] = check_consistency(connection, baseline, summary['ok_by_table'])
+    connection.close()
+    if server:
+        server.shutdown()
+
+    summary['config'] = {
+        key: value for key, value in vars(args).items() if key not in ('json',)
+    }
+    summary['created'] = datetime.now().isoformat(timespec='seconds')
+    print_report(summary)
+
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump(summary, output, indent=2, default=str)
+
+    if not summary['consistency']['ok'] or summary['error_rate'] > 0:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de punta a punta sobre datos sintéticos.
+
+Para cada escala (workload.SCALES) genera un semestre, lo carga en una
+base SQLite nueva (backend de back-end/comun) y mide las rutas de cada
+servicio en un proceso aparte (endpoints.py). Los resultados quedan en
+un JSON por corrida, con el commit, para comparar entre commits.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/run.py                              # escalas 100u-1y y 1k-1y
+    python benchmarks/run.py --escalas 10k-2y,100k-5y --repeticiones 3
+    python benchmarks/run.py --comparar benchmarks/results/anterior.json
+
+Con --comparar se reporta, por ruta y escala, la razón entre la mediana
+nueva y la anterior; si alguna supera --umbral el proceso termina con
+código 1 (útil en CI).
+"""
+import argparse
+from datetime import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+
+from workload import SCALES, Workload, load
+from comun.sqlite import SQLiteDatabase
+
+DEFAULT_SCALES = ['100u-1y', '1k-1y']
+# lector va al final: es la única que escribe
+SERVICES = ['ayudantes', 'estudiantes', 'cliente', 'lector']
+RESULTS_DIR = os.path.join(HERE, 'results')
+
+def git_revision():
+    """(commit corto, si hay cambios sin confirmar) o (None, None) fuera de git"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+def run_service(service, db_path, repeat, workdir):
+    """Corre endpoints.py para un servicio y devuelve sus resultados (o el error)"""
+    output = os.path.join(workdir, f'{service}.json')
+    process = subprocess.run(
+        [sys.executable, os.path.join(HERE, 'endpoints.py'), service,
+         '--sqlite', db_path, '--repeticiones', str(repeat), '--json', output],
+        capture_output=True, text=True
+    )
+    if process.returncode != 0:
+        return {'error': process.stderr.strip().splitlines()[-1] if process.stderr.strip() else 'sin salida'}
+    with open(output) as results:
+        return json.load(results)
+
+def run_scale(name, services, repeat, workdir, seed):
+    """Genera, carga y mide una escala"""
+    print(f"== {name}: generando y cargando datos")
+    db_path = os.path.join(workdir, f'{name}.db')
+    database = SQLiteDatabase(db_path)
+    workload = Workload.for_scale(name, seed=seed)
+
+    start = time.perf_counter()
+    connection = database.connect(autocommit=False)
+    try:
+        rows = load(connection, workload)
+    finally:
+        connection.close()
+    load_seconds = time.perf_counter() - start
+    print(f"   {sum(rows.values())} filas en {load_seconds:.1f} s")
+
+    endpoints = {}
+    for service in services:
+        results = run_service(service, db_path, repeat, workdir)
+        if 'error' in results:
+            print(f"   {service}: ERROR {results['error']}")
+            endpoints[f'{service} (error)'] = results
+            continue
+        for endpoint, stats in results.items():
+            key = f'{service} {endpoint}'
+            endpoints[key] = stats
+            queries = f"   {stats['queries']:>6} queries" if 'queries' in stats else ''
+            print(f"   {key:<55} p50 {stats['p50_ms']:>10.2f} ms   p95 {stats['p95_ms']:>10.2f} ms{queries}")
+
+    database.close()
+    return {
+        'params': workload.params,
+        'rows': rows,
+        'load_s': round(load_seconds, 3),
+        'endpoints': endpoints,
+    }
+
+def compare(current, previous_path, threshold):
+    """
+    Imprime la razón de medianas contra una corrida anterior
+
+    Returns:
+        list: (escala, ruta, razón) de las rutas más lentas que threshold
+    """
+    with open(previous_path) as previous_file:
+        previous = json.load(previous_file)
+
+    print(f"\n== Comparación con {os.path.basename(previous_path)} (commit {previous.get('commit')})")
+    regressions = []
+    for scale, data in current['scales'].items():
+        before = previous.get('scales', {}).get(scale, {}).get('endpoints', {})
+        for endpoint, stats in data['endpoints'].items():
+            old = before.get(endpoint)
+            if not old or 'p50_ms' not in old or 'p50_ms' not in stats or not old['p50_ms']:
+                continue
+            ratio = stats['p50_ms'] / old['p50_ms']
+            flag = '  <-- REGRESIÓN' if ratio > threshold else ''
+            print(f"   {scale:<9} {endpoint:<55} x{ratio:5.2f}{flag}")
+            if ratio > threshold:
+                regressions.append((scale, endpoint, ratio))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de punta a punta sobre datos sintéticos')
+    parser.add_argument('--escalas', default=','.join(DEFAULT_SCALES),
+                        help=f"Escalas separadas por coma ({', '.join(SCALES)})")
+    parser.add_argument('--servicios', default=','.join(SERVICES),
+                        help=f"Servicios a medir ({', '.join(SERVICES)})")
+    parser.add_argument('--repeticiones', type=int, default=5, help='Mediciones por ruta')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='Archivo de resultados (por defecto results/<fecha>-<commit>.json)')
+    parser.add_argument('--comparar', help='JSON de una corrida anterior')
+    parser.add_argument('--umbral', type=float, default=1.25,
+                        help='Razón de medianas desde la que se reporta regresión')
+    parser.add_argument('--conservar', action='store_true', help='No borrar las bases generadas')
+    args = parser.parse_args()
+
+    scales = [name for name in args.escalas.split(',') if name]
+    services = [name for name in args.servicios.split(',') if name]
+    unknown = [name for name in scales if name not in SCALES] + [name for name in services if name not in SERVICES]
+    if unknown:
+        parser.error(f"Desconocido: {', '.join(unknown)}")
+
+    commit, dirty = git_revision()
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'dirty': dirty,
+        'backend': 'sqlite',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'repeat': args.repeticiones,
+        'scales': {},
+    }
+
+    workdir = tempfile.mkdtemp(prefix='labinf-bench-')
+    try:
+        for name in scales:
+            report['scales'][name] = run_scale(name, services, args.repeticiones, workdir, args.seed)
+    finally:
+        if args.conservar:
+            print(f"\nBases en {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.json
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{commit or 'nogit'}.json")
+    with open(output, 'w') as results:
+        json.dump(report, results, indent=2, ensure_ascii=False)
+    print(f"\nResultados en {output}")
+
+    if args.comparar and compare(report, args.comparar, args.umbral):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
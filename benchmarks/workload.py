@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+Generador de semestres sintéticos para los benchmarks.
+
+Produce las filas de usuarios_permitidos, horarios_asignados,
+usuarios_estudiantes, registros, EST_registros, estado_usuarios,
+estado_estudiantes y faces para una cantidad de ayudantes, estudiantes y
+años. Los escaneos terminan ahora, así las rutas que miran la semana o el
+día actual encuentran datos (y gente todavía dentro).
+
+Patrones que imita:
+- Ayudantes con 1 a 3 bloques semanales; llegan con algunos minutos de
+  atraso, a veces faltan y a veces olvidan marcar la salida.
+- Estudiantes que llegan en ráfagas (inicio de la mañana y de la tarde)
+  más un goteo durante el día, con estadías log-normales y salidas
+  olvidadas. Las visitas por día están acotadas por la capacidad del
+  laboratorio, así la escala de 100k estudiantes sigue siendo cargable.
+- Semestres de marzo a julio y de agosto a diciembre, solo días hábiles.
+- Embeddings Facenet512 aleatorios (normalizados) para todos los
+  ayudantes y una fracción de los estudiantes.
+
+Mismo seed, mismos datos. Las filas se generan por día y se insertan por
+lotes, la memoria no depende del tamaño del semestre.
+"""
+from datetime import datetime, time, timedelta
+import json
+import math
+import os
+import random
+import sys
+import unicodedata
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'back-end'))
+
+from comun.repositorio import dia_semana
+
+# Parámetros por defecto de un workload
+DEFAULTS = {
+    'helpers': 50,
+    'students': 950,
+    'years': 1,
+    'seed': 42,
+    # Probabilidad de que un estudiante vaya al laboratorio un día hábil
+    'visit_rate': 0.12,
+    # Máximo de visitas de estudiantes por día (capacidad del laboratorio)
+    'max_daily_visits': 2000,
+    # Fracción de llegadas de estudiantes que caen en las ráfagas
+    'burst_share': 0.55,
+    'helper_attendance': 0.92,
+    'helper_forgotten_exit': 0.04,
+    'student_forgotten_exit': 0.12,
+    # Fracción de estudiantes con rostro enrolado (los ayudantes siempre)
+    'student_faces': 0.05,
+    'embedding_dim': 512,
+}
+
+# Escalas del benchmark: 100 -> 100k usuarios, 1 -> 5 años
+SCALES = {
+    '100u-1y': {'helpers': 20, 'students': 80, 'years': 1},
+    '1k-1y': {'helpers': 50, 'students': 950, 'years': 1},
+    '10k-2y': {'helpers': 200, 'students': 9800, 'years': 2},
+    '100k-5y': {'helpers': 500, 'students': 99500, 'years': 5},
+}
+
+NOMBRES = [
+    'Ana', 'Benjamín', 'Camila', 'Diego', 'Elena', 'Felipe', 'Gabriela', 'Hugo',
+    'Isidora', 'Joaquín', 'Josefa', 'Martín', 'Florencia', 'Matías', 'Antonia',
+    'Tomás', 'Valentina', 'Vicente', 'Catalina', 'Agustín', 'Fernanda', 'Cristóbal',
+]
+APELLIDOS = [
+    'González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva',
+    'Martínez', 'Sepúlveda', 'Morales', 'Rodríguez', 'López', 'Fuentes', 'Hernández',
+    'Torres', 'Araya', 'Flores', 'Espinoza', 'Valenzuela', 'Castillo', 'Tapia',
+]
+CARRERAS = ['Ingeniería Civil', 'Ingeniería Comercial', 'Derecho', 'Diseño', 'Psicología', 'No especificado']
+DIAS_HABILES = ['lunes', 'martes', 'miércoles', 'jueves', 'viernes']
+
+# Horarios de apertura del laboratorio y ráfagas de llegada (minuto del día, desviación)
+APERTURA = 8 * 60
+CIERRE = 20 * 60 + 30
+RAFAGAS = [(8 * 60 + 20, 12), (14 * 60 + 10, 10)]
+
+# Menos visitas los viernes
+FACTOR_DIA = [1.0, 1.05, 1.0, 0.95, 0.7]
+
+def ascii_slug(text):
+    """Texto sin tildes ni espacios, para emails"""
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode()
+    return text.lower().replace(' ', '')
+
+def semester_days(end, years):
+    """Días hábiles de semestre (marzo-julio, agosto-diciembre) en los últimos years años hasta end"""
+    day = end - timedelta(days=round(365.25 * years)) + timedelta(days=1)
+    while day <= end:
+        if day.weekday() < 5 and day.month not in (1, 2):
+            yield day
+        day += timedelta(days=1)
+
+def at(day, minutes):
+    """datetime del día a esa cantidad de minutos (con segundos), acotado al día"""
+    seconds = max(0, min(int(minutes * 60), 24 * 3600 - 1))
+    return datetime.combine(day, time()) + timedelta(seconds=seconds)
+
+class Workload:
+    """
+    Semestres sintéticos con los parámetros de DEFAULTS
+
+    Args:
+        end: Último día con datos (por defecto hoy, solo hasta la hora actual)
+        **params: Valores que reemplazan a DEFAULTS
+    """
+
+    def __init__(self, end=None, **params):
+        unknown = set(params) - set(DEFAULTS)
+        if unknown:
+            raise ValueError(f"Parámetros desconocidos: {', '.join(sorted(unknown))}")
+        self.params = dict(DEFAULTS, **params)
+        self.until = datetime.now() if end is None else datetime.combine(end, time.max)
+        self.end = self.until.date()
+        self.rng = random.Random(self.params['seed'])
+        self.np_rng = np.random.default_rng(self.params['seed'])
+        self.helpers = self._people(self.params['helpers'], 'uai.cl')
+        self.students = self._people(self.params['students'], 'alumnos.uai.cl')
+        self.horarios = self._horarios()
+
+    @classmethod
+    def for_scale(cls, name, end=None, **params):
+        """Workload de una de las escalas de SCALES"""
+        return cls(end=end, **dict(SCALES[name], **params))
+
+    def _people(self, count, domain):
+        people = []
+        for index in range(count):
+            nombre = self.rng.choice(NOMBRES)
+            apellido = self.rng.choice(APELLIDOS)
+            people.append({
+                'id': index + 1,
+                'nombre': nombre,
+                'apellido': apellido,
+                'email': f"{ascii_slug(nombre)}.{ascii_slug(apellido)}{index + 1}@{domain}",
+            })
+        return people
+
+    def _horarios(self):
+        """Bloques por ayudante: {dia: [(entrada, salida) en minutos]}"""
+        horarios = {}
+        for helper in self.helpers:
+            blocks = {}
+            for dia in self.rng.sample(DIAS_HABILES, self.rng.randint(1, 3)):
+                start = self.rng.randrange(APERTURA + 30, 17 * 60, 30)
+                blocks[dia] = [(start, start + self.rng.choice((90, 120, 150, 180)))]
+            horarios[helper['email']] = blocks
+        return horarios
+
+    # --- Filas ---
+
+    def usuarios_permitidos(self):
+        for helper in self.helpers:
+            activo = 0 if self.rng.random() < 0.03 else 1
+            yield (helper['nombre'], helper['apellido'], helper['email'], activo)
+
+    def horarios_asignados(self):
+        for helper in self.helpers:
+            for dia, blocks in self.horarios[helper['email']].items():
+                for start, end in blocks:
+                    yield (helper['id'], dia, f"{start // 60:02d}:{start % 60:02d}:00", f"{end // 60:02d}:{end % 60:02d}:00")
+
+    def usuarios_estudiantes(self):
+        for student in self.students:
+            activo = 0 if self.rng.random() < 0.02 else 1
+            yield (student['nombre'], student['apellido'], student['email'], activo, self.rng.choice(CARRERAS))
+
+    def _helper_events(self, day):
+        dia = DIAS_HABILES[day.weekday()]
+        for helper in self.helpers:
+            for start, end in self.horarios[helper['email']].get(dia, ()):
+                if self.rng.random() > self.params['helper_attendance']:
+                    continue
+                entrada = at(day, start + self.rng.gauss(3, 8))
+                yield entrada, helper, 'Entrada'
+                if self.rng.random() >= self.params['helper_forgotten_exit']:
+                    yield max(entrada + timedelta(minutes=10), at(day, end + self.rng.gauss(2, 6))), helper, 'Salida'
+
+    def _student_events(self, day):
+        expected = len(self.students) * self.params['visit_rate'] * FACTOR_DIA[day.weekday()]
+        visits = min(
+            self.params['max_daily_visits'],
+            len(self.students),
+            max(0, round(self.rng.gauss(expected, math.sqrt(expected) + 1)))
+        )
+        for student in self.rng.sample(self.students, visits):
+            if self.rng.random() < self.params['burst_share']:
+                center, deviation = self.rng.choice(RAFAGAS)
+                arrival = self.rng.gauss(center, deviation)
+            else:
+                arrival = self.rng.uniform(APERTURA, CIERRE - 30)
+            arrival = min(max(arrival, APERTURA), CIERRE - 15)
+            entrada = at(day, arrival)
+            yield entrada, student, 'Entrada'
+            if self.rng.random() >= self.params['student_forgotten_exit']:
+                stay = self.rng.lognormvariate(math.log(80), 0.6)
+                yield at(day, min(arrival + max(stay, 10), CIERRE)), student, 'Salida'
+
+    def scans(self):
+        """
+        Escaneos en orden cronológico, día por día
+
+        Yields:
+            (tabla, fila) con tabla 'registros' o 'EST_registros'
+        """
+        for day in semester_days(self.end, self.params['years']):
+            dia = dia_semana(datetime.combine(day, time()))
+            events = [(moment, 'registros', person, tipo) for moment, person, tipo in self._helper_events(day)]
+            events += [(moment, 'EST_registros', person, tipo) for moment, person, tipo in self._student_events(day)]
+            events.sort(key=lambda event: event[0])
+            for moment, table, person, tipo in events:
+                if moment > self.until:
+                    break
+                base = (moment.date(), moment.time(), dia, person['nombre'], person['apellido'], person['email'], tipo)
+                if table == 'registros':
+                    yield table, base + (moment, 0, self.rng.choice(('qr', 'qr', 'facial')))
+                else:
+                    yield table, base + (0,)
+
+    def faces(self):
+        """Un embedding normalizado por ayudante y por la fracción de estudiantes con rostro"""
+        enrolled = self.helpers + [
+            student for student in self.students if self.rng.random() < self.params['student_faces']
+        ]
+        dimension = self.params['embedding_dim']
+        for person in enrolled:
+            vector = self.np_rng.standard_normal(dimension).astype(np.float32)
+            vector /= np.linalg.norm(vector)
+            yield (
+                f"{person['nombre']} {person['apellido']}", person['email'],
+                json.dumps([round(float(value), 6) for value in vector]), 'deepface-facenet512'
+            )
+
+# Sentencias de carga (parámetros %s, sirven para cualquier backend)
+INSERTS = {
+    'usuarios_permitidos': "INSERT INTO usuarios_permitidos (nombre, apellido, email, activo) VALUES (%s, %s, %s, %s)",
+    'horarios_asignados': "INSERT INTO horarios_asignados (usuario_id, dia, hora_entrada, hora_salida) VALUES (%s, %s, %s, %s)",
+    'usuarios_estudiantes': "INSERT INTO usuarios_estudiantes (nombre, apellido, email, activo, TP) VALUES (%s, %s, %s, %s, %s)",
+    'registros': (
+        "INSERT INTO registros (fecha, hora, dia, nombre, apellido, email, tipo, `timestamp`, auto_generado, metodo) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+    ),
+    'EST_registros': (
+        "INSERT INTO EST_registros (fecha, hora, dia, nombre, apellido, email, tipo, auto_generado) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"
+    ),
+    'faces': "INSERT INTO faces (name, email, embedding, model) VALUES (%s, %s, %s, %s)",
+}
+
+# Estado actual derivado de los registros ya cargados
+ESTADOS = [
+    """
+    INSERT INTO estado_usuarios (email, nombre, apellido, estado, ultima_entrada, ultima_salida)
+    SELECT r.email, r.nombre, r.apellido,
+           CASE WHEN r.tipo = 'Entrada' THEN 'dentro' ELSE 'fuera' END,
+           (SELECT MAX(`timestamp`) FROM registros e WHERE e.email = r.email AND e.tipo = 'Entrada'),
+           (SELECT MAX(`timestamp`) FROM registros s WHERE s.email = r.email AND s.tipo = 'Salida')
+    FROM registros r
+    JOIN (SELECT email, MAX(id) AS last_id FROM registros GROUP BY email) ultimos
+    ON r.id = ultimos.last_id
+    """,
+    """
+    INSERT INTO estado_estudiantes (email, estudiante_id, fecha_estado, movimientos, estado)
+    SELECT er.email, ue.id, er.fecha, COUNT(*),
+           CASE WHEN MOD(COUNT(*), 2) = 1 THEN 'dentro' ELSE 'fuera' END
+    FROM EST_registros er
+    JOIN usuarios_estudiantes ue ON ue.email = er.email
+    WHERE er.fecha = %s
+    GROUP BY er.email, ue.id, er.fecha
+    """,
+]
+
+def load(connection, workload, batch_size=5000):
+    """
+    Inserta el workload completo y confirma
+
+    Args:
+        connection: Conexión de cualquier backend de comun (tablas vacías)
+        workload: Workload a cargar
+        batch_size: Filas por executemany
+
+    Returns:
+        dict: Filas insertadas por tabla
+    """
+    counts = {}
+    cursor = connection.cursor()
+
+    def insert(table, rows):
+        cursor.executemany(INSERTS[table], rows)
+        counts[table] = counts.get(table, 0) + len(rows)
+
+    try:
+        for table in ('usuarios_permitidos', 'horarios_asignados', 'usuarios_estudiantes'):
+            insert(table, list(getattr(workload, table)()))
+
+        pending = {'registros': [], 'EST_registros': []}
+        for table, row in workload.scans():
+            rows = pending[table]
+            rows.append(row)
+            if len(rows) >= batch_size:
+                insert(table, rows)
+                pending[table] = []
+        for table, rows in pending.items():
+            if rows:
+                insert(table, rows)
+
+        batch = []
+        for row in workload.faces():
+            batch.append(row)
+            if len(batch) >= batch_size // 10:
+                insert('faces', batch)
+                batch = []
+        if batch:
+            insert('faces', batch)
+
+        cursor.execute(ESTADOS[0])
+        cursor.execute(ESTADOS[1], (workload.end,))
+        connection.commit()
+    finally:
+        cursor.close()
+
+    return counts
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Rendimiento de la API de ayudantes según cómo se sirve.
+
+Levanta el servicio en un proceso aparte sobre una base SQLite con datos
+sintéticos y le envía carga de lazo cerrado (--clientes conexiones
+keep-alive, cada una pide en cuanto recibe la respuesta anterior) a
+/estado_usuarios y /registros_hoy. Modos:
+
+- dev: python app.py, el servidor de desarrollo de werkzeug con debug,
+  recargador y TLS propio (como se corría antes).
+- gunicorn-tls: gunicorn -c gunicorn.conf.py con TLS en gunicorn.
+- gunicorn: gunicorn -c gunicorn.conf.py en HTTP, con TLS en el proxy.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/wsgi_serving.py
+    python benchmarks/wsgi_serving.py --modos dev,gunicorn --clientes 16 --duracion 20 --json serving.json
+
+Cliente y servidor comparten la máquina: los números sirven para comparar
+modos entre sí, no como capacidad absoluta.
+"""
+import argparse
+from datetime import datetime
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+import urllib3
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+AYUDANTES_DIR = os.path.join(ROOT, 'back-end', 'ayudantes')
+sys.path.insert(0, HERE)
+
+from endpoints import summarize
+from workload import Workload, load
+from comun.sqlite import SQLiteDatabase
+
+MODES = ['dev', 'gunicorn-tls', 'gunicorn']
+ROUTES = ['/estado_usuarios', '/registros_hoy']
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_server(mode, sqlite_path, port, workers, threads):
+    """Lanza el servicio en un modo; devuelve (proceso, URL base)"""
+    env = dict(
+        os.environ, DB_BACKEND='sqlite', SQLITE_PATH=sqlite_path,
+        SCHEDULER_ENABLED='0', LOG_LEVEL='warning', PYTHONUNBUFFERED='1'
+    )
+    if mode == 'dev':
+        env.update(PORT=str(port), FLASK_DEBUG='1')
+        command = [sys.executable, 'app.py']
+        url = f'https://127.0.0.1:{port}'
+    else:
+        env.update(BIND=f'127.0.0.1:{port}')
+        if workers:
+            env['WEB_WORKERS'] = str(workers)
+        if threads:
+            env['WEB_THREADS'] = str(threads)
+        scheme = 'http'
+        if mode == 'gunicorn-tls':
+            env.update(TLS_CERTFILE='certificate.pem', TLS_KEYFILE='privatekey.pem')
+            scheme = 'https'
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app']
+        url = f'{scheme}://127.0.0.1:{port}'
+
+    process = subprocess.Popen(
+        command, cwd=AYUDANTES_DIR, env=env, start_new_session=True,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    return process, url
+
+def wait_ready(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(process.stderr.read().decode(errors='replace')[-2000:])
+        try:
+            if requests.get(url + ROUTES[0], verify=False, timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.3)
+    raise RuntimeError(f'El servidor no respondió en {timeout} s')
+
+def stop_server(process):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=15)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(process.pid, signal.SIGKILL)
+
+def closed_loop(url, clients, duration):
+    """clients conexiones pidiendo url durante duration segundos"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        session = requests.Session()
+        own, failed = [], 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                # verify por petición: REQUESTS_CA_BUNDLE tiene prioridad sobre session.verify
+                ok = session.get(url, timeout=30, verify=False).status_code == 200
+            except requests.RequestException:
+                ok = False
+            if ok:
+                own.append(time.perf_counter() - start)
+            else:
+                failed += 1
+        with lock:
+            latencies.extend(own)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    if not latencies:
+        return {'throughput_rps': 0, 'errors': errors[0]}
+    return summarize(latencies, throughput_rps=round(len(latencies) / elapsed, 1), errors=errors[0])
+
+def prepare_sqlite(path, scale, seed):
+    database = SQLiteDatabase(path)
+    if not database.execute("SELECT 1 FROM usuarios_permitidos LIMIT 1"):
+        connection = database.connect(autocommit=False)
+        try:
+            load(connection, Workload.for_scale(scale, seed=seed))
+        finally:
+            connection.close()
+    return database
+
+def main():
+    parser = argparse.ArgumentParser(description='Rendimiento de la API de ayudantes por modo de servicio')
+    parser.add_argument('--modos', default=','.join(MODES), help=f'Modos a medir ({", ".join(MODES)})')
+    parser.add_argument('--sqlite', help='Base SQLite (por defecto una temporal con --escala)')
+    parser.add_argument('--escala', default='1k-1y', help='Datos a generar si la base está vacía (ver workload.SCALES)')
+    parser.add_argument('--clientes', type=int, default=8, help='Conexiones simultáneas')
+    parser.add_argument('--duracion', type=float, default=10.0, help='Segundos por ruta')
+    parser.add_argument('--workers', type=int, help='WEB_WORKERS (por defecto el de gunicorn.conf.py)')
+    parser.add_argument('--threads', type=int, help='WEB_THREADS (por defecto el de gunicorn.conf.py)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='Archivo donde escribir los resultados')
+    args = parser.parse_args()
+
+    modes = [mode for mode in args.modos.split(',') if mode]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f'Modos desconocidos: {", ".join(sorted(unknown))}')
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    sqlite_path = args.sqlite or os.path.join(tempfile.mkdtemp(prefix='labinf-serving-'), 'ayudantes.db')
+    database = prepare_sqlite(sqlite_path, args.escala, args.seed)
+
+    results = {}
+    for mode in modes:
+        process, url = start_server(mode, database.target, free_port(), args.workers, args.threads)
+        try:
+            wait_ready(url, process)
+            results[mode] = {}
+            for route in ROUTES:
+                stats = closed_loop(url + route, args.clientes, args.duracion)
+                results[mode][route] = stats
+                print(f"{mode:<13} {route:<17} {stats['throughput_rps']:>8.1f} req/s   "
+                      f"p50 {stats.get('p50_ms', 0):>8.1f} ms   p95 {stats.get('p95_ms', 0):>8.1f} ms   "
+                      f"errores {stats['errors']}")
+        finally:
+            stop_server(process)
+    database.close()
+
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump({
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'cpus': os.cpu_count(),
+                'config': {key: value for key, value in vars(args).items() if key != 'json'},
+                'results': results,
+            }, output, indent=2)
+
+if __name__ == '__main__':
+    main()
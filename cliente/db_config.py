@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+# Configuración de la base de datos MySQL del cliente
+DB_CONFIG = {
+    'host': '',
+    'user': '',
+    'password': '',
+    'database': ''
+}
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Backends intercambiables para calcular embeddings faciales Facenet512.
+
+- 'deepface': el comportamiento original (DeepFace.represent, usa TensorFlow)
+- 'onnx': el mismo modelo exportado a ONNX y ejecutado con ONNX Runtime en
+  CPU, con control explícito de hilos y cuantización dinámica int8 opcional
+
+Cada backend declara un `model_tag` que se guarda junto al embedding en la
+tabla faces. Solo se comparan embeddings con tags compatibles; para pasar
+rostros de un backend a otro está tools/reembed_faces.py.
+
+Los dos backends no dan el mismo vector para el mismo recorte: DeepFace
+detecta y alinea el rostro dentro del recorte antes de Facenet, y el
+backend ONNX se salta ese paso (solo redimensiona y rellena). Los
+embeddings son aproximadamente equivalentes, no intercambiables.
+"""
+import os
+import time
+
+import cv2
+import numpy as np
+
+FACENET_INPUT_SIZE = (160, 160)
+EMBEDDING_SIZE = 512
+
+DEFAULT_ONNX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'facenet512.onnx')
+
+
+class EmbeddingBackend:
+    """Interfaz común de los backends de embeddings"""
+
+    name = None
+    model_tag = None
+
+    def load(self):
+        """Carga el modelo (bloqueante). Debe ser idempotente."""
+        raise NotImplementedError
+
+    def represent(self, face_img):
+        """
+        Calcula el embedding de un rostro ya recortado.
+
+        Args:
+            face_img: Imagen BGR (uint8) tal como la entrega OpenCV
+
+        Returns:
+            np.ndarray de EMBEDDING_SIZE elementos
+        """
+        raise NotImplementedError
+
+
+class DeepFaceBackend(EmbeddingBackend):
+    """Facenet512 vía DeepFace/TensorFlow (backend original)"""
+
+    name = 'deepface'
+    model_tag = 'deepface-facenet512'
+
+    def __init__(self):
+        self.deepface = None
+
+    def load(self):
+        if self.deepface is None:
+            from deepface import DeepFace
+            # Construir el modelo ahora para no pagar la carga en la primera llamada
+            DeepFace.build_model("Facenet512")
+            self.deepface = DeepFace
+
+    def represent(self, face_img):
+        self.load()
+        embedding_obj = self.deepface.represent(face_img, model_name="Facenet512")
+        return np.array(embedding_obj[0]['embedding'])
+
+
+class OnnxBackend(EmbeddingBackend):
+    """Facenet512 exportado a ONNX, ejecutado con ONNX Runtime en CPU"""
+
+    name = 'onnx'
+
+    def __init__(self, model_path=None, intra_op_threads=None, quantize=False):
+        """
+        Args:
+            model_path: Ruta del modelo .onnx (ver tools/export_facenet_onnx.py)
+            intra_op_threads: Hilos para operadores; None deja el default de ORT
+            quantize: Usar una versión con pesos int8 (se genera si no existe)
+        """
+        self.model_path = model_path or DEFAULT_ONNX_PATH
+        self.intra_op_threads = intra_op_threads
+        self.quantize = quantize
+        self.model_tag = 'onnx-facenet512-int8' if quantize else 'onnx-facenet512'
+        self.session = None
+        self.input_name = None
+        # Buffer de entrada reutilizado entre llamadas
+        self.input_buffer = np.zeros((1, FACENET_INPUT_SIZE[1], FACENET_INPUT_SIZE[0], 3), dtype=np.float32)
+
+    def _quantized_path(self):
+        base, ext = os.path.splitext(self.model_path)
+        path = f"{base}.int8{ext}"
+        if not os.path.exists(path):
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            print(f"Generando modelo cuantizado int8 en {path}")
+            quantize_dynamic(self.model_path, path, weight_type=QuantType.QInt8)
+        return path
+
+    def load(self):
+        if self.session is not None:
+            return
+
+        import onnxruntime as ort
+
+        if not os.path.exists(self.model_path):
+            raise FileNotFoundError(
+                f"No existe {self.model_path}; generarlo con tools/export_facenet_onnx.py"
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if self.intra_op_threads:
+            options.intra_op_num_threads = int(self.intra_op_threads)
+
+        path = self._quantized_path() if self.quantize else self.model_path
+        self.session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def preprocess(self, face_img):
+        """
+        Replica el preprocesamiento de DeepFace para Facenet: BGR a RGB,
+        redimensionar conservando proporción, rellenar con ceros hasta
+        160x160 y escalar a [0, 1].
+
+        No replica la detección y alineación que DeepFace.represent hace
+        dentro del recorte: el recorte de MediaPipe entra tal cual, así que
+        el embedding es solo aproximadamente el de DeepFace.
+        """
+        target_w, target_h = FACENET_INPUT_SIZE
+        h, w = face_img.shape[:2]
+        factor = min(target_h / h, target_w / w)
+        new_w, new_h = max(1, int(w * factor)), max(1, int(h * factor))
+        resized = cv2.resize(face_img, (new_w, new_h))
+
+        top = (target_h - new_h) // 2
+        left = (target_w - new_w) // 2
+
+        buf = self.input_buffer
+        buf.fill(0)
+        # BGR -> RGB invirtiendo canales al copiar en el buffer
+        buf[0, top:top + new_h, left:left + new_w, :] = resized[:, :, ::-1]
+        buf *= (1.0 / 255.0)
+        return buf
+
+    def represent(self, face_img):
+        self.load()
+        output = self.session.run(None, {self.input_name: self.preprocess(face_img)})[0]
+        return np.asarray(output[0], dtype=np.float64)
+
+
+def create_backend(name=None, **options):
+    """
+    Crea el backend configurado.
+
+    Args:
+        name: 'deepface' u 'onnx'; por defecto la variable CLIENTE_EMBEDDINGS
+        options: Opciones del backend ONNX (model_path, intra_op_threads, quantize)
+    """
+    name = name or os.getenv('CLIENTE_EMBEDDINGS', 'deepface')
+
+    if name == 'deepface':
+        return DeepFaceBackend()
+
+    if name == 'onnx':
+        options.setdefault('model_path', os.getenv('CLIENTE_ONNX_MODEL') or None)
+        options.setdefault('intra_op_threads', os.getenv('CLIENTE_ONNX_THREADS') or None)
+        options.setdefault('quantize', os.getenv('CLIENTE_ONNX_INT8', '0') == '1')
+        return OnnxBackend(**options)
+
+    raise ValueError(f"Backend de embeddings desconocido: {name}")
+
+
+def timed_represent(backend, face_img):
+    """Devuelve (embedding, segundos) para benchmarks"""
+    start = time.perf_counter()
+    embedding = backend.represent(face_img)
+    return embedding, time.perf_counter() - start
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Carga diferida del stack de reconocimiento facial.
+
+MediaPipe y el backend de embeddings (DeepFace arrastra TensorFlow; ver
+embeddings.py) tardan varios segundos en importarse e inicializarse. Este
+módulo los importa recién cuando se necesitan: al entrar por primera vez al
+modo facial o al precalentarlos en un hilo de fondo una vez que la interfaz
+ya está visible.
+
+Si la carga falla (un import o la descarga de un modelo), el stack no queda
+marcado como listo: la siguiente llamada a load() lo vuelve a intentar,
+a lo más una vez cada LOAD_RETRY_SECONDS. El cliente llama a load_async en
+cada frame del modo facial mientras el stack no está listo; dentro del
+intervalo esa llamada no hace nada.
+"""
+import os
+import threading
+import time
+
+import embeddings
+
+# Segundos mínimos entre reintentos de una carga fallida
+LOAD_RETRY_SECONDS = float(os.getenv('CLIENTE_REINTENTO_FACIAL', 30))
+
+_lock = threading.Lock()
+_ready = threading.Event()
+_backend = embeddings.create_backend()
+_state = {
+    'face_detection': None,
+    'error': None,
+    'failed_at': None,
+    'load_seconds': None,
+    'loading': False
+}
+
+
+def _load_stack():
+    """Importa MediaPipe y el backend de embeddings (bloqueante)"""
+    start = time.perf_counter()
+
+    import mediapipe as mp
+    face_detection = mp.solutions.face_detection.FaceDetection(min_detection_confidence=0.5)
+
+    _backend.load()
+
+    _state['face_detection'] = face_detection
+    _state['load_seconds'] = time.perf_counter() - start
+    print(f"[inicio] Stack facial ({_backend.name}) cargado en {_state['load_seconds']:.2f}s")
+
+
+def load():
+    """
+    Carga el stack facial si aún no está cargado.
+
+    Es seguro llamarla desde varios hilos: solo uno realiza la carga y el
+    resto espera a que termine. Tras una carga fallida se reintenta cuando
+    pasaron LOAD_RETRY_SECONDS; antes de eso devuelve False sin intentar.
+
+    Returns:
+        True si el stack quedó disponible, False si la carga falló
+    """
+    if _ready.is_set():
+        return True
+
+    with _lock:
+        if _ready.is_set():
+            return True
+        if retry_pending():
+            return False
+
+        _state['loading'] = True
+        try:
+            _load_stack()
+        except Exception as e:
+            _state['error'] = e
+            _state['failed_at'] = time.monotonic()
+            print(f"Error cargando stack facial: {e}")
+            return False
+        finally:
+            _state['loading'] = False
+
+        _state['error'] = None
+        _state['failed_at'] = None
+        _ready.set()
+    return True
+
+
+def load_async(on_done=None):
+    """
+    Inicia la carga del stack facial en un hilo de fondo.
+
+    Args:
+        on_done: Callback opcional que recibe True/False al terminar la carga
+    """
+    if _ready.is_set() or _state['loading'] or retry_pending():
+        return
+
+    def load_thread():
+        ok = load()
+        if on_done:
+            on_done(ok)
+
+    thread = threading.Thread(target=load_thread)
+    thread.daemon = True
+    thread.start()
+
+
+def is_ready():
+    """Indica si el stack facial está cargado y listo para usarse"""
+    return _ready.is_set()
+
+
+def is_loading():
+    """Indica si hay una carga en curso"""
+    return _state['loading']
+
+
+def retry_pending():
+    """Indica si una carga fallida todavía espera LOAD_RETRY_SECONDS para reintentarse"""
+    failed_at = _state['failed_at']
+    return failed_at is not None and time.monotonic() - failed_at < LOAD_RETRY_SECONDS
+
+
+def get_face_detection():
+    """Devuelve el detector de rostros de MediaPipe o None si no está listo"""
+    return _state['face_detection'] if is_ready() else None
+
+
+def get_backend():
+    """Backend de embeddings configurado (CLIENTE_EMBEDDINGS)"""
+    return _backend
+
+
+def represent(face_img):
+    """
+    Calcula el embedding Facenet512 de un rostro como np.ndarray.
+
+    Carga el stack de forma bloqueante si todavía no estaba disponible, por
+    lo que solo debe llamarse desde hilos de trabajo, nunca desde el loop de
+    Kivy.
+    """
+    if not load():
+        raise RuntimeError(f"Stack facial no disponible: {_state['error']}")
+    return _backend.represent(face_img)
@@ -0,0 +1,439 @@
+# -*- coding: utf-8 -*-
+"""
+Modo supervisor: un proceso de captura y reconocimiento por cámara.
+
+Permite que un solo PC atienda varias puertas. Cada cámara corre en su
+propio proceso (detección y embeddings escalan por núcleo en lugar de
+competir por un GIL) y el proceso principal solo muestra la grilla Kivy y
+hace las escrituras:
+
+- Vista previa: cada worker escribe su último frame en un bloque de
+  shared_memory protegido por un contador de secuencia (seqlock); la UI lo
+  copia directo a una textura.
+- Rostros: el supervisor exporta la matriz de embeddings a un .npy que los
+  workers abren con np.load(mmap_mode='r'); al refrescarse el snapshot se
+  escribe una versión nueva y los workers la detectan por un contador
+  compartido.
+- Eventos: los workers envían los reconocimientos por una cola y el
+  supervisor decide Entrada/Salida con el snapshot local (un único
+  escritor, así la paridad es consistente entre puertas).
+
+Uso (desde cliente/):
+    CLIENTE_CAMARAS="Puerta principal=0;Puerta lateral=1" python multicam.py
+
+Este módulo no importa Kivy a nivel de módulo: con el método spawn (Windows)
+los workers re-importan el script principal y no deben crear ventanas.
+"""
+import json
+import math
+import multiprocessing as mp
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+FRAME_SHAPE = (480, 640, 3)
+HEADER_BYTES = 64
+
+MULTICAM_CONFIG = {
+    'analysis_duration': 3,
+    'cooldown_time': 5,
+    'preview_fps': 15,
+    'faces_refresh_interval': 30
+}
+
+
+def parse_cameras(spec=None):
+    """
+    Lee la lista de cámaras de CLIENTE_CAMARAS ("nombre=fuente;...").
+
+    La fuente puede ser un índice de dispositivo o una URL/ruta de video; el
+    nombre es opcional.
+    """
+    spec = spec if spec is not None else os.getenv('CLIENTE_CAMARAS', 'Cámara 0=0;Cámara 1=1')
+    cameras = []
+    for item in spec.split(';'):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, source = item.partition('=')
+        if not sep:
+            name, source = '', item
+        source, name = source.strip(), name.strip()
+        cameras.append({
+            'source': int(source) if source.isdigit() else source,
+            'name': name or f"Cámara {len(cameras)}"
+        })
+    return cameras
+
+
+class FrameSlot:
+    """Bloque de memoria compartida con un frame y su número de secuencia"""
+
+    def __init__(self, shape=FRAME_SHAPE, name=None, create=False):
+        size = HEADER_BYTES + int(np.prod(shape))
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self.header = np.ndarray((1,), dtype=np.uint64, buffer=self.shm.buf, offset=0)
+        self.frame = np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf, offset=HEADER_BYTES)
+        if create:
+            self.header[0] = 0
+            self.frame.fill(0)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, frame):
+        """Publica un frame (solo lo llama el worker dueño del slot)"""
+        self.header[0] += 1  # impar: escritura en curso
+        np.copyto(self.frame, frame)
+        self.header[0] += 1
+
+    def read_into(self, dst, last_seq):
+        """
+        Copia el frame si hay uno nuevo y consistente.
+
+        Returns:
+            Número de secuencia leído, o last_seq si no hubo cambios
+        """
+        seq = int(self.header[0])
+        if seq == last_seq or seq % 2 == 1:
+            return last_seq
+        np.copyto(dst, self.frame)
+        if int(self.header[0]) != seq:
+            return last_seq
+        return seq
+
+    def close(self, unlink=False):
+        # Soltar las vistas antes de cerrar el bloque
+        del self.header
+        del self.frame
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class SharedFaces:
+    """Rostros exportados a disco y abiertos como memoria mapeada"""
+
+    def __init__(self, folder, version):
+        self.folder = folder
+        self.version = version
+        self.loaded_version = -1
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.names = []
+        self.emails = []
+
+    @staticmethod
+    def paths(folder, version):
+        return (os.path.join(folder, f"faces_{version}.npy"),
+                os.path.join(folder, f"faces_{version}.json"))
+
+    def reload_if_changed(self):
+        version = self.version.value
+        if version == self.loaded_version or version == 0:
+            return
+        matrix_path, meta_path = self.paths(self.folder, version)
+        try:
+            matrix = np.load(matrix_path, mmap_mode='r')
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"No se pudieron abrir los rostros v{version}: {e}")
+            return
+        self.matrix, self.names, self.emails = matrix, meta['names'], meta['emails']
+        self.loaded_version = version
+
+
+def camera_worker(index, camera, slot_name, events, faces_folder, faces_version, stop):
+    """Proceso de captura y reconocimiento de una cámara"""
+    import cv2
+
+    import face_engine
+    from snapshot import match_embedding
+
+    slot = FrameSlot(name=slot_name)
+    faces = SharedFaces(faces_folder, faces_version)
+    name = camera['name']
+
+    capture = cv2.VideoCapture(camera['source'])
+    capture.set(cv2.CAP_PROP_FRAME_WIDTH, FRAME_SHAPE[1])
+    capture.set(cv2.CAP_PROP_FRAME_HEIGHT, FRAME_SHAPE[0])
+    if not capture.isOpened():
+        events.put({'camera': index, 'kind': 'error', 'message': f"No se pudo abrir {name}"})
+        return
+
+    events.put({'camera': index, 'kind': 'status', 'message': "Cargando modelo facial..."})
+    if not face_engine.load():
+        events.put({'camera': index, 'kind': 'error', 'message': "Error cargando modelo facial"})
+        return
+    face_detection = face_engine.get_face_detection()
+    events.put({'camera': index, 'kind': 'status', 'message': "Reconocimiento activo"})
+
+    # Buffers reutilizados entre frames
+    raw = None
+    resized = np.empty(FRAME_SHAPE, dtype=np.uint8)
+    frame = np.empty(FRAME_SHAPE, dtype=np.uint8)
+    rgb = np.empty(FRAME_SHAPE, dtype=np.uint8)
+
+    analysis = {'start': None, 'crop': None, 'busy': False}
+    last_seen = {}
+
+    def analyze(crop, started):
+        try:
+            faces.reload_if_changed()
+            embedding = face_engine.represent(crop)
+            identity, email = match_embedding(faces.matrix, faces.names, faces.emails, embedding)
+            if email and time.time() - last_seen.get(email, 0) >= MULTICAM_CONFIG['cooldown_time']:
+                last_seen[email] = time.time()
+                events.put({'camera': index, 'kind': 'recognized', 'identity': identity,
+                            'email': email, 'time': started})
+            elif not email:
+                events.put({'camera': index, 'kind': 'unknown', 'time': started})
+        except Exception as e:
+            events.put({'camera': index, 'kind': 'error', 'message': str(e)[:60]})
+        finally:
+            analysis['busy'] = False
+
+    try:
+        while not stop.is_set():
+            ret, raw = capture.read(raw)
+            if not ret:
+                time.sleep(0.05)
+                continue
+
+            src = raw
+            if raw.shape != FRAME_SHAPE:
+                src = cv2.resize(raw, (FRAME_SHAPE[1], FRAME_SHAPE[0]), dst=resized)
+            cv2.flip(src, 1, dst=frame)
+
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb)
+            results = face_detection.process(rgb)
+            now = time.time()
+
+            if results.detections and not analysis['busy']:
+                bbox = results.detections[0].location_data.relative_bounding_box
+                ih, iw = FRAME_SHAPE[:2]
+                x, y = max(0, int(bbox.xmin * iw)), max(0, int(bbox.ymin * ih))
+                w, h = int(bbox.width * iw), int(bbox.height * ih)
+                crop = frame[y:y + h, x:x + w]
+
+                if analysis['start'] is None:
+                    analysis['start'] = now
+                if crop.size > 0:
+                    analysis['crop'] = crop.copy()
+
+                progress = min(int((now - analysis['start']) / MULTICAM_CONFIG['analysis_duration'] * 100), 100)
+                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+                cv2.putText(frame, f"Analizando: {progress}%", (x, max(20, y - 10)),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 0), 2)
+
+                if progress >= 100 and analysis['crop'] is not None:
+                    analysis['busy'] = True
+                    crop, started = analysis['crop'], analysis['start']
+                    analysis['start'], analysis['crop'] = None, None
+                    threading.Thread(target=analyze, args=(crop, started), daemon=True).start()
+            elif not results.detections:
+                analysis['start'], analysis['crop'] = None, None
+
+            slot.write(frame)
+    finally:
+        capture.release()
+        slot.close()
+
+
+class Supervisor:
+    """Arranca los workers y mantiene los rostros compartidos al día"""
+
+    def __init__(self, cameras, snapshot):
+        self.cameras = cameras
+        self.snapshot = snapshot
+        self.ctx = mp.get_context('spawn')
+        self.events = self.ctx.Queue()
+        self.stop_event = self.ctx.Event()
+        self.faces_version = self.ctx.Value('i', 0)
+        self.faces_folder = tempfile.mkdtemp(prefix='labinf_rostros_')
+        self.exported_face_id = None
+        self.slots = []
+        self.processes = []
+
+    def export_faces(self):
+        """Publica una versión nueva de los rostros si cambió el snapshot"""
+        if self.snapshot.face_max_id == self.exported_face_id and self.faces_version.value:
+            return
+        version = self.faces_version.value + 1
+        matrix_path, meta_path = SharedFaces.paths(self.faces_folder, version)
+        self.snapshot.export_faces(matrix_path, meta_path)
+        self.exported_face_id = self.snapshot.face_max_id
+        self.faces_version.value = version
+
+        # Versiones viejas: en Windows pueden seguir mapeadas, se reintenta luego
+        for old in range(1, version - 1):
+            for path in SharedFaces.paths(self.faces_folder, old):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def start(self):
+        self.export_faces()
+        for index, camera in enumerate(self.cameras):
+            slot = FrameSlot(create=True)
+            self.slots.append(slot)
+            process = self.ctx.Process(
+                target=camera_worker,
+                args=(index, camera, slot.name, self.events, self.faces_folder,
+                      self.faces_version, self.stop_event),
+                daemon=True
+            )
+            process.start()
+            self.processes.append(process)
+
+    def poll_events(self):
+        """Eventos pendientes de los workers (sin bloquear)"""
+        pending = []
+        while True:
+            try:
+                pending.append(self.events.get_nowait())
+            except queue.Empty:
+                return pending
+
+    def shutdown(self):
+        self.stop_event.set()
+        for process in self.processes:
+            process.join(timeout=3)
+            if process.is_alive():
+                process.terminate()
+        for slot in self.slots:
+            slot.close(unlink=True)
+        shutil.rmtree(self.faces_folder, ignore_errors=True)
+
+
+def run():
+    """Arranca la UI en grilla con un worker por cámara"""
+    # Importes de Kivy/cliente solo en el proceso supervisor
+    import ver
+    from ver import BackgroundLayout, DatabaseManager, COLORS, CLIENT_CONFIG, log_startup_event
+    from snapshot import LocalSnapshot
+    from kivy.app import App
+    from kivy.clock import Clock
+    from kivy.core.window import Window
+    from kivy.graphics.texture import Texture
+    from kivy.uix.boxlayout import BoxLayout
+    from kivy.uix.gridlayout import GridLayout
+    from kivy.uix.image import Image
+    from kivy.uix.label import Label
+    from kivy.utils import get_color_from_hex
+
+    cameras = parse_cameras()
+    cols = max(1, math.ceil(math.sqrt(len(cameras))))
+    rows = math.ceil(len(cameras) / cols)
+    Window.size = (640 * cols // 2 + 40, 480 * rows // 2 + 160)
+
+    snapshot = LocalSnapshot(DatabaseManager.get_db_connection, CLIENT_CONFIG['journal_path'],
+                             ver.accepted_model_tags())
+    if not snapshot.load():
+        print("Advertencia: snapshot vacío, los rostros se publicarán al reconectar")
+
+    supervisor = Supervisor(cameras, snapshot)
+
+    class MultiCameraGrid(BackgroundLayout):
+        def __init__(self, **kwargs):
+            super(MultiCameraGrid, self).__init__(bg_color=COLORS['dark_bg'], orientation='vertical', **kwargs)
+
+            self.add_widget(Label(
+                text=f"CONTROL DE ACCESO - {len(cameras)} PUERTAS",
+                font_size='16sp', bold=True, size_hint=(1, 0.08),
+                color=get_color_from_hex(COLORS['light_text'])
+            ))
+
+            grid = GridLayout(cols=cols, spacing=6, padding=6)
+            self.images, self.labels, self.textures, self.buffers, self.seqs = [], [], [], [], []
+            for camera in cameras:
+                cell = BoxLayout(orientation='vertical')
+                image = Image(size_hint=(1, 0.85))
+                texture = Texture.create(size=(FRAME_SHAPE[1], FRAME_SHAPE[0]), colorfmt='bgr')
+                texture.flip_vertical()
+                image.texture = texture
+                label = Label(text=f"{camera['name']}: iniciando...", size_hint=(1, 0.15),
+                              color=get_color_from_hex(COLORS['light_text']))
+                cell.add_widget(image)
+                cell.add_widget(label)
+                grid.add_widget(cell)
+                self.images.append(image)
+                self.labels.append(label)
+                self.textures.append(texture)
+                self.buffers.append(np.empty(FRAME_SHAPE, dtype=np.uint8))
+                self.seqs.append(0)
+            self.add_widget(grid)
+
+            supervisor.start()
+            snapshot.start_auto_refresh(CLIENT_CONFIG['snapshot_refresh_interval'])
+            Clock.schedule_interval(self.update_previews, 1.0 / MULTICAM_CONFIG['preview_fps'])
+            Clock.schedule_interval(self.handle_events, 0.1)
+            Clock.schedule_interval(
+                lambda dt: threading.Thread(target=supervisor.export_faces, daemon=True).start(),
+                MULTICAM_CONFIG['faces_refresh_interval']
+            )
+            log_startup_event(f"Supervisor con {len(cameras)} cámaras")
+
+        def update_previews(self, dt):
+            for i, slot in enumerate(supervisor.slots):
+                seq = slot.read_into(self.buffers[i], self.seqs[i])
+                if seq != self.seqs[i]:
+                    self.seqs[i] = seq
+                    self.textures[i].blit_buffer(memoryview(self.buffers[i]).cast('B'),
+                                                 colorfmt='bgr', bufferfmt='ubyte')
+                    self.images[i].canvas.ask_update()
+
+        def set_status(self, index, text, color):
+            self.labels[index].text = f"{cameras[index]['name']}: {text}"
+            self.labels[index].color = get_color_from_hex(COLORS[color])
+
+        def handle_events(self, dt):
+            for event in supervisor.poll_events():
+                index, kind = event['camera'], event['kind']
+                if kind == 'status':
+                    self.set_status(index, event['message'], 'light_text')
+                elif kind == 'error':
+                    self.set_status(index, event['message'], 'error')
+                elif kind == 'unknown':
+                    self.set_status(index, "Persona no reconocida", 'error')
+                elif kind == 'recognized':
+                    threading.Thread(target=self.register, args=(event,), daemon=True).start()
+
+        def register(self, event):
+            index = event['camera']
+            user = snapshot.get_user(event['email'])
+            if not user["found"]:
+                Clock.schedule_once(lambda dt: self.set_status(
+                    index, f"Usuario no encontrado: {event['identity']}", 'error'), 0)
+                return
+            registro = snapshot.record_attendance(user, 'facial', DatabaseManager.register_attendance)
+            if registro.get("success"):
+                color = 'entry' if registro['tipo'] == 'Entrada' else 'exit'
+                text = f"{registro['tipo']}: {user['nombre']} {user['apellido']}"
+            else:
+                color, text = 'error', registro.get('message', 'Error')
+            Clock.schedule_once(lambda dt: self.set_status(index, text, color), 0)
+
+    class MultiCameraApp(App):
+        def build(self):
+            Window.clearcolor = get_color_from_hex(COLORS['dark_bg'])
+            return MultiCameraGrid()
+
+        def on_stop(self):
+            snapshot.stop()
+            supervisor.shutdown()
+
+    MultiCameraApp().run()
+
+
+if __name__ == '__main__':
+    mp.freeze_support()
+    run()
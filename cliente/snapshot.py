@@ -0,0 +1,430 @@
+# -*- coding: utf-8 -*-
+"""
+Copia local de los datos que necesita el reconocimiento facial.
+
+Mantiene en memoria los rostros enrolados (como matriz de embeddings
+normalizados), los usuarios activos y la cantidad de registros de hoy por
+email. Con esto el reconocimiento y la decisión Entrada/Salida se hacen sin
+consultar MySQL; cada evento queda en una sola escritura (o en el journal
+local si la base no responde).
+
+La carga inicial trae todo y los refrescos posteriores solo piden filas con
+id mayor al último visto (high-water mark). El mark solo avanza con filas
+leídas de la base: los registros que inserta este cliente se anotan aparte
+(local_ids), porque otros escritores (lector, APIs, otras cámaras) pueden
+haber insertado filas con ids menores que todavía no se leyeron.
+
+Los registros del journal se reenvían con comun.repositorio, igual que los
+en línea: cada uno en su transacción, con reintentos ante bloqueos, y
+actualizando estado_usuarios.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from datetime import date, datetime
+
+import numpy as np
+
+# Acceso a datos compartido con las APIs (back-end/comun)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'back-end'))
+from comun import repositorio
+
+RECOGNITION_THRESHOLD = 0.258
+
+
+def match_embedding(matrix, names, emails, embedding):
+    """
+    Busca el rostro más cercano en una matriz de embeddings normalizados.
+
+    Returns:
+        (identidad, email) igual que DatabaseManager.recognize_face
+    """
+    if embedding is None:
+        return "Error", None
+
+    if matrix.size == 0:
+        return "Desconocido", None
+
+    vector = np.asarray(embedding, dtype=np.float32)
+    if vector.shape[0] != matrix.shape[1]:
+        return "Desconocido", None
+
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        return "Error", None
+
+    distances = 1.0 - matrix @ (vector / norm)
+    best = int(np.argmin(distances))
+    if distances[best] < RECOGNITION_THRESHOLD:
+        return names[best], emails[best]
+    return "Desconocido", None
+
+
+class LocalSnapshot:
+    """Snapshot local de rostros, usuarios activos y estado del día"""
+
+    def __init__(self, connect, journal_path=None, model_tags=None):
+        """
+        Args:
+            connect: Función que devuelve una conexión mysql.connector o None
+            journal_path: Archivo JSON-lines para registros pendientes de enviar
+            model_tags: Tags de embeddings a cargar (None = todos)
+        """
+        self.connect = connect
+        self.journal_path = journal_path
+        self.model_tags = list(model_tags) if model_tags else None
+        self.lock = threading.RLock()
+
+        # Rostros
+        self.face_matrix = np.zeros((0, 0), dtype=np.float32)
+        self.face_names = []
+        self.face_emails = []
+        self.face_max_id = 0
+
+        # Usuarios activos por email
+        self.users = {}
+
+        # Registros de hoy: email -> ids vistos (la paridad define el tipo)
+        self.today = None
+        self.today_ids = {}
+        self.registros_max_id = 0
+        # Ids insertados por este cliente hoy, aún no leídos en un refresco
+        self.local_ids = set()
+        self.pending_local = 0
+
+        self.loaded = False
+        self.last_refresh = 0
+        self._stop = threading.Event()
+
+    # ------------------------------------------------------------------
+    # Carga y refresco
+    # ------------------------------------------------------------------
+
+    def load(self):
+        """Carga completa del snapshot"""
+        with self.lock:
+            self.face_matrix = np.zeros((0, 0), dtype=np.float32)
+            self.face_names = []
+            self.face_emails = []
+            self.face_max_id = 0
+            self.today = None
+        return self.refresh()
+
+    def refresh(self):
+        """
+        Trae solo los cambios desde el último refresco.
+
+        Returns:
+            True si se pudo consultar la base de datos
+        """
+        conn = self.connect()
+        if conn is None:
+            return False
+
+        try:
+            # Primero el journal, así los registros enviados vuelven con su id
+            # real en el refresco de hoy de esta misma pasada
+            self._flush_journal(conn)
+            cursor = conn.cursor()
+            self._refresh_faces(cursor)
+            self._refresh_users(cursor)
+            self._refresh_today(cursor)
+            cursor.close()
+            self.loaded = True
+            self.last_refresh = time.time()
+            return True
+        except Exception as e:
+            print(f"Error refrescando snapshot local: {e}")
+            return False
+        finally:
+            conn.close()
+
+    def _faces_filter(self):
+        if not self.model_tags:
+            return "", ()
+        placeholders = ", ".join(["%s"] * len(self.model_tags))
+        return f" AND model IN ({placeholders})", tuple(self.model_tags)
+
+    def _refresh_faces(self, cursor):
+        model_sql, model_params = self._faces_filter()
+
+        # Si se borraron rostros el conteo no calza y se recarga todo
+        cursor.execute(f"SELECT COUNT(*), COALESCE(MAX(id), 0) FROM faces WHERE 1 = 1{model_sql}", model_params)
+        total, max_id = cursor.fetchone()
+        with self.lock:
+            if total < len(self.face_names) or (max_id == self.face_max_id and total != len(self.face_names)):
+                self.face_matrix = np.zeros((0, 0), dtype=np.float32)
+                self.face_names = []
+                self.face_emails = []
+                self.face_max_id = 0
+            since = self.face_max_id
+
+        if max_id <= since:
+            return
+
+        cursor.execute(
+            f"SELECT id, name, email, embedding FROM faces WHERE id > %s{model_sql} ORDER BY id",
+            (since,) + model_params
+        )
+        rows = cursor.fetchall()
+
+        vectors, names, emails = [], [], []
+        new_max = since
+        for face_id, name, email, embedding_json in rows:
+            new_max = max(new_max, face_id)
+            try:
+                vector = np.asarray(json.loads(embedding_json), dtype=np.float32)
+            except (TypeError, ValueError):
+                continue
+            norm = np.linalg.norm(vector)
+            if norm == 0:
+                continue
+            vectors.append(vector / norm)
+            names.append(name)
+            emails.append(email)
+
+        with self.lock:
+            if vectors:
+                block = np.vstack(vectors)
+                if self.face_matrix.size == 0:
+                    self.face_matrix = block
+                elif block.shape[1] == self.face_matrix.shape[1]:
+                    self.face_matrix = np.vstack([self.face_matrix, block])
+                else:
+                    print("Advertencia: embeddings con dimensión distinta, se ignoran")
+                    block = None
+                if block is not None:
+                    self.face_names.extend(names)
+                    self.face_emails.extend(emails)
+            self.face_max_id = new_max
+
+    def _refresh_users(self, cursor):
+        # La tabla de usuarios es pequeña y puede cambiar el flag activo,
+        # así que se relee completa en cada refresco
+        cursor.execute("""
+            SELECT id, nombre, apellido, email
+            FROM usuarios_permitidos
+            WHERE activo = 1
+        """)
+        users = {}
+        for user_id, nombre, apellido, email in cursor.fetchall():
+            users[email] = {
+                "id": user_id,
+                "nombre": nombre,
+                "apellido": apellido,
+                "email": email,
+                "found": True
+            }
+        with self.lock:
+            self.users = users
+
+    def _refresh_today(self, cursor):
+        today = date.today()
+        with self.lock:
+            if self.today != today:
+                self._reset_day(today)
+            since = self.registros_max_id
+
+        cursor.execute("""
+            SELECT id, email FROM registros
+            WHERE fecha = %s AND id > %s
+            ORDER BY id
+        """, (today.strftime("%Y-%m-%d"), since))
+        rows = cursor.fetchall()
+
+        with self.lock:
+            for registro_id, email in rows:
+                # Los ids propios ya están contados; el set no los duplica
+                self.today_ids.setdefault(email, set()).add(registro_id)
+                self.local_ids.discard(registro_id)
+                self.registros_max_id = max(self.registros_max_id, registro_id)
+
+    def start_auto_refresh(self, interval=30):
+        """Refresca el snapshot periódicamente en un hilo de fondo"""
+        def refresh_loop():
+            while not self._stop.wait(interval):
+                self.refresh()
+
+        thread = threading.Thread(target=refresh_loop)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    # ------------------------------------------------------------------
+    # Consultas locales
+    # ------------------------------------------------------------------
+
+    def recognize(self, embedding):
+        """
+        Reconoce un rostro contra los embeddings locales.
+
+        Returns:
+            (identidad, email) igual que DatabaseManager.recognize_face
+        """
+        with self.lock:
+            matrix = self.face_matrix
+            names = self.face_names
+            emails = self.face_emails
+
+        return match_embedding(matrix, names, emails, embedding)
+
+    def export_faces(self, matrix_path, meta_path):
+        """
+        Escribe los rostros en disco para compartirlos con otros procesos.
+
+        La matriz queda en formato .npy (se abre con np.load(mmap_mode='r'))
+        y nombres/emails en un JSON paralelo.
+        """
+        with self.lock:
+            matrix = self.face_matrix
+            meta = {'names': list(self.face_names), 'emails': list(self.face_emails)}
+
+        np.save(matrix_path, np.ascontiguousarray(matrix, dtype=np.float32))
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+    def get_user(self, email):
+        """Datos del usuario activo o {'found': False}"""
+        with self.lock:
+            return self.users.get(email, {"found": False})
+
+    def next_tipo(self, email):
+        """Entrada/Salida según la paridad de registros de hoy"""
+        with self.lock:
+            self._check_day()
+            count = len(self.today_ids.get(email, ()))
+        return "Entrada" if count % 2 == 0 else "Salida"
+
+    def _check_day(self):
+        if self.today != date.today():
+            self._reset_day(date.today())
+
+    def _reset_day(self, today):
+        self.today = today
+        self.today_ids = {}
+        self.local_ids = set()
+        self.registros_max_id = 0
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+
+    def record_attendance(self, user, metodo, insert):
+        """
+        Decide el tipo localmente y registra con una sola escritura.
+
+        Args:
+            user: Datos del usuario (nombre, apellido, email)
+            metodo: Método de registro ('facial', 'qr')
+            insert: Función (nombre, apellido, email, metodo, tipo, now) que
+                    inserta el registro y devuelve el dict de resultado
+
+        Returns:
+            Dict con el resultado, igual que DatabaseManager.register_attendance
+        """
+        email = user["email"]
+        with self.lock:
+            tipo = self.next_tipo(email)
+            now = datetime.now()
+            fecha = now.strftime("%Y-%m-%d")
+            hora = now.strftime("%H:%M:%S")
+
+            result = insert(user["nombre"], user["apellido"], email, metodo, tipo, now)
+
+            if result.get("success"):
+                registro_id = result.get("id")
+                self.today_ids.setdefault(email, set()).add(registro_id)
+                # Sin tocar registros_max_id: el próximo refresco debe traer
+                # las filas de otros escritores con ids menores que este
+                self.local_ids.add(registro_id)
+                return result
+
+            if self.journal_path and result.get("connection_error"):
+                # Id local negativo para que la paridad avance hasta sincronizar
+                self.pending_local -= 1
+                self._append_journal({
+                    "fecha": fecha, "hora": hora,
+                    "nombre": user["nombre"], "apellido": user["apellido"],
+                    "email": email, "metodo": metodo, "tipo": tipo,
+                    "local_id": self.pending_local
+                })
+                self.today_ids.setdefault(email, set()).add(self.pending_local)
+                return {
+                    "success": True,
+                    "message": f"Registro guardado localmente: {user['nombre']} {user['apellido']}",
+                    "id": None,
+                    "fecha": fecha,
+                    "hora": hora,
+                    "tipo": tipo,
+                    "pendiente": True
+                }
+
+            return result
+
+    def _append_journal(self, entry):
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def _write_journal(self, entries):
+        if not entries:
+            os.remove(self.journal_path)
+            return
+        with open(self.journal_path, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+
+    def _flush_journal(self, conn):
+        """
+        Envía a MySQL los registros pendientes del journal.
+
+        Cada registro va en su propia transacción por
+        repositorio.register_helper_scan (con el tipo decidido al
+        guardarlo), así estado_usuarios queda al día. Si uno falla se
+        detiene y el journal conserva ese y los siguientes.
+        """
+        if not self.journal_path or not os.path.exists(self.journal_path):
+            return 0
+
+        with self.lock:
+            with open(self.journal_path, encoding="utf-8") as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+
+            sent = 0
+            try:
+                for entry in entries:
+                    self._replay(conn, entry)
+                    sent += 1
+                    # Ya no está pendiente: el refresco trae su id real
+                    if entry.get("local_id") is not None:
+                        self.today_ids.get(entry["email"], set()).discard(entry["local_id"])
+            except Exception as e:
+                print(f"Error sincronizando journal: {e}")
+
+            self._write_journal(entries[sent:])
+            if sent:
+                print(f"Journal sincronizado: {sent} de {len(entries)} registros")
+            return sent
+
+    def _replay(self, conn, entry):
+        """Inserta un registro del journal en su propia transacción"""
+        now = datetime.strptime(f"{entry['fecha']} {entry['hora']}", "%Y-%m-%d %H:%M:%S")
+        persona = {"nombre": entry["nombre"], "apellido": entry["apellido"], "email": entry["email"]}
+
+        def transaction():
+            try:
+                conn.start_transaction()
+                cursor = conn.dict_cursor()
+                repositorio.register_helper_scan(
+                    cursor, persona, now, tipo=entry["tipo"], extra={"metodo": entry["metodo"]}
+                )
+                conn.commit()
+                cursor.close()
+            except Exception:
+                conn.rollback()
+                raise
+
+        repositorio.with_lock_retries(transaction)
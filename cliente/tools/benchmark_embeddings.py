@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark y verificación de paridad entre backends de embeddings.
+
+El set etiquetado es un directorio con una carpeta por persona y recortes de
+rostro dentro (el mismo formato que guarda el cliente en rostros/):
+
+    dataset/
+        ana@uai.cl/001.jpg
+        ana@uai.cl/002.jpg
+        pedro@uai.cl/001.jpg
+
+Uso (desde cliente/):
+    python tools/benchmark_embeddings.py dataset/ [--hilos 2] [--int8] [--json salida.json]
+
+Reporta por backend: latencia (media, p50, p95), precisión de identificación
+con el umbral del cliente (primera imagen de cada persona como galería, el
+resto como consultas) y tasa de falsos aceptados. Contra DeepFace reporta la
+distancia coseno por imagen, que indica si los embeddings ya guardados siguen
+siendo comparables o si hace falta tools/reembed_faces.py.
+"""
+import argparse
+import json
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embeddings import DeepFaceBackend, OnnxBackend, timed_represent
+from snapshot import RECOGNITION_THRESHOLD
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def load_dataset(root):
+    """Lista de (etiqueta, ruta) ordenada por etiqueta"""
+    items = []
+    for label in sorted(os.listdir(root)):
+        folder = os.path.join(root, label)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                items.append((label, os.path.join(folder, name)))
+    return items
+
+
+def embed_all(backend, items, warmup=3):
+    """Embeddings normalizados y latencias del backend sobre el set"""
+    backend.load()
+    images = [cv2.imread(path) for _, path in items]
+
+    for img in images[:warmup]:
+        backend.represent(img)
+
+    vectors, latencies = [], []
+    for img in images:
+        try:
+            embedding, seconds = timed_represent(backend, img)
+        except Exception as e:
+            print(f"  [{backend.name}] error: {e}")
+            vectors.append(None)
+            continue
+        latencies.append(seconds)
+        vectors.append(embedding / np.linalg.norm(embedding))
+    return vectors, np.array(latencies)
+
+
+def identification_metrics(items, vectors):
+    """Precisión con galería = primera imagen de cada etiqueta"""
+    gallery = {}
+    probes = []
+    for (label, _), vector in zip(items, vectors):
+        if vector is None:
+            continue
+        if label not in gallery:
+            gallery[label] = vector
+        else:
+            probes.append((label, vector))
+
+    if not probes or len(gallery) < 2:
+        return {'consultas': len(probes)}
+
+    labels = list(gallery)
+    matrix = np.vstack([gallery[label] for label in labels])
+    correct = false_accepts = rejected = 0
+    for label, vector in probes:
+        distances = 1.0 - matrix @ vector
+        best = int(np.argmin(distances))
+        if distances[best] >= RECOGNITION_THRESHOLD:
+            rejected += 1
+        elif labels[best] == label:
+            correct += 1
+        else:
+            false_accepts += 1
+
+    return {
+        'consultas': len(probes),
+        'aciertos': correct / len(probes),
+        'falsos_aceptados': false_accepts / len(probes),
+        'rechazados': rejected / len(probes)
+    }
+
+
+def latency_summary(latencies):
+    if len(latencies) == 0:
+        return {}
+    return {
+        'media_ms': float(np.mean(latencies) * 1000),
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p95_ms': float(np.percentile(latencies, 95) * 1000),
+        'imagenes_por_s': float(1.0 / np.mean(latencies))
+    }
+
+
+def parity(reference, candidate):
+    """Distancia coseno por imagen entre dos backends"""
+    distances = [float(1.0 - np.dot(a, b)) for a, b in zip(reference, candidate)
+                 if a is not None and b is not None]
+    if not distances:
+        return {}
+    return {
+        'media': float(np.mean(distances)),
+        'p95': float(np.percentile(distances, 95)),
+        'max': float(np.max(distances)),
+        # Fracción muy por debajo del umbral de reconocimiento
+        'bajo_umbral_10pct': float(np.mean(np.array(distances) < RECOGNITION_THRESHOLD * 0.1))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de backends de embeddings")
+    parser.add_argument('dataset', help="Directorio con una carpeta por persona")
+    parser.add_argument('--modelo', default=None, help="Ruta del modelo ONNX")
+    parser.add_argument('--hilos', type=int, default=None, help="intra_op_num_threads de ONNX Runtime")
+    parser.add_argument('--int8', action='store_true', help="Incluir la variante cuantizada int8")
+    parser.add_argument('--sin-deepface', action='store_true', help="Omitir DeepFace (sin paridad)")
+    parser.add_argument('--json', default=None, help="Guardar resultados en este archivo")
+    args = parser.parse_args()
+
+    items = load_dataset(args.dataset)
+    print(f"{len(items)} imágenes de {len({label for label, _ in items})} personas")
+
+    backends = []
+    if not args.sin_deepface:
+        backends.append(DeepFaceBackend())
+    backends.append(OnnxBackend(args.modelo, args.hilos, quantize=False))
+    if args.int8:
+        backends.append(OnnxBackend(args.modelo, args.hilos, quantize=True))
+
+    results = {}
+    reference = None
+    for backend in backends:
+        print(f"\n== {backend.model_tag} ==")
+        vectors, latencies = embed_all(backend, items)
+        result = {
+            'latencia': latency_summary(latencies),
+            'identificacion': identification_metrics(items, vectors)
+        }
+        if isinstance(backend, DeepFaceBackend):
+            reference = vectors
+        elif reference is not None:
+            result['paridad_vs_deepface'] = parity(reference, vectors)
+        results[backend.model_tag] = result
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
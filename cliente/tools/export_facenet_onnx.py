@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Exporta el modelo Facenet512 de DeepFace a ONNX para el backend 'onnx'.
+
+Uso (desde cliente/):
+    python tools/export_facenet_onnx.py [--salida models/facenet512.onnx]
+
+Requiere deepface, tensorflow y tf2onnx solo en la máquina que exporta; los
+puestos del laboratorio solo necesitan onnxruntime.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embeddings import DEFAULT_ONNX_PATH, FACENET_INPUT_SIZE
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportar Facenet512 a ONNX")
+    parser.add_argument('--salida', default=DEFAULT_ONNX_PATH, help="Ruta del .onnx a generar")
+    parser.add_argument('--opset', type=int, default=13)
+    args = parser.parse_args()
+
+    import tensorflow as tf
+    import tf2onnx
+    import onnxruntime as ort
+    from deepface import DeepFace
+
+    client = DeepFace.build_model("Facenet512")
+    keras_model = getattr(client, 'model', client)
+
+    width, height = FACENET_INPUT_SIZE
+    spec = (tf.TensorSpec((None, height, width, 3), tf.float32, name="input"),)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.salida)), exist_ok=True)
+    tf2onnx.convert.from_keras(keras_model, input_signature=spec, opset=args.opset, output_path=args.salida)
+    print(f"Modelo exportado en {args.salida}")
+
+    # Verificación rápida contra el modelo Keras con una entrada aleatoria
+    sample = np.random.rand(1, height, width, 3).astype(np.float32)
+    expected = keras_model.predict(sample, verbose=0)[0]
+    session = ort.InferenceSession(args.salida, providers=['CPUExecutionProvider'])
+    got = session.run(None, {session.get_inputs()[0].name: sample})[0][0]
+    print(f"Diferencia máxima Keras vs ONNX: {np.max(np.abs(expected - got)):.2e}")
+
+
+if __name__ == '__main__':
+    main()
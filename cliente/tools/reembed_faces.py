@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Migración de embeddings a otro backend.
+
+Los embeddings no se pueden convertir entre backends, así que se recalculan
+desde imágenes de cada persona, en carpetas por email:
+
+- --rostros (por defecto rostros/): los recortes que guarda el cliente al
+  enrolar un rostro desde que existe esta herramienta. Se usan tal cual.
+- --fotos: fotos de origen para quienes se enrolaron antes (fotos de
+  credencial, capturas nuevas de la cámara...). A cada foto se le detecta
+  el rostro con MediaPipe, igual que en el cliente, y se usa ese recorte;
+  con --guardar-recortes el recorte queda además en --rostros para la
+  próxima migración.
+
+Las filas nuevas quedan en faces con el tag del backend destino; las
+anteriores se conservan salvo que se pase --reemplazar.
+
+El cliente solo compara embeddings del tag de su backend (más los de
+CLIENTE_EMBEDDINGS_COMPATIBLES), así que quien no se migre deja de ser
+reconocido al cambiar CLIENTE_EMBEDDINGS. Al final se listan esas personas
+y el comando termina con código 2 si quedó alguna.
+
+Los embeddings de ONNX y DeepFace no son intercambiables aunque el modelo
+sea el mismo: OnnxBackend no repite el paso de detección y alineación que
+DeepFace.represent aplica dentro del recorte, solo redimensiona y rellena.
+Los vectores son aproximadamente equivalentes, no iguales; por eso no se
+mezclan tags sin verificar la paridad con tools/benchmark_embeddings.py.
+
+Uso (desde cliente/):
+    python tools/reembed_faces.py --backend onnx [--int8] [--rostros rostros/] [--reemplazar]
+    python tools/reembed_faces.py --backend onnx --fotos fotos/ --guardar-recortes
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+import cv2
+import mysql.connector
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_config import DB_CONFIG
+from embeddings import create_backend
+from tools.benchmark_embeddings import load_dataset
+
+
+def face_detector():
+    """Detector de MediaPipe con la misma configuración que face_engine"""
+    import mediapipe as mp
+    return mp.solutions.face_detection.FaceDetection(min_detection_confidence=0.5)
+
+
+def crop_face(detector, img):
+    """
+    Recorte del primer rostro detectado, igual que al enrolar en el cliente
+
+    Returns:
+        Imagen BGR del rostro o None si no se detectó ninguno
+    """
+    results = detector.process(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+    if not results.detections:
+        return None
+    bbox = results.detections[0].location_data.relative_bounding_box
+    h, w = img.shape[:2]
+    x, y = max(0, int(bbox.xmin * w)), max(0, int(bbox.ymin * h))
+    crop = img[y:y + int(bbox.height * h), x:x + int(bbox.width * w)]
+    return crop if crop.size > 0 else None
+
+
+def load_images(rostros, fotos, guardar_recortes):
+    """
+    (email, ruta, imagen del rostro) de los recortes y de las fotos de origen
+    """
+    images = []
+    if rostros and os.path.isdir(rostros):
+        for email, path in load_dataset(rostros):
+            img = cv2.imread(path)
+            if img is not None:
+                images.append((email, path, img))
+
+    if fotos:
+        detector = face_detector()
+        for email, path in load_dataset(fotos):
+            img = cv2.imread(path)
+            crop = crop_face(detector, img) if img is not None else None
+            if crop is None:
+                print(f"  {path}: no se detectó un rostro")
+                continue
+            images.append((email, path, crop))
+            if guardar_recortes and rostros:
+                folder = os.path.join(rostros, email)
+                os.makedirs(folder, exist_ok=True)
+                name = f"{datetime.now():%Y%m%d_%H%M%S}_{os.path.splitext(os.path.basename(path))[0]}.jpg"
+                cv2.imwrite(os.path.join(folder, name), crop)
+    return images
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-generar embeddings con otro backend")
+    parser.add_argument('--backend', default='onnx', choices=['deepface', 'onnx'])
+    parser.add_argument('--int8', action='store_true', help="Backend ONNX cuantizado")
+    parser.add_argument('--rostros', default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'rostros'))
+    parser.add_argument('--fotos', help="Fotos de origen por email (se les detecta el rostro)")
+    parser.add_argument('--guardar-recortes', action='store_true', help="Guardar en --rostros los recortes de --fotos")
+    parser.add_argument('--reemplazar', action='store_true', help="Borrar embeddings de otros modelos de los emails migrados")
+    args = parser.parse_args()
+
+    options = {'quantize': args.int8} if args.backend == 'onnx' else {}
+    backend = create_backend(args.backend, **options)
+    backend.load()
+
+    images = load_images(args.rostros, args.fotos, args.guardar_recortes)
+    if not images:
+        print(f"No hay imágenes en {args.rostros}" + (f" ni en {args.fotos}" if args.fotos else ""))
+        return
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT email, CONCAT(nombre, ' ', apellido) FROM usuarios_permitidos")
+    names = dict(cursor.fetchall())
+
+    rows = []
+    for email, path, img in images:
+        try:
+            embedding = backend.represent(img)
+        except Exception as e:
+            print(f"  {path}: {e}")
+            continue
+        rows.append((names.get(email, email), email, json.dumps(embedding.tolist()), backend.model_tag))
+
+    emails = sorted({row[1] for row in rows})
+    try:
+        # Una migración repetida no duplica: se reemplazan las filas del tag destino
+        for email in emails:
+            cursor.execute("DELETE FROM faces WHERE email = %s AND model = %s", (email, backend.model_tag))
+            if args.reemplazar:
+                cursor.execute("DELETE FROM faces WHERE email = %s AND model <> %s", (email, backend.model_tag))
+
+        cursor.executemany("""
+            INSERT INTO faces (name, email, embedding, model)
+            VALUES (%s, %s, %s, %s)
+        """, rows)
+        conn.commit()
+
+        # Enrolados con otro backend que siguen sin embeddings del destino
+        cursor.execute("""
+            SELECT DISTINCT email FROM faces
+            WHERE model <> %s
+              AND email NOT IN (SELECT email FROM faces WHERE model = %s)
+            ORDER BY email
+        """, (backend.model_tag, backend.model_tag))
+        pendientes = [email for (email,) in cursor.fetchall()]
+    except mysql.connector.Error as e:
+        conn.rollback()
+        print(f"Error en la migración: {e}")
+        sys.exit(1)
+    finally:
+        cursor.close()
+        conn.close()
+
+    print(f"{len(rows)} embeddings '{backend.model_tag}' para {len(emails)} personas")
+
+    if pendientes:
+        print(f"{len(pendientes)} personas sin imágenes para '{backend.model_tag}'; "
+              f"no se reconocerán con ese backend hasta migrarlas con --fotos:")
+        for email in pendientes:
+            print(f"  {email}")
+        sys.exit(2)
+
+
+if __name__ == '__main__':
+    main()
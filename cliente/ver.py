@@ -1,4 +1,9 @@
 # -*- coding: utf-8 -*-
+import time
+
+# Referencia para medir el arranque (primer frame / primer reconocimiento)
+STARTUP_T0 = time.perf_counter()
+
 import kivy
 from kivy.app import App
 from kivy.uix.boxlayout import BoxLayout
@@ -14,13 +19,10 @@ from kivy.uix.popup import Popup
 from kivy.uix.textinput import TextInput
 
 import cv2
-import mediapipe as mp
 import numpy as np
 import mysql.connector
-from deepface import DeepFace
-from scipy.spatial.distance import cosine
-import time
 import json
+import os
 from datetime import datetime
 import threading
 import sys
@@ -28,6 +30,11 @@ import requests
 import urllib3
 from pyzbar.pyzbar import decode
 
+from snapshot import LocalSnapshot
+
+# MediaPipe y el backend de embeddings se cargan bajo demanda (ver face_engine)
+import face_engine
+
 # Deshabilitar warnings SSL si es necesario
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -35,12 +42,32 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 Window.size = (800, 600)
 Window.resizable = False
 
-# Configuración de la base de datos MySQL
-DB_CONFIG = {
-    'host': '',
-    'user': '',
-    'password': '',
-    'database': ''
+# Configuración de la base de datos MySQL (compartida con tools/)
+from db_config import DB_CONFIG
+
+# Acceso a datos compartido con las APIs (back-end/comun)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'back-end'))
+from comun import get_pool, repositorio
+
+# Configuración de arranque del cliente
+CLIENT_CONFIG = {
+    # Modo con el que arranca la interfaz: 'facial' o 'qr'
+    'initial_mode': os.getenv('CLIENTE_MODO_INICIAL', 'facial'),
+    # Precalentar el stack facial en segundo plano aunque se arranque en QR
+    'preload_face_stack': os.getenv('CLIENTE_PRECARGAR_FACIAL', '1') == '1',
+    # Segundos de espera tras mostrar la UI antes de precalentar en modo QR
+    'preload_delay': 2.0,
+    # Segundos entre refrescos incrementales del snapshot local
+    'snapshot_refresh_interval': 30,
+    # Registros que no se pudieron escribir quedan aquí hasta reconectar
+    'journal_path': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'registros_pendientes.jsonl'),
+    # Recortes de los rostros enrolados, para poder re-generar embeddings
+    # si se cambia de backend (tools/reembed_faces.py)
+    'faces_dir': os.getenv('CLIENTE_ROSTROS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rostros')),
+    # Tags de modelo que se comparan contra el backend activo. Por defecto solo
+    # el propio; agregar otros únicamente si la paridad fue verificada con
+    # tools/benchmark_embeddings.py
+    'compatible_model_tags': [t for t in os.getenv('CLIENTE_EMBEDDINGS_COMPATIBLES', '').split(',') if t]
 }
 
 # Configuracion de la API para QR
@@ -73,9 +100,22 @@ COLORS = {
     'qr_mode': '#16a085'
 }
 
-# Inicializar MediaPipe Face Detection
-mp_face_detection = mp.solutions.face_detection
-face_detection = mp_face_detection.FaceDetection(min_detection_confidence=0.5)
+def log_startup_event(event):
+    """Imprime el tiempo transcurrido desde el inicio del proceso"""
+    print(f"[inicio] {event}: {time.perf_counter() - STARTUP_T0:.2f}s")
+
+def accepted_model_tags():
+    """Tags de embeddings comparables con el backend activo"""
+    tags = [face_engine.get_backend().model_tag]
+    tags.extend(t for t in CLIENT_CONFIG['compatible_model_tags'] if t not in tags)
+    return tags
+
+def cosine_distance(a, b):
+    """Distancia coseno entre dos vectores (equivalente a scipy.spatial.distance.cosine)"""
+    denom = np.linalg.norm(a) * np.linalg.norm(b)
+    if denom == 0:
+        return 1.0
+    return 1.0 - float(np.dot(a, b)) / denom
 
 class BackgroundLayout(BoxLayout):
     """BoxLayout con fondo personalizado"""
@@ -98,11 +138,12 @@ class DatabaseManager:
     
     @staticmethod
     def get_db_connection():
-        """Obtiene una conexión a la base de datos MySQL"""
+        """Obtiene una conexión del pool compartido; close() la devuelve al pool"""
         try:
-            conn = mysql.connector.connect(**DB_CONFIG)
-            return conn
-        except mysql.connector.Error as e:
+            # Filas como tuplas, igual que un cursor de mysql.connector
+            pool = get_pool('cliente', backend='mysql-connector', settings=DB_CONFIG, dict_rows=False)
+            return pool.acquire()
+        except Exception as e:
             print(f"Error conectando a MySQL: {e}")
             return None
 
@@ -121,10 +162,23 @@ class DatabaseManager:
                     name VARCHAR(100) NOT NULL,
                     email VARCHAR(100) NOT NULL,
                     embedding JSON NOT NULL,
+                    model VARCHAR(50) NOT NULL DEFAULT 'deepface-facenet512',
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     INDEX idx_email (email)
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
             """)
+            
+            # Tablas creadas antes de existir los backends: todos sus
+            # embeddings vienen de DeepFace
+            cursor.execute("""
+                SELECT COUNT(*) FROM information_schema.columns
+                WHERE table_schema = DATABASE() AND table_name = 'faces' AND column_name = 'model'
+            """)
+            if cursor.fetchone()[0] == 0:
+                cursor.execute("""
+                    ALTER TABLE faces
+                    ADD COLUMN model VARCHAR(50) NOT NULL DEFAULT 'deepface-facenet512' AFTER embedding
+                """)
             conn.commit()
             return True
         except mysql.connector.Error as e:
@@ -137,21 +191,21 @@ class DatabaseManager:
 
     @staticmethod
     def get_face_embedding(face_img):
-        """Obtiene el embedding facial usando DeepFace"""
+        """Obtiene el embedding facial con el backend configurado"""
         try:
-            embedding_obj = DeepFace.represent(face_img, model_name="Facenet512")
-            embedding = np.array(embedding_obj[0]['embedding'])
-            return embedding
+            return face_engine.represent(face_img)
         except Exception as e:
             print(f"Error al obtener embedding: {e}")
             return None
 
     @staticmethod
-    def save_face(name, email, embedding):
+    def save_face(name, email, embedding, model=None):
         """Guarda un rostro en la base de datos MySQL"""
         if embedding is None:
             return False
         
+        model = model or face_engine.get_backend().model_tag
+        
         conn = DatabaseManager.get_db_connection()
         if conn is None:
             return False
@@ -162,9 +216,9 @@ class DatabaseManager:
             embedding_json = json.dumps(embedding_list)
             
             cursor.execute("""
-                INSERT INTO faces (name, email, embedding) 
-                VALUES (%s, %s, %s)
-            """, (name, email, embedding_json))
+                INSERT INTO faces (name, email, embedding, model) 
+                VALUES (%s, %s, %s, %s)
+            """, (name, email, embedding_json, model))
             
             conn.commit()
             return True
@@ -188,7 +242,9 @@ class DatabaseManager:
         
         try:
             cursor = conn.cursor()
-            cursor.execute("SELECT name, email, embedding FROM faces")
+            tags = accepted_model_tags()
+            placeholders = ", ".join(["%s"] * len(tags))
+            cursor.execute(f"SELECT name, email, embedding FROM faces WHERE model IN ({placeholders})", tags)
             known_faces = cursor.fetchall()
             
             if not known_faces:
@@ -206,7 +262,7 @@ class DatabaseManager:
                     if stored_embedding.shape[0] != embedding.shape[0]:
                         continue
                     
-                    dist = cosine(embedding, stored_embedding)
+                    dist = cosine_distance(embedding, stored_embedding)
                     if dist < min_dist:
                         min_dist = dist
                         identity = name
@@ -236,103 +292,63 @@ class DatabaseManager:
             return {"found": False}
         
         try:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, nombre, apellido, email 
-                FROM usuarios_permitidos 
-                WHERE email = %s AND activo = 1
-            """, (email,))
-            
-            user = cursor.fetchone()
+            cursor = conn.dict_cursor()
+            user = repositorio.find_helper(cursor, email)
+            cursor.close()
             
             if user:
-                return {
-                    "id": user[0],
-                    "nombre": user[1],
-                    "apellido": user[2],
-                    "email": user[3],
-                    "found": True
-                }
+                return dict(user, found=True)
             else:
                 return {"found": False}
         except mysql.connector.Error as e:
             print(f"Error al buscar usuario: {e}")
             return {"found": False}
         finally:
-            if conn.is_connected():
-                cursor.close()
-                conn.close()
+            conn.close()
 
     @staticmethod
-    def register_attendance(nombre, apellido, email, metodo='facial'):
-        """Registra la entrada o salida en la tabla registros de MySQL"""
+    def register_attendance(nombre, apellido, email, metodo='facial', tipo=None, now=None):
+        """
+        Registra la entrada o salida en registros y actualiza estado_usuarios
+        
+        Si el snapshot local no decidió el tipo, lo decide estado_usuarios
+        (misma lógica que las APIs de ayudantes y lector).
+        """
         conn = DatabaseManager.get_db_connection()
         if conn is None:
-            return {"success": False, "message": "Error de conexión a la base de datos"}
+            return {
+                "success": False,
+                "message": "Error de conexión a la base de datos",
+                "connection_error": True
+            }
         
         try:
-            cursor = conn.cursor()
-            
-            now = datetime.now()
-            fecha = now.strftime("%Y-%m-%d")
-            hora = now.strftime("%H:%M:%S")
-            dia = now.strftime("%A")
-            
-            # Determinar tipo de registro
-            tipo = DatabaseManager.determinar_tipo_registro(email)
-            
-            cursor.execute("""
-                INSERT INTO registros (fecha, hora, dia, nombre, apellido, email, metodo, tipo)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """, (fecha, hora, dia, nombre, apellido, email, metodo, tipo))
-            
+            conn.start_transaction()
+            cursor = conn.dict_cursor()
+            persona = {"nombre": nombre, "apellido": apellido, "email": email}
+            escaneo = repositorio.register_helper_scan(
+                cursor, persona, now or datetime.now(), tipo=tipo, extra={"metodo": metodo}
+            )
             conn.commit()
-            registro_id = cursor.lastrowid
+            cursor.close()
             
             return {
                 "success": True,
                 "message": f"Registro exitoso: {nombre} {apellido}",
-                "id": registro_id,
-                "fecha": fecha,
-                "hora": hora,
-                "tipo": tipo
+                "id": escaneo.registro_id,
+                "fecha": escaneo.fecha.strftime("%Y-%m-%d"),
+                "hora": escaneo.hora.strftime("%H:%M:%S"),
+                "tipo": escaneo.tipo
             }
         except mysql.connector.Error as e:
             print(f"Error al registrar asistencia: {e}")
             return {
                 "success": False,
-                "message": f"Error: {str(e)}"
+                "message": f"Error: {str(e)}",
+                "connection_error": isinstance(e, (mysql.connector.InterfaceError, mysql.connector.OperationalError))
             }
         finally:
-            if conn.is_connected():
-                cursor.close()
-                conn.close()
-
-    @staticmethod
-    def determinar_tipo_registro(email):
-        """Determina si el registro es de entrada o salida"""
-        conn = DatabaseManager.get_db_connection()
-        if conn is None:
-            return "Entrada"
-        
-        try:
-            cursor = conn.cursor()
-            today = datetime.now().strftime("%Y-%m-%d")
-            
-            cursor.execute("""
-                SELECT COUNT(*) FROM registros 
-                WHERE email = %s AND fecha = %s
-            """, (email, today))
-            
-            count = cursor.fetchone()[0]
-            return "Entrada" if count % 2 == 0 else "Salida"
-        except mysql.connector.Error as e:
-            print(f"Error determinando tipo de registro: {e}")
-            return "Entrada"
-        finally:
-            if conn.is_connected():
-                cursor.close()
-                conn.close()
+            conn.close()
 
 class RegisterFacePopup(Popup):
     """Popup para registrar nuevos rostros"""
@@ -419,6 +435,19 @@ class UnifiedAccessSystem(BackgroundLayout):
         self.access_display_duration = 3
         self.recognized_person = None
         
+        # Buffers de frame preasignados (se crean con el primer frame)
+        self.frame_raw = None
+        self.frame = None
+        self.display_frame = None
+        self.overlay = None
+        self.rgb_frame = None
+        self.gray_frame = None
+        self.texture = None
+        
+        # Métricas de arranque
+        self.first_frame_logged = False
+        self.first_recognition_logged = False
+        
         # Verificar conexión API para modo QR
         self.api_connected = self.check_api_connection()
         
@@ -426,13 +455,59 @@ class UnifiedAccessSystem(BackgroundLayout):
         if not DatabaseManager.init_faces_table():
             print("Error: No se pudo inicializar la tabla de rostros")
         
+        # Snapshot local para reconocer sin ir a MySQL en cada evento
+        self.snapshot = LocalSnapshot(
+            DatabaseManager.get_db_connection,
+            CLIENT_CONFIG['journal_path'],
+            accepted_model_tags()
+        )
+        threading.Thread(target=self.load_snapshot, daemon=True).start()
+        
         # Configurar interfaz
         self.setup_ui()
         
+        if CLIENT_CONFIG['initial_mode'] == 'qr':
+            self.toggle_mode(None)
+        
         # Iniciar loop de cámara
         Clock.schedule_interval(self.update_camera, 1.0 / 15.0)
         
-        print("Sistema unificado iniciado en modo facial")
+        # Cargar el stack facial recién con la UI visible
+        if self.current_mode == 'facial':
+            Clock.schedule_once(lambda dt: self.ensure_face_stack(), 0)
+        elif CLIENT_CONFIG['preload_face_stack']:
+            Clock.schedule_once(lambda dt: self.ensure_face_stack(), CLIENT_CONFIG['preload_delay'])
+        
+        log_startup_event("UI lista")
+        print(f"Sistema unificado iniciado en modo {self.current_mode}")
+    
+    def load_snapshot(self):
+        """Carga inicial del snapshot local y refresco periódico"""
+        if self.snapshot.load():
+            log_startup_event(f"Snapshot local cargado ({len(self.snapshot.face_names)} rostros)")
+        else:
+            print("Advertencia: no se pudo cargar el snapshot local, se reintentará")
+        self.snapshot.start_auto_refresh(CLIENT_CONFIG['snapshot_refresh_interval'])
+    
+    def ensure_face_stack(self):
+        """Inicia la carga en segundo plano del stack facial si hace falta"""
+        if face_engine.is_ready() or face_engine.is_loading():
+            return
+        
+        def on_done(ok):
+            Clock.schedule_once(lambda dt: self.on_face_stack_loaded(ok), 0)
+        
+        face_engine.load_async(on_done)
+    
+    def on_face_stack_loaded(self, ok):
+        """Actualiza la UI cuando termina la carga del stack facial"""
+        log_startup_event("Stack facial listo" if ok else "Stack facial con error")
+        if self.current_mode == 'facial' and self.access_status is None:
+            if ok:
+                self.reset_status(0)
+            else:
+                self.status_label.text = "Error Modelo Facial"
+                self.status_label.color = get_color_from_hex(COLORS['error'])
     
     def check_api_connection(self):
         """Verificar conexión con la API para modo QR"""
@@ -632,6 +707,9 @@ class UnifiedAccessSystem(BackgroundLayout):
             self.status_label.text = "Reconocimiento Facial Activo"
             self.status_label.color = get_color_from_hex(COLORS['success'])
             self.info_label.text = "Listo para reconocer rostros\n\nApunte la cámara hacia su rostro\npara registrar asistencia"
+            
+            # Primer ingreso al modo facial: cargar el stack si no se precalentó
+            self.ensure_face_stack()
         
         # Resetear estados
         self.analyzing = False
@@ -640,13 +718,38 @@ class UnifiedAccessSystem(BackgroundLayout):
         
         print(f"Modo cambiado a: {self.current_mode}")
     
+    def allocate_frame_buffers(self, shape):
+        """Crea los buffers y la textura reutilizados en cada tick"""
+        h, w = shape[:2]
+        self.frame = np.empty(shape, dtype=np.uint8)
+        self.display_frame = np.empty(shape, dtype=np.uint8)
+        self.overlay = np.empty(shape, dtype=np.uint8)
+        self.rgb_frame = np.empty(shape, dtype=np.uint8)
+        self.gray_frame = np.empty((h, w), dtype=np.uint8)
+        
+        # OpenCV entrega BGR con el origen arriba; la textura se invierte una
+        # sola vez en lugar de voltear cada frame
+        self.texture = Texture.create(size=(w, h), colorfmt='bgr')
+        self.texture.flip_vertical()
+        self.camera_image.texture = self.texture
+    
     def update_camera(self, dt):
         """Actualizar frame de cámara y procesar según el modo"""
-        ret, frame = self.capture.read()
+        # read() reutiliza frame_raw cuando ya tiene el tamaño correcto
+        ret, raw = self.capture.read(self.frame_raw)
         
         if ret:
-            frame = cv2.flip(frame, 1)  # Espejo horizontal
-            display_frame = frame.copy()
+            self.frame_raw = raw
+            if self.frame is None or self.frame.shape != raw.shape:
+                self.allocate_frame_buffers(raw.shape)
+            
+            if not self.first_frame_logged:
+                self.first_frame_logged = True
+                log_startup_event("Primer frame")
+            
+            frame = cv2.flip(raw, 1, dst=self.frame)  # Espejo horizontal
+            display_frame = self.display_frame
+            np.copyto(display_frame, frame)
             
             current_time = time.time()
             
@@ -668,7 +771,14 @@ class UnifiedAccessSystem(BackgroundLayout):
     
     def process_facial_recognition(self, frame, display_frame, current_time):
         """Procesar reconocimiento facial"""
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        face_detection = face_engine.get_face_detection()
+        if face_detection is None:
+            # Reintenta una carga fallida cuando vence el intervalo
+            self.ensure_face_stack()
+            cv2.putText(display_frame, "Cargando modelo facial...", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+            return
+        
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self.rgb_frame)
         results = face_detection.process(rgb_frame)
         
         if results.detections:
@@ -690,7 +800,9 @@ class UnifiedAccessSystem(BackgroundLayout):
                 elif self.analyzing:
                     face_img = frame[y:y+h, x:x+w]
                     if face_img.size > 0:
-                        self.analysis_frames.append(face_img)
+                        # El buffer del frame se reutiliza, así que el recorte
+                        # se copia; solo se analiza el último
+                        self.analysis_frames = [face_img.copy()]
                     
                     progress = min(int((current_time - self.analysis_start_time) / self.analysis_duration * 100), 100)
                     cv2.putText(display_frame, f"Analizando: {progress}%", (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 0), 2)
@@ -710,21 +822,37 @@ class UnifiedAccessSystem(BackgroundLayout):
                 embedding = DatabaseManager.get_face_embedding(best_face)
                 
                 if embedding is not None:
-                    identity, email = DatabaseManager.recognize_face(embedding)
+                    if self.snapshot.loaded:
+                        identity, email = self.snapshot.recognize(embedding)
+                    else:
+                        identity, email = DatabaseManager.recognize_face(embedding)
+                    
+                    if not self.first_recognition_logged:
+                        self.first_recognition_logged = True
+                        log_startup_event("Primer reconocimiento")
                     
                     if identity != "Desconocido" and identity != "Error" and email:
                         if email in self.last_recognition_time and current_time - self.last_recognition_time[email] < self.cooldown_time:
                             return
                         
-                        user_data = DatabaseManager.get_user_data_from_email(email)
+                        if self.snapshot.loaded:
+                            user_data = self.snapshot.get_user(email)
+                        else:
+                            user_data = DatabaseManager.get_user_data_from_email(email)
                         
                         if user_data["found"]:
-                            registro = DatabaseManager.register_attendance(
-                                user_data["nombre"], 
-                                user_data["apellido"], 
-                                user_data["email"],
-                                'facial'
-                            )
+                            if self.snapshot.loaded:
+                                # Decisión Entrada/Salida local: una sola escritura
+                                registro = self.snapshot.record_attendance(
+                                    user_data, 'facial', DatabaseManager.register_attendance
+                                )
+                            else:
+                                registro = DatabaseManager.register_attendance(
+                                    user_data["nombre"], 
+                                    user_data["apellido"], 
+                                    user_data["email"],
+                                    'facial'
+                                )
                             
                             Clock.schedule_once(lambda dt: self.show_access_result(registro, identity, current_time), 0)
                             self.last_recognition_time[email] = current_time
@@ -752,7 +880,7 @@ class UnifiedAccessSystem(BackgroundLayout):
     
     def process_qr_detection(self, frame, display_frame, current_time):
         """Procesar detección de QR"""
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.gray_frame)
         qr_codes = decode(gray)
         
         for qr in qr_codes:
@@ -903,7 +1031,8 @@ class UnifiedAccessSystem(BackgroundLayout):
     
     def draw_access_result(self, display_frame, current_time):
         """Dibujar resultado de acceso en el frame"""
-        overlay = display_frame.copy()
+        overlay = self.overlay
+        np.copyto(overlay, display_frame)
         
         if self.access_status["success"]:
             if self.current_mode == 'facial':
@@ -940,10 +1069,9 @@ class UnifiedAccessSystem(BackgroundLayout):
     
     def update_camera_display(self, frame):
         """Actualizar display de la cámara"""
-        buf = cv2.flip(frame, 0).tobytes()
-        texture = Texture.create(size=(frame.shape[1], frame.shape[0]), colorfmt='bgr')
-        texture.blit_buffer(buf, colorfmt='bgr', bufferfmt='ubyte')
-        self.camera_image.texture = texture
+        # Subir el buffer BGR tal cual, sin copias intermedias ni texturas nuevas
+        self.texture.blit_buffer(memoryview(frame).cast('B'), colorfmt='bgr', bufferfmt='ubyte')
+        self.camera_image.canvas.ask_update()
     
     def show_access_result(self, result, person_name, scan_time):
         """Mostrar resultado de acceso en la UI"""
@@ -1040,6 +1168,12 @@ class UnifiedAccessSystem(BackgroundLayout):
         if self.current_mode != 'facial':
             return
         
+        face_detection = face_engine.get_face_detection()
+        if face_detection is None:
+            self.ensure_face_stack()
+            self.show_message("Espere", "El modelo facial aún se está cargando")
+            return
+        
         ret, frame = self.capture.read()
         if ret:
             frame = cv2.flip(frame, 1)
@@ -1076,7 +1210,11 @@ class UnifiedAccessSystem(BackgroundLayout):
                         # Guardar rostro
                         nombre_completo = f"{user_data['nombre']} {user_data['apellido']}"
                         
+                        self.save_face_crop(email, face_img)
+                        
                         if DatabaseManager.save_face(nombre_completo, email, embedding):
+                            # Traer el rostro nuevo al snapshot de inmediato
+                            self.snapshot.refresh()
                             Clock.schedule_once(
                                 lambda dt: self.show_message(
                                     "Éxito", 
@@ -1107,6 +1245,15 @@ class UnifiedAccessSystem(BackgroundLayout):
         thread.daemon = True
         thread.start()
     
+    def save_face_crop(self, email, face_img):
+        """Guarda el recorte enrolado para futuras migraciones de embeddings"""
+        try:
+            folder = os.path.join(CLIENT_CONFIG['faces_dir'], email)
+            os.makedirs(folder, exist_ok=True)
+            cv2.imwrite(os.path.join(folder, datetime.now().strftime("%Y%m%d_%H%M%S") + ".jpg"), face_img)
+        except Exception as e:
+            print(f"No se pudo guardar el recorte del rostro: {e}")
+    
     def show_message(self, title, message):
         """Mostrar mensaje popup"""
         content = BackgroundLayout(orientation='vertical', padding=10)
@@ -1137,6 +1284,7 @@ class UnifiedAccessSystem(BackgroundLayout):
     def quit_app(self, instance):
         """Cerrar aplicación"""
         print("Cerrando sistema unificado...")
+        self.snapshot.stop()
         if self.capture:
             self.capture.release()
         
@@ -51,6 +51,8 @@ export default function RegistrosScreen() {
   });
   const [datePickerMode, setDatePickerMode] = useState<'start' | 'end'>('start');
   const [showFilterModal, setShowFilterModal] = useState(false);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   // Cargar datos iniciales
   useEffect(() => {
@@ -62,9 +64,13 @@ export default function RegistrosScreen() {
     filterRegistros();
   }, [searchText, registros]);
 
-  // Función para cargar la lista de registros
-  const loadRegistros = async () => {
-    setLoading(true);
+  // Función para cargar la lista de registros (cursor = siguiente página)
+  const loadRegistros = async (cursor: string | null = null) => {
+    if (cursor) {
+      setLoadingMore(true);
+    } else {
+      setLoading(true);
+    }
     setError(null);
   
     try {
@@ -85,6 +91,10 @@ export default function RegistrosScreen() {
         endpoint = `${API_BASE}/registros_entre_fechas?inicio=${formatDate(dateFilter.startDate)}&fin=${formatDate(dateFilter.endDate)}`;
       }
     
+      if (cursor) {
+        endpoint += `${endpoint.includes('?') ? '&' : '?'}cursor=${encodeURIComponent(cursor)}`;
+      }
+    
       const response = await fetch(endpoint);
       if (!response.ok) {
         throw new Error('Error al cargar registros');
@@ -95,8 +105,11 @@ export default function RegistrosScreen() {
     
     // ✅ CORRECCIÓN: Acceder a result.data en lugar de result directamente
       if (result.status === 'success' && Array.isArray(result.data)) {
-        setRegistros(result.data);
-        setFilteredRegistros(result.data);
+        // Las páginas siguientes se agregan a las ya cargadas
+        const data = cursor ? [...registros, ...result.data] : result.data;
+        setRegistros(data);
+        setFilteredRegistros(data);
+        setNextCursor(result.pagination?.next_cursor ?? null);
       } else {
         console.error('Estructura de datos inesperada:', result);
         throw new Error('Formato de datos inesperado');
@@ -106,9 +119,17 @@ export default function RegistrosScreen() {
       setError(`No se pudieron cargar los registros: ${error.message}`);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
       setRefreshing(false);
     }
   };
+
+  // Cargar la siguiente página al llegar al final de la lista
+  const loadMore = () => {
+    if (nextCursor && !loadingMore && !loading) {
+      loadRegistros(nextCursor);
+    }
+  };
   // Filtrar registros según búsqueda
   const filterRegistros = () => {
     if (!searchText.trim()) {
@@ -259,7 +280,7 @@ export default function RegistrosScreen() {
     return (
       <View style={styles.centerContainer}>
         <Text style={styles.errorText}>{error}</Text>
-        <TouchableOpacity style={styles.retryButton} onPress={loadRegistros}>
+        <TouchableOpacity style={styles.retryButton} onPress={() => loadRegistros()}>
           <Text style={styles.retryButtonText}>Reintentar</Text>
         </TouchableOpacity>
       </View>
@@ -324,6 +345,9 @@ export default function RegistrosScreen() {
         keyExtractor={item => item.fecha}
         contentContainerStyle={styles.listContainer}
         refreshControl={<RefreshControl refreshing={refreshing} onRefresh={onRefresh} />}
+        onEndReached={loadMore}
+        onEndReachedThreshold={0.5}
+        ListFooterComponent={loadingMore ? <ActivityIndicator size="small" color="#0066CC" /> : null}
         ListEmptyComponent={
           <View style={styles.emptyContainer}>
             <Ionicons name="document-text" size={60} color="#ccc" />
@@ -6,12 +6,13 @@ import os
 
 # Agregar el directorio de ayudantes al path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../back-end/ayudantes'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../back-end'))
 
 from utils.auth import hash_password
 from utils.datetime_utils import format_hora, convert_to_time, get_current_datetime
 from utils.json_encoder import CustomJSONEncoder
 from config import Config
-from datetime import time, timedelta, datetime
+from datetime import date, time, timedelta, datetime
 import json
 
 class TestAuthUtils(unittest.TestCase):
@@ -43,6 +44,97 @@ class TestAuthUtils(unittest.TestCase):
         self.assertIsNotNone(result)
         self.assertIsInstance(result, str)
 
+class TestTokenRequired(unittest.TestCase):
+    """Tests de la caché de principales de token_required"""
+
+    def setUp(self):
+        from flask import Flask
+        from comun import SQLiteDatabase, create_pool
+        import utils.auth as auth
+
+        self.auth = auth
+        self.db = SQLiteDatabase(fixtures=True)
+        self.pool = create_pool(backend='sqlite', settings=self.db.settings, size=2)
+        patches = [
+            patch.object(auth, 'get_connection', self.pool.acquire),
+            patch.object(Config, 'JWT_SECRET', 'test-secret'),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        auth.invalidar_principal()
+        # Las revocaciones sobreviven a invalidar_principal(): un test que
+        # revoca al admin no debe rechazar los tokens del siguiente
+        self.addCleanup(auth._revocados.clear)
+        auth.get_auth_stats(reset=True)
+
+        app = Flask(__name__)
+
+        @app.route('/protegida')
+        @auth.token_required
+        def protegida(current_user):
+            return {'email': current_user['email']}
+
+        @app.route('/rol')
+        @auth.token_required
+        def rol(current_user):
+            return {'role': current_user['role']}
+
+        self.client = app.test_client()
+        self.admin = self.db.execute("SELECT * FROM admin_users WHERE email = 'admin@uai.cl'")[0]
+
+    def tearDown(self):
+        self.db.close()
+
+    def get(self, token):
+        return self.client.get('/protegida', headers={'Authorization': f'Bearer {token}'})
+
+    def test_cached_after_first_request(self):
+        """Test que solo la primera petición de un token lee admin_users"""
+        token = self.auth.crear_token(self.admin, claims=False)
+        for _ in range(3):
+            response = self.get(token)
+            self.assertEqual(response.get_json(), {'email': 'admin@uai.cl'})
+
+        stats = self.auth.get_auth_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['db_lookups']), (2, 1, 1))
+        self.assertAlmostEqual(stats['hit_rate'], 2 / 3, places=3)
+
+    def test_claims_skip_lookup_for_known_user(self):
+        """Test que un token nuevo con claims de un usuario ya validado no lee la base"""
+        self.get(self.auth.crear_token(self.admin))
+        self.assertEqual(self.get(self.auth.crear_token(self.admin)).status_code, 200)
+        self.assertEqual(self.auth.get_auth_stats()['db_lookups'], 1)
+
+    def test_old_claims_after_role_change(self):
+        """Test que un token con el rol anterior no se acepta por sus claims"""
+        anterior = self.auth.crear_token(self.admin)
+        self.db.execute("UPDATE admin_users SET role = 'lector' WHERE id = %s", (self.admin['id'],))
+
+        nuevo = self.auth.crear_token(dict(self.admin, role='lector'))
+        rol = lambda token: self.client.get('/rol', headers={'Authorization': f'Bearer {token}'}).get_json()
+        self.assertEqual(rol(nuevo), {'role': 'lector'})
+        # Sin invalidar_principal (cambio hecho en la base): los claims no
+        # coinciden con los leídos de admin_users y se vuelve a consultar
+        self.assertEqual(rol(anterior), {'role': 'lector'})
+        self.assertEqual(self.auth.get_auth_stats()['db_lookups'], 2)
+
+    def test_invalidation_revokes_tokens(self):
+        """Test que invalidar un usuario eliminado rechaza sus tokens"""
+        token = self.auth.crear_token(self.admin)
+        self.assertEqual(self.get(token).status_code, 200)
+
+        self.db.execute("DELETE FROM admin_users WHERE id = %s", (self.admin['id'],))
+        self.auth.invalidar_principal(self.admin['id'])
+        self.assertEqual(self.get(token).status_code, 401)
+
+    def test_expired_token(self):
+        """Test que un token vencido se rechaza"""
+        token = self.auth.crear_token(self.admin, horas=-1)
+        response = self.get(token)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.get_json(), {'error': 'Token has expired!'})
+
 class TestDateTimeUtils(unittest.TestCase):
     """Tests para utilidades de fecha y hora"""
     
@@ -130,6 +222,48 @@ class TestJSONEncoder(unittest.TestCase):
         with self.assertRaises(TypeError):
             encoder.default(object())
 
+class TestColumnarExport(unittest.TestCase):
+    """Tests para la conversión de registros a Arrow"""
+    
+    def setUp(self):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            self.skipTest("pyarrow no instalado")
+    
+    def test_registros_batch_types(self):
+        """Test tipos de columna: date32, segundos int32 y tipo como diccionario"""
+        import pyarrow as pa
+        from datetime import date
+        from utils.columnar import rows_to_batch
+        
+        batch = rows_to_batch('registros', [
+            (1, date(2024, 3, 15), timedelta(hours=8, minutes=30), 'viernes', 'Ana', 'Soto', 'ana@uai.cl', 'Entrada', None),
+            (2, '2024-03-15', '17:00:05', 'viernes', 'Ana', 'Soto', 'ana@uai.cl', 'Salida', None)
+        ])
+        
+        self.assertEqual(batch.schema.field('fecha').type, pa.date32())
+        self.assertEqual(batch.schema.field('hora').type, pa.int32())
+        self.assertTrue(pa.types.is_dictionary(batch.schema.field('tipo').type))
+        self.assertEqual(batch.column('hora').to_pylist(), [30600, 61205])
+        self.assertEqual(batch.column('tipo').to_pylist(), ['Entrada', 'Salida'])
+    
+    def test_write_partitions_by_month(self):
+        """Test que cada mes queda en su propio directorio"""
+        import tempfile
+        from datetime import date
+        from utils.columnar import rows_to_batch
+        from tasks.columnar_export import write_partitions
+        
+        batch = rows_to_batch('registros', [
+            (1, date(2024, 2, 29), timedelta(hours=8), 'jueves', 'A', 'B', 'a@uai.cl', 'Entrada', None),
+            (2, date(2024, 3, 1), timedelta(hours=9), 'viernes', 'A', 'B', 'a@uai.cl', 'Entrada', None)
+        ])
+        
+        with tempfile.TemporaryDirectory() as destino:
+            self.assertEqual(write_partitions(destino, 'registros', batch), 2)
+            self.assertEqual(sorted(os.listdir(os.path.join(destino, 'registros'))), ['mes=2024-02', 'mes=2024-03'])
+
 class TestDatabaseConfig(unittest.TestCase):
     """Tests para configuración de base de datos"""
     
@@ -158,6 +292,516 @@ class TestUtilityFunctions(unittest.TestCase):
         self.assertIn('friday', Config.DIAS_TRADUCCION)
         self.assertEqual(Config.DIAS_TRADUCCION['monday'], 'lunes')
 
+    def test_healthcheck_url_follows_tls_settings(self):
+        """Test que la sonda usa HTTP sin TLS en gunicorn y el puerto de BIND"""
+        from healthcheck import health_url
+        with patch.dict(os.environ, {'BIND': '0.0.0.0:8000', 'TLS_CERTFILE': '', 'TLS_KEYFILE': ''}):
+            self.assertEqual(health_url(), 'http://127.0.0.1:8000/health')
+        with patch.dict(os.environ, {'TLS_CERTFILE': 'certificate.pem', 'TLS_KEYFILE': 'privatekey.pem'}):
+            os.environ.pop('BIND', None)
+            self.assertEqual(health_url(), 'https://127.0.0.1:5000/health')
+
+    def test_health_endpoint(self):
+        """Test que /health responde 200 sin tocar la base"""
+        from app import create_app
+        response = create_app().test_client().get('/health')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['status'], 'ok')
+
+class TestCierreDiario(unittest.TestCase):
+    """Tests del cierre diario por conjunto contra la base SQLite"""
+
+    def setUp(self):
+        from comun import SQLiteDatabase, create_pool, repositorio
+        self.db = SQLiteDatabase(fixtures=True)
+        self.pool = create_pool(backend='sqlite', settings=self.db.settings, size=2)
+
+        with self.pool.transaction() as cursor:
+            ana = repositorio.find_helper(cursor, 'ana.rojas@uai.cl')
+            benjamin = repositorio.find_helper(cursor, 'benjamin.soto@uai.cl')
+            repositorio.register_helper_scan(cursor, ana, datetime(2024, 3, 4, 9, 0))
+            for hour in (10, 12):
+                repositorio.register_helper_scan(cursor, benjamin, datetime(2024, 3, 4, hour, 0))
+
+            elena = repositorio.find_student(cursor, 'elena.castro@alumnos.uai.cl')
+            felipe = repositorio.find_student(cursor, 'felipe.vera@alumnos.uai.cl')
+            repositorio.register_student_scan(cursor, elena, datetime(2024, 3, 4, 9, 30))
+            for minute in (0, 45):
+                repositorio.register_student_scan(cursor, felipe, datetime(2024, 3, 4, 11, minute))
+
+    def tearDown(self):
+        self.db.close()
+
+    def cerrar(self):
+        from tasks.cierre_diario import cerrar_dia
+        conn = self.pool.acquire()
+        try:
+            return cerrar_dia(date(2024, 3, 4), conn=conn)
+        finally:
+            conn.close()
+
+    def test_closes_open_entries(self):
+        """Test Salida automática solo para quien quedó dentro"""
+        resultado = self.cerrar()
+
+        self.assertEqual(resultado['registros_creados'], 1)
+        self.assertEqual([d['email'] for d in resultado['detalle']], ['ana.rojas@uai.cl'])
+        self.assertEqual(resultado['estudiantes_cerrados'], 1)
+        self.assertEqual(resultado['detalle'][0]['hora'], '23:59:59')
+
+        salidas = self.db.execute("SELECT email, dia FROM registros WHERE auto_generado = 1")
+        self.assertEqual(salidas, [{'email': 'ana.rojas@uai.cl', 'dia': 'lunes'}])
+        estados = self.db.execute("SELECT email, estado FROM estado_usuarios ORDER BY email")
+        self.assertTrue(all(e['estado'] == 'fuera' for e in estados))
+        estudiantes = self.db.execute("SELECT email FROM EST_registros WHERE auto_generado = 1")
+        self.assertEqual(estudiantes, [{'email': 'elena.castro@alumnos.uai.cl'}])
+
+    def test_rerun_is_noop(self):
+        """Test que cerrar dos veces el mismo día no duplica Salidas"""
+        self.cerrar()
+        resultado = self.cerrar()
+        self.assertEqual(resultado['registros_creados'], 0)
+        self.assertEqual(resultado['estudiantes_cerrados'], 0)
+
+    def test_catch_up_from_mark(self):
+        """Test que los días sin cerrar desde la marca se cierran en una pasada"""
+        from comun import repositorio
+        from tasks.cierre_diario import MARCA, cerrar_pendientes
+
+        with self.pool.transaction() as cursor:
+            carla = repositorio.find_helper(cursor, 'carla.munoz@uai.cl')
+            repositorio.register_helper_scan(cursor, carla, datetime(2024, 3, 6, 8, 30))
+        self.db.execute("INSERT INTO sistema_config (clave, valor) VALUES (%s, %s)", (MARCA, '2024-03-01'))
+
+        conn = self.pool.acquire()
+        try:
+            resultado = cerrar_pendientes(hasta=date(2024, 3, 7), conn=conn)
+            self.assertEqual(resultado['desde'], '2024-03-01')
+            self.assertEqual(resultado['fechas_cerradas'], ['2024-03-04', '2024-03-06'])
+            self.assertEqual(resultado['registros_creados'], 2)
+            self.assertEqual(resultado['estudiantes_cerrados'], 1)
+
+            # La marca avanzó: la siguiente corrida empieza ahí y no crea nada
+            again = cerrar_pendientes(hasta=date(2024, 3, 7), conn=conn)
+            self.assertEqual(again['desde'], '2024-03-07')
+            self.assertEqual(again['registros_creados'], 0)
+        finally:
+            conn.close()
+
+        salidas = self.db.execute("SELECT fecha, hora, dia FROM registros WHERE auto_generado = 1 ORDER BY fecha")
+        self.assertEqual([s['dia'] for s in salidas], ['lunes', 'miércoles'])
+        self.assertEqual(salidas[1]['hora'], timedelta(hours=23, minutes=59, seconds=59))
+        marca = self.db.execute("SELECT valor FROM sistema_config WHERE clave = %s", (MARCA,))
+        self.assertEqual(marca, [{'valor': '2024-03-07'}])
+
+def registrar_semana(cursor, repositorio):
+    """Escaneos de la semana del 2024-03-04 sobre los datos de ejemplo"""
+    ana = repositorio.find_helper(cursor, 'ana.rojas@uai.cl')
+    benjamin = repositorio.find_helper(cursor, 'benjamin.soto@uai.cl')
+    # Lunes completo, miércoles ausente
+    repositorio.register_helper_scan(cursor, ana, datetime(2024, 3, 4, 8, 50))
+    repositorio.register_helper_scan(cursor, ana, datetime(2024, 3, 4, 11, 5))
+    # Martes tarde, jueves ausente
+    repositorio.register_helper_scan(cursor, benjamin, datetime(2024, 3, 5, 10, 30))
+    repositorio.register_helper_scan(cursor, benjamin, datetime(2024, 3, 5, 13, 0))
+
+class TestReinicioSemanal(unittest.TestCase):
+    """Tests del reinicio semanal por conjunto contra la base SQLite"""
+
+    def setUp(self):
+        from comun import SQLiteDatabase, create_pool, repositorio
+        self.db = SQLiteDatabase(fixtures=True)
+        self.pool = create_pool(backend='sqlite', settings=self.db.settings, size=2)
+
+        with self.pool.transaction() as cursor:
+            registrar_semana(cursor, repositorio)
+
+    def tearDown(self):
+        self.db.close()
+
+    def cerrar(self, fecha=date(2024, 3, 6), hoy=None):
+        import tasks.reinicio_semanal as reinicio
+        from utils.datetime_utils import TIMEZONE
+        now = TIMEZONE.localize(hoy or datetime(2024, 3, 20, 12, 0))
+        conn = self.pool.acquire()
+        try:
+            with patch.object(reinicio, 'get_current_datetime', lambda: now):
+                return reinicio.cerrar_semana(fecha, conn=conn)
+        finally:
+            conn.close()
+
+    def test_closes_week_once(self):
+        """Test que la semana se guarda una vez por ayudante"""
+        resultado = self.cerrar()
+        self.assertEqual(resultado['semana_inicio'], '2024-03-04')
+        self.assertEqual(resultado['registros_historial'], 3)
+
+        again = self.cerrar()
+        self.assertEqual(again['registros_historial'], 0)
+        self.assertEqual(again['ya_cerrados'], 3)
+
+        historial = self.db.execute(
+            "SELECT email, estado, cumplidos, incompletos, ausentes FROM historial_cumplimiento ORDER BY email"
+        )
+        self.assertEqual([(h['email'], h['estado']) for h in historial], [
+            ('ana.rojas@uai.cl', 'Incompleto'),
+            ('benjamin.soto@uai.cl', 'Incompleto'),
+            ('carla.munoz@uai.cl', 'Ausente'),
+        ])
+        self.assertEqual((historial[0]['cumplidos'], historial[0]['ausentes']), (1, 1))
+        self.assertEqual((historial[1]['incompletos'], historial[1]['ausentes']), (1, 1))
+
+    def test_week_in_progress_is_replaced(self):
+        """Test que una semana en curso se puede volver a cerrar hasta que pase el domingo"""
+        # Miércoles 6: el bloque de Carla del viernes aún no ocurre
+        parcial = self.cerrar(hoy=datetime(2024, 3, 6, 12, 0))
+        self.assertTrue(parcial['en_curso'])
+        self.assertEqual(parcial['registros_historial'], 3)
+
+        # Domingo 10 (tarea programada): se reemplazan las filas del miércoles
+        domingo = self.cerrar(hoy=datetime(2024, 3, 10, 23, 55))
+        self.assertTrue(domingo['en_curso'])
+        self.assertEqual((domingo['reemplazados'], domingo['registros_historial']), (3, 3))
+
+        # Pasado el domingo la semana queda cerrada
+        lunes = self.cerrar(hoy=datetime(2024, 3, 11, 0, 5))
+        self.assertFalse(lunes['en_curso'])
+        self.assertEqual((lunes['reemplazados'], lunes['registros_historial'], lunes['ya_cerrados']), (0, 0, 3))
+        self.assertEqual(len(self.db.execute("SELECT id FROM historial_cumplimiento")), 3)
+
+    def test_day_comes_from_fecha(self):
+        """Test que registros con dia en inglés o vacío cuentan por su fecha"""
+        # Miércoles 6 de Ana (14:00-16:00) como lo guardaba el cliente Kivy anterior
+        columnas = "INSERT INTO registros (fecha, hora, dia, nombre, apellido, email, tipo) VALUES (%s, %s, %s, %s, %s, %s, %s)"
+        self.db.execute(columnas, (date(2024, 3, 6), '13:55:00', 'Wednesday', 'Ana', 'Rojas', 'ana.rojas@uai.cl', 'Entrada'))
+        self.db.execute(columnas, (date(2024, 3, 6), '16:05:00', None, 'Ana', 'Rojas', 'ana.rojas@uai.cl', 'Salida'))
+
+        self.cerrar()
+        ana = self.db.execute(
+            "SELECT estado, cumplidos, ausentes FROM historial_cumplimiento WHERE email = %s", ('ana.rojas@uai.cl',)
+        )
+        self.assertEqual(ana, [{'estado': 'Cumple', 'cumplidos': 2, 'ausentes': 0}])
+
+    def test_unique_key_added_to_existing_table(self):
+        """Test que una tabla sin el índice único se depura y migra una vez"""
+        import tasks.reinicio_semanal as reinicio
+        conn = MagicMock()
+        conn.backend.name = 'pymysql'
+        cursor = MagicMock()
+        cursor.rowcount = 2
+        # Tabla creada por la versión anterior: solo la clave primaria
+        cursor.fetchall.return_value = [{'nombre': 'PRIMARY', 'no_unico': 0, 'columnas': 'id'}]
+
+        with patch.object(reinicio, '_historial_verificado', False):
+            reinicio.asegurar_historial(conn, cursor)
+            sentencias = [' '.join(c[0][0].split()) for c in cursor.execute.call_args_list]
+            delete = next(i for i, s in enumerate(sentencias) if s.startswith('DELETE h FROM historial_cumplimiento'))
+            alter = sentencias.index('ALTER TABLE historial_cumplimiento ADD UNIQUE KEY '
+                                     'uq_historial_usuario_semana (usuario_id, semana_inicio)')
+            self.assertLess(delete, alter)
+            self.assertIn('ALTER TABLE historial_cumplimiento ADD INDEX '
+                          'idx_historial_email_semana (email, semana_inicio)', sentencias)
+            self.assertTrue(reinicio._historial_verificado)
+
+            # Ya verificada en este proceso: solo el CREATE TABLE IF NOT EXISTS
+            cursor.reset_mock()
+            reinicio.asegurar_historial(conn, cursor)
+            self.assertEqual(cursor.execute.call_count, 1)
+
+        # Con los índices presentes no se borra ni se altera nada
+        cursor.reset_mock()
+        cursor.fetchall.return_value = [
+            {'nombre': 'uq_historial_usuario_semana', 'no_unico': 0, 'columnas': 'usuario_id,semana_inicio'},
+            {'nombre': 'idx_historial_email_semana', 'no_unico': 1, 'columnas': 'email,semana_inicio'},
+        ]
+        with patch.object(reinicio, '_historial_verificado', False):
+            reinicio.asegurar_historial(conn, cursor)
+        sentencias = ' '.join(c[0][0] for c in cursor.execute.call_args_list)
+        self.assertNotIn('DELETE', sentencias)
+        self.assertNotIn('ALTER', sentencias)
+
+    def test_future_week_is_rejected(self):
+        """Test que una semana que aún no empieza no se cierra"""
+        with self.assertRaises(ValueError):
+            self.cerrar(fecha=date(2024, 3, 13), hoy=datetime(2024, 3, 10, 12, 0))
+        self.assertEqual(self.db.execute("SELECT id FROM historial_cumplimiento"), [])
+
+    def test_route_rejects_future_week(self):
+        """Test que POST /reiniciar_cumplimiento responde 400 con una semana futura"""
+        import routes.cumplimiento as cumplimiento
+        from app import create_app
+        with patch.object(cumplimiento, 'cerrar_semana', lambda semana: self.cerrar(semana, datetime(2024, 3, 10, 12, 0))):
+            client = create_app().test_client()
+            response = client.post('/reiniciar_cumplimiento', json={'semana': '2024-03-13'})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('aún no empieza', response.get_json()['error'])
+            self.assertEqual(client.post('/reiniciar_cumplimiento', json={'semana': 'marzo'}).status_code, 400)
+            self.assertEqual(client.post('/reiniciar_cumplimiento', json={'semana': '2024-03-06'}).status_code, 200)
+
+class TestCumplimientoSemanas(unittest.TestCase):
+    """Tests de /cumplimiento por semana y por rango contra la base SQLite"""
+
+    def setUp(self):
+        from comun import SQLiteDatabase, create_pool, repositorio
+        from utils.cumplimiento import invalidar_semanas
+        from utils.datetime_utils import TIMEZONE
+        from app import create_app
+        import routes.cumplimiento as cumplimiento
+
+        invalidar_semanas()
+        self.db = SQLiteDatabase(fixtures=True)
+        self.pool = create_pool(backend='sqlite', settings=self.db.settings, size=2)
+        with self.pool.transaction() as cursor:
+            registrar_semana(cursor, repositorio)
+
+        # Lunes 11 de marzo a las 10:00: bloque de Ana en curso
+        now = TIMEZONE.localize(datetime(2024, 3, 11, 10, 0))
+        patches = [
+            patch.object(cumplimiento, 'get_connection', self.pool.acquire),
+            patch.object(cumplimiento, 'get_current_datetime', lambda: now),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.client = create_app().test_client()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_past_week(self):
+        """Test ?semana con una semana terminada"""
+        response = self.client.get('/cumplimiento?semana=2024-W10')
+        self.assertEqual(response.status_code, 200)
+        estados = {u['email']: u['estado'] for u in response.get_json()}
+        self.assertEqual(estados, {
+            'ana.rojas@uai.cl': 'Incompleto',
+            'benjamin.soto@uai.cl': 'Incompleto',
+            'carla.munoz@uai.cl': 'Ausente',
+        })
+
+    def test_current_week(self):
+        """Test sin parámetros: el bloque de hoy en curso queda Atrasado"""
+        usuarios = {u['email']: u for u in self.client.get('/cumplimiento').get_json()}
+        self.assertEqual(usuarios['ana.rojas@uai.cl']['bloques_info'][0]['estado'], 'Atrasado')
+
+    def test_range_uses_cache(self):
+        """Test ?desde&hasta: totales por ayudante y semanas terminadas en caché"""
+        url = '/cumplimiento?desde=2024-03-01&hasta=2024-03-11'
+        data = self.client.get(url).get_json()
+        self.assertEqual([s['semana'] for s in data['semanas']], ['2024-W09', '2024-W10', '2024-W11'])
+        totales = {t['email']: t for t in data['totales']}
+        self.assertEqual(totales['ana.rojas@uai.cl']['cumplidos'], 1)
+
+        # Los registros de semanas terminadas ya no se consultan, solo la semana en curso
+        import utils.cumplimiento as utils_cumplimiento
+        with patch.object(utils_cumplimiento, 'cargar_registros', wraps=utils_cumplimiento.cargar_registros) as cargar:
+            again = self.client.get(url).get_json()
+        self.assertEqual(again['semanas'][1], data['semanas'][1])
+        self.assertEqual([c[0][1] for c in cargar.call_args_list], [date(2024, 3, 11)])
+
+        # Un cambio de horario cambia la versión y se recalcula
+        self.db.execute("UPDATE horarios_asignados SET hora_entrada = '08:00:00' WHERE dia = 'lunes'")
+        changed = self.client.get(url).get_json()
+        ana = next(u for u in changed['semanas'][1]['usuarios'] if u['email'] == 'ana.rojas@uai.cl')
+        self.assertEqual((ana['cumplidos'], ana['incompletos']), (0, 1))
+
+    def test_backdated_registro_refreshes_cache(self):
+        """Test que un registro con fecha pasada se ve en la siguiente consulta"""
+        import routes.registros as registros
+        url = '/cumplimiento?semana=2024-W10'
+        estados = lambda: {u['email']: u['estado'] for u in self.client.get(url).get_json()}
+        self.assertEqual(estados()['carla.munoz@uai.cl'], 'Ausente')
+
+        # Viernes 8 de Carla (08:30-12:30), cargado el lunes siguiente
+        carla = {'nombre': 'Carla', 'apellido': 'Muñoz', 'email': 'carla.munoz@uai.cl', 'fecha': '2024-03-08'}
+        with patch.object(registros, 'get_connection', self.pool.acquire):
+            for hora in ('08:25:00', '12:35:00'):
+                self.assertEqual(self.client.post('/registros', json={**carla, 'hora': hora}).status_code, 200)
+        self.assertEqual(estados()['carla.munoz@uai.cl'], 'Cumple')
+
+        # Otro proceso (cierre diario, otro worker) escribe directo en la base
+        self.db.execute(
+            "INSERT INTO registros (fecha, hora, dia, nombre, apellido, email, tipo) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            (date(2024, 3, 6), '13:50:00', 'miércoles', 'Ana', 'Rojas', 'ana.rojas@uai.cl', 'Entrada')
+        )
+        self.db.execute(
+            "INSERT INTO registros (fecha, hora, dia, nombre, apellido, email, tipo) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            (date(2024, 3, 6), '16:10:00', 'miércoles', 'Ana', 'Rojas', 'ana.rojas@uai.cl', 'Salida')
+        )
+        self.assertEqual(estados()['ana.rojas@uai.cl'], 'Cumple')
+
+    def test_invalid_week(self):
+        """Test que un formato de semana inválido da 400"""
+        self.assertEqual(self.client.get('/cumplimiento?semana=marzo').status_code, 400)
+
+class TestExportarRegistros(unittest.TestCase):
+    """Tests de /exportar_registros en streaming contra la base SQLite"""
+
+    def setUp(self):
+        from comun import SQLiteDatabase, create_pool
+        from app import create_app
+        import database
+
+        self.db = SQLiteDatabase(fixtures=True)
+        self.pool = create_pool(backend='sqlite', settings=self.db.settings, size=1)
+        for fecha, hora, tipo in [('2024-03-11', '09:00:00', 'Entrada'), ('2024-03-11', '11:00:00', 'Salida'),
+                                  ('2024-03-20', '09:00:00', 'Entrada')]:
+            self.db.execute("""
+                INSERT INTO registros (fecha, hora, dia, nombre, apellido, email, tipo)
+                VALUES (%s, %s, 'lunes', 'Ana', 'Rojas', 'ana.rojas@uai.cl', %s)
+            """, (fecha, hora, tipo))
+        p = patch.object(database, 'app_pool', lambda: self.pool)
+        p.start()
+        self.addCleanup(p.stop)
+        self.client = create_app().test_client()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_ndjson(self):
+        """Test NDJSON con los registros del rango, en orden de id"""
+        response = self.client.get('/exportar_registros?inicio=2024-03-01&fin=2024-03-15')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        filas = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual([(f['fecha'], f['hora'], f['tipo']) for f in filas], [
+            ('2024-03-11', '09:00:00', 'Entrada'), ('2024-03-11', '11:00:00', 'Salida')
+        ])
+
+    def test_csv_gzip(self):
+        """Test CSV comprimido con cabecera y nombre de archivo .csv.gz"""
+        import gzip
+        response = self.client.get('/exportar_registros?inicio=2024-03-01&fin=2024-03-31&formato=csv&gzip=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('registros_ayudantes_2024-03-01_2024-03-31.csv.gz', response.headers['Content-Disposition'])
+        lineas = gzip.decompress(response.get_data()).decode('utf-8').splitlines()
+        self.assertEqual(lineas[0], 'id,fecha,hora,dia,nombre,apellido,email,tipo,timestamp')
+        self.assertEqual(len(lineas), 4)
+
+    def test_invalid_params(self):
+        """Test fechas faltantes o formato desconocido dan 400"""
+        self.assertEqual(self.client.get('/exportar_registros?inicio=2024-03-01').status_code, 400)
+        self.assertEqual(
+            self.client.get('/exportar_registros?inicio=2024-03-01&fin=2024-03-31&formato=xml').status_code, 400
+        )
+
+class TestScheduler(unittest.TestCase):
+    """Tests del scheduler con un solo líder contra la base SQLite"""
+
+    PROGRAMADA = datetime(2024, 3, 4, 23, 59)
+
+    def setUp(self):
+        from comun import SQLiteDatabase, create_pool
+        import tasks.scheduler as scheduler
+        self.scheduler = scheduler
+        self.db = SQLiteDatabase(fixtures=True)
+        self.pool = create_pool(backend='sqlite', settings=self.db.settings, size=2)
+        self.llamadas = []
+
+        patches = [
+            patch.object(scheduler, 'get_connection', self.pool.acquire),
+            patch.dict(scheduler.TAREAS, clear=True),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        scheduler.registrar_tarea('prueba', self.llamadas.append, hour=23, minute=59)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_run_is_recorded_once(self):
+        """Test que una hora programada se ejecuta y registra una sola vez"""
+        self.scheduler.ejecutar_tarea('prueba', self.PROGRAMADA)
+        self.scheduler.ejecutar_tarea('prueba', self.PROGRAMADA)
+
+        self.assertEqual(self.llamadas, [self.PROGRAMADA])
+        ejecuciones = self.db.execute("SELECT tarea, programada, estado, pid FROM tareas_ejecuciones")
+        self.assertEqual(len(ejecuciones), 1)
+        self.assertEqual(ejecuciones[0]['estado'], 'ok')
+        self.assertEqual(ejecuciones[0]['pid'], os.getpid())
+
+    def test_lock_holder_elsewhere_skips(self):
+        """Test que si otro proceso tiene el lock la tarea no se ejecuta"""
+        otro = self.db.connect(autocommit=True)
+        try:
+            otro.cursor().execute("SELECT GET_LOCK(%s, 0)", ('labinf:prueba',))
+            self.assertIsNone(self.scheduler.ejecutar_tarea('prueba', self.PROGRAMADA))
+        finally:
+            otro.close()
+
+        self.assertEqual(self.llamadas, [])
+        self.assertEqual(self.db.execute("SELECT id FROM tareas_ejecuciones"), [])
+
+    def test_failure_is_recorded(self):
+        """Test que un error queda en la tabla y se reintenta en la siguiente corrida"""
+        def falla(programada):
+            raise RuntimeError('sin conexión')
+        self.scheduler.registrar_tarea('falla', falla, hour=23, minute=59)
+
+        self.scheduler.ejecutar_tarea('falla', self.PROGRAMADA)
+        self.scheduler.ejecutar_tarea('falla', self.PROGRAMADA)
+        ejecuciones = self.db.execute("SELECT estado, detalle FROM tareas_ejecuciones WHERE tarea = 'falla'")
+        self.assertEqual([e['estado'] for e in ejecuciones], ['error', 'error'])
+        self.assertEqual(ejecuciones[0]['detalle'], 'sin conexión')
+
+    def test_stale_running_row_is_retried(self):
+        """Test que una ejecución en 'corriendo' de un líder caído se repite tras el timeout"""
+        def corriendo(inicio):
+            self.db.execute("""
+                INSERT INTO tareas_ejecuciones (tarea, programada, inicio, estado, host, pid)
+                VALUES ('prueba', %s, %s, 'corriendo', 'otro', 1)
+            """, (self.PROGRAMADA, inicio))
+
+        self.scheduler.asegurar_tabla()
+        with patch.object(self.scheduler, 'local_now', lambda: datetime(2024, 3, 5, 0, 30)):
+            # Reciente: puede seguir corriendo en otro proceso
+            corriendo(datetime(2024, 3, 5, 0, 0))
+            self.assertIsNone(self.scheduler.ejecutar_tarea('prueba', self.PROGRAMADA))
+            self.assertEqual(self.llamadas, [])
+
+            self.db.execute("DELETE FROM tareas_ejecuciones")
+            corriendo(datetime(2024, 3, 4, 23, 0))
+            with patch.object(self.scheduler, 'SCHEDULER_TIMEOUT', 1800):
+                self.scheduler.ejecutar_tarea('prueba', self.PROGRAMADA)
+
+        self.assertEqual(self.llamadas, [self.PROGRAMADA])
+        ejecuciones = self.db.execute("SELECT estado, detalle FROM tareas_ejecuciones ORDER BY id")
+        self.assertEqual([e['estado'] for e in ejecuciones], ['error', 'ok'])
+        self.assertIn('proceso caído', ejecuciones[0]['detalle'])
+
+    def test_stale_running_row_is_missed(self):
+        """Test que al iniciar una ejecución en 'corriendo' vencida cuenta como perdida"""
+        from utils.datetime_utils import TIMEZONE
+        now = TIMEZONE.localize(datetime(2024, 3, 5, 10, 0))
+        self.scheduler.asegurar_tabla()
+        self.db.execute("""
+            INSERT INTO tareas_ejecuciones (tarea, programada, inicio, estado)
+            VALUES ('prueba', %s, %s, 'ok'), ('prueba', %s, %s, 'corriendo')
+        """, (datetime(2024, 3, 3, 23, 59), datetime(2024, 3, 3, 23, 59),
+              self.PROGRAMADA, self.PROGRAMADA))
+
+        with patch.object(self.scheduler, 'local_now', lambda: now.replace(tzinfo=None)):
+            self.assertEqual(self.scheduler.ejecuciones_perdidas(now), [('prueba', self.PROGRAMADA)])
+            with patch.object(self.scheduler, 'SCHEDULER_TIMEOUT', 86400):
+                self.assertEqual(self.scheduler.ejecuciones_perdidas(now), [])
+
+    def test_missed_runs(self):
+        """Test que se detecta la ejecución perdida solo si la tarea corrió antes"""
+        from utils.datetime_utils import TIMEZONE
+        now = TIMEZONE.localize(datetime(2024, 3, 7, 10, 0))
+        self.assertEqual(self.scheduler.ejecuciones_perdidas(now), [])
+
+        self.scheduler.ejecutar_tarea('prueba', self.PROGRAMADA)
+        self.assertEqual(self.scheduler.ejecuciones_perdidas(now), [('prueba', datetime(2024, 3, 6, 23, 59))])
+
+    def test_last_scheduled_time(self):
+        """Test de la última hora programada de una tarea semanal"""
+        from utils.datetime_utils import TIMEZONE
+        now = TIMEZONE.localize(datetime(2024, 3, 6, 12, 0))
+        programada = self.scheduler.ultima_programada({'day_of_week': 'sun', 'hour': 23, 'minute': 55}, now)
+        self.assertEqual(programada, datetime(2024, 3, 3, 23, 55))
+
 # Tests de integración básicos
 class TestAppCreation(unittest.TestCase):
     """Tests básicos de creación de app"""
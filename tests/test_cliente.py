@@ -0,0 +1,258 @@
+# test_cliente.py
+import unittest
+import sys
+import os
+import json
+import tempfile
+import threading
+from datetime import date, datetime, timedelta
+
+# Agregar cliente y back-end al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../cliente'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../back-end'))
+
+import numpy as np
+from unittest.mock import patch
+
+from comun import repositorio
+from comun.pool import create_pool
+from comun.sqlite import SQLiteDatabase
+from snapshot import LocalSnapshot, match_embedding
+
+try:
+    import face_engine
+except ImportError:  # cv2 no instalado
+    face_engine = None
+
+ANA = {'nombre': 'Ana', 'apellido': 'Rojas', 'email': 'ana.rojas@uai.cl'}
+BENJAMIN = {'nombre': 'Benjamín', 'apellido': 'Soto', 'email': 'benjamin.soto@uai.cl'}
+
+class TestLocalSnapshot(unittest.TestCase):
+    """Tests del snapshot local del cliente sobre el backend SQLite"""
+
+    def setUp(self):
+        self.db = SQLiteDatabase(fixtures=True)
+        # Como DatabaseManager.get_db_connection: filas como tupla
+        self.pool = create_pool(backend='sqlite', settings=self.db.settings, size=2, dict_rows=False)
+        self.snapshot = LocalSnapshot(self.pool.acquire)
+
+    def tearDown(self):
+        self.db.close()
+
+    def insert(self, nombre, apellido, email, metodo, tipo, now):
+        """Igual que DatabaseManager.register_attendance"""
+        conn = self.pool.acquire()
+        try:
+            conn.start_transaction()
+            cursor = conn.dict_cursor()
+            escaneo = repositorio.register_helper_scan(
+                cursor, {'nombre': nombre, 'apellido': apellido, 'email': email},
+                now, tipo=tipo, extra={'metodo': metodo}
+            )
+            conn.commit()
+            return {'success': True, 'id': escaneo.registro_id, 'tipo': escaneo.tipo}
+        finally:
+            conn.close()
+
+    def other_writer(self, persona, tipo, registro_id=None, fecha=None):
+        """Registro insertado por otro escritor (lector, APIs, otra cámara)"""
+        columns = 'fecha, hora, dia, nombre, apellido, email, tipo'
+        values = [fecha or date.today(), '10:00:00', 'lunes',
+                  persona['nombre'], persona['apellido'], persona['email'], tipo]
+        if registro_id is not None:
+            columns = 'id, ' + columns
+            values.insert(0, registro_id)
+        self.db.execute(f"INSERT INTO registros ({columns}) VALUES ({', '.join(['%s'] * len(values))})", values)
+
+    def test_parity_from_refreshed_rows(self):
+        """Test el tipo sale de los registros de hoy leídos en el refresco"""
+        self.other_writer(ANA, 'Entrada')
+        self.other_writer(BENJAMIN, 'Entrada')
+        self.other_writer(BENJAMIN, 'Salida')
+        self.other_writer(ANA, 'Entrada', fecha=date.today() - timedelta(days=1))
+
+        self.assertTrue(self.snapshot.load())
+
+        self.assertEqual(self.snapshot.next_tipo(ANA['email']), 'Salida')
+        self.assertEqual(self.snapshot.next_tipo(BENJAMIN['email']), 'Entrada')
+        self.assertEqual(self.snapshot.next_tipo('carla.munoz@uai.cl'), 'Entrada')
+        self.assertTrue(self.snapshot.get_user('carla.munoz@uai.cl')['found'])
+        self.assertFalse(self.snapshot.get_user('diego.perez@uai.cl')['found'])
+
+    def test_local_insert_does_not_skip_lower_ids(self):
+        """Test un registro propio no salta filas de otros con id menor"""
+        # Deja un hueco de ids (1-4) para simular transacciones de otros
+        # escritores que confirman después que la nuestra
+        self.other_writer(ANA, 'Entrada', registro_id=5, fecha=date.today() - timedelta(days=1))
+        self.snapshot.load()
+
+        result = self.snapshot.record_attendance(ANA, 'facial', self.insert)
+        self.assertTrue(result['success'])
+        self.assertEqual(result['tipo'], 'Entrada')
+        self.assertGreater(result['id'], 5)
+        self.assertEqual(self.snapshot.registros_max_id, 0)
+        self.assertIn(result['id'], self.snapshot.local_ids)
+
+        self.other_writer(BENJAMIN, 'Entrada', registro_id=3)
+        self.snapshot.refresh()
+
+        self.assertEqual(self.snapshot.next_tipo(BENJAMIN['email']), 'Salida')
+        # El registro propio leído de nuevo no cuenta dos veces
+        self.assertEqual(self.snapshot.next_tipo(ANA['email']), 'Salida')
+        self.assertEqual(self.snapshot.local_ids, set())
+        self.assertEqual(self.snapshot.registros_max_id, result['id'])
+
+    def test_alternates_with_local_inserts(self):
+        """Test registros seguidos alternan Entrada y Salida"""
+        self.snapshot.load()
+        tipos = [self.snapshot.record_attendance(ANA, 'facial', self.insert)['tipo'] for _ in range(3)]
+        self.assertEqual(tipos, ['Entrada', 'Salida', 'Entrada'])
+
+        self.snapshot.refresh()
+        self.assertEqual(self.snapshot.next_tipo(ANA['email']), 'Salida')
+
+    def test_day_change_resets_state(self):
+        """Test al cambiar el día se reinician los conteos y el mark"""
+        self.other_writer(ANA, 'Entrada')
+        self.snapshot.load()
+        self.assertEqual(self.snapshot.next_tipo(ANA['email']), 'Salida')
+
+        self.snapshot.today = date.today() - timedelta(days=1)
+        self.snapshot.local_ids.add(99)
+
+        self.assertEqual(self.snapshot.next_tipo(ANA['email']), 'Entrada')
+        self.assertEqual(self.snapshot.registros_max_id, 0)
+        self.assertEqual(self.snapshot.local_ids, set())
+
+        # El refresco siguiente vuelve a leer el día completo
+        self.snapshot.refresh()
+        self.assertEqual(self.snapshot.next_tipo(ANA['email']), 'Salida')
+
+    def test_refresh_faces(self):
+        """Test carga incremental de rostros y reconocimiento local"""
+        self.db.execute(
+            "INSERT INTO faces (name, email, embedding) VALUES (%s, %s, %s)",
+            ('Ana Rojas', ANA['email'], json.dumps([1.0, 0.0, 0.0]))
+        )
+        self.snapshot.load()
+        self.assertEqual(self.snapshot.recognize([2.0, 0.0, 0.0]), ('Ana Rojas', ANA['email']))
+
+        self.db.execute(
+            "INSERT INTO faces (name, email, embedding) VALUES (%s, %s, %s)",
+            ('Benjamín Soto', BENJAMIN['email'], json.dumps([0.0, 1.0, 0.0]))
+        )
+        self.snapshot.refresh()
+        self.assertEqual(self.snapshot.face_matrix.shape, (2, 3))
+        self.assertEqual(self.snapshot.recognize([0.0, 1.0, 0.1]), ('Benjamín Soto', BENJAMIN['email']))
+
+    def offline(self, nombre, apellido, email, metodo, tipo, now):
+        return {'success': False, 'connection_error': True}
+
+    def journal_snapshot(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return LocalSnapshot(self.pool.acquire, journal_path=os.path.join(directory.name, 'pendientes.jsonl'))
+
+    def test_journal_replay_updates_estado(self):
+        """Test el journal se reenvía por el repositorio y actualiza estado_usuarios"""
+        snapshot = self.journal_snapshot()
+        snapshot.load()
+
+        first = snapshot.record_attendance(ANA, 'facial', self.offline)
+        second = snapshot.record_attendance(BENJAMIN, 'qr', self.offline)
+        self.assertTrue(first['pendiente'])
+        self.assertEqual((first['tipo'], second['tipo']), ('Entrada', 'Entrada'))
+        self.assertEqual(snapshot.next_tipo(ANA['email']), 'Salida')
+
+        self.assertTrue(snapshot.refresh())
+
+        self.assertFalse(os.path.exists(snapshot.journal_path))
+        dia = repositorio.dia_semana(datetime.now())
+        rows = self.db.execute("SELECT email, tipo, dia, metodo FROM registros ORDER BY id")
+        self.assertEqual(rows, [
+            {'email': ANA['email'], 'tipo': 'Entrada', 'dia': dia, 'metodo': 'facial'},
+            {'email': BENJAMIN['email'], 'tipo': 'Entrada', 'dia': dia, 'metodo': 'qr'},
+        ])
+        estados = {row['email']: row['estado'] for row in self.db.execute("SELECT email, estado FROM estado_usuarios")}
+        self.assertEqual(estados, {ANA['email']: 'dentro', BENJAMIN['email']: 'dentro'})
+
+        # Los ids locales se reemplazan por los reales, sin contar dos veces
+        self.assertEqual(snapshot.next_tipo(ANA['email']), 'Salida')
+        self.assertTrue(all(i > 0 for ids in snapshot.today_ids.values() for i in ids))
+
+    def test_journal_keeps_failed_entries(self):
+        """Test si un registro del journal falla se conservan ese y los siguientes"""
+        snapshot = self.journal_snapshot()
+        snapshot.load()
+        snapshot.record_attendance(ANA, 'facial', self.offline)
+        with open(snapshot.journal_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'fecha': 'no es fecha', 'hora': '10:00:00', 'nombre': 'X',
+                                'apellido': 'Y', 'email': 'x@uai.cl', 'metodo': 'qr', 'tipo': 'Entrada'}) + '\n')
+        snapshot.record_attendance(BENJAMIN, 'qr', self.offline)
+
+        snapshot.refresh()
+
+        self.assertEqual(self.db.execute("SELECT email FROM registros"), [{'email': ANA['email']}])
+        with open(snapshot.journal_path, encoding='utf-8') as f:
+            pending = [json.loads(line)['email'] for line in f]
+        self.assertEqual(pending, ['x@uai.cl', BENJAMIN['email']])
+        self.assertEqual(snapshot.next_tipo(BENJAMIN['email']), 'Salida')
+
+    def test_match_embedding(self):
+        """Test umbral y casos borde de match_embedding"""
+        matrix = np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+        names, emails = ['A', 'B'], ['a@uai.cl', 'b@uai.cl']
+
+        self.assertEqual(match_embedding(matrix, names, emails, [0.9, 0.1]), ('A', 'a@uai.cl'))
+        self.assertEqual(match_embedding(matrix, names, emails, [1.0, 1.0]), ('Desconocido', None))
+        self.assertEqual(match_embedding(matrix, names, emails, [1.0, 0.0, 0.0]), ('Desconocido', None))
+        self.assertEqual(match_embedding(matrix, names, emails, [0.0, 0.0]), ('Error', None))
+        self.assertEqual(match_embedding(matrix, names, emails, None), ('Error', None))
+        self.assertEqual(match_embedding(np.zeros((0, 0)), [], [], [1.0]), ('Desconocido', None))
+
+@unittest.skipUnless(face_engine, "face_engine requiere cv2")
+class TestFaceStackRetry(unittest.TestCase):
+    """Reintento de la carga del stack facial tras un fallo"""
+
+    def setUp(self):
+        face_engine._ready.clear()
+        face_engine._state.update(face_detection=None, error=None, failed_at=None, loading=False)
+        self.attempts = []
+
+        def load_stack():
+            self.attempts.append(len(self.attempts))
+            if len(self.attempts) == 1:
+                raise RuntimeError("descarga fallida")
+            face_engine._state['face_detection'] = object()
+
+        patcher = patch.object(face_engine, '_load_stack', side_effect=load_stack)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(face_engine._ready.clear)
+
+    def load_async(self, timeout=5):
+        """Como ensure_face_stack en cada frame; espera el hilo si se inició"""
+        done = threading.Event()
+        result = []
+        face_engine.load_async(lambda ok: (result.append(ok), done.set()))
+        done.wait(timeout)
+        return result[0] if result else None
+
+    def test_failed_load_reloads_after_interval(self):
+        """Test una carga fallida se reintenta sola al vencer el intervalo"""
+        self.assertFalse(self.load_async())
+        self.assertTrue(face_engine.retry_pending())
+
+        # Dentro del intervalo los frames siguientes no inician otra carga
+        self.assertIsNone(self.load_async(timeout=0.2))
+        self.assertEqual(len(self.attempts), 1)
+        self.assertIsNone(face_engine.get_face_detection())
+
+        face_engine._state['failed_at'] -= face_engine.LOAD_RETRY_SECONDS
+        self.assertTrue(self.load_async())
+        self.assertEqual(len(self.attempts), 2)
+        self.assertIsNotNone(face_engine.get_face_detection())
+        self.assertFalse(face_engine.retry_pending())
+
+if __name__ == '__main__':
+    unittest.main()
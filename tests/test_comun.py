@@ -0,0 +1,626 @@
+# test_comun.py
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+import gc
+import json
+import threading
+from datetime import date, datetime, time, timedelta
+
+# Agregar back-end al path para importar el paquete compartido
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../back-end'))
+
+from comun import backends
+from comun.backends import Backend, register_backend, error_code, is_lock_conflict
+from comun.pool import ConnectionPool, PoolTimeout, create_pool
+from comun.instrumentation import InstrumentedCursor, get_statement_stats
+from comun import detector, metrics, profiler
+from comun import repositorio
+from comun.sqlite import SQLiteConnection, SQLiteDatabase, SQLiteError, translate
+
+class FakeConnection:
+    """Conexión mínima para probar el pool sin base de datos"""
+
+    def __init__(self):
+        self.in_transaction = False
+        self.rollbacks = 0
+        self.closed = False
+
+    def cursor(self):
+        return MagicMock()
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+
+@register_backend
+class FakeBackend(Backend):
+    name = 'fake'
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.opened = []
+
+    def connect(self, autocommit):
+        conn = FakeConnection()
+        self.opened.append(conn)
+        return conn
+
+    def cursor(self, connection):
+        return connection.cursor()
+
+    def in_transaction(self, connection):
+        return connection.in_transaction
+
+class LockError(Exception):
+    """Error con el código en args[0], como los de PyMySQL"""
+
+class TestConnectionPool(unittest.TestCase):
+    """Tests para el pool de conexiones compartido"""
+
+    def setUp(self):
+        self.backend = backends.create_backend('fake', {})
+        self.pool = ConnectionPool(self.backend, size=2, timeout=0.05)
+
+    def test_reuses_released_connection(self):
+        """Test que close() devuelve la conexión al pool en vez de cerrarla"""
+        conn = self.pool.acquire()
+        raw = conn.raw
+        conn.close()
+        conn.close()
+
+        again = self.pool.acquire()
+        self.assertIs(again.raw, raw)
+        self.assertFalse(raw.closed)
+        self.assertEqual(len(self.backend.opened), 1)
+
+    def test_exhausted_pool_times_out(self):
+        """Test que se respeta el tamaño máximo del pool"""
+        first = self.pool.acquire()
+        second = self.pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            self.pool.acquire()
+        self.assertEqual(self.pool.stats()['timeouts'], 1)
+        first.close()
+        second.close()
+
+    def test_unclosed_connection_returns_to_pool(self):
+        """Test que una conexión perdida sin close() vuelve al pool"""
+        self.pool.acquire()
+        gc.collect()
+        self.assertEqual(self.pool.stats()['idle'], 1)
+
+    def test_open_transaction_is_rolled_back(self):
+        """Test que una transacción abierta se revierte al devolver la conexión"""
+        conn = self.pool.acquire()
+        conn.raw.in_transaction = True
+        conn.close()
+        self.assertEqual(self.backend.opened[0].rollbacks, 1)
+
+    def test_discard_closes_connection(self):
+        """Test que una conexión descartada no se reutiliza"""
+        conn = self.pool.acquire()
+        raw = conn.raw
+        conn.discard()
+        conn.close()
+
+        self.assertTrue(raw.closed)
+        self.assertIsNot(self.pool.acquire().raw, raw)
+
+    def test_warm_opens_idle_connections(self):
+        """Test que warm() deja conexiones abiertas y libres sin pasar del tamaño"""
+        self.assertEqual(self.pool.warm(5), 2)
+        self.assertEqual(len(self.backend.opened), 2)
+        self.assertEqual(self.pool.stats()['idle'], 2)
+        self.assertEqual(self.pool.warm(), 2)
+        self.assertEqual(len(self.backend.opened), 2)
+
+    def test_cursor_is_instrumented(self):
+        """Test que las sentencias del pool quedan en los contadores"""
+        get_statement_stats(reset=True)
+        conn = self.pool.acquire()
+        with conn.cursor() as cursor:
+            self.assertIsInstance(cursor, InstrumentedCursor)
+            cursor.execute("SELECT 1")
+        conn.close()
+
+        stats = get_statement_stats(reset=True)
+        self.assertEqual(stats[0]['query'], 'SELECT 1')
+        self.assertEqual(stats[0]['calls'], 1)
+
+class TestBackends(unittest.TestCase):
+    """Tests para el registro de backends y los códigos de error"""
+
+    def test_unknown_backend(self):
+        """Test backend desconocido"""
+        with self.assertRaises(ValueError):
+            backends.create_backend('oracle', {})
+
+    def test_error_code(self):
+        """Test código de error de ambos drivers"""
+        self.assertEqual(error_code(LockError(1213, 'Deadlock found')), 1213)
+        connector_error = Exception('Lock wait timeout')
+        connector_error.errno = 1205
+        self.assertTrue(is_lock_conflict(connector_error))
+        self.assertIsNone(error_code(ValueError('x')))
+
+class TestRepositorio(unittest.TestCase):
+    """Tests para el repositorio común"""
+
+    def test_with_lock_retries(self):
+        """Test reintento ante deadlock"""
+        calls = []
+
+        def operation():
+            calls.append(1)
+            if len(calls) < 3:
+                raise LockError(1213, 'Deadlock found')
+            return 'ok'
+
+        self.assertEqual(repositorio.with_lock_retries(operation), 'ok')
+        self.assertEqual(len(calls), 3)
+
+    def test_with_lock_retries_other_errors(self):
+        """Test que otros errores no se reintentan"""
+        operation = MagicMock(side_effect=LockError(1062, 'Duplicate entry'))
+        with self.assertRaises(LockError):
+            repositorio.with_lock_retries(operation)
+        operation.assert_called_once()
+
+    def test_insert_registro_rejects_unknown_columns(self):
+        """Test columnas y tablas permitidas en registros"""
+        persona = {'nombre': 'Ana', 'apellido': 'Rojas', 'email': 'ana@uai.cl'}
+        with self.assertRaises(ValueError):
+            repositorio.insert_registro(MagicMock(), 'registros', persona, 'Entrada', None, None, 'lunes', {'id': 1})
+        with self.assertRaises(ValueError):
+            repositorio.insert_registro(MagicMock(), 'usuarios', persona, 'Entrada', None, None, 'lunes')
+
+    def test_register_student_scan_parity(self):
+        """Test que el contador de movimientos decide Entrada/Salida"""
+        persona = {'id': 7, 'nombre': 'Ana', 'apellido': 'Rojas', 'email': 'ana@uai.cl'}
+        now = datetime(2024, 3, 4, 10, 30, 15, 123)
+
+        for movimientos, tipo in ((0, 'Entrada'), (2, 'Salida'), (3, 'Entrada')):
+            cursor = MagicMock()
+            cursor.lastrowid = movimientos
+            escaneo = repositorio.register_student_scan(cursor, persona, now)
+            self.assertEqual(escaneo.tipo, tipo)
+
+        # El registro se guarda con el día en español y sin microsegundos
+        params = cursor.execute.call_args_list[-1][0][1]
+        self.assertEqual(params[2], 'lunes')
+        self.assertEqual(str(params[1]), '10:30:15')
+
+    def test_register_helper_scan_toggle(self):
+        """Test decisión de ayudante según estado_usuarios"""
+        persona = {'nombre': 'Ana', 'apellido': 'Rojas', 'email': 'ana@uai.cl'}
+        cursor = MagicMock()
+        cursor.fetchone.return_value = {'estado': 'dentro'}
+
+        escaneo = repositorio.register_helper_scan(cursor, persona, datetime(2024, 3, 4, 18, 0))
+        self.assertEqual(escaneo.tipo, 'Salida')
+        self.assertIn('FOR UPDATE', cursor.execute.call_args_list[0][0][0])
+
+        cursor.fetchone.return_value = None
+        escaneo = repositorio.register_helper_scan(cursor, persona, datetime(2024, 3, 4, 18, 0))
+        self.assertEqual(escaneo.tipo, 'Entrada')
+
+class TestSQLiteBackend(unittest.TestCase):
+    """Tests del backend SQLite con el SQL real del repositorio"""
+
+    def setUp(self):
+        self.db = SQLiteDatabase(fixtures=True)
+        self.pool = create_pool(backend='sqlite', settings=self.db.settings, size=2)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_translate(self):
+        """Test traducción del dialecto de MySQL"""
+        self.assertEqual(
+            translate("INSERT INTO t (a) VALUES (%s) ON DUPLICATE KEY UPDATE a = VALUES(a)"),
+            "INSERT INTO t (a) VALUES (?) ON CONFLICT DO UPDATE SET a = excluded.a"
+        )
+        self.assertEqual(
+            translate("SELECT estado FROM e WHERE email = %s FOR UPDATE"),
+            "SELECT estado FROM e WHERE email = ?"
+        )
+        self.assertEqual(
+            translate("SELECT DATE_SUB(CURDATE(), INTERVAL %s DAY)"),
+            "SELECT DATE_SUB(CURDATE(), ?, 'DAY')"
+        )
+        self.assertEqual(translate("SELECT '100%%' WHERE a = %s"), "SELECT '100%' WHERE a = ?")
+        self.assertEqual(translate("SELECT '100%%'", with_params=False), "SELECT '100%%'")
+
+    def test_mysql_functions_and_types(self):
+        """Test funciones de fecha de MySQL y tipos devueltos como los drivers"""
+        rows = self.db.execute("""
+            SELECT DATE_ADD('2024-01-31', INTERVAL 1 MONTH) AS mes,
+                   LAST_DAY('2024-02-10') AS fin,
+                   WEEKDAY('2024-03-04') AS dia,
+                   IF(MOD(7, 2) = 1, 'impar', 'par') AS paridad,
+                   SUBSTRING_INDEX('Entrada,Salida', ',', 1) AS primero
+        """)
+        self.assertEqual(rows, [{'mes': '2024-02-29', 'fin': '2024-02-29', 'dia': 0,
+                                 'paridad': 'impar', 'primero': 'Entrada'}])
+
+        self.db.execute("INSERT INTO horarios_asignados (usuario_id, dia, hora_entrada, hora_salida) "
+                        "VALUES (%s, %s, %s, %s)", (1, 'lunes', time(9, 0), timedelta(hours=11)))
+        horario = self.db.execute("SELECT hora_entrada, hora_salida FROM horarios_asignados ORDER BY id DESC LIMIT 1")[0]
+        self.assertEqual(horario, {'hora_entrada': timedelta(hours=9), 'hora_salida': timedelta(hours=11)})
+
+    def test_student_scans_alternate(self):
+        """Test upsert de estudiante y contador de movimientos por día"""
+        with self.pool.transaction() as cursor:
+            estudiante = repositorio.find_student(cursor, 'elena.castro@alumnos.uai.cl')
+            self.assertEqual(repositorio.upsert_student(cursor, dict(estudiante)), estudiante['id'])
+            nuevo = repositorio.upsert_student(cursor, {'nombre': 'Iris', 'apellido': 'Mora', 'email': 'iris@alumnos.uai.cl'})
+            self.assertGreater(nuevo, estudiante['id'])
+
+            tipos = [
+                repositorio.register_student_scan(cursor, estudiante, datetime(2024, 3, 4, 9, minute)).tipo
+                for minute in range(3)
+            ]
+            self.assertEqual(tipos, ['Entrada', 'Salida', 'Entrada'])
+            self.assertTrue(repositorio.student_is_present(cursor, estudiante['email'], date(2024, 3, 4)))
+
+            # Otro día el contador vuelve a empezar
+            escaneo = repositorio.register_student_scan(cursor, estudiante, datetime(2024, 3, 5, 9, 0))
+            self.assertEqual(escaneo.tipo, 'Entrada')
+            self.assertEqual(escaneo.fecha, date(2024, 3, 5))
+
+    def test_student_state_keeps_scan_parity(self):
+        """Test que un tipo fijado a mano deja el contador con su paridad"""
+        email = 'elena.castro@alumnos.uai.cl'
+        with self.pool.transaction() as cursor:
+            estudiante = repositorio.find_student(cursor, email)
+            pasos = [
+                ('Entrada', 1), ('Entrada', 3), ('Salida', 4), ('Salida', 6), ('Entrada', 7),
+            ]
+            for tipo, movimientos in pasos:
+                repositorio.set_student_state(cursor, email, date(2024, 3, 4), tipo)
+                cursor.execute("SELECT movimientos FROM estado_estudiantes WHERE email = %s", (email,))
+                self.assertEqual(cursor.fetchone()['movimientos'], movimientos, tipo)
+
+            escaneo = repositorio.register_student_scan(cursor, estudiante, datetime(2024, 3, 4, 12, 0))
+            self.assertEqual(escaneo.tipo, 'Salida')
+
+            # Un día nuevo empieza en 1 o 2 según el tipo
+            repositorio.set_student_state(cursor, email, date(2024, 3, 5), 'Salida')
+            escaneo = repositorio.register_student_scan(cursor, estudiante, datetime(2024, 3, 5, 9, 0))
+            self.assertEqual(escaneo.tipo, 'Entrada')
+
+    def test_helper_scans_and_presence(self):
+        """Test Entrada/Salida de ayudantes con estado_usuarios y presencia del día"""
+        with self.pool.transaction() as cursor:
+            ayudante = repositorio.find_helper(cursor, 'ana.rojas@uai.cl')
+            tipos = [
+                repositorio.register_helper_scan(cursor, ayudante, datetime(2024, 3, 4, hour)).tipo
+                for hour in (9, 11, 14)
+            ]
+            self.assertEqual(tipos, ['Entrada', 'Salida', 'Entrada'])
+            presentes = repositorio.helpers_present(cursor, date(2024, 3, 4))
+            # Los ayudantes inactivos no se encuentran
+            self.assertIsNone(repositorio.find_helper(cursor, 'diego.perez@uai.cl'))
+
+        self.assertEqual([p['email'] for p in presentes], ['ana.rojas@uai.cl'])
+        self.assertEqual(presentes[0]['ultima_entrada'], timedelta(hours=14))
+
+    def test_lock_errors_are_retryable(self):
+        """Test que un bloqueo de SQLite llega con el código de MySQL"""
+        first = self.db.connect(autocommit=False)
+        second = SQLiteConnection(self.db.target, timeout=0)
+        first.begin()
+        try:
+            with self.assertRaises(SQLiteError) as caught:
+                second.begin()
+            self.assertTrue(is_lock_conflict(caught.exception))
+        finally:
+            first.rollback()
+            second.close()
+            first.close()
+
+    def test_read_then_write_waits_for_writer(self):
+        """Test que una transacción que lee y luego escribe espera al otro escritor"""
+        reader = self.db.connect(autocommit=False)
+        writer = self.db.connect(autocommit=False)
+        try:
+            cursor = reader.cursor(dictionary=True)
+            self.assertIsNotNone(repositorio.find_student(cursor, 'elena.castro@alumnos.uai.cl'))
+
+            writer.begin()
+            writer.cursor().execute("UPDATE usuarios_estudiantes SET TP = %s WHERE id = 1", ('Derecho',))
+            threading.Timer(0.1, writer.commit).start()
+
+            cursor.execute("UPDATE usuarios_estudiantes SET TP = %s WHERE id = 2", ('Diseño',))
+            reader.commit()
+        finally:
+            reader.close()
+            writer.close()
+
+    def test_named_locks(self):
+        """Test que GET_LOCK es exclusivo por nombre y se libera al cerrar"""
+        first = self.db.connect(autocommit=True)
+        second = self.db.connect(autocommit=True)
+
+        def get_lock(connection, name):
+            cursor = connection.cursor()
+            cursor.execute("SELECT GET_LOCK(%s, 0)", (name,))
+            return cursor.fetchone()[0]
+
+        try:
+            self.assertEqual(get_lock(first, 'labinf:prueba'), 1)
+            self.assertEqual(get_lock(second, 'labinf:prueba'), 0)
+            self.assertEqual(get_lock(second, 'labinf:otra'), 1)
+
+            first.close()
+            self.assertEqual(get_lock(second, 'labinf:prueba'), 1)
+            cursor = second.cursor()
+            cursor.execute("SELECT RELEASE_LOCK(%s)", ('labinf:prueba',))
+            self.assertEqual(cursor.fetchone()[0], 1)
+        finally:
+            second.close()
+
+class TestMetrics(unittest.TestCase):
+    """Tests para las métricas por petición y por sentencia"""
+
+    def setUp(self):
+        from flask import Flask
+
+        metrics.reset_metrics()
+        self.db = SQLiteDatabase(fixtures=True)
+        self.pool = create_pool(backend='sqlite', settings=self.db.settings, size=1)
+        self.app = Flask(__name__)
+
+        @self.app.route('/usuarios/<int:usuario_id>')
+        def usuario(usuario_id):
+            conn = self.pool.acquire()
+            try:
+                with conn.cursor() as cursor:
+                    for _ in range(3):
+                        cursor.execute("SELECT id FROM usuarios_permitidos WHERE id = %s", (usuario_id,))
+                        cursor.fetchall()
+            finally:
+                conn.close()
+            return 'ok'
+
+        metrics.init_metrics(self.app, 'prueba')
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_server_timing_header(self):
+        """Test que cada respuesta informa sentencias, filas y tiempo de base"""
+        response = self.client.get('/usuarios/1')
+        timing = response.headers['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="3 queries, 3 rows"', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_prometheus_histograms(self):
+        """Test que /metrics agrupa por plantilla de ruta y por sentencia"""
+        self.client.get('/usuarios/1')
+        self.client.get('/usuarios/2')
+        text = self.client.get('/metrics').get_data(as_text=True)
+
+        self.assertIn('# TYPE labinf_http_request_duration_seconds histogram', text)
+        self.assertRegex(text, r'labinf_http_request_queries_count\{service="prueba",method="GET",'
+                               r'route="/usuarios/<int:usuario_id>",pid="\d+"\} 2')
+        self.assertRegex(text, r'labinf_http_request_queries_bucket\{[^}]*le="5"[^}]*\} 2')
+        self.assertRegex(text, r'labinf_db_query_duration_seconds_count\{service="prueba",query_id="\w+",'
+                               r'query="SELECT id FROM usuarios_permitidos WHERE id = %s",pid="\d+"\} 6')
+        self.assertNotIn('route="/metrics"', text)
+
+    def test_outside_request(self):
+        """Test que las sentencias fuera de una petición solo van al histograma por sentencia"""
+        self.assertIsNone(metrics.current_request())
+        conn = self.pool.acquire()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+        finally:
+            conn.close()
+        series = metrics.QUERY_SECONDS.snapshot()
+        self.assertEqual(sum(count for _, _, count in series.values()), 1)
+        self.assertEqual(metrics.REQUEST_QUERIES.snapshot(), {})
+
+class TestDetector(unittest.TestCase):
+    """Tests para el detector de sentencias lentas y N+1"""
+
+    def setUp(self):
+        from flask import Flask
+        import tempfile
+
+        detector.get_findings(reset=True)
+        self.saved = (detector.REPEAT_THRESHOLD, detector.SLOW_MS, detector.LOG_PATH, detector._logger)
+        self.tmp = tempfile.TemporaryDirectory()
+        detector.REPEAT_THRESHOLD = 2
+        detector.LOG_PATH = os.path.join(self.tmp.name, 'hallazgos.log')
+        detector._logger = None
+
+        self.db = SQLiteDatabase(fixtures=True)
+        self.pool = create_pool(backend='sqlite', settings=self.db.settings, size=1)
+        self.app = Flask(__name__)
+
+        @self.app.route('/ayudantes')
+        def ayudantes():
+            conn = self.pool.acquire()
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT id FROM usuarios_permitidos")
+                    for row in cursor.fetchall():
+                        cursor.execute("SELECT * FROM horarios_asignados WHERE usuario_id = %s", (row['id'],))
+                        cursor.fetchall()
+            finally:
+                conn.close()
+            return 'ok'
+
+        metrics.init_metrics(self.app, 'prueba')
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        logger = detector._logger
+        if logger is not None:
+            for handler in list(logger.handlers):
+                handler.close()
+                logger.removeHandler(handler)
+        detector.REPEAT_THRESHOLD, detector.SLOW_MS, detector.LOG_PATH, detector._logger = self.saved
+        detector.get_findings(reset=True)
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_repeated_statement_is_flagged(self):
+        """Test que una sentencia repetida en una petición queda como n_plus_one"""
+        self.client.get('/ayudantes')
+        self.client.get('/ayudantes')
+
+        findings = detector.get_findings()['findings']
+        self.assertEqual(len(findings), 1)
+        finding = findings[0]
+        self.assertEqual(finding['kind'], 'n_plus_one')
+        self.assertEqual(finding['route'], '/ayudantes')
+        self.assertEqual(finding['occurrences'], 2)
+        self.assertGreater(finding['max_count'], 2)
+        self.assertIn('FROM horarios_asignados WHERE usuario_id = %s', finding['query'])
+
+        # El log escribe la primera vez y no repite dentro del intervalo
+        with open(detector.LOG_PATH) as log:
+            lines = [json.loads(line) for line in log]
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0]['kind'], 'n_plus_one')
+        self.assertEqual(lines[0]['service'], 'prueba')
+
+    def test_slow_statement_is_flagged(self):
+        """Test que una ejecución sobre el umbral queda como slow_query, con sus filas"""
+        detector.REPEAT_THRESHOLD = 1000
+        detector.SLOW_MS = 0
+        self.client.get('/ayudantes')
+
+        slow = [f for f in detector.get_findings(reset=True)['findings'] if f['kind'] == 'slow_query']
+        by_query = {f['query']: f for f in slow}
+        self.assertEqual(by_query['SELECT id FROM usuarios_permitidos']['route'], '/ayudantes')
+        self.assertGreater(by_query['SELECT id FROM usuarios_permitidos']['rows'], 0)
+        self.assertEqual(detector.get_findings()['findings'], [])
+
+class TestProfiler(unittest.TestCase):
+    """Tests para el perfilado bajo demanda"""
+
+    def setUp(self):
+        import tempfile
+
+        self.saved = (profiler.SECRET, profiler.SAMPLE_RATE, profiler.PROFILE_DIR)
+        self.tmp = tempfile.TemporaryDirectory()
+        profiler.SECRET = 'secreto'
+        profiler.SAMPLE_RATE = 0
+        profiler.PROFILE_DIR = os.path.join(self.tmp.name, 'perfiles')
+        self.db = SQLiteDatabase(fixtures=True)
+        self.pool = create_pool(backend='sqlite', settings=self.db.settings, size=1)
+
+    def tearDown(self):
+        profiler.SECRET, profiler.SAMPLE_RATE, profiler.PROFILE_DIR = self.saved
+        self.db.close()
+        self.tmp.cleanup()
+
+    def make_app(self):
+        from flask import Flask
+
+        app = Flask(__name__)
+
+        @app.route('/lento')
+        def lento():
+            conn = self.pool.acquire()
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT id FROM usuarios_permitidos")
+                    cursor.fetchall()
+            finally:
+                conn.close()
+            threading.Event().wait(0.05)
+            return 'ok'
+
+        metrics.init_metrics(app, 'prueba')
+        profiler.init_profiler(app, 'prueba')
+        return app
+
+    def signed(self, path):
+        return {profiler.HEADER: profiler.sign('secreto', 'GET', path)}
+
+    def test_signature(self):
+        """Test que la firma cubre método, ruta y vigencia"""
+        header = profiler.sign('secreto', 'GET', '/lento', timestamp=1000)
+        self.assertTrue(profiler.verify('secreto', header, 'GET', '/lento', now=1010))
+        self.assertFalse(profiler.verify('secreto', header, 'POST', '/lento', now=1010))
+        self.assertFalse(profiler.verify('secreto', header, 'GET', '/otra', now=1010))
+        self.assertFalse(profiler.verify('otro', header, 'GET', '/lento', now=1010))
+        self.assertFalse(profiler.verify('secreto', header, 'GET', '/lento', now=1000 + profiler.SIGNATURE_TTL + 1))
+        self.assertFalse(profiler.verify('secreto', 'basura', 'GET', '/lento'))
+
+    def test_disabled_adds_no_hooks(self):
+        """Test que sin secreto ni muestra la app queda sin hooks ni endpoints"""
+        from flask import Flask
+
+        profiler.SECRET = ''
+        app = Flask(__name__)
+        profiler.init_profiler(app, 'prueba')
+        self.assertEqual(dict(app.before_request_funcs), {})
+        self.assertEqual(dict(app.after_request_funcs), {})
+        self.assertNotIn('profiles', app.view_functions)
+
+    def test_signed_request_is_profiled(self):
+        """Test que una petición firmada deja un .pstats descargable con sus metadatos"""
+        import pstats
+
+        client = self.make_app().test_client()
+        self.assertNotIn('X-Profile-Id', client.get('/lento').headers)
+        self.assertNotIn('X-Profile-Id', client.get('/lento', headers={profiler.HEADER: '1:abc'}).headers)
+
+        profile_id = client.get('/lento', headers=self.signed('/lento')).headers['X-Profile-Id']
+        self.assertEqual(client.get('/profiles').status_code, 403)
+        listing = client.get('/profiles', headers=self.signed('/profiles')).get_json()['profiles']
+        self.assertEqual(len(listing), 1)
+        metadata = listing[0]
+        self.assertEqual((metadata['id'], metadata['mode'], metadata['trigger']), (profile_id, 'cprofile', 'signed'))
+        self.assertEqual((metadata['route'], metadata['status'], metadata['queries']), ('/lento', 200, 1))
+        self.assertGreaterEqual(metadata['duration_ms'], 50)
+
+        path = f'/profiles/{profile_id}'
+        self.assertEqual(client.get(path).status_code, 403)
+        download = client.get(path, headers=self.signed(path))
+        self.assertEqual(download.status_code, 200)
+        target = os.path.join(self.tmp.name, 'descarga.pstats')
+        with open(target, 'wb') as output:
+            output.write(download.data)
+        functions = {name for _, _, name in pstats.Stats(target).stats}
+        self.assertIn('lento', functions)
+
+    def test_sampled_request_writes_collapsed_stacks(self):
+        """Test que la muestra aleatoria usa el sampler y escribe pilas colapsadas"""
+        profiler.SAMPLE_RATE = 1
+        client = self.make_app().test_client()
+        profile_id = client.get('/lento').headers['X-Profile-Id']
+
+        metadata = profiler.list_profiles()[0]
+        self.assertEqual((metadata['id'], metadata['mode'], metadata['trigger']), (profile_id, 'sample', 'sample'))
+        self.assertGreater(metadata['samples'], 0)
+        with open(os.path.join(profiler.PROFILE_DIR, metadata['file'])) as folded:
+            lines = folded.read().splitlines()
+        self.assertTrue(any(';test_comun.py:lento' in line for line in lines))
+        self.assertTrue(all(line.rsplit(' ', 1)[1].isdigit() for line in lines))
+
+    def test_prune_keeps_latest(self):
+        """Test que solo se conservan los perfiles más recientes"""
+        client = self.make_app().test_client()
+        for _ in range(3):
+            client.get('/lento', headers=self.signed('/lento'))
+        profiler.prune_profiles(keep=1)
+        self.assertEqual(len(profiler.list_profiles()), 1)
+        self.assertEqual(len(os.listdir(profiler.PROFILE_DIR)), 2)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -7,10 +7,13 @@ import json
 
 # Agregar el directorio de estudiantes al path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../back-end/estudiantes'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../back-end'))
 
 from utils.validators import validate_email, validate_required_fields, validate_qr_data
 from utils.helpers import format_response, serialize_datetime, safe_int, safe_bool
-from datetime import datetime, date, time
+from utils.helpers import encode_cursor, decode_cursor, validate_page_size
+from comun.export import ndjson_chunks, csv_chunks, gzip_chunks
+from datetime import datetime, date, time, timedelta
 
 class TestValidators(unittest.TestCase):
     """Tests para funciones de validación"""
@@ -216,6 +219,79 @@ class TestHelpers(unittest.TestCase):
         result = safe_bool('invalid', default=False)
         self.assertFalse(result)
 
+class TestPagination(unittest.TestCase):
+    """Tests para cursores y tamaño de página"""
+    
+    def test_cursor_round_trip(self):
+        """Test que un cursor codificado se decodifica igual"""
+        values = ['2024-03-15', '08:30:00', 42]
+        cursor = encode_cursor(values)
+        
+        self.assertNotIn('=', cursor)
+        self.assertEqual(decode_cursor(cursor, 3), values)
+    
+    def test_decode_cursor_invalid(self):
+        """Test que cursores mal formados se rechazan"""
+        invalid_cursors = [
+            'no-es-base64!!',
+            encode_cursor(['2024-03-15', '08:30:00']),
+            encode_cursor({'id': 1})
+        ]
+        
+        for cursor in invalid_cursors:
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor, 3)
+    
+    def test_validate_page_size(self):
+        """Test límites del tamaño de página"""
+        test_cases = [
+            ({}, 100),
+            ({'per_page': '20'}, 20),
+            ({'per_page': '0'}, 1),
+            ({'per_page': '10000'}, 500),
+            ({'per_page': 'abc'}, 100)
+        ]
+        
+        for args, expected in test_cases:
+            request = MagicMock()
+            request.args = args
+            self.assertEqual(validate_page_size(request), expected)
+
+class TestExport(unittest.TestCase):
+    """Tests para la exportación en streaming"""
+    
+    columns = ['id', 'fecha', 'hora', 'tipo']
+    rows = [
+        (1, date(2024, 3, 15), timedelta(hours=8, minutes=5), 'Entrada'),
+        (2, date(2024, 3, 15), timedelta(hours=17, seconds=30), 'Salida')
+    ]
+    
+    def test_ndjson_chunks(self):
+        """Test una línea JSON por fila con fechas y horas serializadas"""
+        text = ''.join(ndjson_chunks(self.columns, iter(self.rows), batch_size=1))
+        lines = [json.loads(line) for line in text.splitlines()]
+        
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(lines[0], {'id': 1, 'fecha': '2024-03-15', 'hora': '08:05:00', 'tipo': 'Entrada'})
+        self.assertEqual(lines[1]['hora'], '17:00:30')
+    
+    def test_csv_header_first(self):
+        """Test que la cabecera CSV sale antes de leer filas"""
+        chunks = csv_chunks(self.columns, iter(self.rows))
+        
+        self.assertEqual(next(chunks).strip(), 'id,fecha,hora,tipo')
+        self.assertEqual(''.join(chunks).splitlines(), [
+            '1,2024-03-15,08:05:00,Entrada',
+            '2,2024-03-15,17:00:30,Salida'
+        ])
+    
+    def test_gzip_chunks(self):
+        """Test que el flujo comprimido es un gzip válido"""
+        import gzip
+        chunks = [b'linea 1\n', b'linea 2\n']
+        
+        self.assertEqual(gzip.decompress(b''.join(gzip_chunks(iter(chunks)))), b''.join(chunks))
+
 class TestDatabaseConfig(unittest.TestCase):
     """Tests para configuración de base de datos"""
     
@@ -245,6 +321,75 @@ class TestDatabaseConfig(unittest.TestCase):
                         # Es normal que falle sin contexto completo de Flask
                         self.assertTrue(callable(get_db))
 
+class TestStatementCache(unittest.TestCase):
+    """Tests para el caché de prepared statements y los contadores"""
+    
+    class FakeConnection:
+        """Conexión física mínima: entrega un cursor nuevo por llamada"""
+        def __init__(self):
+            self.connection_id = 1
+            self.created = 0
+        
+        def cursor(self, prepared=False):
+            self.created += 1
+            return MagicMock(name=f'cursor{self.created}')
+    
+    def test_prepared_cursor_reused_per_query(self):
+        """Test que la misma sentencia reutiliza su cursor preparado"""
+        from config.database import prepared_cursor
+        conn = self.FakeConnection()
+        
+        first = prepared_cursor(conn, "SELECT 1")
+        self.assertIs(prepared_cursor(conn, "SELECT 1"), first)
+        self.assertIsNot(prepared_cursor(conn, "SELECT 2"), first)
+        self.assertEqual(conn.created, 2)
+    
+    def test_prepared_cursor_cache_bounded(self):
+        """Test que el caché descarta (y cierra) el menos usado"""
+        from config import database
+        conn = self.FakeConnection()
+        
+        oldest = database.prepared_cursor(conn, "SELECT 0")
+        for i in range(1, database.STATEMENT_CACHE_SIZE + 1):
+            database.prepared_cursor(conn, f"SELECT {i}")
+        
+        oldest.close.assert_called_once()
+        self.assertEqual(len(conn._statement_cache['cursors']), database.STATEMENT_CACHE_SIZE)
+    
+    def test_prepared_cursor_reset_on_reconnect(self):
+        """Test que una reconexión invalida los statements preparados"""
+        from config.database import prepared_cursor
+        conn = self.FakeConnection()
+        
+        first = prepared_cursor(conn, "SELECT 1")
+        conn.connection_id = 2
+        self.assertIsNot(prepared_cursor(conn, "SELECT 1"), first)
+    
+    def test_statement_stats(self):
+        """Test contadores por sentencia con espacios normalizados"""
+        from config.database import record_statement, get_statement_stats
+        get_statement_stats(reset=True)
+        
+        record_statement("SELECT *\n  FROM t", 0.010)
+        record_statement("SELECT * FROM t", 0.030, error=True)
+        stats = get_statement_stats(reset=True)
+        
+        self.assertEqual(len(stats), 1)
+        self.assertEqual(stats[0]['query'], 'SELECT * FROM t')
+        self.assertEqual(stats[0]['calls'], 2)
+        self.assertEqual(stats[0]['errors'], 1)
+        self.assertAlmostEqual(stats[0]['avg_ms'], 20.0)
+        self.assertEqual(get_statement_stats(), [])
+    
+    def test_execute_query_requires_kind(self):
+        """Test que el tipo de sentencia se declara explícitamente"""
+        from config.database import execute_query
+        
+        with self.assertRaises(TypeError):
+            execute_query("SELECT 1")
+        with self.assertRaises(ValueError):
+            execute_query("SELECT 1", kind='select')
+
 class TestAppCreation(unittest.TestCase):
     """Tests básicos de creación de aplicación"""
     
@@ -276,6 +421,230 @@ class TestAppCreation(unittest.TestCase):
         self.assertIn('timestamp', health_response)
         self.assertIn('message', health_response)
 
+@unittest.skipUnless(os.getenv('TEST_MYSQL_HOST'), "Requiere TEST_MYSQL_HOST (base MySQL de prueba)")
+class TestQRScanConcurrency(unittest.TestCase):
+    """Escaneos simultáneos del mismo estudiante contra una base MySQL real"""
+    
+    SCANS = 40
+    EMAIL = 'concurrencia.qr@test.cl'
+    
+    @classmethod
+    def setUpClass(cls):
+        import mysql.connector
+        from app import create_app
+        
+        cls.db_config = {
+            'host': os.getenv('TEST_MYSQL_HOST'),
+            'user': os.getenv('TEST_MYSQL_USER', 'root'),
+            'password': os.getenv('TEST_MYSQL_PASSWORD', ''),
+            'database': os.getenv('TEST_MYSQL_DB', 'registro_qr_test'),
+            'autocommit': True
+        }
+        with patch.dict(os.environ, {
+            'MYSQL_HOST': cls.db_config['host'],
+            'MYSQL_USER': cls.db_config['user'],
+            'MYSQL_PASSWORD': cls.db_config['password'],
+            'MYSQL_DB': cls.db_config['database']
+        }):
+            cls.app = create_app()
+        
+        # Crea estado_estudiantes y el índice único antes de limpiar
+        from config.schema import ensure_schema
+        with cls.app.app_context():
+            ensure_schema()
+        
+        conn = mysql.connector.connect(**cls.db_config)
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM EST_registros WHERE email = %s", (cls.EMAIL,))
+        cursor.execute("DELETE FROM usuarios_estudiantes WHERE email = %s", (cls.EMAIL,))
+        cursor.execute("DELETE FROM estado_estudiantes WHERE email = %s", (cls.EMAIL,))
+        conn.close()
+    
+    def test_parallel_scans_alternate(self):
+        """Test que N escaneos paralelos producen Entrada/Salida alternadas"""
+        from concurrent.futures import ThreadPoolExecutor
+        import mysql.connector
+        
+        def scan(_):
+            qr_data = json.dumps({
+                'name': 'Test', 'surname': 'Concurrencia', 'email': self.EMAIL,
+                'timestamp': int(datetime.now().timestamp() * 1000),
+                'tipoUsuario': 'ESTUDIANTE', 'status': 'VALID', 'autoRenewal': True
+            })
+            with self.app.test_client() as client:
+                response = client.post('/api/qr/validate', json={'qr_data': qr_data})
+                return response.status_code, response.get_json()
+        
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(scan, range(self.SCANS)))
+        
+        self.assertTrue(all(status == 200 for status, _ in results), results)
+        self.assertEqual(len({body['data']['estudiante']['id'] for _, body in results}), 1)
+        
+        conn = mysql.connector.connect(**self.db_config)
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM usuarios_estudiantes WHERE email = %s", (self.EMAIL,))
+        self.assertEqual(cursor.fetchone()[0], 1)
+        cursor.execute("SELECT tipo FROM EST_registros WHERE email = %s ORDER BY id", (self.EMAIL,))
+        tipos = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT movimientos, estado FROM estado_estudiantes WHERE email = %s", (self.EMAIL,))
+        movimientos, estado = cursor.fetchone()
+        conn.close()
+        
+        # En orden de inserción los tipos alternan sin repetirse
+        self.assertEqual(tipos, ['Entrada' if i % 2 == 0 else 'Salida' for i in range(self.SCANS)])
+        self.assertEqual(movimientos, self.SCANS)
+        self.assertEqual(estado, 'fuera')
+
+class TestQRScanSQLite(unittest.TestCase):
+    """Rutas de QR y registros sobre una base SQLite nueva (DB_BACKEND=sqlite)"""
+
+    SCANS = 20
+    EMAIL = 'felipe.vera@alumnos.uai.cl'
+
+    def setUp(self):
+        from app import create_app
+        from comun import SQLiteDatabase
+
+        self.db = SQLiteDatabase(fixtures=True)
+        with patch.dict(os.environ, {'DB_BACKEND': 'sqlite', 'SQLITE_PATH': self.db.target}):
+            self.app = create_app()
+
+    def tearDown(self):
+        self.db.close()
+
+    def scan(self, _=None):
+        qr_data = json.dumps({
+            'name': 'Felipe', 'surname': 'Vera', 'email': self.EMAIL,
+            'timestamp': int(datetime.now().timestamp() * 1000),
+            'tipoUsuario': 'ESTUDIANTE', 'status': 'VALID', 'autoRenewal': True
+        })
+        with self.app.test_client() as client:
+            response = client.post('/api/qr/validate', json={'qr_data': qr_data})
+            return response.status_code, response.get_json()
+
+    def test_parallel_scans_alternate(self):
+        """Test que escaneos paralelos alternan Entrada/Salida sin duplicar al estudiante"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(self.scan, range(self.SCANS)))
+
+        self.assertTrue(all(status == 200 for status, _ in results), results)
+        tipos = [row['tipo'] for row in self.db.execute(
+            "SELECT tipo FROM EST_registros WHERE email = %s ORDER BY id", (self.EMAIL,)
+        )]
+        self.assertEqual(tipos, ['Entrada' if i % 2 == 0 else 'Salida' for i in range(self.SCANS)])
+        estado = self.db.execute("SELECT movimientos, estado FROM estado_estudiantes WHERE email = %s", (self.EMAIL,))
+        self.assertEqual(estado, [{'movimientos': self.SCANS, 'estado': 'fuera'}])
+        self.assertEqual(
+            self.db.execute("SELECT COUNT(*) AS n FROM usuarios_estudiantes WHERE email = %s", (self.EMAIL,)),
+            [{'n': 1}]
+        )
+
+    def test_registros_routes(self):
+        """Test que los listados del día, semana y mes devuelven el escaneo"""
+        self.scan()
+        with self.app.test_client() as client:
+            for route in ('/api/registros_hoy', '/api/registros_semana', '/api/registros_mes'):
+                response = client.get(route)
+                self.assertEqual(response.status_code, 200, route)
+                registros = response.get_json()['data']
+                self.assertEqual([(r['nombreEstudiante'], r['tipoRegistro']) for r in registros],
+                                 [('Felipe', 'entrada')], route)
+
+    def tipos(self):
+        return [row['tipo'] for row in self.db.execute(
+            "SELECT tipo FROM EST_registros WHERE email = %s ORDER BY id", (self.EMAIL,)
+        )]
+
+    def test_toggle_then_scan(self):
+        """Test que el escaneo siguiente a un cambio manual de presencia alterna desde él"""
+        estudiante_id = self.db.execute(
+            "SELECT id FROM usuarios_estudiantes WHERE email = %s", (self.EMAIL,)
+        )[0]['id']
+        route = f'/api/estudiantes_presentes/estudiantes/{estudiante_id}/presente'
+        with self.app.test_client() as client:
+            self.assertEqual(client.post(route, json={'presente': True}).status_code, 200)
+            self.scan()
+            self.scan()
+            self.assertEqual(client.post(route, json={'presente': False}).status_code, 200)
+            self.scan()
+
+        self.assertEqual(self.tipos(), ['Entrada', 'Salida', 'Entrada', 'Salida', 'Entrada'])
+        estado = self.db.execute("SELECT movimientos, estado FROM estado_estudiantes WHERE email = %s", (self.EMAIL,))
+        self.assertEqual(estado, [{'movimientos': 5, 'estado': 'dentro'}])
+
+    def test_manual_registro_then_scan(self):
+        """Test que un registro manual de hoy fija el tipo del escaneo siguiente"""
+        registro = {'nombre': 'Felipe', 'apellido': 'Vera', 'email': self.EMAIL}
+        with self.app.test_client() as client:
+            response = client.post('/api/registros', json={**registro, 'tipo': 'salida'})
+            self.assertEqual(response.status_code, 201)
+            self.scan()
+            response = client.post('/api/registros', json={**registro, 'tipo': 'entrada'})
+            self.assertEqual(response.status_code, 201)
+            self.scan()
+
+        self.assertEqual(self.tipos(), ['Salida', 'Entrada', 'Entrada', 'Salida'])
+
+    def estado(self):
+        return self.db.execute("SELECT movimientos, estado FROM estado_estudiantes WHERE email = %s", (self.EMAIL,))
+
+    def test_earlier_manual_registro_keeps_state(self):
+        """Test que un registro manual anterior al último escaneo no cambia el estado"""
+        self.scan()
+        self.scan()
+        registro = {'nombre': 'Felipe', 'apellido': 'Vera', 'email': self.EMAIL,
+                    'tipo': 'entrada', 'hora': '00:00:01'}
+        with self.app.test_client() as client:
+            self.assertEqual(client.post('/api/registros', json=registro).status_code, 201)
+
+        self.assertEqual(self.estado(), [{'movimientos': 4, 'estado': 'fuera'}])
+        self.scan()
+        self.assertEqual(self.tipos(), ['Entrada', 'Salida', 'Entrada', 'Entrada'])
+
+    def test_delete_registro_recomputes_state(self):
+        """Test que borrar el registro de hoy rehace el estado del estudiante"""
+        self.scan()
+        self.scan()
+        ultimo = self.db.execute("SELECT MAX(id) AS id FROM EST_registros WHERE email = %s", (self.EMAIL,))[0]['id']
+        with self.app.test_client() as client:
+            self.assertEqual(client.delete(f'/api/registros/{ultimo}').status_code, 200)
+            self.assertEqual(self.estado(), [{'movimientos': 1, 'estado': 'dentro'}])
+
+            primero = self.db.execute("SELECT MIN(id) AS id FROM EST_registros WHERE email = %s", (self.EMAIL,))[0]['id']
+            self.assertEqual(client.delete(f'/api/registros/{primero}').status_code, 200)
+            self.assertEqual(self.estado(), [{'movimientos': 0, 'estado': 'fuera'}])
+            self.assertEqual(client.delete(f'/api/registros/{primero}').status_code, 404)
+
+        self.scan()
+        self.assertEqual(self.tipos(), ['Entrada'])
+
+    def test_cursor_with_wrong_types(self):
+        """Test que un cursor bien codificado con valores de otro tipo da 400"""
+        from routes.registros import parse_registros_cursor
+        invalid_cursors = [
+            encode_cursor([1, 2, 3]),
+            encode_cursor(['2024-03-15', '08:30:00', '42']),
+            encode_cursor(['2024-03-15', '08:30:00', True]),
+            encode_cursor([None, '08:30:00', 42]),
+        ]
+        with self.app.test_client() as client:
+            for cursor in invalid_cursors:
+                with self.assertRaises(ValueError):
+                    parse_registros_cursor(cursor)
+                response = client.get('/api/registros', query_string={'cursor': cursor})
+                self.assertEqual(response.status_code, 400, cursor)
+            valid = encode_cursor(['2024-03-15', '08:30:00', 42])
+            self.assertEqual(client.get('/api/registros', query_string={'cursor': valid}).status_code, 200)
+
+    def test_schema_checked_at_startup(self):
+        """Test que el esquema se verifica al crear la app y no en cada petición"""
+        from config.schema import ensure_schema, index_available
+        self.assertTrue(index_available('uq_usuarios_estudiantes_email'))
+        self.assertNotIn(ensure_schema, self.app.before_request_funcs.get(None, []))
+
 class TestUtilityFunctions(unittest.TestCase):
     """Tests para funciones de utilidad adicionales"""
     
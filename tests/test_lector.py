@@ -435,6 +435,40 @@ class TestIntegrationBasics(unittest.TestCase):
         self.assertIsNotNone(app_config['SECRET_KEY'])
         self.assertGreater(len(app_config['SECRET_KEY']), 0)
 
+class TestValidateQRSQLite(unittest.TestCase):
+    """Endpoints del lector sobre una base SQLite nueva con datos de ejemplo"""
+
+    def setUp(self):
+        import api_qr_temporal
+        from comun import SQLiteDatabase, create_pool
+
+        self.db = SQLiteDatabase(fixtures=True)
+        self.pool = create_pool(backend='sqlite', settings=self.db.settings)
+        self.client = api_qr_temporal.app.test_client()
+        patcher = patch('api_qr_temporal.get_db_connection', side_effect=self.pool.acquire)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.db.close)
+
+    def scan(self, email, tipo_usuario):
+        return self.client.post('/validate-qr', json={
+            'name': 'Test', 'surname': 'SQLite', 'email': email, 'tipoUsuario': tipo_usuario,
+            'timestamp': int(time.time() * 1000), 'status': 'VALID'
+        }).get_json()
+
+    def test_scans_alternate_and_last_records(self):
+        """Test Entrada/Salida alternadas y últimos registros serializables"""
+        tipos = [self.scan('ana.rojas@uai.cl', 'AYUDANTE')['tipo'] for _ in range(3)]
+        self.assertEqual(tipos, ['Entrada', 'Salida', 'Entrada'])
+        self.assertEqual(self.scan('elena.castro@alumnos.uai.cl', 'ESTUDIANTE')['tipo'], 'Entrada')
+
+        # Ayudantes inactivos o desconocidos no registran
+        self.assertFalse(self.scan('diego.perez@uai.cl', 'AYUDANTE')['success'])
+
+        records = self.client.get('/get-last-records').get_json()['records']
+        self.assertEqual(len(records), 4)
+        self.assertRegex(records[0]['hora'], r'^\d{2}:\d{2}:\d{2}$')
+
 if __name__ == '__main__':
     # Configurar logging para tests
     import logging
@@ -23,7 +23,9 @@ def run_tests():
     test_modules = [
         'test_ayudantes',
         'test_estudiantes', 
-        'test_lector'
+        'test_lector',
+        'test_comun',
+        'test_cliente'
     ]
     
     total_tests = 0
@@ -160,6 +162,8 @@ def main():
             print("python test_runner.py ayudantes - Ejecutar tests de ayudantes")
             print("python test_runner.py estudiantes - Ejecutar tests de estudiantes")  
             print("python test_runner.py lector    - Ejecutar tests de lector QR")
+            print("python test_runner.py comun     - Ejecutar tests del acceso a datos compartido")
+            print("python test_runner.py cliente   - Ejecutar tests del snapshot del cliente facial")
             print("python test_runner.py requirements - Crear requirements-test.txt")
             print("python test_runner.py help      - Mostrar esta ayuda")
             return
@@ -168,7 +172,7 @@ def main():
             create_test_requirements()
             return
         
-        elif command in ['ayudantes', 'estudiantes', 'lector']:
+        elif command in ['ayudantes', 'estudiantes', 'lector', 'comun', 'cliente']:
             success = run_specific_test(command)
             sys.exit(0 if success else 1)
         